@@ -0,0 +1,1043 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import (
+    VALIDATION_STATS,
+    PRECISION_CHECK_SCENARIOS, PRECISION_REL_TOL, PRECISION_ABS_TOL,
+    FAN_CHART_QUANTILES, FAN_CHART_BIN_WIDTH, FAN_CHART_MIN_ABS, FAN_CHART_MAX_ABS
+)
+import config
+import simulation_core as sc
+from simulation_config import resolve_config
+from debt_kernel import withdraw_savings, repay_from_assets, accrue_debt, settle_tax
+import jit_kernel
+from shocks import generate_shock_timeline, get_shock_timeline
+from results import ScenarioResults
+from telemetry import make_progress_info
+
+# ===== ВЕКТОРИЗОВАННЫЙ РАСЧЕТ ПАКЕТА ПЛАНОВ =====
+# Состояние хранится массивами (планы × сценарии). Все планы пакета используют
+# один поток случайных чисел (stream_id), т.е. одну шкалу шоков, поэтому за один
+# проход по месяцам считаются сразу все планы. Формулы месячного шага
+# повторяют simulate_scenarios поэлементно: для плана с тем же потоком
+# результаты совпадают со скалярным расчетом simulate_scenarios(stream_id, ...).
+# НОВОЕ: режим float32 (config.FLOAT32_MODE или dtype=np.float32) - массивы
+# состояния в float32, денежные накопители в float64; точность контролирует
+# check_precision (пересчет части сценариев в float64).
+# НОВОЕ: параметры модели - sim_config (SimulationConfig), как в run_simulation;
+# BatchState хранит конфигурацию пакета, помесячные функции получают ее явно.
+# НОВОЕ: JIT-движок (config.JIT_BACKEND) - simulate_plan_batch в float64 считает
+# пакет ядром jit_kernel на Numba (побитово те же результаты, см. check_jit_backend);
+# потоковый iter_plan_batch и режим float32 всегда работают на NumPy.
+# НОВОЕ: веерные диаграммы (fan_chart=True) - в конце каждого месяца живые
+# массивы состояния раскладываются по бинам FAN_CHART_EDGES; хранятся только
+# счетчики (месяцы × бины) на план и показатель, без траекторий. Счетчики
+# диапазонов сценариев складываются, перцентили FAN_CHART_QUANTILES считаются
+# по сумме (fan_chart_bands) - результат не зависит от разбиения на диапазоны.
+
+# Показатели веерных диаграмм (порядок оси показателей BatchState.fan_counts)
+FAN_CHART_METRICS = ('net_wealth', 'debt', 'cushion')
+
+# Бинов логарифмической сетки по каждую сторону от нуля
+_FAN_LOG_STEP = np.log1p(FAN_CHART_BIN_WIDTH)
+_FAN_SIDE_BINS = int(np.ceil(np.log(FAN_CHART_MAX_ABS / FAN_CHART_MIN_ABS) / _FAN_LOG_STEP))
+_fan_side_edges = FAN_CHART_MIN_ABS * np.exp(np.arange(_FAN_SIDE_BINS + 1) * _FAN_LOG_STEP)
+# Границы бинов веерных диаграмм (₽): -MAX..-MIN, 0, 0, MIN..MAX (бин {0} - нулевой ширины)
+FAN_CHART_EDGES = np.concatenate((-_fan_side_edges[::-1], [0.0, 0.0], _fan_side_edges))
+
+# Ключевые показатели для контроля точности (₽)
+PRECISION_METRICS = {
+    'avg_wealth': lambda data: np.mean(data['net_wealth']),
+    'median_wealth': lambda data: np.median(data['net_wealth']),
+    'avg_final_debt': lambda data: np.mean(data['final_debt']),
+    'avg_compounding_loss': lambda data: np.mean(data['scenarios_compounding_loss']) * 1000000,
+    'avg_planned_compounding_loss': lambda data: np.mean(data['scenarios_planned_compounding_loss']) * 1000000,
+}
+
+
+def resolve_dtype(dtype=None):
+    """Тип массивов состояния: явный dtype или по config.FLOAT32_MODE"""
+    if dtype is None:
+        return np.dtype(np.float32 if config.FLOAT32_MODE else np.float64)
+    return np.dtype(dtype)
+
+
+def plan_schedules(plans, n_months):
+    """
+    Помесячные доходы и расходы планов
+
+    Returns:
+        tuple: (income, expenses) массивы (планы, n_months + 1); столбец m - месяц m
+    """
+    income = np.zeros((len(plans), n_months + 1))
+    expenses = np.zeros((len(plans), n_months + 1))
+    for p, plan_data in enumerate(plans):
+        for month in range(1, n_months + 1):
+            income[p, month], expenses[p, month] = sc.check_plan_changes(month, plan_data)
+    return income, expenses
+
+
+def _apply_cash_flow_batch(available, cushion, savings, annual_growth, debt, cushion_amount):
+    """
+    Погашение долга из потока, пополнение подушки/savings или покрытие дефицита
+    cushion_amount - целевой размер подушки (SimulationConfig.cushion_amount)
+
+    Returns:
+        np.ndarray: маска месяцев без взноса (contribution_type == 'zero')
+    """
+    # Погашение долга из текущего потока
+    repay = (debt > 0) & (available > 0)
+    if repay.any():
+        repayment = np.minimum(available[repay], debt[repay])
+        debt[repay] -= repayment
+        available[repay] -= repayment
+
+    positive = available > 0
+    negative = available < 0
+
+    # Формирование активов - сначала подушка, потом savings
+    to_cushion = positive & (cushion < cushion_amount)
+    if to_cushion.any():
+        cushion_need = np.minimum(available[to_cushion], cushion_amount - cushion[to_cushion])
+        cushion[to_cushion] += cushion_need
+        available[to_cushion] -= cushion_need
+    to_savings = positive & (available > 0)
+    savings[to_savings] += available[to_savings]
+
+    # Покрытие дефицита: подушка, затем savings с корректировкой annual_growth
+    if negative.any():
+        deficit = -available
+        from_cushion = negative & (cushion >= deficit)
+        cushion[from_cushion] -= deficit[from_cushion]
+        rest = negative & ~from_cushion
+        deficit[rest] -= cushion[rest]
+        cushion[rest] = 0
+        debt += withdraw_savings(savings, annual_growth, deficit, rest)[2]
+    return ~positive
+
+
+def _validate_batch(savings, annual_growth, mask, plan_ids, scenario_start, month, label):
+    """
+    Проверки validate_financial_state для сценариев под маской
+
+    Счетчик проверок увеличивается на число сценариев; аномальные состояния
+    (редкие) проходят через validate_financial_state для записи в лог.
+    """
+    if not sc.DEBUG_VALIDATION:
+        return
+    n_checks = int(np.count_nonzero(mask))
+    anomalies = mask & (savings <= 0) & (annual_growth > 0)
+    n_anomalies = int(np.count_nonzero(anomalies))
+    VALIDATION_STATS['total_checks'] += n_checks - n_anomalies
+    for p, s in np.argwhere(anomalies):
+        sc.validate_financial_state(savings[p, s], annual_growth[p, s],
+                                    f"Plan {plan_ids[p]}, scenario {scenario_start + s}, month {month} - {label}")
+
+
+
+class BatchState:
+    """
+    Состояние пакета планов: массивы (планы × сценарии) реального и виртуального
+    сценариев, накопители для горизонтов и таблица запланированных расходов
+
+    НОВОЕ: dtype - тип массивов состояния и счетчиков (np.float32 - режим
+    пониженной точности). Денежные накопители (поток, прямые потери, проценты,
+    сумма долга) всегда float64.
+    НОВОЕ: sim_config - параметры модели пакета (None = константы config)
+    """
+    def __init__(self, plans, n, dtype=np.float64, sim_config=None):
+        n_plans = len(plans)
+        shape = (n_plans, n)
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.sim_config = cfg = resolve_config(sim_config)
+
+        # Запланированные расходы: таблица (планы × max число расходов)
+        self.plan_expenses = [plan_data.get('planned_expenses', []) for plan_data in plans]
+        self.n_expenses = max((len(expenses) for expenses in self.plan_expenses), default=0)
+        self.expense_amount = np.zeros((n_plans, self.n_expenses))
+        self.expense_condition = np.zeros((n_plans, self.n_expenses))
+        self.expense_is_time = np.zeros((n_plans, self.n_expenses), dtype=bool)
+        self.expense_is_target = np.zeros((n_plans, self.n_expenses), dtype=bool)
+        for p, expenses in enumerate(self.plan_expenses):
+            for e, expense in enumerate(expenses):
+                self.expense_amount[p, e] = expense['amount']
+                self.expense_condition[p, e] = expense['condition']
+                self.expense_is_time[p, e] = expense['type'] == 'time'
+                self.expense_is_target[p, e] = expense['type'] == 'savings_target'
+        # Месяц срабатывания расхода (0 = не было)
+        self.expense_month = np.zeros((n_plans, n, self.n_expenses), dtype=np.int16)
+
+        # Инициализация стартового капитала с защитой от некорректных значений
+        initial_capital = np.array([max(0, plan_data.get('initial_capital', 0) or 0) for plan_data in plans],
+                                   dtype=float)[:, None]
+        self.cushion = np.broadcast_to(np.minimum(cfg.cushion_amount, initial_capital), shape).astype(dtype)
+        self.savings = np.broadcast_to(np.maximum(0, initial_capital - cfg.cushion_amount), shape).astype(dtype)
+        self.debt = np.zeros(shape, dtype=dtype)
+        self.annual_growth = np.zeros(shape, dtype=dtype)
+        self.is_restructured = np.zeros(shape, dtype=bool)
+
+        # Виртуальный сценарий для расчета потерь компаундинга
+        self.virtual_cushion = self.cushion.copy()
+        self.virtual_savings = self.savings.copy()
+        self.virtual_debt = np.zeros(shape, dtype=dtype)
+        self.virtual_annual_growth = np.zeros(shape, dtype=dtype)
+        self.virtual_is_restructured = np.zeros(shape, dtype=bool)
+
+        # Накопители по сценариям (денежные - float64 в любом режиме)
+        self.scenario_cash_flow = np.zeros(shape)
+        self.direct_losses_total = np.zeros(shape)
+        self.months_zero = np.zeros(shape, dtype=dtype)
+        self.minor_em_count = np.zeros(n, dtype=dtype)
+        self.medium_em_count = np.zeros(n, dtype=dtype)
+        self.major_em_count = np.zeros(n, dtype=dtype)
+        self.max_debt = np.zeros(shape, dtype=dtype)
+        self.months_with_debt = np.zeros(shape, dtype=dtype)
+        self.debt_sum = np.zeros(shape)
+        self.total_interest_paid = np.zeros(shape)
+        self.restructuring_count = np.zeros(shape, dtype=dtype)
+        self.bankruptcy_count = np.zeros(shape, dtype=dtype)
+        self.months_restructuring = np.zeros(shape, dtype=dtype)
+        # НОВОЕ: время до событий - месяцы первого наступления (0 = не было), int16
+        self.first_debt_month = np.zeros(shape, dtype=np.int16)
+        self.first_restructuring_month = np.zeros(shape, dtype=np.int16)
+        self.first_bankruptcy_month = np.zeros(shape, dtype=np.int16)
+        self.first_cushion_depletion_month = np.zeros(shape, dtype=np.int16)
+        self.first_cushion_recovery_months = np.zeros(shape, dtype=np.int16)
+        self.max_cushion_depletion_months = np.zeros(shape, dtype=np.int16)
+        self.cushion_depleted_since = np.zeros(shape, dtype=np.int16)  # 0 = подушка полна
+        self.cushion_full = self.cushion >= cfg.cushion_amount
+        # Доли шоков по месяцам (для каждого плана - список массивов по месяцам)
+        self.shock_pct_chunks = [[] for _ in range(n_plans)]
+        # Гистограммы веерных диаграмм (планы, показатели, месяцы, бины); None = не считаются
+        self.fan_counts = None
+
+
+def simulate_plan_batch(plans, scenario_start, scenario_stop, horizons=None, seed=None,
+                        stream_id='service', timeline=None, profiler=None, plan_ids=None, dtype=np.float64,
+                        sim_config=None, backend=None, fan_chart=False):
+    """
+    НОВАЯ ФУНКЦИЯ: Векторизованная симуляция пакета планов на сценариях [scenario_start, scenario_stop)
+
+    Args:
+        plans: список планов (формат PLANS)
+        stream_id: поток случайных чисел (общий для всех планов пакета)
+        timeline: готовая шкала шоков потока (например, из кэша); None = строится здесь
+        profiler: PhaseProfiler или None
+        plan_ids: подписи планов для лога валидации
+        dtype: тип массивов состояния (np.float32 - режим пониженной точности, см. BatchState)
+        sim_config: параметры модели (SimulationConfig); seed=None - sim_config.random_seed
+        backend: движок ('auto', 'numba', 'numpy'; None = config.JIT_BACKEND). Ядро
+                 Numba используется для float64 без профилировщика фаз и веерных диаграмм
+        fan_chart: считать помесячные гистограммы веерных диаграмм (расчет всегда на NumPy)
+
+    Returns:
+        list: сырые результаты по горизонтам для каждого плана (формат simulate_scenarios);
+        при fan_chart=True - кортеж (сырые результаты, [гистограммы для каждого плана]);
+        гистограмма - счетчики (FAN_CHART_METRICS, месяцы, бины FAN_CHART_EDGES)
+    """
+    if (jit_kernel.resolve_backend(backend) == 'numba' and np.dtype(dtype) == np.float64
+            and profiler is None and not fan_chart):
+        return _simulate_plan_batch_jit(plans, scenario_start, scenario_stop, horizons, seed, stream_id,
+                                        timeline, plan_ids, sim_config)
+    raw = [{} for _ in plans]
+    fan_counts = [] if fan_chart else None
+    for years, horizon_parts in iter_plan_batch(plans, scenario_start, scenario_stop, horizons, seed,
+                                                stream_id, timeline, profiler, plan_ids, dtype, sim_config,
+                                                fan_counts):
+        for plan_raw, horizon_data in zip(raw, horizon_parts):
+            plan_raw[years] = horizon_data
+    if fan_chart:
+        return raw, list(fan_counts[0])
+    return raw
+
+
+def iter_plan_batch(plans, scenario_start, scenario_stop, horizons=None, seed=None,
+                    stream_id='service', timeline=None, profiler=None, plan_ids=None, dtype=np.float64,
+                    sim_config=None, fan_counts=None):
+    """
+    НОВОЕ: Генератор векторизованной симуляции - отдает горизонт сразу после его месяца
+
+    Параметры - как у simulate_plan_batch.
+    fan_counts: список, в который кладется массив гистограмм веерных диаграмм
+                (планы, FAN_CHART_METRICS, месяцы, бины FAN_CHART_EDGES); None = не считаются.
+                Массив заполняется по мере расчета месяцев.
+
+    Yields:
+        tuple: (years, [сырые результаты горизонта для каждого плана])
+    """
+    cfg = resolve_config(sim_config)
+    savings_return_rate = cfg.savings_return_rate
+    ideal_return_rate = cfg.ideal_return_rate
+    tax_rate = cfg.tax_rate
+    partial_loss_rate = cfg.partial_loss_rate
+    if seed is None:
+        seed = cfg.random_seed
+    horizons = sc.normalize_horizons(horizons, cfg)
+    n_months = max(horizons) * 12
+    snapshot_months = {years * 12 for years in cfg.horizons if years * 12 <= n_months}
+    if plan_ids is None:
+        plan_ids = [f"{stream_id}#{p}" for p in range(len(plans))]
+
+    profiling = profiler is not None
+    if profiling:
+        profiler.start()
+
+    if timeline is None or not timeline.covers(scenario_start, scenario_stop, n_months):
+        timeline = generate_shock_timeline(seed, stream_id, scenario_start, scenario_stop, n_months, cfg)
+    rows = slice(scenario_start - timeline.scenario_start, scenario_stop - timeline.scenario_start)
+    emergency_costs = timeline.emergency_cost[rows].astype(dtype)
+    minor_counts = timeline.minor_count[rows]
+    medium_counts = timeline.medium_count[rows]
+    major_counts = timeline.major_count[rows]
+    partial_losses = timeline.partial_loss[rows]
+    full_losses = timeline.full_loss[rows]
+    if profiling:
+        profiler.lap('events')
+
+    n = scenario_stop - scenario_start
+    state = BatchState(plans, n, dtype, cfg)
+    income_schedule, expense_schedule = (schedule.astype(dtype) for schedule in plan_schedules(plans, n_months))
+    raw = [sc._empty_scenario_results(n, expenses, horizons) for expenses in state.plan_expenses]
+    if fan_counts is not None:
+        state.fan_counts = np.zeros((len(plans), len(FAN_CHART_METRICS), n_months, len(FAN_CHART_EDGES) - 1),
+                                    dtype=np.int32)
+        fan_counts.append(state.fan_counts)
+
+    for month in range(1, n_months + 1):
+        current_income = income_schedule[:, month:month + 1]
+        current_expenses = expense_schedule[:, month:month + 1]
+        target_savings = current_income - current_expenses
+        m = month - 1
+
+        # Начало года - сброс для налога
+        if month % 12 == 1:
+            state.annual_growth[:] = 0
+            state.virtual_annual_growth[:] = 0
+        if profiling:
+            profiler.lap('plan_changes')
+
+        # РЕАЛЬНЫЙ СЦЕНАРИЙ
+        repay_from_assets(state.cushion, state.savings, state.annual_growth, state.debt)
+        *_, accrued = accrue_debt(state.debt, state.cushion, state.savings, state.annual_growth,
+                                  state.is_restructured, current_income, cfg)
+        if accrued is not None:
+            bankrupt, newly_restructured, restructured, interest = accrued
+            state.bankruptcy_count += bankrupt
+            state.restructuring_count += newly_restructured
+            state.months_restructuring += restructured
+            state.total_interest_paid += interest
+            state.first_bankruptcy_month[bankrupt & (state.first_bankruptcy_month == 0)] = month
+            state.first_restructuring_month[newly_restructured & (state.first_restructuring_month == 0)] = month
+
+        # Начисление доходности только на savings (подушка не растет)
+        growing = state.savings > 0
+        growth = state.savings[growing] * savings_return_rate
+        state.annual_growth[growing] += growth
+        state.savings[growing] += growth
+        if profiling:
+            profiler.lap('debt')
+        _validate_batch(state.savings, state.annual_growth, growing, plan_ids, scenario_start, month, "after growth")
+        if profiling:
+            profiler.lap('validation')
+
+        # Шоки месяца из шкалы (общей для всех планов пакета)
+        emergency_cost = emergency_costs[:, m]
+        state.minor_em_count += minor_counts[:, m]
+        state.medium_em_count += medium_counts[:, m]
+        state.major_em_count += major_counts[:, m]
+        available = (current_income - current_expenses) - emergency_cost
+        loss = np.where(partial_losses[:, m], current_income * partial_loss_rate, 0.0)
+        loss = np.where(full_losses[:, m], loss + current_income, loss)
+        state.direct_losses_total += emergency_cost + loss
+        available -= loss
+        if profiling:
+            profiler.lap('events')
+
+        # Запланированные расходы (по порядку в плане, только из savings)
+        if state.n_expenses:
+            current_year = (month - 1) // 12 + 1
+            for e in range(state.n_expenses):
+                amount = state.expense_amount[:, e:e + 1]
+                condition = state.expense_condition[:, e:e + 1]
+                pending = state.expense_month[:, :, e] == 0
+                due = pending & (
+                    (state.expense_is_time[:, e:e + 1] & (current_year >= condition) & (state.savings >= amount))
+                    | (state.expense_is_target[:, e:e + 1] & (state.savings >= condition))
+                )
+                if due.any():
+                    state.debt += withdraw_savings(state.savings, state.annual_growth, amount, due)[2]
+                    state.expense_month[:, :, e][due] = month
+        if profiling:
+            profiler.lap('planned_expenses')
+
+        # Новая метрика: доля шока в плановом остатке
+        shock_total = emergency_cost + loss
+        shocked = (shock_total > 0) & (target_savings > 0)
+        if shocked.any():
+            shock_pct = (shock_total / target_savings) * 100
+            for p, chunks in enumerate(state.shock_pct_chunks):
+                chunks.append(shock_pct[p][shocked[p]])
+
+        zero_contribution = _apply_cash_flow_batch(available, state.cushion, state.savings,
+                                                   state.annual_growth, state.debt, cfg.cushion_amount)
+        repay_from_assets(state.cushion, state.savings, state.annual_growth, state.debt)
+        state.scenario_cash_flow += ((current_income - current_expenses) - loss) - emergency_cost
+        if profiling:
+            profiler.lap('cash_flow')
+
+        # Уплата налога (в конце года)
+        if month % 12 == 0:
+            taxed = state.annual_growth > 0
+            if taxed.any():
+                if profiling:
+                    profiler.lap('tax')
+                _validate_batch(state.savings, state.annual_growth, taxed, plan_ids, scenario_start, month,
+                                "before tax")
+                if profiling:
+                    profiler.lap('validation')
+                state.debt += settle_tax(state.savings, state.annual_growth, tax_rate, taxed)[2]
+                if profiling:
+                    profiler.lap('tax')
+                _validate_batch(state.savings, state.annual_growth, taxed, plan_ids, scenario_start, month,
+                                "after tax")
+                if profiling:
+                    profiler.lap('validation')
+                repay_from_assets(state.cushion, state.savings, state.annual_growth, state.debt, mask=taxed)
+        if profiling:
+            profiler.lap('tax')
+
+        # ВИРТУАЛЬНЫЙ СЦЕНАРИЙ (без шоков, с теми же запланированными расходами)
+        repay_from_assets(state.virtual_cushion, state.virtual_savings, state.virtual_annual_growth,
+                          state.virtual_debt)
+        accrue_debt(state.virtual_debt, state.virtual_cushion, state.virtual_savings,
+                    state.virtual_annual_growth, state.virtual_is_restructured, current_income, cfg)
+        virtual_growing = state.virtual_savings > 0
+        virtual_growth = state.virtual_savings[virtual_growing] * ideal_return_rate
+        state.virtual_annual_growth[virtual_growing] += virtual_growth
+        state.virtual_savings[virtual_growing] += virtual_growth
+
+        virtual_available = np.broadcast_to(current_income - current_expenses, state.shape).copy()
+        _apply_cash_flow_batch(virtual_available, state.virtual_cushion, state.virtual_savings,
+                               state.virtual_annual_growth, state.virtual_debt, cfg.cushion_amount)
+
+        # КЛЮЧЕВОЕ: Синхронизированные траты из реального сценария
+        for e in range(state.n_expenses):
+            spent = state.expense_month[:, :, e] == month
+            if spent.any():
+                state.virtual_debt += withdraw_savings(state.virtual_savings, state.virtual_annual_growth,
+                                                       state.expense_amount[:, e:e + 1], spent)[2]
+
+        repay_from_assets(state.virtual_cushion, state.virtual_savings, state.virtual_annual_growth,
+                          state.virtual_debt)
+
+        if month % 12 == 0:
+            virtual_taxed = state.virtual_annual_growth > 0
+            if virtual_taxed.any():
+                if profiling:
+                    profiler.lap('virtual')
+                _validate_batch(state.virtual_savings, state.virtual_annual_growth, virtual_taxed, plan_ids,
+                                scenario_start, month, "virtual before tax")
+                if profiling:
+                    profiler.lap('validation')
+                state.virtual_debt += settle_tax(state.virtual_savings, state.virtual_annual_growth, tax_rate,
+                                                 virtual_taxed)[2]
+                if profiling:
+                    profiler.lap('virtual')
+                _validate_batch(state.virtual_savings, state.virtual_annual_growth, virtual_taxed, plan_ids,
+                                scenario_start, month, "virtual after tax")
+                if profiling:
+                    profiler.lap('validation')
+                repay_from_assets(state.virtual_cushion, state.virtual_savings, state.virtual_annual_growth,
+                                  state.virtual_debt, mask=virtual_taxed)
+        if profiling:
+            profiler.lap('virtual')
+
+        # Обновление счетчиков и истории долга
+        state.months_zero += zero_contribution
+        np.maximum(state.max_debt, state.debt, out=state.max_debt)
+        in_debt = state.debt > 0
+        state.months_with_debt += in_debt
+        state.debt_sum += np.where(in_debt, state.debt, 0.0)
+        _record_first_events(state, month, in_debt)
+
+        # Фиксация результатов (финальное погашение - на всех горизонтах конфигурации)
+        snapshot = month in snapshot_months
+        if snapshot:
+            repay_from_assets(state.cushion, state.savings, state.annual_growth, state.debt, both_sources=True)
+            repay_from_assets(state.virtual_cushion, state.virtual_savings, state.virtual_annual_growth,
+                              state.virtual_debt, both_sources=True)
+        if state.fan_counts is not None:
+            _record_fan_counts(state, m)
+        if snapshot:
+            years = month // 12
+            if years in horizons:
+                record_horizon_batch(raw, years, state)
+                if profiling:
+                    profiler.lap('horizons')
+                yield years, [plan_raw[years] for plan_raw in raw]
+                # Время потребителя между итерациями не относится ни к одной фазе
+                if profiling:
+                    profiler.start()
+        if profiling:
+            profiler.lap('horizons')
+
+
+def _record_first_events(state, month, in_debt):
+    """
+    ВЕКТОРИЗОВАНО: время до событий на конец месяца (как в simulate_scenarios) -
+    первый долг, начало и конец истощения подушки
+    """
+    state.first_debt_month[in_debt & (state.first_debt_month == 0)] = month
+    below = state.cushion < state.sim_config.cushion_amount
+    depleted = below & state.cushion_full
+    if depleted.any():
+        state.cushion_depleted_since[depleted] = month
+        state.first_cushion_depletion_month[depleted & (state.first_cushion_depletion_month == 0)] = month
+        state.cushion_full[depleted] = False
+    refilled = ~below & ~state.cushion_full
+    if refilled.any():
+        recovered = refilled & (state.cushion_depleted_since > 0)
+        duration = month - state.cushion_depleted_since
+        first_spell = recovered & (state.cushion_depleted_since == state.first_cushion_depletion_month)
+        state.first_cushion_recovery_months[first_spell] = duration[first_spell]
+        np.maximum(state.max_cushion_depletion_months, np.where(recovered, duration, 0),
+                   out=state.max_cushion_depletion_months)
+        state.cushion_depleted_since[recovered] = 0
+        state.cushion_full[refilled] = True
+
+
+def fan_chart_bins(values):
+    """Номера бинов FAN_CHART_EDGES для значений (₽); за пределами сетки - крайние бины"""
+    magnitude = np.abs(values)
+    side = np.floor(np.log(np.maximum(magnitude, FAN_CHART_MIN_ABS) / FAN_CHART_MIN_ABS) / _FAN_LOG_STEP)
+    side = np.minimum(side, _FAN_SIDE_BINS - 1).astype(np.int64)
+    small = magnitude < FAN_CHART_MIN_ABS
+    positive = np.where(small, _FAN_SIDE_BINS + 2, _FAN_SIDE_BINS + 3 + side)
+    negative = np.where(small, _FAN_SIDE_BINS, _FAN_SIDE_BINS - 1 - side)
+    bins = np.where(values > 0, positive, negative)
+    bins[values == 0] = _FAN_SIDE_BINS + 1
+    return bins
+
+
+def _record_fan_counts(state, m):
+    """Гистограммы месяца m + 1 по сценариям для всех планов пакета (в state.fan_counts)"""
+    cushion = state.cushion.astype(np.float64)
+    net_wealth = (cushion + state.savings) - state.debt
+    bins = fan_chart_bins(np.stack((net_wealth, state.debt.astype(np.float64), cushion), axis=1))
+    n_series = bins.shape[0] * bins.shape[1]
+    n_bins = state.fan_counts.shape[-1]
+    # Одним bincount для всех планов и показателей: у каждой пары свой отрезок номеров
+    offsets = np.arange(n_series).reshape(bins.shape[0], bins.shape[1], 1) * n_bins
+    counts = np.bincount((bins + offsets).ravel(), minlength=n_series * n_bins)
+    state.fan_counts[:, :, m] = counts.reshape(bins.shape[0], bins.shape[1], n_bins)
+
+
+def merge_fan_charts(parts):
+    """
+    Объединение гистограмм веерной диаграммы плана по диапазонам сценариев
+
+    Счетчики на общей сетке FAN_CHART_EDGES складываются - объединение точное:
+    сумма не зависит от того, как сценарии разбиты на диапазоны.
+    """
+    merged = np.zeros(parts[0].shape, dtype=np.int64)
+    for part in parts:
+        merged += part
+    return merged
+
+
+def _histogram_order_statistic(counts, cumulative, j):
+    """Значение j-го по порядку элемента гистограмм (точка внутри его бина)"""
+    bins = np.argmax(cumulative > j, axis=-1)[..., None]
+    in_bin = np.take_along_axis(counts, bins, axis=-1)
+    share = (j - (np.take_along_axis(cumulative, bins, axis=-1) - in_bin) + 0.5) / in_bin
+    lower, upper = FAN_CHART_EDGES[bins], FAN_CHART_EDGES[bins + 1]
+    return (lower + share * (upper - lower))[..., 0]
+
+
+def fan_chart_bands(plan_counts, quantiles=FAN_CHART_QUANTILES):
+    """
+    Веерная диаграмма плана из гистограмм (FAN_CHART_METRICS, месяцы, бины)
+
+    Значение j-го по порядку сценария - точка внутри его бина (сценарии бина
+    равномерно по ширине), перцентиль - интерполяция соседних по рангу, как у
+    np.percentile; погрешность не больше ширины бина - FAN_CHART_BIN_WIDTH от
+    значения или FAN_CHART_MIN_ABS около нуля.
+
+    Returns:
+        dict: {'quantiles': перцентили, 'n_scenarios': сценариев,
+               показатель из FAN_CHART_METRICS: массив (месяцы × перцентили), ₽}
+    """
+    cumulative = np.cumsum(plan_counts, axis=-1)
+    n_scenarios = int(cumulative[0, 0, -1])
+    values = np.empty(plan_counts.shape[:-1] + (len(quantiles),))
+    for i, q in enumerate(quantiles):
+        rank = q / 100 * (n_scenarios - 1)
+        low = int(np.floor(rank))
+        lower = _histogram_order_statistic(plan_counts, cumulative, low)
+        upper = _histogram_order_statistic(plan_counts, cumulative, min(low + 1, n_scenarios - 1))
+        values[..., i] = lower + (rank - low) * (upper - lower)
+    bands = {'quantiles': quantiles, 'n_scenarios': n_scenarios}
+    for k, metric in enumerate(FAN_CHART_METRICS):
+        bands[metric] = values[k]
+    return bands
+
+
+def shock_pct_chunks(income_schedule, expense_schedule, emergency_costs, partial_losses, full_losses,
+                     partial_loss_rate):
+    """
+    Доли шоков в плановом остатке (%) - отдельно от месячной рекуррентности
+
+    Доля зависит только от шкалы шоков и графиков дохода/расходов плана, поэтому
+    JIT-ядро ее не хранит (плотный массив планы × сценарии × месяцы), а она
+    считается здесь теми же операциями, что и в iter_plan_batch.
+
+    Returns:
+        list: по планам - список по месяцам массивов долей сценариев с шоком
+              (порядок NumPy-движка: по месяцам, внутри месяца - по сценариям)
+    """
+    chunks = [[] for _ in range(income_schedule.shape[0])]
+    for m in range(emergency_costs.shape[1]):
+        current_income = income_schedule[:, m + 1:m + 2]
+        target_savings = current_income - expense_schedule[:, m + 1:m + 2]
+        emergency_cost = emergency_costs[:, m]
+        loss = np.where(partial_losses[:, m], current_income * partial_loss_rate, 0.0)
+        loss = np.where(full_losses[:, m], loss + current_income, loss)
+        shock_total = emergency_cost + loss
+        shocked = (shock_total > 0) & (target_savings > 0)
+        shock_pct = (shock_total / target_savings) * 100
+        for p, plan_chunks in enumerate(chunks):
+            plan_chunks.append(shock_pct[p][shocked[p]])
+    return chunks
+
+
+def _simulate_plan_batch_jit(plans, scenario_start, scenario_stop, horizons=None, seed=None,
+                             stream_id='service', timeline=None, plan_ids=None, sim_config=None, compiled=True):
+    """
+    НОВАЯ ФУНКЦИЯ: simulate_plan_batch на ядре jit_kernel (float64)
+
+    Ядро проходит все месяцы и возвращает снимки состояния на горизонтах; каждый
+    снимок записывается в сырые результаты тем же record_horizon_batch.
+    compiled=False - ядро без компиляции (проверка check_jit_backend без Numba).
+    """
+    cfg = resolve_config(sim_config)
+    if seed is None:
+        seed = cfg.random_seed
+    horizons = sc.normalize_horizons(horizons, cfg)
+    n_months = max(horizons) * 12
+    snapshot_months = [years * 12 for years in cfg.horizons if years * 12 <= n_months]
+    if plan_ids is None:
+        plan_ids = [f"{stream_id}#{p}" for p in range(len(plans))]
+
+    if timeline is None or not timeline.covers(scenario_start, scenario_stop, n_months):
+        timeline = generate_shock_timeline(seed, stream_id, scenario_start, scenario_stop, n_months, cfg)
+    rows = slice(scenario_start - timeline.scenario_start, scenario_stop - timeline.scenario_start)
+    months = slice(0, n_months)
+
+    n = scenario_stop - scenario_start
+    state = BatchState(plans, n, np.float64, cfg)
+    income_schedule, expense_schedule = plan_schedules(plans, n_months)
+    raw = [sc._empty_scenario_results(n, expenses, horizons) for expenses in state.plan_expenses]
+    snapshots = jit_kernel.run_month_kernel(
+        state, income_schedule, expense_schedule, timeline.emergency_cost[rows, months],
+        timeline.partial_loss[rows, months], timeline.full_loss[rows, months],
+        snapshot_months, [years * 12 for years in horizons], plan_ids, scenario_start, compiled)
+
+    pct_chunks = shock_pct_chunks(income_schedule, expense_schedule, timeline.emergency_cost[rows, months],
+                                  timeline.partial_loss[rows, months], timeline.full_loss[rows, months],
+                                  cfg.partial_loss_rate)
+    em_counts = [counts[rows, months].astype(np.float64)
+                 for counts in (timeline.minor_count, timeline.medium_count, timeline.major_count)]
+    for slot, years in enumerate(horizons):
+        horizon_months = years * 12
+        for field_index, name in enumerate(jit_kernel.SNAPSHOT_FIELDS):
+            setattr(state, name, snapshots[slot, field_index])
+        state.minor_em_count, state.medium_em_count, state.major_em_count = (
+            counts[:, :horizon_months].sum(axis=1) for counts in em_counts)
+        state.shock_pct_chunks = [chunks[:horizon_months] for chunks in pct_chunks]
+        record_horizon_batch(raw, years, state)
+    return raw
+
+
+def record_horizon_batch(raw, years, state):
+    """Записывает показатели горизонта years для всех планов пакета в сырые результаты raw"""
+    horizon_months = years * 12
+    # Разности активов считаются в float64 и в режиме float32 (без потери значащих цифр)
+    total_wealth = state.cushion.astype(np.float64) + state.savings
+    real_net_wealth = total_wealth - state.debt
+    virtual_net_wealth = (state.virtual_cushion.astype(np.float64) + state.virtual_savings) - state.virtual_debt
+    direct_losses = state.direct_losses_total / 1000000  # в млн
+    # Потеря компаундинга = (виртуальные активы - реальные активы) - прямые потери
+    compounding_loss = np.maximum(0, (virtual_net_wealth - real_net_wealth) / 1000000 - direct_losses)
+
+    # Запланированные расходы и потеря компаундинга от них (рост за оставшиеся месяцы)
+    spent = (state.expense_month > 0) & (state.expense_month <= horizon_months)
+    planned_total = np.zeros(state.shape)
+    planned_compounding_loss = np.zeros(state.shape)
+    # Множители роста - таблица конфигурации (степени Python float, как в скалярном расчете)
+    cfg = state.sim_config
+    growth_factors = np.array(cfg.savings_growth_factors[:horizon_months + 1]) - 1
+    remaining_months = horizon_months - state.expense_month.astype(np.int64)
+    grows = spent & (remaining_months > 0)
+    compounding_growth = np.where(
+        grows, state.expense_amount[:, None, :] * growth_factors[np.where(grows, remaining_months, 0)], 0.0
+    )
+    # Суммирование в хронологическом порядке покупок (как история в скалярном расчете)
+    chronological = np.argsort(state.expense_month, axis=2, kind='stable')
+    compounding_growth = np.take_along_axis(compounding_growth, chronological, axis=2)
+    for e in range(state.n_expenses):
+        planned_total += np.where(spent[:, :, e], state.expense_amount[:, e:e + 1], 0.0)
+        planned_compounding_loss += compounding_growth[:, :, e]
+
+    # Проценты и месяцы реструктуризации - пропорционально горизонту
+    horizon_share = horizon_months / cfg.n_months if cfg.n_months > 0 else 0
+    avg_debt = np.divide(state.debt_sum, state.months_with_debt, out=np.zeros(state.shape),
+                         where=state.months_with_debt > 0)
+    # Незавершенное истощение подушки считается до горизонта
+    ongoing = np.where(state.cushion_depleted_since > 0, horizon_months - state.cushion_depleted_since, 0)
+    max_depletion = np.maximum(state.max_cushion_depletion_months, ongoing)
+
+    for p, plan_raw in enumerate(raw):
+        horizon_data = plan_raw[years]
+        horizon_data['net_wealth'][:] = real_net_wealth[p]
+        horizon_data['final_debt'][:] = state.debt[p]
+        # Построчное сложение - в том же порядке, что и в скалярном расчете
+        horizon_data['total_cash_flow'] += sum(state.scenario_cash_flow[p].tolist())
+        horizon_data['months_zero'][:] = state.months_zero[p]
+        horizon_data['minor_emergencies'][:] = state.minor_em_count
+        horizon_data['medium_emergencies'][:] = state.medium_em_count
+        horizon_data['major_emergencies'][:] = state.major_em_count
+        if state.shock_pct_chunks[p]:
+            horizon_data['shock_pcts'].extend(np.concatenate(state.shock_pct_chunks[p]).tolist())
+        horizon_data['scenarios_direct_losses'].extend(direct_losses[p].tolist())
+        horizon_data['scenarios_planned_expenses'].extend((planned_total[p] / 1000000).tolist())
+        horizon_data['scenarios_compounding_loss'].extend(compounding_loss[p].tolist())
+        horizon_data['scenarios_planned_compounding_loss'].extend((planned_compounding_loss[p] / 1000000).tolist())
+        for e, expense in enumerate(state.plan_expenses[p]):
+            count = int(np.count_nonzero(spent[p, :, e]))
+            stats = horizon_data['planned_expenses_stats'][expense['name']]
+            stats['count'] += count
+            stats['total_amount'] += expense['amount'] * count
+        horizon_data['max_debt'][:] = state.max_debt[p]
+        horizon_data['months_in_debt'][:] = state.months_with_debt[p]
+        horizon_data['total_interest_paid'][:] = state.total_interest_paid[p] * horizon_share
+        horizon_data['avg_debt_when_in_debt'][:] = avg_debt[p]
+        horizon_data['restructuring_events'][:] = state.restructuring_count[p]
+        horizon_data['bankruptcy_events'][:] = state.bankruptcy_count[p]
+        horizon_data['months_in_restructuring'][:] = state.months_restructuring[p] * horizon_share
+        horizon_data['first_debt_month'][:] = state.first_debt_month[p]
+        horizon_data['first_restructuring_month'][:] = state.first_restructuring_month[p]
+        horizon_data['first_bankruptcy_month'][:] = state.first_bankruptcy_month[p]
+        horizon_data['first_cushion_depletion_month'][:] = state.first_cushion_depletion_month[p]
+        horizon_data['first_cushion_recovery_months'][:] = state.first_cushion_recovery_months[p]
+        horizon_data['max_cushion_depletion_months'][:] = max_depletion[p]
+        horizon_data['planned_expense_months'] = sc.first_expense_months(
+            state.expense_month[p, :, :len(state.plan_expenses[p])], state.plan_expenses[p], horizon_months)
+
+
+def _simulate_batch_shard(stream_id, plans, scenario_start, scenario_stop, horizons, seed, anomaly_log_file,
+                          cache_timeline=False, plan_ids=None, dtype=None, sim_config=None, fan_chart=False):
+    """
+    Точка входа воркера: пакет планов на диапазоне сценариев
+    cache_timeline=True - шкала шоков берется из кэша процесса (долгоживущие воркеры сервиса)
+    dtype - тип массивов состояния (None = по config.FLOAT32_MODE)
+    sim_config - параметры модели (None = константы config)
+    fan_chart=True - третьим элементом возвращаются гистограммы веерных диаграмм планов
+
+    Returns:
+        tuple: (список сырых результатов по планам, (проверок, аномалий)[, веерные диаграммы])
+    """
+    config.ANOMALY_LOG_FILE = anomaly_log_file
+    VALIDATION_STATS['total_checks'] = 0
+    VALIDATION_STATS['total_anomalies'] = 0
+    VALIDATION_STATS['anomaly_details'] = []
+
+    timeline = None
+    if cache_timeline:
+        cfg = resolve_config(sim_config)
+        timeline = get_shock_timeline(seed, stream_id, scenario_start, scenario_stop, cfg.n_months, sim_config)
+    raw = simulate_plan_batch(plans, scenario_start, scenario_stop, horizons, seed,
+                              stream_id=stream_id, timeline=timeline, plan_ids=plan_ids, dtype=resolve_dtype(dtype),
+                              sim_config=sim_config, fan_chart=fan_chart)
+    counts = (VALIDATION_STATS['total_checks'], VALIDATION_STATS['total_anomalies'])
+    if fan_chart:
+        raw, fan_charts = raw
+        return raw, counts, fan_charts
+    return raw, counts
+
+
+def _simulate_batch_chunk(stream_id, plans, scenario_start, scenario_stop, horizons, seed, plan_ids, dtype,
+                          sim_config, fan_chart):
+    """
+    Диапазон пакета в текущем процессе - в том же формате, что и _simulate_batch_shard
+    (счетчики валидации - прирост за диапазон)
+    """
+    checks, anomalies = VALIDATION_STATS['total_checks'], VALIDATION_STATS['total_anomalies']
+    raw = simulate_plan_batch(plans, scenario_start, scenario_stop, horizons, seed, stream_id=stream_id,
+                              plan_ids=plan_ids, dtype=dtype, sim_config=sim_config, fan_chart=fan_chart)
+    counts = (VALIDATION_STATS['total_checks'] - checks, VALIDATION_STATS['total_anomalies'] - anomalies)
+    if fan_chart:
+        raw, fan_charts = raw
+        return raw, counts, fan_charts
+    return raw, counts
+
+
+def run_simulation_batch(plans, stream_id='service', horizons=None, n_scenarios=None, seed=None,
+                         compute_mode_stats=True, executor=None, observer=None, dtype=None, sim_config=None,
+                         fan_chart=False, checkpoint=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Аналог run_simulation для пакета планов с общим потоком шоков
+
+    Args:
+        plans: словарь {ключ: план}
+        stream_id: поток случайных чисел, общий для всех планов
+        horizons, n_scenarios, seed, compute_mode_stats, executor, sim_config: см. run_simulation
+        dtype: тип массивов состояния (None = по config.FLOAT32_MODE); в режиме
+               float32 результаты проверяются check_precision с предупреждением о дрейфе
+        fan_chart: заполнить results.fan_chart помесячными перцентилями (fan_chart_bands)
+        checkpoint: контрольные точки (checkpoints.RunCheckpoint) - расчет по их
+                    диапазонам с сохранением каждого готового; None = выключено
+
+    Returns:
+        dict: {ключ: ScenarioResults}
+    """
+    cfg = resolve_config(sim_config)
+    horizons = sc.normalize_horizons(horizons, cfg)
+    if n_scenarios is None:
+        n_scenarios = cfg.n_scenarios
+    if seed is None:
+        seed = cfg.random_seed
+    dtype = resolve_dtype(dtype)
+    keys = list(plans)
+    plan_list = [plans[key] for key in keys]
+    start_time = time.time()
+
+    fan_parts = []
+    if executor is None and checkpoint is None:
+        raw = simulate_plan_batch(plan_list, 0, n_scenarios, horizons, seed, stream_id=stream_id, plan_ids=keys,
+                                  dtype=dtype, sim_config=cfg, fan_chart=fan_chart)
+        if fan_chart:
+            raw, fan_charts = raw
+            fan_parts.append(fan_charts)
+        parts = [raw]
+    else:
+        # НОВОЕ: с контрольными точками диапазоны - по checkpoint.chunks (не по числу воркеров);
+        # сохраненные диапазоны загружаются, остальные считаются и сохраняются по готовности
+        if checkpoint is not None:
+            shards = checkpoint.chunks(n_scenarios)
+            checkpoint_stream = f"batch_{stream_id}"
+        else:
+            n_workers = getattr(executor, '_max_workers', 1) or 1
+            shards = sc.split_scenarios(n_scenarios, n_workers)
+        saved = [checkpoint.load(checkpoint_stream, shard_start, shard_stop) if checkpoint is not None else None
+                 for shard_start, shard_stop in shards]
+        futures = [None if saved[i] is not None or executor is None else
+                   executor.submit(_simulate_batch_shard, stream_id, plan_list, shard_start, shard_stop,
+                                   horizons, seed, config.ANOMALY_LOG_FILE, False, keys, dtype, cfg, fan_chart)
+                   for i, (shard_start, shard_stop) in enumerate(shards)]
+        parts = []
+        completed = 0
+        for i, (shard_start, shard_stop) in enumerate(shards):
+            if saved[i] is not None:
+                shard_result = saved[i]
+            else:
+                if futures[i] is not None:
+                    shard_result = futures[i].result()
+                else:
+                    shard_result = _simulate_batch_chunk(stream_id, plan_list, shard_start, shard_stop, horizons,
+                                                         seed, keys, dtype, cfg, fan_chart)
+                if checkpoint is not None:
+                    checkpoint.save(checkpoint_stream, shard_start, shard_stop, shard_result)
+            raw, (checks, anomalies), *fan_charts = shard_result
+            parts.append(raw)
+            fan_parts.extend(fan_charts)
+            if saved[i] is not None or futures[i] is not None:
+                # Счетчики воркера или контрольной точки (расчет в этом процессе уже учтен)
+                VALIDATION_STATS['total_checks'] += checks
+                VALIDATION_STATS['total_anomalies'] += anomalies
+            completed += shard_stop - shard_start
+            if observer is not None:
+                observer.on_progress(make_progress_info(stream_id, completed, n_scenarios, start_time,
+                                                        VALIDATION_STATS))
+
+    all_results = {}
+    for p, key in enumerate(keys):
+        results = ScenarioResults.from_raw(sc.merge_scenario_results([part[p] for part in parts]), float_dtype=dtype)
+        baselines = sc.compute_baselines(plan_list[p], horizons, cfg)
+        for years in horizons:
+            results[years].update(baselines[years])
+        sc.finalize_horizon_statistics(results, plan_list[p], n_scenarios, compute_mode_stats, cfg)
+        if fan_chart:
+            results.fan_chart = fan_chart_bands(merge_fan_charts([fan_charts[p] for fan_charts in fan_parts]))
+        results.random_stream = (seed, stream_id)
+        all_results[key] = results
+
+    if dtype != np.float64 and PRECISION_CHECK_SCENARIOS > 0:
+        drifts = check_precision(plan_list, keys, all_results, stream_id, horizons, seed, sim_config=cfg)
+        for key, years, metric, value, reference in drifts:
+            print(f"⚠️  {dtype.name}: план {key}, {years} лет, {metric} = {value:,.0f} ₽ "
+                  f"(float64: {reference:,.0f} ₽) - дрейф выше допуска")
+    return all_results
+
+
+def check_precision(plan_list, keys, all_results, stream_id, horizons, seed, n_check=PRECISION_CHECK_SCENARIOS,
+                    rel_tol=PRECISION_REL_TOL, abs_tol=PRECISION_ABS_TOL, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Контроль точности режима пониженной точности
+
+    Первые n_check сценариев пересчитываются в float64 (те же потоки случайных
+    чисел), показатели PRECISION_METRICS сравниваются с результатами на тех же
+    сценариях. Допуск: max(abs_tol, rel_tol * |эталон|).
+
+    Returns:
+        list: (ключ, years, показатель, значение, эталон float64) с превышением допуска
+    """
+    n_check = min(n_check, next(iter(all_results.values())).n_scenarios)
+    reference = simulate_plan_batch(plan_list, 0, n_check, horizons, seed, stream_id=stream_id, plan_ids=keys,
+                                    sim_config=sim_config)
+    drifts = []
+    for p, key in enumerate(keys):
+        sample = all_results[key].scenarios(0, n_check)
+        for years in horizons:
+            for metric, compute in PRECISION_METRICS.items():
+                value = float(compute(sample[years]))
+                expected = float(compute(reference[p][years]))
+                if abs(value - expected) > max(abs_tol, rel_tol * abs(expected)):
+                    drifts.append((key, years, metric, value, expected))
+    return drifts
+
+
+def check_jit_backend(plans=None, n_scenarios=200, seed=None, stream_id='jit-check', sim_config=None,
+                      compiled=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Проверка побитового совпадения JIT-ядра и NumPy-движка
+
+    Оба движка считают пакет планов на одной шкале шоков; сравниваются все сырые
+    показатели всех горизонтов и число проверок валидации. compiled=None -
+    скомпилированное ядро, если Numba установлен, иначе ядро в интерпретаторе
+    (проверяется сама арифметика ядра).
+
+        python -c "import batch_simulation as bs; print(bs.check_jit_backend())"
+
+    Returns:
+        list: (план, years, показатель) с расхождениями (пустой - совпадают)
+    """
+    cfg = resolve_config(sim_config)
+    if plans is None:
+        plans = list(cfg.plans.values())
+    if compiled is None:
+        compiled = jit_kernel.NUMBA_AVAILABLE
+    horizons = list(cfg.horizons)
+    timeline = generate_shock_timeline(cfg.random_seed if seed is None else seed, stream_id, 0, n_scenarios,
+                                       cfg.n_months, cfg)
+    checks_before = VALIDATION_STATS['total_checks']
+    reference = simulate_plan_batch(plans, 0, n_scenarios, horizons, seed, stream_id, timeline, sim_config=cfg,
+                                    backend='numpy')
+    reference_checks = VALIDATION_STATS['total_checks'] - checks_before
+    checks_before = VALIDATION_STATS['total_checks']
+    jit_raw = _simulate_plan_batch_jit(plans, 0, n_scenarios, horizons, seed, stream_id, timeline,
+                                       sim_config=cfg, compiled=compiled)
+    jit_checks = VALIDATION_STATS['total_checks'] - checks_before
+
+    mismatches = [] if jit_checks == reference_checks else [(None, None, 'validation_checks')]
+    for p, (expected_raw, actual_raw) in enumerate(zip(reference, jit_raw)):
+        for years in horizons:
+            for metric, expected in expected_raw[years].items():
+                actual = actual_raw[years][metric]
+                if isinstance(expected, np.ndarray):
+                    same = expected.dtype == actual.dtype and np.array_equal(expected, actual)
+                else:
+                    same = expected == actual
+                if not same:
+                    mismatches.append((p, years, metric))
+    return mismatches
+
+
+def _stream_batch_shard(queue, shard_index, stream_id, plans, scenario_start, scenario_stop, horizons, seed,
+                        anomaly_log_file, cache_timeline=False, plan_ids=None, sim_config=None):
+    """
+    Точка входа воркера для потоковой выдачи: каждый готовый горизонт
+    кладется в очередь как (shard_index, years, [сырые результаты по планам])
+
+    Returns:
+        tuple: (проверок, аномалий)
+    """
+    config.ANOMALY_LOG_FILE = anomaly_log_file
+    VALIDATION_STATS['total_checks'] = 0
+    VALIDATION_STATS['total_anomalies'] = 0
+    VALIDATION_STATS['anomaly_details'] = []
+
+    timeline = None
+    if cache_timeline:
+        cfg = resolve_config(sim_config)
+        timeline = get_shock_timeline(seed, stream_id, scenario_start, scenario_stop, cfg.n_months, sim_config)
+    for years, horizon_parts in iter_plan_batch(plans, scenario_start, scenario_stop, horizons, seed,
+                                                stream_id=stream_id, timeline=timeline, plan_ids=plan_ids,
+                                                sim_config=sim_config):
+        queue.put((shard_index, years, horizon_parts))
+    return VALIDATION_STATS['total_checks'], VALIDATION_STATS['total_anomalies']
+
+
+def finalize_horizon(years, horizon_data, plan_data, n_scenarios, compute_mode_stats=True, sim_config=None):
+    """
+    Итоговые статистики одного горизонта (с идеальным и линейным сценариями)
+
+    Returns:
+        dict: horizon_data, дополненный итоговыми показателями (как results_by_horizon[years])
+    """
+    horizon_data.update(sc.compute_baselines(plan_data, [years], sim_config)[years])
+    sc.finalize_horizon_statistics({years: horizon_data}, plan_data, n_scenarios, compute_mode_stats, sim_config)
+    return horizon_data
+
+
+def iter_simulation_by_horizon(plan_id, plan_data, horizons=None, n_scenarios=None, seed=None,
+                               compute_mode_stats=True, profiler=None, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Потоковый вариант run_simulation - горизонты по мере готовности
+
+    Горизонт 5 лет отдается сразу после 60-го месяца, не дожидаясь 360 месяцев.
+    Поток случайных чисел - plan_id, поэтому показатели совпадают с
+    run_simulation(plan_id, plan_data, ...).
+
+    Yields:
+        tuple: (years, итоговые результаты горизонта - как results_by_horizon[years])
+    """
+    cfg = resolve_config(sim_config)
+    horizons = sc.normalize_horizons(horizons, cfg)
+    if n_scenarios is None:
+        n_scenarios = cfg.n_scenarios
+    for years, (horizon_data,) in iter_plan_batch([plan_data], 0, n_scenarios, horizons, seed,
+                                                  stream_id=plan_id, profiler=profiler, plan_ids=[plan_id],
+                                                  sim_config=cfg):
+        yield years, finalize_horizon(years, horizon_data, plan_data, n_scenarios, compute_mode_stats, cfg)
+
+
+async def stream_simulation(plan_id, plan_data, horizons=None, n_scenarios=None, seed=None,
+                            compute_mode_stats=True, executor=None, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Асинхронный генератор поверх iter_simulation_by_horizon
+
+    Каждый шаг расчета выполняется в executor (None = пул потоков по умолчанию),
+    поэтому event loop не блокируется:
+
+        async for years, horizon_data in stream_simulation('A', PLANS['A']):
+            ...
+
+    Генератор расчета живет в этом процессе, и шаги вызывают его next(), поэтому
+    подходит только пул потоков (ThreadPoolExecutor); другой executor - ValueError
+    (пул процессов не может продолжить генератор родительского процесса).
+    """
+    if executor is not None and not isinstance(executor, ThreadPoolExecutor):
+        raise ValueError(f"stream_simulation поддерживает только пул потоков, получен {type(executor).__name__}")
+    loop = asyncio.get_running_loop()
+    results = iter_simulation_by_horizon(plan_id, plan_data, horizons, n_scenarios, seed, compute_mode_stats,
+                                         sim_config=sim_config)
+    finished = object()
+    while True:
+        item = await loop.run_in_executor(executor, next, results, finished)
+        if item is finished:
+            return
+        yield item
@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+import subprocess
+import statistics
+
+# ===== БЕНЧМАРК ВРЕМЕНИ ИМПОРТА =====
+# Каждый сценарий запускается в свежем интерпретаторе несколько раз.
+# Печатается медиана/минимум времени и какие тяжелые модули оказались загружены.
+# Запуск: python benchmark_import.py [повторов] > bench_output.txt
+
+REPEATS = 5
+HEAVY_MODULES = ['scipy', 'reporting']
+
+SCENARIOS = {
+    'import config': "import config",
+    'import simulation_core': "import simulation_core",
+    'import main': "import main",
+    'compute-only (План A, 50 сценариев)': (
+        "import config\n"
+        "import simulation_core\n"
+        "simulation_core.compute_all_results({'A': config.PLANS['A']}, n_scenarios=50)"
+    ),
+}
+
+CHILD_TEMPLATE = """
+import sys, time, json
+_start = time.perf_counter()
+{code}
+_elapsed = time.perf_counter() - _start
+print(json.dumps({{'elapsed': _elapsed, 'loaded': {{name: name in sys.modules for name in {heavy!r}}}}}))
+"""
+
+
+def measure(code, repeats):
+    """Запускает code в свежем интерпретаторе repeats раз"""
+    script = CHILD_TEMPLATE.format(code=code, heavy=HEAVY_MODULES)
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    loaded = {}
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=package_dir, capture_output=True, text=True, check=True
+        ).stdout
+        record = json.loads(output.strip().splitlines()[-1])
+        timings.append(record['elapsed'])
+        loaded = record['loaded']
+    return timings, loaded
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else REPEATS
+    print("="*70)
+    print(" ВРЕМЯ ИМПОРТА И БЫСТРОГО СТАРТА ")
+    print("="*70)
+    print(f"Python: {sys.version.split()[0]}, повторов: {repeats}\n")
+    print(f"{'Сценарий':<40} | {'медиана, мс':>11} | {'мин, мс':>8} | загружены")
+    print("-" * 80)
+    for name, code in SCENARIOS.items():
+        timings, loaded = measure(code, repeats)
+        heavy = ", ".join(module for module, is_loaded in loaded.items() if is_loaded) or "-"
+        print(f"{name:<40} | {statistics.median(timings)*1000:>11.1f} | {min(timings)*1000:>8.1f} | {heavy}")
+
+
+if __name__ == "__main__":
+    main()
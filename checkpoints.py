@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+from config import CHECKPOINT_CHUNK_SCENARIOS
+
+# ===== КОНТРОЛЬНЫЕ ТОЧКИ ДОЛГИХ РАСЧЕТОВ =====
+# Расчет плана делится на диапазоны по CHECKPOINT_CHUNK_SCENARIOS сценариев;
+# каждый готовый диапазон (сырые результаты, счетчики валидации, траектории)
+# сразу сохраняется в папку checkpoints/ внутри папки запуска. У каждого
+# сценария свой поток случайных чисел (shocks.scenario_rng), поэтому позиция
+# генератора для диапазона полностью задается его границами: продолжение с
+# первого несохраненного диапазона дает те же числа, что и расчет без перерыва.
+# Диапазоны не зависят от числа процессов - продолжать можно с другим --workers.
+
+CHECKPOINT_DIR = "checkpoints"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def run_fingerprint(plans, horizons, n_scenarios, seed, sim_config, **mode):
+    """
+    Отпечаток запуска (SHA-256): планы, горизонты, число сценариев, seed,
+    параметры модели (repr SimulationConfig) и режим движка (mode).
+    Контрольные точки подходят только запуску с тем же отпечатком
+    """
+    params = {
+        'plans': plans,
+        'horizons': list(horizons),
+        'n_scenarios': n_scenarios,
+        'seed': seed,
+        'model': repr(sim_config),
+        'mode': mode,
+    }
+    text = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _atomic_write(filepath, mode, write):
+    """Запись через временный файл и os.replace: оборванная запись не портит прежний файл"""
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+
+
+class RunCheckpoint:
+    """
+    НОВОЕ: Контрольные точки запуска в папке results_dir/checkpoints
+
+    manifest.json - отпечаток запуска (run_fingerprint), аргументы командной строки
+    (для --resume), размер диапазона и список завершенных диапазонов
+    {поток, начало, конец, файл}; данные диапазона - отдельный pickle. Манифест
+    обновляется после записи файла диапазона, поэтому диапазон, оборванный на
+    середине, в нем не числится и при продолжении считается заново.
+
+    Атрибуты:
+        args: аргументы запуска из манифеста
+        chunk_scenarios: сценариев в диапазоне
+        resumed_scenarios: сколько сценариев загружено из контрольных точек
+    """
+
+    def __init__(self, results_dir, fingerprint, args=None, chunk_scenarios=CHECKPOINT_CHUNK_SCENARIOS):
+        if chunk_scenarios <= 0:
+            raise ValueError("chunk_scenarios должно быть положительным")
+        self.directory = os.path.join(results_dir, CHECKPOINT_DIR)
+        self.fingerprint = fingerprint
+        self.args = dict(args or {})
+        self.chunk_scenarios = chunk_scenarios
+        self.resumed_scenarios = 0
+        self._completed = {}  # (поток, начало, конец) -> имя файла
+
+    @classmethod
+    def create(cls, results_dir, fingerprint, args=None, chunk_scenarios=CHECKPOINT_CHUNK_SCENARIOS):
+        """Новые контрольные точки (пустой манифест)"""
+        checkpoint = cls(results_dir, fingerprint, args, chunk_scenarios)
+        os.makedirs(checkpoint.directory, exist_ok=True)
+        checkpoint._write_manifest()
+        return checkpoint
+
+    @staticmethod
+    def read_manifest(results_dir):
+        """Манифест контрольных точек папки запуска (FileNotFoundError, если его нет)"""
+        filepath = os.path.join(results_dir, CHECKPOINT_DIR, MANIFEST_FILE)
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Контрольные точки не найдены: {filepath}")
+        with open(filepath, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Неподдерживаемая версия контрольных точек: {manifest.get('version')}")
+        return manifest
+
+    @classmethod
+    def resume(cls, results_dir, fingerprint):
+        """
+        Контрольные точки прерванного запуска; ValueError, если параметры
+        запуска (отпечаток) изменились
+        """
+        manifest = cls.read_manifest(results_dir)
+        if manifest['fingerprint'] != fingerprint:
+            raise ValueError("Параметры запуска или модели изменились - контрольные точки не подходят")
+        checkpoint = cls(results_dir, fingerprint, manifest['args'], manifest['chunk_scenarios'])
+        for chunk in manifest['chunks']:
+            if os.path.exists(os.path.join(checkpoint.directory, chunk['file'])):
+                checkpoint._completed[(chunk['stream'], chunk['start'], chunk['stop'])] = chunk['file']
+        return checkpoint
+
+    @property
+    def completed_scenarios(self):
+        """Сценариев в завершенных диапазонах (по всем потокам)"""
+        return sum(stop - start for _, start, stop in self._completed)
+
+    def chunks(self, n_scenarios):
+        """Диапазоны [начало, конец) по chunk_scenarios сценариев"""
+        return [(start, min(start + self.chunk_scenarios, n_scenarios))
+                for start in range(0, n_scenarios, self.chunk_scenarios)]
+
+    def load(self, stream, start, stop):
+        """Сохраненные данные диапазона или None, если он еще не посчитан"""
+        filename = self._completed.get((str(stream), start, stop))
+        if filename is None:
+            return None
+        with open(os.path.join(self.directory, filename), 'rb') as f:
+            payload = pickle.load(f)
+        self.resumed_scenarios += stop - start
+        return payload
+
+    def save(self, stream, start, stop, payload):
+        """Сохраняет данные готового диапазона и отмечает его в манифесте"""
+        stream = str(stream)
+        filename = f"{stream}_{start:010d}_{stop:010d}.pkl"
+        _atomic_write(os.path.join(self.directory, filename), 'wb',
+                      lambda f: pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL))
+        self._completed[(stream, start, stop)] = filename
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'fingerprint': self.fingerprint,
+            'args': self.args,
+            'chunk_scenarios': self.chunk_scenarios,
+            'chunks': [{'stream': stream, 'start': start, 'stop': stop, 'file': filename}
+                       for (stream, start, stop), filename in sorted(self._completed.items())],
+        }
+        _atomic_write(os.path.join(self.directory, MANIFEST_FILE), 'w',
+                      lambda f: json.dump(manifest, f, ensure_ascii=False, indent=2))
+
+    def remove(self):
+        """Удаляет папку контрольных точек (после успешного сохранения отчетов)"""
+        shutil.rmtree(self.directory, ignore_errors=True)
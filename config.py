@@ -4,14 +4,17 @@ import numpy as np
 # ===== ВОСПРОИЗВОДИМОСТЬ =====
 RANDOM_SEED = 42  # Можно изменить на любое число
 
-def set_random_seeds():
-    """Устанавливает seeds для воспроизводимости результатов"""
-    random.seed(RANDOM_SEED)
-    np.random.seed(RANDOM_SEED)
+def set_random_seeds(seed=None):
+    """Устанавливает seeds для воспроизводимости результатов (seed=None - RANDOM_SEED)"""
+    if seed is None:
+        seed = RANDOM_SEED
+    random.seed(seed)
+    np.random.seed(seed)
 
 # ===== ПАРАМЕТРЫ СИМУЛЯЦИИ =====
 N_SCENARIOS = 1000  # ВЕКТОРИЗОВАНО: Уменьшено до 1000 для веб-версии (было 10000)
 N_MONTHS = 360
+PROGRESS_INTERVAL = 200  # Как часто (в сценариях) движок сообщает о прогрессе наблюдателю
 
 # ===== ФИНАНСОВЫЕ ПАРАМЕТРЫ =====
 SAVINGS_RETURN_RATE = 0.005
@@ -126,6 +129,88 @@ PLANS = {
     }
 }
 
+# ===== РЕЗУЛЬТАТЫ =====
+RESULTS_DIR = r"Y:\code\monte carlo\results"  # Базовая папка по умолчанию (переопределяется --output-dir)
+
+# ===== ОТЧЕТЫ =====
+REPORT_WORKERS = 4  # Потоков генерации отчетов (1 - последовательно)
+
+# ===== КОНТРОЛЬНЫЕ ТОЧКИ =====
+# Готовые диапазоны сценариев сохраняются в папку checkpoints/ внутри папки
+# запуска (--checkpoint); --resume <папка запуска> продолжает расчет с первого
+# несохраненного диапазона с теми же результатами, что и без перерыва
+CHECKPOINT_ENABLED = False          # Сохранять контрольные точки по умолчанию
+CHECKPOINT_CHUNK_SCENARIOS = 50000  # Сценариев в одном диапазоне контрольной точки
+CHECKPOINT_KEEP = False             # Оставлять контрольные точки после сохранения отчетов
+
+# ===== ПРОФИЛИРОВАНИЕ =====
+PROFILING_ENABLED = False  # Таймеры по фазам месячного шага (отчет profiling_report.txt)
+PROFILER_BACKEND = None    # None, 'cprofile' или 'pyinstrument' - захват полного профиля
+
+# ===== ТЕЛЕМЕТРИЯ =====
+METRICS_JSONL_ENABLED = True  # Запись событий прогресса в metrics.jsonl рядом с отчетами
+
+# ===== ПУЛ ПРОЦЕССОВ =====
+SHARED_MEMORY_RESULTS = True  # Воркеры пишут показатели по сценариям в общую память вместо pickle
+
+# ===== ТОЧНОСТЬ ВЕКТОРИЗОВАННОГО РАСЧЕТА =====
+FLOAT32_MODE = False             # float32 для массивов состояния пакетного расчета и денежных показателей/долей шоков
+                                 # в результатах (денежные накопители - float64; счетчики результатов всегда int16)
+PRECISION_CHECK_SCENARIOS = 200  # Сценариев в контрольном пересчете float64 (0 = без проверки)
+PRECISION_REL_TOL = 1e-4         # Допустимый относительный дрейф ключевых показателей
+PRECISION_ABS_TOL = 5000         # Допустимый абсолютный дрейф, ₽ (половина шага отчета 0.01 млн)
+
+# ===== ПРОПУСК МЕСЯЦЕВ БЕЗ СОБЫТИЙ =====
+# Дискретно-событийный режим: сценарий идет по календарю событий (шоки, смены
+# плана, концы года, покупки), а месяцы между ними без долга считаются одной
+# формулой геометрического ряда. Результат совпадает с помесячным расчетом до
+# ошибок округления (не побитово), поэтому режим включается явно (--skip-ahead)
+EVENT_SKIP_AHEAD = False
+SKIP_AHEAD_MIN_MONTHS = 2  # Короче этого отрезки считаются помесячно
+
+# ===== JIT-ДВИЖОК ПАКЕТНОГО РАСЧЕТА =====
+# 'auto' - ядро jit_kernel на Numba, если он установлен (иначе NumPy); 'numba' -
+# то же с предупреждением при отсутствии Numba; 'numpy' - всегда NumPy.
+# Результаты обоих движков совпадают побитово (float64)
+JIT_BACKEND = 'auto'
+
+# ===== ОБЩИЕ СЛУЧАЙНЫЕ ЧИСЛА =====
+# Все планы считаются одним пакетом (планы × сценарии) на одной шкале шоков:
+# сценарий i у всех планов - одни и те же ЧП и периоды потери дохода (потеря
+# дохода - доля дохода каждого плана). Разности планов тогда парные, без шума
+# выборки шоков; отчет - paired_comparison.txt (--common-random-numbers)
+COMMON_RANDOM_NUMBERS = False
+COMMON_STREAM_ID = 'common'  # Поток случайных чисел, общий для всех планов
+
+# ===== ВЕЕРНЫЕ ДИАГРАММЫ =====
+# Помесячные перцентили чистых активов, долга и подушки по сценариям
+# (векторизованный расчет, выгрузка fan_chart.npz). Диапазоны сценариев
+# копят гистограммы на общей логарифмической сетке; их сумма - точное
+# объединение, поэтому перцентили не зависят от числа воркеров и контрольных точек
+FAN_CHART_QUANTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+FAN_CHART_BIN_WIDTH = 0.01     # Относительная ширина бина (погрешность перцентиля не больше)
+FAN_CHART_MIN_ABS = 1000       # ₽: |значение| меньше - бины (-MIN, 0), {0} и (0, MIN)
+FAN_CHART_MAX_ABS = 1e10       # ₽: |значение| больше попадает в крайний бин
+
+# ===== ВЫБОРКА ТРАЕКТОРИЙ =====
+# Полные помесячные траектории и журналы событий для детального разбора
+TRAJECTORY_SAMPLES = 0                              # Равномерная выборка K сценариев на план (0 = выключено)
+TRAJECTORY_QUANTILES = (1, 5, 25, 50, 75, 95, 99)   # + сценарии на этих перцентилях итоговых чистых активов
+
+# ===== КЭШ ШКАЛ ШОКОВ =====
+SHOCK_CACHE_SIZE = 64  # Сколько шкал шоков (seed, поток, диапазон сценариев) держать в памяти процесса
+
+# ===== СЕРВИС =====
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_WORKERS = 4            # Размер прогретого пула процессов
+SERVICE_MAX_CONCURRENT = 4     # Одновременно выполняемых пакетов запросов
+SERVICE_MAX_PENDING = 256      # Запросов в работе и в очереди (дальше - 503)
+SERVICE_REQUEST_TIMEOUT = 60.0 # Таймаут запроса по умолчанию (сек)
+SERVICE_MAX_SCENARIOS = 20000  # Верхняя граница n_scenarios в одном запросе
+SERVICE_BATCH_WINDOW = 0.05    # Окно сбора запросов в пакет (сек); 0 = без объединения
+SERVICE_MAX_BATCH = 32         # Максимум планов в одном векторизованном пакете
+
 # ===== ЛОГИРОВАНИЕ АНОМАЛИЙ =====
 ANOMALY_LOG_FILE = None  # Устанавливается в main.py
 
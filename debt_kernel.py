@@ -0,0 +1,212 @@
+import numpy as np
+
+from simulation_config import resolve_config
+
+# ===== ЯДРО УПРАВЛЕНИЯ ДОЛГОМ =====
+# Общие для всех путей расчета операции с долгом: изъятие из savings,
+# погашение из активов (сначала подушка, потом savings), поэтапное управление
+# долгом (обычный кредит / реструктуризация под половину ставки / банкротство)
+# и уплата налога в конце года.
+# Каждая функция принимает либо скаляры Python (идеальный, линейный, реальный и
+# виртуальный сценарии simulation_core), либо массивы NumPy состояния
+# (пакетный расчет batch_simulation). Скаляры возвращаются новыми значениями,
+# массивы изменяются на месте и возвращаются теми же объектами - так вызов
+# "cushion, savings, ... = repay_from_assets(...)" одинаков в обоих случаях.
+# Скалярная ветка повторяет прежний построчный код, поэтому результаты не
+# меняются побитово; оптимизации (маски, JIT) вносятся в одном месте.
+
+
+def withdraw_savings(savings, annual_growth, amount, mask=None):
+    """
+    Изъятие amount из savings с пропорциональной корректировкой annual_growth
+
+    Если сбережений не хватает, остаток изъятия становится приростом долга;
+    пустые сбережения обнуляют и накопленный рост (нет роста без сбережений).
+    mask (только для массивов) ограничивает сценарии.
+
+    Returns:
+        tuple: (new_savings, new_annual_growth, debt_increase)
+    """
+    if isinstance(savings, np.ndarray):
+        return _withdraw_savings_array(savings, annual_growth, amount, mask)
+
+    if amount <= 0:
+        return savings, annual_growth, 0
+
+    # ИСПРАВЛЕНИЕ: Если нет сбережений, то не должно быть и накопленного роста
+    if savings <= 0:
+        # Любое изъятие из пустых сбережений полностью идет в долг
+        return 0, 0, amount
+
+    if savings >= amount:
+        # Частичное изъятие - пропорционально уменьшаем annual_growth
+        withdrawal_ratio = amount / savings
+        new_annual_growth = annual_growth * (1 - withdrawal_ratio)
+        new_savings = savings - amount
+        debt_increase = 0
+
+        # Дополнительная проверка консистентности
+        if new_savings <= 0:
+            new_savings = 0
+            new_annual_growth = 0
+
+    else:
+        # Полное изъятие - обнуляем annual_growth, остаток в долг
+        debt_increase = amount - savings
+        new_savings = 0
+        new_annual_growth = 0  # Весь накопленный рост "съеден"
+
+    return new_savings, new_annual_growth, debt_increase
+
+
+def _withdraw_savings_array(savings, annual_growth, amount, mask):
+    """ВЕКТОРИЗОВАННАЯ ветка withdraw_savings (savings и annual_growth изменяются на месте)"""
+    amount = np.broadcast_to(amount, savings.shape)
+    mask = amount > 0 if mask is None else mask & (amount > 0)
+    debt_increase = np.zeros(savings.shape, dtype=savings.dtype)
+    if not mask.any():
+        return savings, annual_growth, debt_increase
+
+    # Из пустых сбережений все изъятие идет в долг
+    empty = mask & (savings <= 0)
+    partial = mask & (savings > 0) & (savings >= amount)
+    full = mask & (savings > 0) & (savings < amount)
+    debt_increase[empty] = amount[empty]
+    debt_increase[full] = amount[full] - savings[full]
+
+    # Частичное изъятие - пропорционально уменьшаем annual_growth
+    if partial.any():
+        partial_savings = savings[partial]
+        partial_amount = amount[partial]
+        annual_growth[partial] = annual_growth[partial] * (1 - partial_amount / partial_savings)
+        savings[partial] = partial_savings - partial_amount
+
+    cleared = empty | full | (partial & (savings <= 0))
+    savings[cleared] = 0
+    annual_growth[cleared] = 0
+    return savings, annual_growth, debt_increase
+
+
+def repay_from_assets(cushion, savings, annual_growth, debt, mask=None, both_sources=False):
+    """
+    Погашение долга из активов: сначала подушка, потом savings
+
+    both_sources=False - savings используются, только если подушки не было
+    (погашение в начале/конце месяца и после налога); True - оба источника
+    подряд (финальное погашение на горизонте). mask (только для массивов)
+    ограничивает сценарии.
+
+    Returns:
+        tuple: (cushion, savings, annual_growth, debt)
+    """
+    if isinstance(debt, np.ndarray):
+        has_debt = debt > 0
+        if mask is not None:
+            has_debt &= mask
+        from_cushion = has_debt & (cushion > 0)
+        if from_cushion.any():
+            repayment = np.minimum(cushion[from_cushion], debt[from_cushion])
+            cushion[from_cushion] -= repayment
+            debt[from_cushion] -= repayment
+
+        if both_sources:
+            from_savings = has_debt & (debt > 0) & (savings > 0)
+        else:
+            from_savings = has_debt & ~from_cushion & (savings > 0)
+        if from_savings.any():
+            repayment = np.minimum(savings, debt)
+            _withdraw_savings_array(savings, annual_growth, repayment, from_savings)
+            debt[from_savings] -= repayment[from_savings]
+        return cushion, savings, annual_growth, debt
+
+    if debt > 0:
+        from_cushion = cushion > 0
+        if from_cushion:
+            repayment = min(cushion, debt)
+            cushion -= repayment
+            debt -= repayment
+        if (debt > 0 if both_sources else not from_cushion) and savings > 0:
+            repayment = min(savings, debt)
+            # ИСПРАВЛЕНИЕ: Корректируем annual_growth при погашении долга
+            savings, annual_growth, _ = withdraw_savings(savings, annual_growth, repayment)
+            debt -= repayment
+    return cushion, savings, annual_growth, debt
+
+
+def accrue_debt(debt, cushion, savings, annual_growth, is_restructured, current_income, sim_config=None):
+    """
+    Поэтапное управление долгом и начисление процентов за месяц
+
+    Этап 3 - банкротство (долг свыше bankruptcy_threshold_ratio годовых доходов):
+    долг и активы обнуляются. Этап 2 - реструктуризация (свыше
+    restructuring_threshold_ratio): половина ставки. Этап 1 - обычный кредит.
+    Пороги и ставка - из sim_config (None = константы config).
+
+    Returns:
+        tuple: (debt, cushion, savings, annual_growth, is_restructured, events), где
+        events = (bankrupt, newly_restructured, restructured, interest) - флаги/маски
+        событий месяца и начисленные проценты; None, если долгов нет
+    """
+    cfg = resolve_config(sim_config)
+    annual_income = current_income * 12
+    restructuring_threshold = annual_income * cfg.restructuring_threshold_ratio
+    bankruptcy_threshold = annual_income * cfg.bankruptcy_threshold_ratio
+
+    if isinstance(debt, np.ndarray):
+        in_debt = debt > 0
+        if not in_debt.any():
+            return debt, cushion, savings, annual_growth, is_restructured, None
+        # Этап 3: Банкротство (свыше 3 годовых доходов)
+        bankrupt = in_debt & (debt > bankruptcy_threshold)
+        # Этап 2: Реструктуризация (1-3 годовых дохода)
+        restructured = in_debt & ~bankrupt & (debt > restructuring_threshold)
+        # Этап 1: Нормальное кредитование
+        normal = in_debt & ~bankrupt & ~restructured
+
+        debt[bankrupt] = 0
+        cushion[bankrupt] = 0
+        savings[bankrupt] = 0
+        annual_growth[bankrupt] = 0
+
+        newly_restructured = restructured & ~is_restructured
+        is_restructured[bankrupt | normal] = False
+        is_restructured[restructured] = True
+
+        interest = np.zeros(debt.shape, dtype=debt.dtype)
+        interest[restructured] = debt[restructured] * (cfg.debt_interest_rate * 0.5)
+        interest[normal] = debt[normal] * cfg.debt_interest_rate
+        debt += interest
+        return debt, cushion, savings, annual_growth, is_restructured, (
+            bankrupt, newly_restructured, restructured, interest)
+
+    if debt <= 0:
+        return debt, cushion, savings, annual_growth, is_restructured, None
+
+    # Этап 3: Банкротство (свыше 3 годовых доходов)
+    if debt > bankruptcy_threshold:
+        # ИСПРАВЛЕНИЕ: Обнуляем и накопленный рост при банкротстве
+        return 0, 0, 0, 0, False, (True, False, False, 0)
+
+    # Этап 2: Реструктуризация (1-3 годовых дохода)
+    if debt > restructuring_threshold:
+        debt_interest = debt * (cfg.debt_interest_rate * 0.5)  # 12% годовых (1% в месяц)
+        return debt + debt_interest, cushion, savings, annual_growth, True, (
+            False, not is_restructured, True, debt_interest)
+
+    # Этап 1: Нормальное кредитование (до 1 годового дохода) - выход из реструктуризации
+    debt_interest = debt * cfg.debt_interest_rate  # 24% годовых (2% в месяц)
+    return debt + debt_interest, cushion, savings, annual_growth, False, (False, False, False, debt_interest)
+
+
+def settle_tax(savings, annual_growth, tax_rate, mask=None):
+    """
+    Уплата налога tax_rate с накопленного за год роста из savings
+
+    Налог корректирует annual_growth как обычное изъятие; нехватка сбережений
+    становится приростом долга. Скаляры: вызывать при annual_growth > 0;
+    массивы: mask - сценарии с налогом.
+
+    Returns:
+        tuple: (new_savings, new_annual_growth, debt_increase)
+    """
+    return withdraw_savings(savings, annual_growth, annual_growth * tax_rate, mask)
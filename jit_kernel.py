@@ -0,0 +1,454 @@
+import numpy as np
+
+import config
+import simulation_core as sc
+from config import VALIDATION_STATS
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# ===== JIT-ЯДРО МЕСЯЧНОГО ШАГА =====
+# Полная рекуррентность (планы × сценарии × месяцы) пакетного расчета одной
+# функцией со скалярными циклами. При установленном Numba функция компилируется
+# njit(cache=True): машинный код сохраняется в __pycache__, и повторные запуски
+# (воркеры пула, перезапуск сервиса) не тратят время на компиляцию. Без Numba
+# пакетный расчет остается на NumPy (batch_simulation.iter_plan_batch).
+# Порядок операций месячного шага и формулы повторяют iter_plan_batch и
+# debt_kernel поэлементно (без fastmath), поэтому оба движка дают побитово
+# одинаковые результаты на одной шкале шоков - см. batch_simulation.check_jit_backend.
+
+NUMBA_AVAILABLE = numba is not None
+
+# Показатели состояния, фиксируемые на горизонтах (имена полей BatchState)
+SNAPSHOT_FIELDS = (
+    'cushion', 'savings', 'debt', 'virtual_cushion', 'virtual_savings', 'virtual_debt',
+    'scenario_cash_flow', 'direct_losses_total', 'months_zero', 'max_debt', 'months_with_debt',
+    'debt_sum', 'total_interest_paid', 'restructuring_count', 'bankruptcy_count', 'months_restructuring',
+    'first_debt_month', 'first_restructuring_month', 'first_bankruptcy_month', 'first_cushion_depletion_month',
+    'first_cushion_recovery_months', 'max_cushion_depletion_months', 'cushion_depleted_since',
+)
+
+# Подписи проверок валидации (как в iter_plan_batch)
+VALIDATION_LABELS = ("after growth", "before tax", "after tax", "virtual before tax", "virtual after tax")
+ANOMALY_CAPACITY = 1000  # Аномалий с подробностями на прогон ядра (остальные только считаются)
+
+_backend_warning_shown = False
+
+
+def resolve_backend(backend=None):
+    """
+    Движок пакетного расчета: 'numba' или 'numpy'
+
+    backend (None = config.JIT_BACKEND): 'auto' - Numba, если установлен;
+    'numba' - Numba с предупреждением и откатом на NumPy, если его нет; 'numpy'.
+    """
+    global _backend_warning_shown
+    if backend is None:
+        backend = config.JIT_BACKEND
+    if backend not in ('auto', 'numba', 'numpy'):
+        raise ValueError(f"Неизвестный движок пакетного расчета: {backend}")
+    if backend == 'numpy':
+        return 'numpy'
+    if NUMBA_AVAILABLE:
+        return 'numba'
+    if backend == 'numba' and not _backend_warning_shown:
+        print("⚠️  Numba не установлен, пакетный расчет выполняется на NumPy")
+        _backend_warning_shown = True
+    return 'numpy'
+
+
+def _jit(function):
+    """njit(cache=True) при установленном Numba, иначе исходная функция"""
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+@_jit
+def _withdraw(savings, annual_growth, amount):
+    """Скалярный debt_kernel.withdraw_savings: (savings, annual_growth, debt_increase)"""
+    if amount <= 0:
+        return savings, annual_growth, 0.0
+    if savings <= 0:
+        return 0.0, 0.0, amount
+    if savings >= amount:
+        new_annual_growth = annual_growth * (1 - amount / savings)
+        new_savings = savings - amount
+        if new_savings <= 0:
+            return 0.0, 0.0, 0.0
+        return new_savings, new_annual_growth, 0.0
+    return 0.0, 0.0, amount - savings
+
+
+@_jit
+def _repay(cushion, savings, annual_growth, debt, both_sources):
+    """Скалярный debt_kernel.repay_from_assets: (cushion, savings, annual_growth, debt)"""
+    if debt > 0:
+        from_cushion = cushion > 0
+        if from_cushion:
+            repayment = min(cushion, debt)
+            cushion -= repayment
+            debt -= repayment
+        if (debt > 0 if both_sources else not from_cushion) and savings > 0:
+            repayment = min(savings, debt)
+            savings, annual_growth, _ = _withdraw(savings, annual_growth, repayment)
+            debt -= repayment
+    return cushion, savings, annual_growth, debt
+
+
+@_jit
+def _accrue(debt, cushion, savings, annual_growth, is_restructured, current_income,
+            debt_interest_rate, restructuring_ratio, bankruptcy_ratio):
+    """
+    Скалярный debt_kernel.accrue_debt для сценария с долгом
+
+    Returns:
+        tuple: (debt, cushion, savings, annual_growth, is_restructured,
+                bankrupt, newly_restructured, restructured, interest)
+    """
+    annual_income = current_income * 12
+    restructuring_threshold = annual_income * restructuring_ratio
+    bankruptcy_threshold = annual_income * bankruptcy_ratio
+    if debt > bankruptcy_threshold:
+        return 0.0, 0.0, 0.0, 0.0, False, True, False, False, 0.0
+    if debt > restructuring_threshold:
+        interest = debt * (debt_interest_rate * 0.5)
+        return debt + interest, cushion, savings, annual_growth, True, False, not is_restructured, True, interest
+    interest = debt * debt_interest_rate
+    return debt + interest, cushion, savings, annual_growth, False, False, False, False, interest
+
+
+@_jit
+def _apply_cash_flow(available, cushion, savings, annual_growth, debt, cushion_amount):
+    """
+    Скалярный batch_simulation._apply_cash_flow_batch
+
+    Returns:
+        tuple: (cushion, savings, annual_growth, debt, месяц без взноса)
+    """
+    if debt > 0 and available > 0:
+        repayment = min(available, debt)
+        debt -= repayment
+        available -= repayment
+    positive = available > 0
+    if positive:
+        if cushion < cushion_amount:
+            cushion_need = min(available, cushion_amount - cushion)
+            cushion += cushion_need
+            available -= cushion_need
+        if available > 0:
+            savings += available
+    elif available < 0:
+        deficit = -available
+        if cushion >= deficit:
+            cushion -= deficit
+        else:
+            deficit -= cushion
+            cushion = 0.0
+            savings, annual_growth, debt_increase = _withdraw(savings, annual_growth, deficit)
+            debt += debt_increase
+    return cushion, savings, annual_growth, debt, not positive
+
+
+@_jit
+def _check_state(savings, annual_growth, month, label, p, i, n_anomalies, anomaly_index, anomaly_values):
+    """Проверка validate_financial_state; аномалия записывается в буфер. Returns: новое число аномалий"""
+    if savings <= 0 and annual_growth > 0:
+        if n_anomalies < anomaly_index.shape[0]:
+            anomaly_index[n_anomalies, 0] = month
+            anomaly_index[n_anomalies, 1] = label
+            anomaly_index[n_anomalies, 2] = p
+            anomaly_index[n_anomalies, 3] = i
+            anomaly_values[n_anomalies, 0] = savings
+            anomaly_values[n_anomalies, 1] = annual_growth
+        return n_anomalies + 1
+    return n_anomalies
+
+
+@_jit
+def _simulate_kernel(income, expenses, emergency_cost, partial_loss, full_loss,
+                     cushion0, savings0, n_expenses, expense_amount, expense_condition,
+                     expense_is_time, expense_is_target, expense_month, snapshot_months, snapshot_slots,
+                     savings_return_rate, ideal_return_rate, tax_rate, cushion_amount, debt_interest_rate,
+                     restructuring_ratio, bankruptcy_ratio, partial_loss_rate, validate,
+                     snapshots, anomaly_index, anomaly_values, counters):
+    """
+    Месячная рекуррентность пакета: каждый сценарий каждого плана проходит все месяцы
+
+    Результаты пишутся в выходные массивы: snapshots (слот горизонта, поле
+    SNAPSHOT_FIELDS, план, сценарий), expense_month (месяц покупки), counters =
+    [проверок, аномалий]. Доли шоков ядро не хранит - они зависят только от шкалы
+    шоков и графиков плана (batch_simulation.shock_pct_chunks).
+    """
+    n_plans, n = cushion0.shape
+    n_months = income.shape[1] - 1
+    n_checks = 0
+    n_anomalies = 0
+    for p in range(n_plans):
+        for i in range(n):
+            cushion = cushion0[p, i]
+            savings = savings0[p, i]
+            debt = 0.0
+            annual_growth = 0.0
+            is_restructured = False
+            virtual_cushion = cushion
+            virtual_savings = savings
+            virtual_debt = 0.0
+            virtual_annual_growth = 0.0
+            virtual_is_restructured = False
+            scenario_cash_flow = 0.0
+            direct_losses_total = 0.0
+            months_zero = 0.0
+            max_debt = 0.0
+            months_with_debt = 0.0
+            debt_sum = 0.0
+            total_interest_paid = 0.0
+            restructuring_count = 0.0
+            bankruptcy_count = 0.0
+            months_restructuring = 0.0
+            first_debt_month = 0
+            first_restructuring_month = 0
+            first_bankruptcy_month = 0
+            first_depletion_month = 0
+            first_recovery_months = 0
+            max_depletion_months = 0
+            depleted_since = 0
+            cushion_full = cushion >= cushion_amount
+            next_snapshot = 0
+
+            for month in range(1, n_months + 1):
+                current_income = income[p, month]
+                current_expenses = expenses[p, month]
+                m = month - 1
+
+                # Начало года - сброс для налога
+                if month % 12 == 1:
+                    annual_growth = 0.0
+                    virtual_annual_growth = 0.0
+
+                # РЕАЛЬНЫЙ СЦЕНАРИЙ
+                cushion, savings, annual_growth, debt = _repay(cushion, savings, annual_growth, debt, False)
+                if debt > 0:
+                    (debt, cushion, savings, annual_growth, is_restructured,
+                     bankrupt, newly_restructured, restructured, interest) = _accrue(
+                        debt, cushion, savings, annual_growth, is_restructured, current_income,
+                        debt_interest_rate, restructuring_ratio, bankruptcy_ratio)
+                    bankruptcy_count += bankrupt
+                    restructuring_count += newly_restructured
+                    months_restructuring += restructured
+                    total_interest_paid += interest
+                    if bankrupt and first_bankruptcy_month == 0:
+                        first_bankruptcy_month = month
+                    if newly_restructured and first_restructuring_month == 0:
+                        first_restructuring_month = month
+
+                if savings > 0:
+                    growth = savings * savings_return_rate
+                    annual_growth += growth
+                    savings += growth
+                    if validate:
+                        n_checks += 1
+                        n_anomalies = _check_state(savings, annual_growth, month, 0, p, i, n_anomalies,
+                                                   anomaly_index, anomaly_values)
+
+                # Шоки месяца из шкалы
+                emergency = emergency_cost[i, m]
+                available = (current_income - current_expenses) - emergency
+                loss = 0.0
+                if partial_loss[i, m]:
+                    loss = current_income * partial_loss_rate
+                if full_loss[i, m]:
+                    loss = loss + current_income
+                direct_losses_total += emergency + loss
+                available -= loss
+
+                # Запланированные расходы (по порядку в плане, только из savings)
+                current_year = (month - 1) // 12 + 1
+                for e in range(n_expenses[p]):
+                    if expense_month[p, i, e] != 0:
+                        continue
+                    amount = expense_amount[p, e]
+                    if ((expense_is_time[p, e] and current_year >= expense_condition[p, e] and savings >= amount)
+                            or (expense_is_target[p, e] and savings >= expense_condition[p, e])):
+                        savings, annual_growth, debt_increase = _withdraw(savings, annual_growth, amount)
+                        debt += debt_increase
+                        expense_month[p, i, e] = month
+
+                cushion, savings, annual_growth, debt, zero_contribution = _apply_cash_flow(
+                    available, cushion, savings, annual_growth, debt, cushion_amount)
+                cushion, savings, annual_growth, debt = _repay(cushion, savings, annual_growth, debt, False)
+                scenario_cash_flow += ((current_income - current_expenses) - loss) - emergency
+
+                # Уплата налога (в конце года)
+                if month % 12 == 0 and annual_growth > 0:
+                    if validate:
+                        n_checks += 1
+                        n_anomalies = _check_state(savings, annual_growth, month, 1, p, i, n_anomalies,
+                                                   anomaly_index, anomaly_values)
+                    savings, annual_growth, debt_increase = _withdraw(savings, annual_growth,
+                                                                      annual_growth * tax_rate)
+                    debt += debt_increase
+                    if validate:
+                        n_checks += 1
+                        n_anomalies = _check_state(savings, annual_growth, month, 2, p, i, n_anomalies,
+                                                   anomaly_index, anomaly_values)
+                    cushion, savings, annual_growth, debt = _repay(cushion, savings, annual_growth, debt, False)
+
+                # ВИРТУАЛЬНЫЙ СЦЕНАРИЙ (без шоков, с теми же запланированными расходами)
+                virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt = _repay(
+                    virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt, False)
+                if virtual_debt > 0:
+                    (virtual_debt, virtual_cushion, virtual_savings, virtual_annual_growth,
+                     virtual_is_restructured, _, _, _, _) = _accrue(
+                        virtual_debt, virtual_cushion, virtual_savings, virtual_annual_growth,
+                        virtual_is_restructured, current_income,
+                        debt_interest_rate, restructuring_ratio, bankruptcy_ratio)
+                if virtual_savings > 0:
+                    virtual_growth = virtual_savings * ideal_return_rate
+                    virtual_annual_growth += virtual_growth
+                    virtual_savings += virtual_growth
+
+                virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt, _ = _apply_cash_flow(
+                    current_income - current_expenses, virtual_cushion, virtual_savings, virtual_annual_growth,
+                    virtual_debt, cushion_amount)
+
+                # КЛЮЧЕВОЕ: Синхронизированные траты из реального сценария
+                for e in range(n_expenses[p]):
+                    if expense_month[p, i, e] == month:
+                        virtual_savings, virtual_annual_growth, debt_increase = _withdraw(
+                            virtual_savings, virtual_annual_growth, expense_amount[p, e])
+                        virtual_debt += debt_increase
+
+                virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt = _repay(
+                    virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt, False)
+
+                if month % 12 == 0 and virtual_annual_growth > 0:
+                    if validate:
+                        n_checks += 1
+                        n_anomalies = _check_state(virtual_savings, virtual_annual_growth, month, 3, p, i,
+                                                   n_anomalies, anomaly_index, anomaly_values)
+                    virtual_savings, virtual_annual_growth, debt_increase = _withdraw(
+                        virtual_savings, virtual_annual_growth, virtual_annual_growth * tax_rate)
+                    virtual_debt += debt_increase
+                    if validate:
+                        n_checks += 1
+                        n_anomalies = _check_state(virtual_savings, virtual_annual_growth, month, 4, p, i,
+                                                   n_anomalies, anomaly_index, anomaly_values)
+                    virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt = _repay(
+                        virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt, False)
+
+                # Обновление счетчиков
+                months_zero += zero_contribution
+                max_debt = max(max_debt, debt)
+                if debt > 0:
+                    months_with_debt += 1
+                    debt_sum += debt
+                    if first_debt_month == 0:
+                        first_debt_month = month
+
+                # Время до событий: истощение и восстановление подушки
+                if cushion < cushion_amount:
+                    if cushion_full:
+                        cushion_full = False
+                        depleted_since = month
+                        if first_depletion_month == 0:
+                            first_depletion_month = month
+                elif not cushion_full:
+                    cushion_full = True
+                    if depleted_since > 0:
+                        if depleted_since == first_depletion_month:
+                            first_recovery_months = month - depleted_since
+                        max_depletion_months = max(max_depletion_months, month - depleted_since)
+                        depleted_since = 0
+
+                # Фиксация горизонта (финальное погашение из обоих источников)
+                if next_snapshot < snapshot_months.shape[0] and month == snapshot_months[next_snapshot]:
+                    cushion, savings, annual_growth, debt = _repay(cushion, savings, annual_growth, debt, True)
+                    virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt = _repay(
+                        virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt, True)
+                    slot = snapshot_slots[next_snapshot]
+                    next_snapshot += 1
+                    if slot >= 0:
+                        snapshots[slot, 0, p, i] = cushion
+                        snapshots[slot, 1, p, i] = savings
+                        snapshots[slot, 2, p, i] = debt
+                        snapshots[slot, 3, p, i] = virtual_cushion
+                        snapshots[slot, 4, p, i] = virtual_savings
+                        snapshots[slot, 5, p, i] = virtual_debt
+                        snapshots[slot, 6, p, i] = scenario_cash_flow
+                        snapshots[slot, 7, p, i] = direct_losses_total
+                        snapshots[slot, 8, p, i] = months_zero
+                        snapshots[slot, 9, p, i] = max_debt
+                        snapshots[slot, 10, p, i] = months_with_debt
+                        snapshots[slot, 11, p, i] = debt_sum
+                        snapshots[slot, 12, p, i] = total_interest_paid
+                        snapshots[slot, 13, p, i] = restructuring_count
+                        snapshots[slot, 14, p, i] = bankruptcy_count
+                        snapshots[slot, 15, p, i] = months_restructuring
+                        snapshots[slot, 16, p, i] = first_debt_month
+                        snapshots[slot, 17, p, i] = first_restructuring_month
+                        snapshots[slot, 18, p, i] = first_bankruptcy_month
+                        snapshots[slot, 19, p, i] = first_depletion_month
+                        snapshots[slot, 20, p, i] = first_recovery_months
+                        snapshots[slot, 21, p, i] = max_depletion_months
+                        snapshots[slot, 22, p, i] = depleted_since
+    counters[0] = n_checks
+    counters[1] = n_anomalies
+
+
+def run_month_kernel(state, income_schedule, expense_schedule, emergency_costs, partial_losses, full_losses,
+                     snapshot_months, recorded_months, plan_ids, scenario_start, compiled=True):
+    """
+    Прогон ядра для пакета BatchState (float64) на готовой шкале шоков
+
+    Args:
+        state: BatchState пакета; expense_month заполняется ядром
+        income_schedule, expense_schedule: помесячные доходы/расходы (планы, n_months + 1)
+        emergency_costs, partial_losses, full_losses: строки шкалы шоков пакета (сценарии, месяцы)
+        snapshot_months: месяцы финального погашения (горизонты конфигурации)
+        recorded_months: месяцы горизонтов, показатели которых нужны (подмножество snapshot_months)
+        plan_ids, scenario_start: подписи для лога аномалий
+        compiled: False - ядро выполняется интерпретатором Python (проверка без Numba)
+
+    Returns:
+        np.ndarray: snapshots (горизонт, поле SNAPSHOT_FIELDS, план, сценарий)
+    """
+    cfg = state.sim_config
+    snapshot_months = np.array(sorted(snapshot_months), dtype=np.int64)
+    recorded = sorted(recorded_months)
+    snapshot_slots = np.array([recorded.index(month) if month in recorded else -1 for month in snapshot_months],
+                              dtype=np.int64)
+    n_plans, n = state.shape
+    snapshots = np.zeros((len(recorded), len(SNAPSHOT_FIELDS), n_plans, n))
+    anomaly_index = np.zeros((ANOMALY_CAPACITY, 4), dtype=np.int64)
+    anomaly_values = np.zeros((ANOMALY_CAPACITY, 2))
+    counters = np.zeros(2, dtype=np.int64)
+    n_expenses = np.array([len(expenses) for expenses in state.plan_expenses], dtype=np.int64)
+
+    kernel = _simulate_kernel if compiled else getattr(_simulate_kernel, 'py_func', _simulate_kernel)
+    kernel(np.ascontiguousarray(income_schedule, dtype=np.float64),
+           np.ascontiguousarray(expense_schedule, dtype=np.float64),
+           np.ascontiguousarray(emergency_costs, dtype=np.float64),
+           np.ascontiguousarray(partial_losses), np.ascontiguousarray(full_losses),
+           state.cushion, state.savings, n_expenses, state.expense_amount, state.expense_condition,
+           state.expense_is_time, state.expense_is_target, state.expense_month, snapshot_months, snapshot_slots,
+           cfg.savings_return_rate, cfg.ideal_return_rate, cfg.tax_rate, float(cfg.cushion_amount),
+           cfg.debt_interest_rate, cfg.restructuring_threshold_ratio, cfg.bankruptcy_threshold_ratio,
+           cfg.partial_loss_rate, bool(sc.DEBUG_VALIDATION),
+           snapshots, anomaly_index, anomaly_values, counters)
+
+    # Счетчики валидации: аномалии проходят validate_financial_state (лог) в порядке
+    # NumPy-движка - по месяцам, затем по типу проверки, плану и сценарию
+    n_checks, n_anomalies = int(counters[0]), int(counters[1])
+    logged = min(n_anomalies, ANOMALY_CAPACITY)
+    VALIDATION_STATS['total_checks'] += n_checks - logged
+    VALIDATION_STATS['total_anomalies'] += n_anomalies - logged
+    order = np.lexsort(anomaly_index[:logged].T[::-1])
+    for k in order:
+        month, label, p, s = anomaly_index[k].tolist()
+        sc.validate_financial_state(anomaly_values[k, 0], anomaly_values[k, 1],
+                                    f"Plan {plan_ids[p]}, scenario {scenario_start + s}, month {month} - "
+                                    f"{VALIDATION_LABELS[label]}")
+    return snapshots
@@ -1,45 +1,156 @@
-import random
-import numpy as np
 import time
 import os
 import datetime
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 # Импорты из наших модулей
-from config import (
-    RANDOM_SEED, PLANS, N_SCENARIOS, N_MONTHS, HORIZONS,
-    SAVINGS_RETURN_RATE, IDEAL_RETURN_RATE, TAX_RATE, CUSHION_AMOUNT,
-    DEBT_INTEREST_RATE, MINOR_EMERGENCY_PROB, MINOR_EMERGENCY_COST,
-    MEDIUM_EMERGENCY_PROB, MEDIUM_EMERGENCY_COST, MAJOR_EMERGENCY_PROB, MAJOR_EMERGENCY_COST,
-    MINOR_CLUSTER_PROB, MAJOR_CLUSTER_LAMBDA,
-    PARTIAL_LOSS_PROB, PARTIAL_LOSS_RATE, PARTIAL_LOSS_DURATION,
-    FULL_LOSS_PROB, FULL_LOSS_DURATION_MEAN
-)
+from config import PLANS, N_SCENARIOS, HORIZONS, RESULTS_DIR, VALIDATION_STATS
+from simulation_config import DEFAULT_CONFIG
 from simulation_core import run_simulation, initialize_validation_log, finalize_validation_log
-from reporting import (
-    print_comparative_results, save_results_to_text, save_shock_analysis_to_text, 
-    save_planned_expenses_analysis, save_debt_analysis, save_key_scenarios_analysis, 
-    save_wealth_distribution_analysis, save_simulation_parameters
-)
+from profiling import PhaseProfiler, capture_profile
+from telemetry import CompositeObserver, ConsoleReporter, JsonLinesReporter, make_progress_info
+from checkpoints import RunCheckpoint, run_fingerprint
 import config  # Импортируем модуль для установки ANOMALY_LOG_FILE
 
-# ===== ВОСПРОИЗВОДИМОСТЬ =====
-random.seed(RANDOM_SEED)
-np.random.seed(RANDOM_SEED)
+# ===== ОТЧЕТЫ И ЭКСПОРТ =====
+# Имя для --reports -> (файл, функция из reporting, нужна ли KDE-мода)
+REPORTS = {
+    'main': ("main_results.txt", 'save_results_to_text', True),
+    'shock': ("shock_analysis.txt", 'save_shock_analysis_to_text', False),
+    'planned': ("planned_expenses_analysis.txt", 'save_planned_expenses_analysis', False),
+    'debt': ("debt_analysis.txt", 'save_debt_analysis', True),
+    'key': ("key_scenarios_analysis.txt", 'save_key_scenarios_analysis', True),
+    'wealth': ("wealth_distribution_analysis.txt", 'save_wealth_distribution_analysis', True),
+    'events': ("time_to_event_analysis.txt", 'save_time_to_event_analysis', False),
+    'params': ("simulation_parameters.txt", 'save_simulation_parameters', False),
+}
 
-def main():
+# Отчет парного сравнения планов (только с --common-random-numbers)
+PAIRED_REPORT = "paired_comparison.txt"
+# Выборка траекторий (--trajectories K)
+TRAJECTORIES_EXPORT = "trajectories.npz"
+
+# Аргументы запуска, которые --resume восстанавливает из контрольных точек
+RESUME_ARGS = ('plans', 'horizons', 'scenarios', 'seed', 'reports', 'exports', 'skip_ahead', 'trajectories',
+               'common_random_numbers')
+
+# Имя для --exports -> файл
+EXPORTS = {
+    'metrics': "metrics.jsonl",
+    'profiling': "profiling_report.txt",
+    'summary-json': "results_summary.json",
+    'fan-chart': "fan_chart.npz",
+}
+
+
+def parse_args(argv=None):
+    """НОВОЕ: Аргументы командной строки (по умолчанию - прежнее поведение: все планы, горизонты и отчеты)"""
+    parser = argparse.ArgumentParser(
+        description="Монте-Карло симуляция личных финансов по планам (траекториям)"
+    )
+    parser.add_argument('--plans', nargs='+', choices=list(PLANS.keys()), default=list(PLANS.keys()),
+                        help="планы для расчета (по умолчанию все)")
+    parser.add_argument('--horizons', nargs='+', type=int, choices=HORIZONS, default=list(HORIZONS),
+                        help="горизонты анализа в годах (по умолчанию все)")
+    parser.add_argument('--scenarios', type=int, default=N_SCENARIOS,
+                        help=f"количество сценариев (по умолчанию {N_SCENARIOS})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="количество процессов для расчета сценариев (по умолчанию 1)")
+    parser.add_argument('--seed', type=int, default=config.RANDOM_SEED,
+                        help=f"random seed (по умолчанию {config.RANDOM_SEED})")
+    parser.add_argument('--output-dir', default=RESULTS_DIR,
+                        help="базовая папка результатов (внутри создается папка запуска)")
+    parser.add_argument('--reports', nargs='+', choices=list(REPORTS.keys()) + ['all', 'none'], default=['all'],
+                        help="текстовые отчеты (по умолчанию все)")
+    default_exports = ['metrics'] if config.METRICS_JSONL_ENABLED else []
+    if config.PROFILING_ENABLED:
+        default_exports.append('profiling')
+    parser.add_argument('--exports', nargs='+', choices=list(EXPORTS.keys()) + ['none'], default=default_exports,
+                        help="дополнительные выгрузки")
+    parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default=config.PROFILER_BACKEND,
+                        help="захват полного профиля расчета")
+    parser.add_argument('--skip-ahead', action='store_true', default=config.EVENT_SKIP_AHEAD,
+                        help="месяцы без событий считаются одной формулой (быстрее, совпадает до округления)")
+    parser.add_argument('--trajectories', type=int, default=config.TRAJECTORY_SAMPLES, metavar='K',
+                        help="полные траектории K случайных сценариев и сценариев-перцентилей на план "
+                             "(выгрузка trajectories.npz, 0 = выключено)")
+    parser.add_argument('--common-random-numbers', action='store_true', default=config.COMMON_RANDOM_NUMBERS,
+                        help="все планы на одних и тех же шоках (парное сравнение планов)")
+    parser.add_argument('--checkpoint', action='store_true', default=config.CHECKPOINT_ENABLED,
+                        help="сохранять готовые диапазоны сценариев в checkpoints/ папки запуска "
+                             "(продолжение после сбоя - --resume)")
+    parser.add_argument('--resume', metavar='RUN_DIR',
+                        help="продолжить прерванный запуск из его папки; параметры расчета берутся "
+                             "из контрольных точек, --workers можно изменить")
+    args = parser.parse_args(argv)
+
+    if args.resume:
+        # НОВОЕ: параметры прерванного запуска - из манифеста контрольных точек
+        try:
+            manifest = RunCheckpoint.read_manifest(args.resume)
+        except (OSError, ValueError) as e:
+            parser.error(f"--resume: {e}")
+        for name in RESUME_ARGS:
+            setattr(args, name, manifest['args'][name])
+        args.checkpoint = True
+
+    if args.scenarios <= 0:
+        parser.error("--scenarios должно быть положительным")
+    if args.trajectories < 0:
+        parser.error("--trajectories не может быть отрицательным")
+    if args.workers <= 0:
+        parser.error("--workers должно быть положительным")
+
+    if 'all' in args.reports:
+        args.reports = list(REPORTS.keys())
+    elif 'none' in args.reports:
+        args.reports = []
+    if 'none' in args.exports:
+        args.exports = []
+    args.plans = list(dict.fromkeys(args.plans))
+    args.horizons = sorted(set(args.horizons))
+    return args
+
+
+def main(argv=None):
     """Основная функция запуска симуляции"""
-    
+    args = parse_args(argv)
+    plans = {plan_id: PLANS[plan_id] for plan_id in args.plans}
+    n_scenarios = args.scenarios
+    horizons = args.horizons
+    # KDE-мода (scipy) нужна только отчетам, которые ее показывают
+    compute_mode_stats = any(REPORTS[name][2] for name in args.reports)
+    # НОВОЕ: веерные диаграммы считает векторизованный движок (на потоке плана - те же результаты)
+    fan_chart = 'fan-chart' in args.exports
+    # НОВОЕ: парное сравнение - только на общих случайных числах и для нескольких планов
+    paired = args.common_random_numbers and len(plans) > 1
+    # НОВОЕ: траектории записывает расчет по сценариям (run_simulation)
+    trajectories = args.trajectories > 0 and not (args.common_random_numbers or fan_chart)
+    if args.trajectories > 0 and not trajectories:
+        print("⚠️  --trajectories не поддерживается вместе с --common-random-numbers и fan-chart")
+
+    # НОВОЕ: параметры запуска - неизменяемая конфигурация, модуль config не меняется
+    sim_config = DEFAULT_CONFIG.replace(n_scenarios=n_scenarios, random_seed=args.seed,
+                                        event_skip_ahead=args.skip_ahead)
+
+    # ===== ВОСПРОИЗВОДИМОСТЬ =====
+    # ОПТИМИЗИРОВАНО: seed устанавливается при запуске, а не при импорте модуля,
+    # чтобы дочерние процессы и импортирующий код не платили за это
+    config.set_random_seeds(args.seed)
+
     # Вывод информации о симуляции
     print("="*70)
     print(" ВЕКТОРИЗОВАННАЯ ФИНАНСОВАЯ СИМУЛЯЦИЯ С ПЛАНАМИ (ТРАЕКТОРИЯМИ) ")
     print("="*70)
-    print(f"Сценариев: {N_SCENARIOS}, Месяцев: {N_MONTHS} (30 лет)")
+    print(f"Сценариев: {n_scenarios}, Месяцев: {max(horizons)*12} ({max(horizons)} лет)")
+    print(f"Горизонты: {horizons} лет, процессов: {args.workers}, seed: {args.seed}")
     print("Базовые параметры:")
-    print(f"- Доходность сбережений: {SAVINGS_RETURN_RATE*100:.1f}%/мес (~{SAVINGS_RETURN_RATE*12*100:.0f}% годовых)")
-    print(f"- Налог на инвестиционный доход: {TAX_RATE*100:.0f}%")
-    print(f"- Идеальная доходность: {IDEAL_RETURN_RATE*100:.1f}%/мес (~{IDEAL_RETURN_RATE*12*100:.0f}% годовых)")
-    print(f"- Подушка безопасности: {CUSHION_AMOUNT:,}₽ (0% доходности)")
-    print(f"- Ставка по долгу: {DEBT_INTEREST_RATE*100:.1f}%/мес (~{DEBT_INTEREST_RATE*12*100:.0f}% годовых)")
+    print(f"- Доходность сбережений: {sim_config.savings_return_rate*100:.1f}%/мес (~{sim_config.savings_return_rate*12*100:.0f}% годовых)")
+    print(f"- Налог на инвестиционный доход: {sim_config.tax_rate*100:.0f}%")
+    print(f"- Идеальная доходность: {sim_config.ideal_return_rate*100:.1f}%/мес (~{sim_config.ideal_return_rate*12*100:.0f}% годовых)")
+    print(f"- Подушка безопасности: {sim_config.cushion_amount:,}₽ (0% доходности)")
+    print(f"- Ставка по долгу: {sim_config.debt_interest_rate*100:.1f}%/мес (~{sim_config.debt_interest_rate*12*100:.0f}% годовых)")
     print(f"- НОВОЕ: Динамические планы с изменением дохода/расходов во времени")
     print(f"- ИСПРАВЛЕНО: Виртуальный сценарий для правильного расчета потерь компаундинга")
     print(f"- ИСПРАВЛЕНО: Единая система долгов во всех сценариях")
@@ -47,9 +158,13 @@ def main():
     print(f"- ВЕКТОРИЗОВАНО: Батчевая генерация случайных чисел для ускорения")
     print(f"- ОПТИМИЗИРОВАНО: Количество сценариев снижено до {N_SCENARIOS} для веб-версии")
     print(f"- НОВОЕ: Детальная валидация финансовых состояний с логированием")
+    if sim_config.event_skip_ahead:
+        print(f"- НОВОЕ: Пропуск месяцев без событий (закрытая формула, совпадение до округления)")
+    if args.common_random_numbers:
+        print(f"- НОВОЕ: Общие случайные числа - все планы на одной шкале шоков (поток '{config.COMMON_STREAM_ID}')")
 
     print("\nПланы (траектории):")
-    for plan_id, plan_data in PLANS.items():
+    for plan_id, plan_data in plans.items():
         plan_expenses = plan_data.get('planned_expenses', [])
         print(f"- План {plan_id}: {plan_data['initial_income']:,}₽ → {plan_data['initial_expenses']:,}₽ (стартовый капитал: {plan_data.get('initial_capital', 0):,}₽, расходов: {len(plan_expenses)})")
         if plan_data['income_changes']:
@@ -73,19 +188,19 @@ def main():
                     print(f"    ├── {expense['name']}: {expense['amount']:,}₽ (при накоплении {expense['condition']:,}₽)")
 
     print("\nРиски ЧП (Москва 2025):")
-    print(f"- Мелкие траты ({MINOR_EMERGENCY_PROB*100:.1f}%/мес): {MINOR_EMERGENCY_COST}₽")
-    print(f"- Средние траты ({MEDIUM_EMERGENCY_PROB*100:.1f}%/мес): {MEDIUM_EMERGENCY_COST}₽")
-    print(f"- Крупные траты ({MAJOR_EMERGENCY_PROB*100:.1f}%/мес): {MAJOR_EMERGENCY_COST}₽")
-    print(f"  Кластеризация мелких/средних: {MINOR_CLUSTER_PROB*100:.0f}% вероятность продолжения")
-    print(f"  Кластеризация крупных: распределение Пуассона (λ={MAJOR_CLUSTER_LAMBDA})")
-    print(f"- Частичная потеря дохода: {PARTIAL_LOSS_PROB*100:.2f}%/мес ({PARTIAL_LOSS_RATE*100:.0f}% от дохода)")
-    print(f"  Средняя длительность: {PARTIAL_LOSS_DURATION:.1f} мес")
-    print(f"- Полная потеря дохода: {FULL_LOSS_PROB*100:.3f}%/мес")
-    print(f"  Средняя длительность: {FULL_LOSS_DURATION_MEAN:.1f} мес")
+    print(f"- Мелкие траты ({sim_config.minor_emergency_prob*100:.1f}%/мес): {sim_config.minor_emergency_cost}₽")
+    print(f"- Средние траты ({sim_config.medium_emergency_prob*100:.1f}%/мес): {sim_config.medium_emergency_cost}₽")
+    print(f"- Крупные траты ({sim_config.major_emergency_prob*100:.1f}%/мес): {sim_config.major_emergency_cost}₽")
+    print(f"  Кластеризация мелких/средних: {sim_config.minor_cluster_prob*100:.0f}% вероятность продолжения")
+    print(f"  Кластеризация крупных: распределение Пуассона (λ={sim_config.major_cluster_lambda})")
+    print(f"- Частичная потеря дохода: {sim_config.partial_loss_prob*100:.2f}%/мес ({sim_config.partial_loss_rate*100:.0f}% от дохода)")
+    print(f"  Средняя длительность: {sim_config.partial_loss_duration:.1f} мес")
+    print(f"- Полная потеря дохода: {sim_config.full_loss_prob*100:.3f}%/мес")
+    print(f"  Средняя длительность: {sim_config.full_loss_duration_mean:.1f} мес")
     print("="*70)
 
     # Сохранение результатов в файл
-    base_results_dir = r"Y:\code\monte carlo\results"
+    base_results_dir = args.output_dir
     try:
         os.makedirs(base_results_dir, exist_ok=True)
         print(f"✓ Базовая директория создана/существует: {base_results_dir}")
@@ -100,7 +215,10 @@ def main():
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
     unique_folder = f"simulation_vectorized_{timestamp}"  # Изменено название папки
     results_dir = os.path.join(base_results_dir, unique_folder)
-    
+    if args.resume:
+        # НОВОЕ: продолжение пишет результаты в папку прерванного запуска
+        results_dir = args.resume
+
     try:
         os.makedirs(results_dir, exist_ok=True)
         print(f"✓ Директория результатов создана: {results_dir}")
@@ -108,6 +226,27 @@ def main():
         print(f"✗ Ошибка создания директории результатов {results_dir}: {e}")
         return
 
+    # НОВОЕ: Контрольные точки - готовые диапазоны сценариев в папке запуска
+    checkpoint = None
+    if args.checkpoint:
+        fingerprint = run_fingerprint(plans, horizons, n_scenarios, args.seed, sim_config,
+                                      common_random_numbers=args.common_random_numbers, fan_chart=fan_chart,
+                                      fan_chart_grid=(config.FAN_CHART_BIN_WIDTH, config.FAN_CHART_MIN_ABS,
+                                                      config.FAN_CHART_MAX_ABS) if fan_chart else None,
+                                      trajectories=args.trajectories if trajectories else 0,
+                                      float32=config.FLOAT32_MODE)
+        try:
+            if args.resume:
+                checkpoint = RunCheckpoint.resume(results_dir, fingerprint)
+                print(f"✓ Продолжение запуска: {checkpoint.completed_scenarios:,} сценариев в контрольных точках")
+            else:
+                checkpoint = RunCheckpoint.create(results_dir, fingerprint,
+                                                  {name: getattr(args, name) for name in RESUME_ARGS})
+                print(f"✓ Контрольные точки: {checkpoint.directory} (по {checkpoint.chunk_scenarios:,} сценариев)")
+        except (OSError, ValueError) as e:
+            print(f"✗ Ошибка контрольных точек: {e}")
+            return
+
     # Настройка логирования аномалий
     anomaly_log_filename = "debug_anomalies.log"
     anomaly_log_filepath = os.path.join(results_dir, anomaly_log_filename)
@@ -118,48 +257,78 @@ def main():
 
     # НОВОЕ: Инициализация лога валидации
     print(f"\nИнициализация системы валидации...")
-    initialize_validation_log()
+    initialize_validation_log(n_scenarios=n_scenarios, horizons=horizons, seed=args.seed, resume=bool(args.resume))
 
     # Имена файлов в уникальной папке
-    txt_filename = "main_results.txt"
-    txt_filepath = os.path.join(results_dir, txt_filename)
-
-    shock_filename = "shock_analysis.txt"
-    shock_filepath = os.path.join(results_dir, shock_filename)
-
-    planned_filename = "planned_expenses_analysis.txt"
-    planned_filepath = os.path.join(results_dir, planned_filename)
-
-    debt_filename = "debt_analysis.txt"
-    debt_filepath = os.path.join(results_dir, debt_filename)
-
-    # НОВОЕ: Файлы для ключевых сценариев и распределения активов
-    key_scenarios_filename = "key_scenarios_analysis.txt"
-    key_scenarios_filepath = os.path.join(results_dir, key_scenarios_filename)
-
-    wealth_distribution_filename = "wealth_distribution_analysis.txt"
-    wealth_distribution_filepath = os.path.join(results_dir, wealth_distribution_filename)
-
-    # НОВОЕ: Файл с параметрами симуляции
-    params_filename = "simulation_parameters.txt"
-    params_filepath = os.path.join(results_dir, params_filename)
-
     print(f"\nСохранение результатов в папку: {results_dir}")
-    print(f"  ├── {txt_filename}")
-    print(f"  ├── {shock_filename}")
-    print(f"  ├── {planned_filename}")
-    print(f"  ├── {debt_filename}")
-    print(f"  ├── {key_scenarios_filename}")
-    print(f"  ├── {wealth_distribution_filename}")
-    print(f"  ├── {params_filename}")
+    for name in args.reports:
+        print(f"  ├── {REPORTS[name][0]}")
+    for name in args.exports:
+        print(f"  ├── {EXPORTS[name]}")
+    if paired:
+        print(f"  ├── {PAIRED_REPORT}")
+    if trajectories:
+        print(f"  ├── {TRAJECTORIES_EXPORT}")
     print(f"  └── {anomaly_log_filename} (лог валидации - создается всегда)")
 
+    # НОВОЕ: Наблюдатели за прогрессом вместо печати внутри движка
+    metrics_reporter = None
+    if 'metrics' in args.exports:
+        metrics_reporter = JsonLinesReporter(os.path.join(results_dir, EXPORTS['metrics']))
+    observer = CompositeObserver([ConsoleReporter(), metrics_reporter])
+    profiling_enabled = 'profiling' in args.exports
+
     # Запуск симуляций
     start_total = time.time()
     all_results = {}
+    profiles = {}
+    observer.on_run_start(list(plans.keys()), n_scenarios)
 
-    for plan_id, plan_data in PLANS.items():
-        all_results[plan_id] = run_simulation(plan_id, plan_data)
+    # НОВОЕ: Пул процессов - сценарии каждого плана делятся на диапазоны между воркерами
+    executor = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        with capture_profile(args.profiler, results_dir):
+            if profiling_enabled and (args.common_random_numbers or fan_chart):
+                print("⚠️  Профиль фаз доступен только в расчете по сценариям (без общих случайных чисел и fan-chart)")
+            if args.common_random_numbers:
+                # НОВОЕ: Все планы одним пакетом на общей шкале шоков
+                from batch_simulation import run_simulation_batch
+                for plan_id, plan_data in plans.items():
+                    observer.on_plan_start(plan_id, plan_data)
+                all_results = run_simulation_batch(
+                    plans, stream_id=config.COMMON_STREAM_ID, horizons=horizons, n_scenarios=n_scenarios,
+                    seed=args.seed, compute_mode_stats=compute_mode_stats, executor=executor, observer=observer,
+                    sim_config=sim_config, fan_chart=fan_chart, checkpoint=checkpoint
+                )
+                for plan_id in plans:
+                    observer.on_plan_complete(plan_id, make_progress_info(plan_id, n_scenarios, n_scenarios,
+                                                                          start_total, VALIDATION_STATS))
+            elif fan_chart:
+                # НОВОЕ: План на своем потоке в векторизованном движке - числа как у run_simulation
+                from batch_simulation import run_simulation_batch
+                for plan_id, plan_data in plans.items():
+                    observer.on_plan_start(plan_id, plan_data)
+                    all_results.update(run_simulation_batch(
+                        {plan_id: plan_data}, stream_id=plan_id, horizons=horizons, n_scenarios=n_scenarios,
+                        seed=args.seed, compute_mode_stats=compute_mode_stats, executor=executor,
+                        observer=observer, sim_config=sim_config, fan_chart=True, checkpoint=checkpoint
+                    ))
+                    observer.on_plan_complete(plan_id, make_progress_info(plan_id, n_scenarios, n_scenarios,
+                                                                          start_total, VALIDATION_STATS))
+            else:
+                for plan_id, plan_data in plans.items():
+                    profiler = PhaseProfiler(plan_id) if profiling_enabled else None
+                    all_results[plan_id] = run_simulation(
+                        plan_id, plan_data, profiler=profiler, observer=observer,
+                        compute_mode_stats=compute_mode_stats, horizons=horizons,
+                        n_scenarios=n_scenarios, seed=args.seed, executor=executor, sim_config=sim_config,
+                        trajectory_samples=args.trajectories, checkpoint=checkpoint
+                    )
+                    if profiler is not None:
+                        profiles[plan_id] = profiler.as_dict()
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
     total_time = time.time() - start_total
 
@@ -167,27 +336,54 @@ def main():
     print(f"\nФинализация валидации...")
     finalize_validation_log()
 
-    # Вывод результатов
-    print_comparative_results(all_results)
+    # ОПТИМИЗИРОВАНО: модуль отчетности загружается только когда нужны отчеты
+    if args.reports or profiles or 'summary-json' in args.exports or fan_chart or paired or trajectories:
+        import reporting
+
+    # Вывод результатов (та же таблица, что и в основном отчете)
+    if 'main' in args.reports:
+        reporting.print_comparative_results(all_results, sim_config)
 
     print(f"\nСохранение результатов в файлы...")
     try:
-        save_results_to_text(all_results, txt_filepath)
-        save_shock_analysis_to_text(all_results, shock_filepath)
-        save_planned_expenses_analysis(all_results, planned_filepath)
-        save_debt_analysis(all_results, debt_filepath)
-        save_key_scenarios_analysis(all_results, key_scenarios_filepath)
-        save_wealth_distribution_analysis(all_results, wealth_distribution_filepath)
-        save_simulation_parameters(params_filepath)
+        # НОВОЕ: отчеты и выгрузки генерируются параллельно (reporting.save_reports)
+        jobs = []
+        for name in args.reports:
+            filename, function_name, _ = REPORTS[name]
+            filepath = os.path.join(results_dir, filename)
+            if name == 'params':
+                jobs.append((reporting.save_simulation_parameters, (filepath,), dict(
+                    plan_ids=list(plans.keys()), n_scenarios=n_scenarios, horizons=horizons, seed=args.seed,
+                    sim_config=sim_config)))
+            else:
+                jobs.append((getattr(reporting, function_name), (all_results, filepath), {'sim_config': sim_config}))
+        if profiles:
+            jobs.append((reporting.save_profiling_report,
+                         (profiles, os.path.join(results_dir, EXPORTS['profiling'])), {}))
+        if 'summary-json' in args.exports:
+            jobs.append((reporting.save_summary_json,
+                         (all_results, os.path.join(results_dir, EXPORTS['summary-json'])), {}))
+        if fan_chart:
+            jobs.append((reporting.save_fan_chart, (all_results, os.path.join(results_dir, EXPORTS['fan-chart'])), {}))
+        if trajectories:
+            jobs.append((reporting.save_trajectories,
+                         (all_results, os.path.join(results_dir, TRAJECTORIES_EXPORT)), {}))
+        if paired:
+            jobs.append((reporting.save_paired_comparison,
+                         (all_results, os.path.join(results_dir, PAIRED_REPORT), sim_config), {}))
+        if jobs:
+            reporting.save_reports(all_results, jobs)
         print("✓ Результаты успешно сохранены!")
         print(f"✓ Путь к папке: {results_dir}")
-        
+        # НОВОЕ: после сохранения отчетов контрольные точки больше не нужны
+        if checkpoint is not None and not config.CHECKPOINT_KEEP:
+            checkpoint.remove()
+            print(f"✓ Контрольные точки удалены: {checkpoint.directory}")
+
         # ОБНОВЛЕНО: Проверка лога валидации (теперь создается всегда)
         if os.path.exists(anomaly_log_filepath):
             file_size = os.path.getsize(anomaly_log_filepath)
             if file_size > 0:
-                # Импортируем статистику валидации
-                from config import VALIDATION_STATS
                 if VALIDATION_STATS['total_anomalies'] > 0:
                     print(f"⚠️  Обнаружено {VALIDATION_STATS['total_anomalies']:,} финансовых аномалий из {VALIDATION_STATS['total_checks']:,} проверок!")
                     print(f"📋 Детали в файле: {anomaly_log_filename}")
@@ -199,16 +395,24 @@ def main():
         else:
             print(f"✗ Лог валидации не создан: {anomaly_log_filename}")
             print(f"    Проверьте права доступа к директории: {results_dir}")
-            
+
     except Exception as e:
         print(f"✗ Ошибка при сохранении: {e}")
         import traceback
         traceback.print_exc()
 
-    print(f"\nОбщее время расчета: {total_time/60:.1f} минут")
-    print(f"Скорость: {N_SCENARIOS/total_time:.0f} сценариев/сек")
+    observer.on_run_complete({
+        'total_time': total_time,
+        'n_plans': len(plans),
+        'n_scenarios': n_scenarios,
+        'scenarios_per_sec': n_scenarios / total_time if total_time > 0 else 0,
+        'validation_checks': VALIDATION_STATS['total_checks'],
+        'validation_anomalies': VALIDATION_STATS['total_anomalies'],
+    })
+    if metrics_reporter is not None:
+        metrics_reporter.close()
     print(f"ВЕКТОРИЗОВАНО: Использованы батчи случайных чисел для ускорения")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,138 @@
+import time
+import os
+from contextlib import contextmanager
+
+# ===== ФАЗЫ МЕСЯЧНОГО ШАГА =====
+# Порядок определяет порядок строк в отчете профилирования
+PHASE_LABELS = {
+    'baselines': 'Идеальный/линейный сценарии',
+    'plan_changes': 'Изменения плана и начало года',
+    'skip_ahead': 'Пропуск месяцев без событий',
+    'debt': 'Управление долгом и рост',
+    'events': 'Генерация ЧП и потерь дохода',
+    'planned_expenses': 'Запланированные расходы',
+    'cash_flow': 'Денежный поток и подушка',
+    'tax': 'Налог в конце года',
+    'virtual': 'Виртуальный сценарий',
+    'validation': 'Валидация состояний',
+    'horizons': 'Фиксация горизонтов',
+    'statistics': 'Итоговые статистики и мода',
+    'trajectories': 'Выборка траекторий',
+}
+
+
+class PhaseProfiler:
+    """
+    НОВОЕ: Легковесные таймеры и счетчики по фазам месячного шага
+
+    Работает в режиме "круга": lap(phase) относит время, прошедшее с предыдущей
+    отметки, к указанной фазе. В горячем цикле вызовы обернуты в проверку
+    `if profiling:`, поэтому при выключенном профилировании стоимость - одно
+    сравнение булевой переменной.
+    """
+    def __init__(self, plan_id):
+        self.plan_id = plan_id
+        self.timers = {phase: 0.0 for phase in PHASE_LABELS}
+        self.calls = {phase: 0 for phase in PHASE_LABELS}
+        self.counters = {}
+        self.total_time = 0.0
+        self._last = None
+        self._started = None
+
+    def start(self):
+        """Запускает отсчет (первая отметка круга)"""
+        self._last = time.perf_counter()
+        if self._started is None:
+            self._started = self._last
+
+    def lap(self, phase):
+        """Относит время с предыдущей отметки к фазе phase"""
+        now = time.perf_counter()
+        self.timers[phase] = self.timers.get(phase, 0.0) + (now - self._last)
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self._last = now
+
+    def count(self, name, n=1):
+        """Увеличивает именованный счетчик (события, проверки и т.п.)"""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """Добавляет таймеры и счетчики профиля из другого процесса (as_dict())"""
+        for phase, seconds in other['timers'].items():
+            self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+        for phase, calls in other['calls'].items():
+            self.calls[phase] = self.calls.get(phase, 0) + calls
+        for name, value in other['counters'].items():
+            self.count(name, value)
+
+    def stop(self):
+        """Завершает отсчет и фиксирует общее время"""
+        if self._started is not None:
+            self.total_time = time.perf_counter() - self._started
+        self._last = None
+
+    def as_dict(self):
+        """Сводка для отчета"""
+        return {
+            'plan_id': self.plan_id,
+            'timers': dict(self.timers),
+            'calls': dict(self.calls),
+            'counters': dict(self.counters),
+            'total_time': self.total_time,
+        }
+
+
+@contextmanager
+def capture_profile(backend, output_dir):
+    """
+    НОВОЕ: Опциональный захват профиля всего расчета
+
+    Args:
+        backend: None, 'cprofile' или 'pyinstrument'
+        output_dir: папка, куда сохраняется профиль
+
+    Yields:
+        str или None: путь к файлу профиля (заполняется после выхода из блока)
+    """
+    if not backend:
+        yield None
+        return
+
+    if backend == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("✗ pyinstrument не установлен, используем cProfile")
+            backend = 'cprofile'
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield os.path.join(output_dir, "profile_pyinstrument.html")
+            finally:
+                profiler.stop()
+                filepath = os.path.join(output_dir, "profile_pyinstrument.html")
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(profiler.output_html())
+                print(f"✓ Профиль pyinstrument сохранен: {filepath}")
+            return
+
+    if backend != 'cprofile':
+        raise ValueError(f"Неизвестный профилировщик: {backend}")
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    filepath = os.path.join(output_dir, "profile_cprofile.prof")
+    profiler.enable()
+    try:
+        yield filepath
+    finally:
+        profiler.disable()
+        profiler.dump_stats(filepath)
+        # Текстовая сводка рядом с бинарным профилем
+        with open(os.path.join(output_dir, "profile_cprofile.txt"), 'w', encoding='utf-8') as f:
+            stats = pstats.Stats(profiler, stream=f)
+            stats.sort_stats('cumulative').print_stats(40)
+        print(f"✓ Профиль cProfile сохранен: {filepath}")
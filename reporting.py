@@ -1,32 +1,80 @@
 import numpy as np
 import datetime
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
-# Импорты из config.py (будут доступны после создания config.py)
-from config import (
-    PLANS, N_SCENARIOS, HORIZONS,
-    DEBT_INTEREST_RATE, RESTRUCTURING_THRESHOLD_RATIO, BANKRUPTCY_THRESHOLD_RATIO,
-    SAVINGS_RETURN_RATE, IDEAL_RETURN_RATE, TAX_RATE, CUSHION_AMOUNT,
-    MINOR_EMERGENCY_PROB, MINOR_EMERGENCY_COST,
-    MEDIUM_EMERGENCY_PROB, MEDIUM_EMERGENCY_COST,
-    MAJOR_EMERGENCY_PROB, MAJOR_EMERGENCY_COST,
-    MINOR_CLUSTER_PROB, MAJOR_CLUSTER_LAMBDA,
-    PARTIAL_LOSS_PROB, PARTIAL_LOSS_RATE, PARTIAL_LOSS_DURATION,
-    FULL_LOSS_PROB, FULL_LOSS_DURATION_MEAN, FULL_LOSS_DURATION_SD,
-    RANDOM_SEED, N_MONTHS
-)
-
-
-def print_comparative_results(all_results):
+# НОВОЕ: параметры модели и планы - из sim_config (SimulationConfig), переданного
+# в функцию отчета; None = константы config
+from simulation_config import resolve_config
+from config import REPORT_WORKERS
+
+
+@contextmanager
+def _report_buffer(filepath):
+    """
+    НОВОЕ: Отчет собирается в памяти (io.StringIO) и записывается в файл одной
+    операцией - вместо сотен мелких f.write в открытый файл
+    """
+    buffer = io.StringIO()
+    yield buffer
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(buffer.getvalue())
+
+
+def _result_layout(all_results):
+    """
+    Планы, горизонты и число сценариев, фактически присутствующие в результатах
+    (запуск может быть ограничен частью планов/горизонтов)
+    """
+    plan_ids = list(all_results.keys())
+    first_plan = all_results[plan_ids[0]]
+    horizons = sorted(first_plan.keys())
+    n_scenarios = len(first_plan[horizons[0]]['net_wealth'])
+    return plan_ids, horizons, n_scenarios
+
+
+def _distribution(all_results, plan_id, years):
+    """
+    Распределение чистых активов плана на горизонте (results.WealthDistribution):
+    у ScenarioResults - общее для всех отчетов, у сырых словарей - строится здесь
+    """
+    results = all_results[plan_id]
+    if hasattr(results, 'distribution'):
+        return results.distribution(years)
+    from results import WealthDistribution
+    return WealthDistribution(results[years]['net_wealth'])
+
+
+def _replay_call(all_results, plan_id, sim_config=None):
+    """
+    Вызов simulation_core.replay_scenario для сценария #N плана - с seed и потоком
+    случайных чисел расчета (results.random_stream; у сырых словарей - seed
+    конфигурации и поток плана)
+    """
+    random_stream = getattr(all_results[plan_id], 'random_stream', None)
+    seed, stream_id = random_stream or (resolve_config(sim_config).random_seed, plan_id)
+    return f"simulation_core.replay_scenario({plan_id!r}, N, seed={seed}, stream_id={stream_id!r})"
+
+
+def _selected_plans(plan_ids, sim_config=None):
+    """Подмножество PLANS в порядке plan_ids"""
+    cfg = resolve_config(sim_config)
+    return {plan_id: cfg.plans[plan_id] for plan_id in plan_ids}
+
+
+def print_comparative_results(all_results, sim_config=None):
     """Вывод сравнительных результатов симуляции в консоль"""
-    avg_emergency_cost = (MINOR_EMERGENCY_PROB * MINOR_EMERGENCY_COST +
-                          MEDIUM_EMERGENCY_PROB * MEDIUM_EMERGENCY_COST +
-                          MAJOR_EMERGENCY_PROB * MAJOR_EMERGENCY_COST)
+    cfg = resolve_config(sim_config)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    avg_emergency_cost = cfg.expected_emergency_cost
     
     # ИЗМЕНЕНО: теперь используем названия планов
-    headers = [f"План {plan_id}" for plan_id in PLANS.keys()]
+    headers = [f"План {plan_id}" for plan_id in plan_ids]
     col_width = 12
     
-    for years in HORIZONS:
+    for years in horizons:
         months = years * 12
         print("\n" + "="*70)
         print(f" СРАВНЕНИЕ РЕЗУЛЬТАТОВ ЗА {years} ЛЕТ ({months} месяцев) ")
@@ -34,10 +82,10 @@ def print_comparative_results(all_results):
         
         header_str = f"{'Параметр':<30} | " + " | ".join(f"{h:>{col_width}}" for h in headers)
         print(header_str)
-        print("-" * (30 + 3 + (col_width + 3) * len(PLANS) - 3))
+        print("-" * (30 + 3 + (col_width + 3) * len(plan_ids) - 3))
         
         def get_values(key):
-            return [all_results[plan_id][years][key] for plan_id in PLANS.keys()]
+            return [all_results[plan_id][years][key] for plan_id in plan_ids]
         
         # Основные показатели
         avg_wealth = get_values('avg_wealth')
@@ -78,29 +126,29 @@ def print_comparative_results(all_results):
         def get_total_avg_debt(plan_id, years):
             return np.mean(all_results[plan_id][years]['final_debt'])
         
-        total_avg_debt = [get_total_avg_debt(plan_id, years) for plan_id in PLANS.keys()]
+        total_avg_debt = [get_total_avg_debt(plan_id, years) for plan_id in plan_ids]
         print(f"{'Общий средний долг (млн)':<30} | " + " | ".join(f"{v/1e6:>{col_width}.3f}" for v in total_avg_debt))
         
         # ИЗМЕНЕНО: теперь рассчитываем теоретический поток для каждого плана отдельно
         theoretical = {}
-        for plan_id in PLANS.keys():
-            plan_data = PLANS[plan_id]
+        for plan_id in plan_ids:
+            plan_data = cfg.plans[plan_id]
             # Упрощенный расчет - берем начальные значения
             base_income = plan_data['initial_income']
             base_expenses = plan_data['initial_expenses']
             theoretical[plan_id] = (base_income - base_expenses 
                                    - avg_emergency_cost
-                                   - PARTIAL_LOSS_PROB * base_income * PARTIAL_LOSS_RATE * PARTIAL_LOSS_DURATION
-                                   - FULL_LOSS_PROB * base_income * FULL_LOSS_DURATION_MEAN)
+                                   - cfg.partial_loss_prob * base_income * cfg.partial_loss_rate * cfg.partial_loss_duration
+                                   - cfg.full_loss_prob * base_income * cfg.full_loss_duration_mean)
         
-        theor_values = [theoretical[plan_id] for plan_id in PLANS.keys()]
+        theor_values = [theoretical[plan_id] for plan_id in plan_ids]
         print(f"{'Теор. денежный поток (₽)':<30} | " + " | ".join(f"{v:>{col_width},.0f}" for v in theor_values))
         
         real_cash = get_values('real_avg_cash_flow')
         print(f"{'Реал. денежный поток (₽)':<30} | " + " | ".join(f"{v:>{col_width},.0f}" for v in real_cash))
         
         efficiency = []
-        for i, plan_id in enumerate(PLANS.keys()):
+        for i, plan_id in enumerate(plan_ids):
             eff = all_results[plan_id][years]['avg_wealth'] / (theoretical[plan_id] * months) if theoretical[plan_id] != 0 else 0
             efficiency.append(eff)
         print(f"{'Эффективность накопления':<30} | " + " | ".join(f"{v:>{col_width}.2f}" for v in efficiency))
@@ -124,12 +172,12 @@ def print_comparative_results(all_results):
         p95_shock = get_values('p95_shock_pct')
         print(f"{'95-й перцентиль шоков (%)':<30} | " + " | ".join(f"{v:>{col_width}.1f}" for v in p95_shock))
         
-        print("-" * (30 + 3 + (col_width + 3) * len(PLANS) - 3))
+        print("-" * (30 + 3 + (col_width + 3) * len(plan_ids) - 3))
         
         # НОВОЕ: Показатели стартового капитала
-        print(f"{'СТАРТОВЫЙ КАПИТАЛ:':<30} | " + " | ".join(f"{'':>{col_width}}" for _ in PLANS))
+        print(f"{'СТАРТОВЫЙ КАПИТАЛ:':<30} | " + " | ".join(f"{'':>{col_width}}" for _ in plan_ids))
         
-        initial_capitals = [PLANS[plan_id].get('initial_capital', 0) for plan_id in PLANS.keys()]
+        initial_capitals = [cfg.plans[plan_id].get('initial_capital', 0) for plan_id in plan_ids]
         print(f"{'Изначальная сумма (млн)':<30} | " + " | ".join(f"{v/1e6:>{col_width}.3f}" for v in initial_capitals))
         
         potential_values = get_values('initial_capital_potential')
@@ -138,35 +186,42 @@ def print_comparative_results(all_results):
         profit_values = get_values('initial_capital_profit')
         print(f"{'Потенциальная прибыль (млн)':<30} | " + " | ".join(f"{v/1e6:>{col_width}.2f}" for v in profit_values))
         
-        print("-" * (30 + 3 + (col_width + 3) * len(PLANS) - 3))
+        print("-" * (30 + 3 + (col_width + 3) * len(plan_ids) - 3))
 
 
-def save_key_scenarios_analysis(all_results, filepath):
+def save_key_scenarios_analysis(all_results, filepath, sim_config=None):
     """
     НОВАЯ ФУНКЦИЯ: Сохранение анализа ключевых сценариев в отдельный файл
     """
-    with open(filepath, 'w', encoding='utf-8') as f:
+    cfg = resolve_config(sim_config)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    with _report_buffer(filepath) as f:
         f.write("="*70 + "\n")
         f.write(" КЛЮЧЕВЫЕ СЦЕНАРИИ С ДЕТАЛИЗАЦИЕЙ ШОКОВ \n")
         f.write("="*70 + "\n")
-        f.write(f"Сценариев: {N_SCENARIOS}\n")
-        f.write("Анализ типичных сценариев с разбивкой потерь от шоков на прямые и компаундинговые\n\n")
+        f.write(f"Сценариев: {n_scenarios}\n")
+        f.write("Анализ типичных сценариев с разбивкой потерь от шоков на прямые и компаундинговые\n")
+        f.write("Помесячный разбор сценария #N:\n")
+        for plan_id in plan_ids:
+            f.write(f"  План {plan_id}: {_replay_call(all_results, plan_id, cfg)}\n")
+        f.write("\n")
         
-        for years in HORIZONS:
+        for years in horizons:
             f.write(f"\n{'='*50}\n")
             f.write(f" {years} ЛЕТ - КЛЮЧЕВЫЕ СЦЕНАРИИ \n")
             f.write(f"{'='*50}\n")
             
-            for plan_id in PLANS.keys():
+            for plan_id in plan_ids:
                 data = all_results[plan_id][years]
                 net_wealth = data['net_wealth']
+                distribution = _distribution(all_results, plan_id, years)
                 direct_losses = np.array(data['scenarios_direct_losses'])
                 compounding_losses = np.array(data['scenarios_compounding_loss'])
                 
-                f.write(f"\n--- План {plan_id} (начальный доход {PLANS[plan_id]['initial_income']:,}₽, стартовый капитал {PLANS[plan_id].get('initial_capital', 0):,}₽) ---\n")
+                f.write(f"\n--- План {plan_id} (начальный доход {cfg.plans[plan_id]['initial_income']:,}₽, стартовый капитал {cfg.plans[plan_id].get('initial_capital', 0):,}₽) ---\n")
                 
                 # Показатели стартового капитала
-                initial_capital = PLANS[plan_id].get('initial_capital', 0) or 0
+                initial_capital = cfg.plans[plan_id].get('initial_capital', 0) or 0
                 if initial_capital > 0:
                     f.write(f"Стартовый капитал: {initial_capital/1e6:.3f} млн\n")
                     f.write(f"Потенциал стартового капитала: {data['initial_capital_potential']/1e6:.2f} млн (при 6% годовых)\n")
@@ -185,12 +240,12 @@ def save_key_scenarios_analysis(all_results, filepath):
                 f.write(f"Линейные активы: {linear_wealth:.2f} млн (0% доходности, без шоков)\n")
                 
                 # 3. МЕДИАННЫЙ СЦЕНАРИЙ
-                median_wealth = np.median(net_wealth) / 1e6
-                median_idx = np.argmin(np.abs(net_wealth - np.median(net_wealth)))
+                median_wealth = distribution.median() / 1e6
+                median_idx = distribution.nearest_scenario(distribution.median())
                 median_direct = direct_losses[median_idx]
                 median_compounding = compounding_losses[median_idx]
                 total_median_shocks = median_direct + median_compounding
-                f.write(f"Медианные активы: {median_wealth:.2f} млн\n")
+                f.write(f"Медианные активы: {median_wealth:.2f} млн [сценарий #{median_idx}]\n")
                 if total_median_shocks > 0:
                     f.write(f"  ├── Общие потери от шоков: {total_median_shocks:.2f} млн\n")
                     f.write(f"  ├── Прямые потери: {median_direct:.2f} млн ({median_direct/total_median_shocks*100:.0f}%)\n")
@@ -200,12 +255,12 @@ def save_key_scenarios_analysis(all_results, filepath):
                 
                 # 4. МОДАЛЬНЫЙ СЦЕНАРИЙ (ближайший к моде)
                 modal_value = data['modal_wealth']
-                modal_idx = np.argmin(np.abs(net_wealth - modal_value))
+                modal_idx = distribution.nearest_scenario(modal_value)
                 modal_wealth = net_wealth[modal_idx] / 1e6
                 modal_direct = direct_losses[modal_idx]
                 modal_compounding = compounding_losses[modal_idx]
                 total_modal_shocks = modal_direct + modal_compounding
-                f.write(f"Модальные активы: {modal_wealth:.2f} млн (наиболее вероятный)\n")
+                f.write(f"Модальные активы: {modal_wealth:.2f} млн (наиболее вероятный) [сценарий #{modal_idx}]\n")
                 if total_modal_shocks > 0:
                     f.write(f"  ├── Общие потери от шоков: {total_modal_shocks:.2f} млн\n")
                     f.write(f"  ├── Прямые потери: {modal_direct:.2f} млн ({modal_direct/total_modal_shocks*100:.0f}%)\n")
@@ -214,13 +269,13 @@ def save_key_scenarios_analysis(all_results, filepath):
                     f.write(f"  └── Потери от шоков: отсутствуют\n")
                 
                 # 5. 30-Й ПЕРЦЕНТИЛЬ (умеренно плохой сценарий)
-                p30_value = np.percentile(net_wealth, 30)
-                p30_idx = np.argmin(np.abs(net_wealth - p30_value))
+                p30_value = distribution.percentile(30)
+                p30_idx = distribution.nearest_scenario(p30_value)
                 p30_wealth = net_wealth[p30_idx] / 1e6
                 p30_direct = direct_losses[p30_idx]
                 p30_compounding = compounding_losses[p30_idx]
                 total_p30_shocks = p30_direct + p30_compounding
-                f.write(f"30-й перцентиль умеренно плохой: {p30_wealth:.2f} млн (30% худших)\n")
+                f.write(f"30-й перцентиль умеренно плохой: {p30_wealth:.2f} млн (30% худших) [сценарий #{p30_idx}]\n")
                 if total_p30_shocks > 0:
                     f.write(f"  ├── Общие потери от шоков: {total_p30_shocks:.2f} млн\n")
                     f.write(f"  ├── Прямые потери: {p30_direct:.2f} млн ({p30_direct/total_p30_shocks*100:.0f}%)\n")
@@ -229,13 +284,13 @@ def save_key_scenarios_analysis(all_results, filepath):
                     f.write(f"  └── Потери от шоков: отсутствуют\n")
                 
                 # 6. 20-Й ПЕРЦЕНТИЛЬ (плохой сценарий)
-                p20_value = np.percentile(net_wealth, 20)
-                p20_idx = np.argmin(np.abs(net_wealth - p20_value))
+                p20_value = distribution.percentile(20)
+                p20_idx = distribution.nearest_scenario(p20_value)
                 p20_wealth = net_wealth[p20_idx] / 1e6
                 p20_direct = direct_losses[p20_idx]
                 p20_compounding = compounding_losses[p20_idx]
                 total_p20_shocks = p20_direct + p20_compounding
-                f.write(f"20-й перцентиль плохой: {p20_wealth:.2f} млн (20% худших)\n")
+                f.write(f"20-й перцентиль плохой: {p20_wealth:.2f} млн (20% худших) [сценарий #{p20_idx}]\n")
                 if total_p20_shocks > 0:
                     f.write(f"  ├── Общие потери от шоков: {total_p20_shocks:.2f} млн\n")
                     f.write(f"  ├── Прямые потери: {p20_direct:.2f} млн ({p20_direct/total_p20_shocks*100:.0f}%)\n")
@@ -244,13 +299,13 @@ def save_key_scenarios_analysis(all_results, filepath):
                     f.write(f"  └── Потери от шоков: отсутствуют\n")
                 
                 # 7. 10-Й ПЕРЦЕНТИЛЬ (плохой сценарий)
-                p10_value = np.percentile(net_wealth, 10)
-                p10_idx = np.argmin(np.abs(net_wealth - p10_value))
+                p10_value = distribution.percentile(10)
+                p10_idx = distribution.nearest_scenario(p10_value)
                 p10_wealth = net_wealth[p10_idx] / 1e6
                 p10_direct = direct_losses[p10_idx]
                 p10_compounding = compounding_losses[p10_idx]
                 total_p10_shocks = p10_direct + p10_compounding
-                f.write(f"10-й перцентиль плохой: {p10_wealth:.2f} млн (10% худших)\n")
+                f.write(f"10-й перцентиль плохой: {p10_wealth:.2f} млн (10% худших) [сценарий #{p10_idx}]\n")
                 if total_p10_shocks > 0:
                     f.write(f"  ├── Общие потери от шоков: {total_p10_shocks:.2f} млн\n")
                     f.write(f"  ├── Прямые потери: {p10_direct:.2f} млн ({p10_direct/total_p10_shocks*100:.0f}%)\n")
@@ -259,13 +314,13 @@ def save_key_scenarios_analysis(all_results, filepath):
                     f.write(f"  └── Потери от шоков: отсутствуют\n")
                 
                 # 8. 1-Й ПЕРЦЕНТИЛЬ (критический сценарий)
-                p1_value = np.percentile(net_wealth, 1)
-                p1_idx = np.argmin(np.abs(net_wealth - p1_value))
+                p1_value = distribution.percentile(1)
+                p1_idx = distribution.nearest_scenario(p1_value)
                 p1_wealth = net_wealth[p1_idx] / 1e6
                 p1_direct = direct_losses[p1_idx]
                 p1_compounding = compounding_losses[p1_idx]
                 total_p1_shocks = p1_direct + p1_compounding
-                f.write(f"1-й перцентиль критический: {p1_wealth:.2f} млн (1% худших)\n")
+                f.write(f"1-й перцентиль критический: {p1_wealth:.2f} млн (1% худших) [сценарий #{p1_idx}]\n")
                 if total_p1_shocks > 0:
                     f.write(f"  ├── Общие потери от шоков: {total_p1_shocks:.2f} млн\n")
                     f.write(f"  ├── Прямые потери: {p1_direct:.2f} млн ({p1_direct/total_p1_shocks*100:.0f}%)\n")
@@ -276,123 +331,40 @@ def save_key_scenarios_analysis(all_results, filepath):
                 f.write("\n")
 
 
-def save_wealth_distribution_analysis(all_results, filepath):
+def save_wealth_distribution_analysis(all_results, filepath, sim_config=None):
     """
     НОВАЯ ФУНКЦИЯ: Сохранение распределения активов по бинам в отдельный файл
     """
-    with open(filepath, 'w', encoding='utf-8') as f:
+    cfg = resolve_config(sim_config)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    with _report_buffer(filepath) as f:
         f.write("="*70 + "\n")
         f.write(" РАСПРЕДЕЛЕНИЕ АКТИВОВ ПО БИНАМ \n")
         f.write("="*70 + "\n")
-        f.write(f"Сценариев: {N_SCENARIOS}\n")
+        f.write(f"Сценариев: {n_scenarios}\n")
         f.write("Анализ распределения итоговых активов с группировкой по диапазонам\n\n")
         
-        for years in HORIZONS:
+        for years in horizons:
             f.write(f"\n{'='*50}\n")
             f.write(f" {years} ЛЕТ - РАСПРЕДЕЛЕНИЕ АКТИВОВ \n")
             f.write(f"{'='*50}\n")
             
-            for i, plan_id in enumerate(PLANS.keys()):
-                net_wealth = all_results[plan_id][years]['net_wealth'] / 1e6  # в млн
-                min_w = np.min(net_wealth)
-                max_w = np.max(net_wealth)
-                med_w = np.median(net_wealth)
+            for i, plan_id in enumerate(plan_ids):
+                distribution = _distribution(all_results, plan_id, years)
+                min_w = distribution.min / 1e6  # в млн
+                max_w = distribution.max / 1e6
+                med_w = distribution.median() / 1e6
                 mod_w = all_results[plan_id][years]['modal_wealth'] / 1e6  # модальное значение в млн
                 
-                f.write(f"\n--- План {plan_id} (начальный доход {PLANS[plan_id]['initial_income']:,}₽, стартовый капитал {PLANS[plan_id].get('initial_capital', 0):,}₽) ---\n")
+                f.write(f"\n--- План {plan_id} (начальный доход {cfg.plans[plan_id]['initial_income']:,}₽, стартовый капитал {cfg.plans[plan_id].get('initial_capital', 0):,}₽) ---\n")
                 
                 if max_w - min_w == 0:
-                    f.write(f"Все сценарии дали одинаковый результат: {med_w:.2f} млн (100.0%, {N_SCENARIOS} сценариев)\n")
+                    f.write(f"Все сценарии дали одинаковый результат: {med_w:.2f} млн (100.0%, {n_scenarios} сценариев)\n")
                     continue
                 
-                # Базовые 6 бинов
-                range_w = max_w - min_w
-                num_bins = 6
-                bin_step = range_w / num_bins
-                bin_edges = np.arange(min_w, max_w + bin_step / 2, bin_step)
-                
-                hist, edges = np.histogram(net_wealth, bins=bin_edges)
-                pcts = hist / N_SCENARIOS * 100
-                counts = hist
-                
-                # Объединение только мелких бинов
-                merged_pcts = []      
-                merged_counts = []    
-                merged_labels = []    
-                
-                # Отрицательный хвост (активы < 0)
-                tail_neg_pct = 0      
-                tail_neg_count = 0    
-                tail_neg_min = float('inf')   
-                tail_neg_max = float('-inf')  
-                
-                # Положительный хвост (активы > 0)
-                tail_pos_pct = 0      
-                tail_pos_count = 0    
-                tail_pos_min = float('inf')   
-                tail_pos_max = float('-inf')  
-
-                for j in range(len(hist)):
-                    low = edges[j]    
-                    high = edges[j+1] 
-                    pct = pcts[j]     
-                    count = counts[j] 
-                    
-                    # ПРАВИЛО: Если bin мелкий (<5%), он идет в хвост
-                    if pct < 5:
-                        # СЛУЧАЙ 1: Bin полностью отрицательный (все значения ≤ 0)
-                        if high <= 0:
-                            tail_neg_pct += pct
-                            tail_neg_count += count
-                            tail_neg_min = min(tail_neg_min, low)
-                            tail_neg_max = max(tail_neg_max, high)
-                        
-                        # СЛУЧАЙ 2: Bin полностью положительный (все значения ≥ 0)
-                        elif low >= 0:
-                            tail_pos_pct += pct
-                            tail_pos_count += count
-                            tail_pos_min = min(tail_pos_min, low)
-                            tail_pos_max = max(tail_pos_max, high)
-                        
-                        # СЛУЧАЙ 3: Bin пересекает ноль
-                        else:
-                            total_width = high - low
-                            if total_width > 0:
-                                # Отрицательная часть: от low до 0
-                                neg_width = -low
-                                neg_frac = neg_width / total_width
-                                tail_neg_pct += pct * neg_frac
-                                tail_neg_count += int(count * neg_frac)
-                                tail_neg_min = min(tail_neg_min, low)
-                                tail_neg_max = max(tail_neg_max, 0)
-                                
-                                # Положительная часть: от 0 до high
-                                pos_width = high
-                                pos_frac = pos_width / total_width
-                                tail_pos_pct += pct * pos_frac
-                                tail_pos_count += int(count * pos_frac)
-                                tail_pos_min = min(tail_pos_min, 0)
-                                tail_pos_max = max(tail_pos_max, high)
-                    else:
-                        # СЛУЧАЙ 4: Bin крупный (≥5%) - остается как отдельный бин
-                        bin_label = f"{low:.1f}-{high:.1f} млн"
-                        merged_pcts.append(pct)
-                        merged_counts.append(count)
-                        merged_labels.append(bin_label)
-
-                # Добавление хвостов в итоговый список
-                if tail_neg_pct > 0:
-                    tail_label = f"{tail_neg_min:.1f}-{tail_neg_max:.1f} млн (Tail <{tail_neg_pct:.0f}%)"
-                    merged_pcts.insert(0, tail_neg_pct)   
-                    merged_counts.insert(0, tail_neg_count)
-                    merged_labels.insert(0, tail_label)
-                    
-                if tail_pos_pct > 0:
-                    tail_label = f"{tail_pos_min:.1f}-{tail_pos_max:.1f} млн (Tail <{tail_pos_pct:.0f}%)"
-                    insert_idx = 1 if tail_neg_pct > 0 else 0
-                    merged_pcts.insert(insert_idx, tail_pos_pct)
-                    merged_counts.insert(insert_idx, tail_pos_count)
-                    merged_labels.insert(insert_idx, tail_label)
+                # ВЕКТОРИЗОВАНО: 6 равных бинов, мелкие (<5%) объединены в хвосты
+                # (бин, пересекающий ноль, делится между хвостами)
+                bins = distribution.merged_bins(num_bins=6, min_pct=5)
 
                 f.write(f"Диапазон: от {min_w:.2f} до {max_w:.2f} млн\n")
                 f.write(f"Медиана: {med_w:.2f} млн\n")
@@ -402,10 +374,12 @@ def save_wealth_distribution_analysis(all_results, filepath):
                 f.write(f"Вероятность ±10% от моды: {all_results[plan_id][years]['prob_near_mode_10pct']:.1f}%\n\n")
                 
                 f.write("Распределение по бинам:\n")
-                for k in range(len(merged_pcts)):
-                    pct = merged_pcts[k]
-                    count = merged_counts[k]
-                    bin_label = merged_labels[k]
+                for bin_data in bins:
+                    pct = bin_data['pct']
+                    count = bin_data['count']
+                    bin_label = f"{bin_data['low']:.1f}-{bin_data['high']:.1f} млн"
+                    if bin_data['tail']:
+                        bin_label += f" (Tail <{pct:.0f}%)"
                     if pct == 0:
                         continue
 
@@ -417,35 +391,38 @@ def save_wealth_distribution_analysis(all_results, filepath):
                 f.write("\n")
 
 
-def save_debt_analysis(all_results, filepath):
+def save_debt_analysis(all_results, filepath, sim_config=None):
     """
     НОВАЯ ФУНКЦИЯ: Сохранение детального анализа долговой нагрузки в отдельный файл
     ОБНОВЛЕНО: теперь работает с планами
     """
-    with open(filepath, 'w', encoding='utf-8') as f:
+    cfg = resolve_config(sim_config)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    with _report_buffer(filepath) as f:
         f.write("="*70 + "\n")
         f.write(" ДЕТАЛЬНЫЙ АНАЛИЗ ДОЛГОВОЙ НАГРУЗКИ \n")
         f.write("="*70 + "\n")
-        f.write(f"Сценариев: {N_SCENARIOS}\n")
-        f.write(f"Ставка по долгу (нормальная): {DEBT_INTEREST_RATE*100:.1f}%/мес (~{DEBT_INTEREST_RATE*12*100:.0f}% годовых)\n")
-        f.write(f"Ставка по долгу (реструктуризация): {DEBT_INTEREST_RATE*0.5*100:.1f}%/мес (~{DEBT_INTEREST_RATE*0.5*12*100:.0f}% годовых)\n")
-        f.write(f"Порог реструктуризации: {RESTRUCTURING_THRESHOLD_RATIO} годовых дохода\n")
-        f.write(f"Порог банкротства: {BANKRUPTCY_THRESHOLD_RATIO} годовых дохода\n")
-        f.write(f"Доходность сбережений: {SAVINGS_RETURN_RATE*100:.1f}%/мес (~{SAVINGS_RETURN_RATE*12*100:.0f}% годовых)\n")
+        f.write(f"Сценариев: {n_scenarios}\n")
+        f.write(f"Ставка по долгу (нормальная): {cfg.debt_interest_rate*100:.1f}%/мес (~{cfg.debt_interest_rate*12*100:.0f}% годовых)\n")
+        f.write(f"Ставка по долгу (реструктуризация): {cfg.debt_interest_rate*0.5*100:.1f}%/мес (~{cfg.debt_interest_rate*0.5*12*100:.0f}% годовых)\n")
+        f.write(f"Порог реструктуризации: {cfg.restructuring_threshold_ratio} годовых дохода\n")
+        f.write(f"Порог банкротства: {cfg.bankruptcy_threshold_ratio} годовых дохода\n")
+        f.write(f"Доходность сбережений: {cfg.savings_return_rate*100:.1f}%/мес (~{cfg.savings_return_rate*12*100:.0f}% годовых)\n")
         f.write("Примечание: ставки нельзя напрямую сравнивать (номинальная vs реальная)\n\n")
         
-        for years in HORIZONS:
+        for years in horizons:
             f.write(f"\n{'='*50}\n")
             f.write(f" {years} ЛЕТ - АНАЛИЗ ДОЛГОВОЙ НАГРУЗКИ \n")
             f.write(f"{'='*50}\n")
             
-            for plan_id in PLANS.keys():
+            for plan_id in plan_ids:
                 data = all_results[plan_id][years]
                 
-                f.write(f"\n--- План {plan_id} (начальный доход {PLANS[plan_id]['initial_income']:,}₽, стартовый капитал {PLANS[plan_id].get('initial_capital', 0):,}₽) ---\n")
+                f.write(f"\n--- План {plan_id} (начальный доход {cfg.plans[plan_id]['initial_income']:,}₽, стартовый капитал {cfg.plans[plan_id].get('initial_capital', 0):,}₽) ---\n")
                 
                 # Получаем массивы для анализа
                 net_wealth = data['net_wealth']
+                distribution = _distribution(all_results, plan_id, years)
                 final_debt = data['final_debt']
                 max_debt = data['max_debt']
                 months_in_debt = data['months_in_debt']
@@ -459,16 +436,16 @@ def save_debt_analysis(all_results, filepath):
                 
                 # 1. ОБЩАЯ СТАТИСТИКА ПО ДОЛГАМ
                 debt_scenarios = np.sum(final_debt > 0)
-                debt_percentage = (debt_scenarios / N_SCENARIOS) * 100
+                debt_percentage = (debt_scenarios / n_scenarios) * 100
                 
                 f.write(f"Общая статистика:\n")
-                f.write(f"  ├── Сценариев с финальным долгом: {debt_scenarios} из {N_SCENARIOS} ({debt_percentage:.1f}%)\n")
+                f.write(f"  ├── Сценариев с финальным долгом: {debt_scenarios} из {n_scenarios} ({debt_percentage:.1f}%)\n")
                 f.write(f"  ├── Средний финальный долг: {np.mean(final_debt)/1e6:.3f} млн ₽\n")
                 f.write(f"  ├── Средний максимальный долг: {np.mean(max_debt)/1e6:.3f} млн ₽\n")
                 f.write(f"  ├── Среднее время в долгу: {np.mean(months_in_debt):.1f} месяцев\n")
                 f.write(f"  ├── Средняя сумма процентов: {np.mean(total_interest_paid)/1e6:.3f} млн ₽\n")
-                f.write(f"  ├── Сценариев с реструктуризацией: {np.sum(restructuring_events > 0)} ({np.sum(restructuring_events > 0)/N_SCENARIOS*100:.1f}%)\n")
-                f.write(f"  ├── Сценариев с банкротством: {np.sum(bankruptcy_events > 0)} ({np.sum(bankruptcy_events > 0)/N_SCENARIOS*100:.1f}%)\n")
+                f.write(f"  ├── Сценариев с реструктуризацией: {np.sum(restructuring_events > 0)} ({np.sum(restructuring_events > 0)/n_scenarios*100:.1f}%)\n")
+                f.write(f"  ├── Сценариев с банкротством: {np.sum(bankruptcy_events > 0)} ({np.sum(bankruptcy_events > 0)/n_scenarios*100:.1f}%)\n")
                 f.write(f"  └── Среднее время в реструктуризации: {np.mean(months_in_restructuring):.1f} месяцев\n\n")
                 
                 # 2. АНАЛИЗ ТИПИЧНЫХ СЦЕНАРИЕВ
@@ -476,15 +453,15 @@ def save_debt_analysis(all_results, filepath):
                 
                 # Определяем индексы для каждого типичного сценария
                 scenarios_data = [
-                    ("Модальный сценарий (наиболее вероятный)", np.argmin(np.abs(net_wealth - data['modal_wealth']))),
-                    ("30-й перцентиль (умеренно плохой)", np.argmin(np.abs(net_wealth - np.percentile(net_wealth, 30)))),
-                    ("20-й перцентиль (плохой)", np.argmin(np.abs(net_wealth - np.percentile(net_wealth, 20)))),
-                    ("10-й перцентиль (плохой)", np.argmin(np.abs(net_wealth - np.percentile(net_wealth, 10)))),
-                    ("1-й перцентиль (критический)", np.argmin(np.abs(net_wealth - np.percentile(net_wealth, 1))))
+                    ("Модальный сценарий (наиболее вероятный)", distribution.nearest_scenario(data['modal_wealth'])),
+                    ("30-й перцентиль (умеренно плохой)", distribution.nearest_scenario(distribution.percentile(30))),
+                    ("20-й перцентиль (плохой)", distribution.nearest_scenario(distribution.percentile(20))),
+                    ("10-й перцентиль (плохой)", distribution.nearest_scenario(distribution.percentile(10))),
+                    ("1-й перцентиль (критический)", distribution.nearest_scenario(distribution.percentile(1)))
                 ]
                 
                 for scenario_name, scenario_idx in scenarios_data:
-                    f.write(f"{scenario_name}:\n")
+                    f.write(f"{scenario_name} [сценарий #{scenario_idx}]:\n")
                     f.write(f"  ├── Итоговые активы: {net_wealth[scenario_idx]/1e6:.2f} млн\n")
                     f.write(f"  ├── Финальный долг: {final_debt[scenario_idx]/1e6:.3f} млн ₽\n")
                     f.write(f"  ├── Максимальный долг: {max_debt[scenario_idx]/1e6:.3f} млн ₽\n")
@@ -509,11 +486,11 @@ def save_debt_analysis(all_results, filepath):
                 heavy_debt = np.sum((months_in_debt > years * 6) & (months_in_debt <= years * 10))  # 6-10 месяцев в год
                 extreme_debt = np.sum(months_in_debt > years * 10)  # больше 10 месяцев в год
                 
-                f.write(f"  ├── Без долгов: {no_debt} сценариев ({no_debt/N_SCENARIOS*100:.1f}%)\n")
-                f.write(f"  ├── Легкая нагрузка (≤{years*2} мес): {light_debt} сценариев ({light_debt/N_SCENARIOS*100:.1f}%)\n")
-                f.write(f"  ├── Умеренная нагрузка ({years*2}-{years*6} мес): {moderate_debt} сценариев ({moderate_debt/N_SCENARIOS*100:.1f}%)\n")
-                f.write(f"  ├── Тяжелая нагрузка ({years*6}-{years*10} мес): {heavy_debt} сценариев ({heavy_debt/N_SCENARIOS*100:.1f}%)\n")
-                f.write(f"  └── Критическая нагрузка (>{years*10} мес): {extreme_debt} сценариев ({extreme_debt/N_SCENARIOS*100:.1f}%)\n\n")
+                f.write(f"  ├── Без долгов: {no_debt} сценариев ({no_debt/n_scenarios*100:.1f}%)\n")
+                f.write(f"  ├── Легкая нагрузка (≤{years*2} мес): {light_debt} сценариев ({light_debt/n_scenarios*100:.1f}%)\n")
+                f.write(f"  ├── Умеренная нагрузка ({years*2}-{years*6} мес): {moderate_debt} сценариев ({moderate_debt/n_scenarios*100:.1f}%)\n")
+                f.write(f"  ├── Тяжелая нагрузка ({years*6}-{years*10} мес): {heavy_debt} сценариев ({heavy_debt/n_scenarios*100:.1f}%)\n")
+                f.write(f"  └── Критическая нагрузка (>{years*10} мес): {extreme_debt} сценариев ({extreme_debt/n_scenarios*100:.1f}%)\n\n")
                 
                 # 4. ВЛИЯНИЕ ПРОЦЕНТОВ НА ИТОГОВЫЕ РЕЗУЛЬТАТЫ
                 f.write(f"Влияние процентов на итоговые результаты:\n")
@@ -523,7 +500,7 @@ def save_debt_analysis(all_results, filepath):
                     max_interest_loss = np.max(total_interest_paid) / 1e6
                     interest_scenarios = np.sum(scenarios_with_interest)
                     
-                    f.write(f"  ├── Сценариев с процентами: {interest_scenarios} из {N_SCENARIOS} ({interest_scenarios/N_SCENARIOS*100:.1f}%)\n")
+                    f.write(f"  ├── Сценариев с процентами: {interest_scenarios} из {n_scenarios} ({interest_scenarios/n_scenarios*100:.1f}%)\n")
                     f.write(f"  ├── Средняя потеря на процентах: {avg_interest_loss:.3f} млн ₽\n")
                     f.write(f"  ├── Максимальная потеря: {max_interest_loss:.3f} млн ₽\n")
                     
@@ -538,20 +515,22 @@ def save_debt_analysis(all_results, filepath):
                 f.write("\n")
 
 
-def save_planned_expenses_analysis(all_results, filepath):
+def save_planned_expenses_analysis(all_results, filepath, sim_config=None):
     """
     НОВАЯ ФУНКЦИЯ: Сохранение анализа потерь от запланированных расходов в отдельный файл
     ОБНОВЛЕНО: теперь работает с индивидуальными запланированными расходами планов
     """
-    with open(filepath, 'w', encoding='utf-8') as f:
+    cfg = resolve_config(sim_config)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    with _report_buffer(filepath) as f:
         f.write("="*70 + "\n")
         f.write(" АНАЛИЗ ПОТЕРЬ ОТ ЗАПЛАНИРОВАННЫХ РАСХОДОВ \n")
         f.write("="*70 + "\n")
-        f.write(f"Сценариев: {N_SCENARIOS}\n")
+        f.write(f"Сценариев: {n_scenarios}\n")
         f.write(f"Каждый план имеет индивидуальные запланированные расходы\n\n")
         
         f.write("Запланированные расходы по планам:\n")
-        for plan_id, plan_data in PLANS.items():
+        for plan_id, plan_data in _selected_plans(plan_ids, cfg).items():
             plan_expenses = plan_data.get('planned_expenses', [])
             f.write(f"План {plan_id}:\n")
             if plan_expenses:
@@ -565,16 +544,16 @@ def save_planned_expenses_analysis(all_results, filepath):
                 f.write(f"  Запланированных расходов нет\n")
             f.write("\n")
         
-        for years in HORIZONS:
+        for years in horizons:
             f.write(f"\n{'='*50}\n")
             f.write(f" {years} ЛЕТ - АНАЛИЗ ЗАПЛАНИРОВАННЫХ РАСХОДОВ \n")
             f.write(f"{'='*50}\n")
             
-            for plan_id in PLANS.keys():
+            for plan_id in plan_ids:
                 data = all_results[plan_id][years]
-                plan_expenses = PLANS[plan_id].get('planned_expenses', [])
+                plan_expenses = cfg.plans[plan_id].get('planned_expenses', [])
                 
-                f.write(f"\n--- План {plan_id} (начальный доход {PLANS[plan_id]['initial_income']:,}₽, {len(plan_expenses)} запланированных расходов) ---\n")
+                f.write(f"\n--- План {plan_id} (начальный доход {cfg.plans[plan_id]['initial_income']:,}₽, {len(plan_expenses)} запланированных расходов) ---\n")
                 
                 # 1. ОБЩАЯ СТАТИСТИКА
                 planned_expenses_array = np.array(data['scenarios_planned_expenses'])
@@ -584,7 +563,7 @@ def save_planned_expenses_analysis(all_results, filepath):
                     unique_values, counts = np.unique(planned_expenses_array, return_counts=True)
                     modal_idx = np.argmax(counts)
                     modal_planned = unique_values[modal_idx]
-                    modal_frequency = counts[modal_idx] / N_SCENARIOS * 100
+                    modal_frequency = counts[modal_idx] / n_scenarios * 100
                     
                     f.write(f"Модальные запланированные расходы: {modal_planned:.2f} млн\n")
                     f.write(f"Частота модального значения: {modal_frequency:.1f}% сценариев\n")
@@ -593,7 +572,7 @@ def save_planned_expenses_analysis(all_results, filepath):
                     nonzero_mask = planned_expenses_array > 0
                     if np.any(nonzero_mask):
                         nonzero_expenses = planned_expenses_array[nonzero_mask]
-                        nonzero_frequency = len(nonzero_expenses) / N_SCENARIOS * 100
+                        nonzero_frequency = len(nonzero_expenses) / n_scenarios * 100
                         avg_nonzero = np.mean(nonzero_expenses)
                         f.write(f"В {nonzero_frequency:.1f}% сценариев потрачено в среднем {avg_nonzero:.2f} млн\n")
                 else:
@@ -614,9 +593,9 @@ def save_planned_expenses_analysis(all_results, filepath):
                 for name, stats in data['planned_expenses_stats'].items():
                     if stats['count'] > 0:
                         avg_amount = stats['total_amount'] / stats['count'] / 1e6
-                        frequency = stats['count'] / N_SCENARIOS * 100
+                        frequency = stats['count'] / n_scenarios * 100
                         f.write(f"  {name}:\n")
-                        f.write(f"    ├── Частота: {frequency:.1f}% сценариев ({stats['count']} из {N_SCENARIOS})\n")
+                        f.write(f"    ├── Частота: {frequency:.1f}% сценариев ({stats['count']} из {n_scenarios})\n")
                         f.write(f"    └── Средняя сумма: {avg_amount:.2f} млн\n")
                     else:
                         f.write(f"  {name}: Не произошло ни в одном сценарии\n")
@@ -624,25 +603,25 @@ def save_planned_expenses_analysis(all_results, filepath):
                 f.write("\n")
 
 
-def save_results_to_text(all_results, filepath):
+def save_results_to_text(all_results, filepath, sim_config=None):
     """Сохранение результатов в текстовый файл с тем же форматированием что и в консоли
     ОБНОВЛЕНО: теперь работает с планами"""
-    avg_emergency_cost = (MINOR_EMERGENCY_PROB * MINOR_EMERGENCY_COST +
-                          MEDIUM_EMERGENCY_PROB * MEDIUM_EMERGENCY_COST +
-                          MAJOR_EMERGENCY_PROB * MAJOR_EMERGENCY_COST)
+    cfg = resolve_config(sim_config)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    avg_emergency_cost = cfg.expected_emergency_cost
     
-    with open(filepath, 'w', encoding='utf-8') as f:
+    with _report_buffer(filepath) as f:
         # Заголовок
         f.write("="*70 + "\n")
         f.write(" СРАВНИТЕЛЬНАЯ ФИНАНСОВАЯ СИМУЛЯЦИЯ С АНАЛИЗОМ ПОТЕРЬ ОТ ШОКОВ \n")
         f.write("="*70 + "\n")
-        f.write(f"Сценариев: {N_SCENARIOS}, Месяцев: {N_MONTHS} (30 лет)\n")
+        f.write(f"Сценариев: {n_scenarios}, Месяцев: {max(horizons)*12} ({max(horizons)} лет)\n")
         f.write("Базовые параметры:\n")
-        f.write(f"- Доходность сбережений: {SAVINGS_RETURN_RATE*100:.1f}%/мес (~{SAVINGS_RETURN_RATE*12*100:.0f}% годовых)\n")
-        f.write(f"- Налог на инвестиционный доход: {TAX_RATE*100:.0f}%\n")
-        f.write(f"- Идеальная доходность: {IDEAL_RETURN_RATE*100:.1f}%/мес (~{IDEAL_RETURN_RATE*12*100:.0f}% годовых)\n")
-        f.write(f"- Подушка безопасности: {CUSHION_AMOUNT:,}₽ (0% доходности)\n")
-        f.write(f"- Ставка по долгу: {DEBT_INTEREST_RATE*100:.1f}%/мес (~{DEBT_INTEREST_RATE*12*100:.0f}% годовых)\n")
+        f.write(f"- Доходность сбережений: {cfg.savings_return_rate*100:.1f}%/мес (~{cfg.savings_return_rate*12*100:.0f}% годовых)\n")
+        f.write(f"- Налог на инвестиционный доход: {cfg.tax_rate*100:.0f}%\n")
+        f.write(f"- Идеальная доходность: {cfg.ideal_return_rate*100:.1f}%/мес (~{cfg.ideal_return_rate*12*100:.0f}% годовых)\n")
+        f.write(f"- Подушка безопасности: {cfg.cushion_amount:,}₽ (0% доходности)\n")
+        f.write(f"- Ставка по долгу: {cfg.debt_interest_rate*100:.1f}%/мес (~{cfg.debt_interest_rate*12*100:.0f}% годовых)\n")
         f.write(f"- Потенциал сбережений (буфер): доход - расходы (индивидуально для каждого плана)\n")
         f.write(f"- Модальные активы: наиболее вероятное значение (пик плотности распределения)\n")
         f.write(f"- Плотность в моде: относительная частота появления модального значения\n")
@@ -660,18 +639,18 @@ def save_results_to_text(all_results, filepath):
         f.write("- ИСПРАВЛЕНО: Единая система долгов во всех сценариях (идеальный, линейный, виртуальный)\n")
         
         f.write("\nРиски ЧП (Москва 2025):\n")
-        f.write(f"- Мелкие траты ({MINOR_EMERGENCY_PROB*100:.1f}%/мес): {MINOR_EMERGENCY_COST}₽\n")
-        f.write(f"- Средние траты ({MEDIUM_EMERGENCY_PROB*100:.1f}%/мес): {MEDIUM_EMERGENCY_COST}₽\n")
-        f.write(f"- Крупные траты ({MAJOR_EMERGENCY_PROB*100:.1f}%/мес): {MAJOR_EMERGENCY_COST}₽\n")
-        f.write(f"  Кластеризация мелких/средних: {MINOR_CLUSTER_PROB*100:.0f}% вероятность продолжения\n")
-        f.write(f"  Кластеризация крупных: распределение Пуассона (λ={MAJOR_CLUSTER_LAMBDA})\n")
-        f.write(f"- Частичная потеря дохода: {PARTIAL_LOSS_PROB*100:.2f}%/мес ({PARTIAL_LOSS_RATE*100:.0f}% от дохода)\n")
-        f.write(f"  Средняя длительность: {PARTIAL_LOSS_DURATION:.1f} мес\n")
-        f.write(f"- Полная потеря дохода: {FULL_LOSS_PROB*100:.3f}%/мес\n")
-        f.write(f"  Средняя длительность: {FULL_LOSS_DURATION_MEAN:.1f} мес\n")
+        f.write(f"- Мелкие траты ({cfg.minor_emergency_prob*100:.1f}%/мес): {cfg.minor_emergency_cost}₽\n")
+        f.write(f"- Средние траты ({cfg.medium_emergency_prob*100:.1f}%/мес): {cfg.medium_emergency_cost}₽\n")
+        f.write(f"- Крупные траты ({cfg.major_emergency_prob*100:.1f}%/мес): {cfg.major_emergency_cost}₽\n")
+        f.write(f"  Кластеризация мелких/средних: {cfg.minor_cluster_prob*100:.0f}% вероятность продолжения\n")
+        f.write(f"  Кластеризация крупных: распределение Пуассона (λ={cfg.major_cluster_lambda})\n")
+        f.write(f"- Частичная потеря дохода: {cfg.partial_loss_prob*100:.2f}%/мес ({cfg.partial_loss_rate*100:.0f}% от дохода)\n")
+        f.write(f"  Средняя длительность: {cfg.partial_loss_duration:.1f} мес\n")
+        f.write(f"- Полная потеря дохода: {cfg.full_loss_prob*100:.3f}%/мес\n")
+        f.write(f"  Средняя длительность: {cfg.full_loss_duration_mean:.1f} мес\n")
         
         f.write("\nПланы (траектории):\n")
-        for plan_id, plan_data in PLANS.items():
+        for plan_id, plan_data in _selected_plans(plan_ids, cfg).items():
             plan_expenses = plan_data.get('planned_expenses', [])
             f.write(f"- План {plan_id}: {plan_data['initial_income']:,}₽ → {plan_data['initial_expenses']:,}₽ (стартовый капитал: {plan_data.get('initial_capital', 0):,}₽, расходов: {len(plan_expenses)})\n")
             if plan_data['income_changes']:
@@ -688,10 +667,10 @@ def save_results_to_text(all_results, filepath):
         
         f.write("="*70 + "\n")
         
-        headers = [f"План {plan_id}" for plan_id in PLANS.keys()]
+        headers = [f"План {plan_id}" for plan_id in plan_ids]
         col_width = 12
         
-        for years in HORIZONS:
+        for years in horizons:
             months = years * 12
             f.write("\n" + "="*70 + "\n")
             f.write(f" СРАВНЕНИЕ РЕЗУЛЬТАТОВ ЗА {years} ЛЕТ ({months} месяцев) \n")
@@ -699,10 +678,10 @@ def save_results_to_text(all_results, filepath):
             
             header_str = f"{'Параметр':<30} | " + " | ".join(f"{h:>{col_width}}" for h in headers)
             f.write(header_str + "\n")
-            f.write("-" * (30 + 3 + (col_width + 3) * len(PLANS) - 3) + "\n")
+            f.write("-" * (30 + 3 + (col_width + 3) * len(plan_ids) - 3) + "\n")
             
             def get_values(key):
-                return [all_results[plan_id][years][key] for plan_id in PLANS.keys()]
+                return [all_results[plan_id][years][key] for plan_id in plan_ids]
             
             # Основные показатели
             avg_wealth = get_values('avg_wealth')
@@ -743,27 +722,27 @@ def save_results_to_text(all_results, filepath):
             def get_total_avg_debt_file(plan_id, years):
                 return np.mean(all_results[plan_id][years]['final_debt'])
             
-            total_avg_debt = [get_total_avg_debt_file(plan_id, years) for plan_id in PLANS.keys()]
+            total_avg_debt = [get_total_avg_debt_file(plan_id, years) for plan_id in plan_ids]
             f.write(f"{'Общий средний долг (млн)':<30} | " + " | ".join(f"{v/1e6:>{col_width}.3f}" for v in total_avg_debt) + "\n")
             
             theoretical = {}
-            for plan_id in PLANS.keys():
-                plan_data = PLANS[plan_id]
+            for plan_id in plan_ids:
+                plan_data = cfg.plans[plan_id]
                 base_income = plan_data['initial_income']
                 base_expenses = plan_data['initial_expenses']
                 theoretical[plan_id] = (base_income - base_expenses 
                                        - avg_emergency_cost
-                                       - PARTIAL_LOSS_PROB * base_income * PARTIAL_LOSS_RATE * PARTIAL_LOSS_DURATION
-                                       - FULL_LOSS_PROB * base_income * FULL_LOSS_DURATION_MEAN)
+                                       - cfg.partial_loss_prob * base_income * cfg.partial_loss_rate * cfg.partial_loss_duration
+                                       - cfg.full_loss_prob * base_income * cfg.full_loss_duration_mean)
             
-            theor_values = [theoretical[plan_id] for plan_id in PLANS.keys()]
+            theor_values = [theoretical[plan_id] for plan_id in plan_ids]
             f.write(f"{'Теор. денежный поток (₽)':<30} | " + " | ".join(f"{v:>{col_width},.0f}" for v in theor_values) + "\n")
             
             real_cash = get_values('real_avg_cash_flow')
             f.write(f"{'Реал. денежный поток (₽)':<30} | " + " | ".join(f"{v:>{col_width},.0f}" for v in real_cash) + "\n")
             
             efficiency = []
-            for i, plan_id in enumerate(PLANS.keys()):
+            for i, plan_id in enumerate(plan_ids):
                 eff = all_results[plan_id][years]['avg_wealth'] / (theoretical[plan_id] * months) if theoretical[plan_id] != 0 else 0
                 efficiency.append(eff)
             f.write(f"{'Эффективность накопления':<30} | " + " | ".join(f"{v:>{col_width}.2f}" for v in efficiency) + "\n")
@@ -786,12 +765,12 @@ def save_results_to_text(all_results, filepath):
             p95_shock = get_values('p95_shock_pct')
             f.write(f"{'95-й перцентиль шоков (%)':<30} | " + " | ".join(f"{v:>{col_width}.1f}" for v in p95_shock) + "\n")
             
-            f.write("-" * (30 + 3 + (col_width + 3) * len(PLANS) - 3) + "\n")
+            f.write("-" * (30 + 3 + (col_width + 3) * len(plan_ids) - 3) + "\n")
             
             # НОВОЕ: Показатели стартового капитала
-            f.write(f"{'СТАРТОВЫЙ КАПИТАЛ:':<30} | " + " | ".join(f"{'':>{col_width}}" for _ in PLANS) + "\n")
+            f.write(f"{'СТАРТОВЫЙ КАПИТАЛ:':<30} | " + " | ".join(f"{'':>{col_width}}" for _ in plan_ids) + "\n")
             
-            initial_capitals = [PLANS[plan_id].get('initial_capital', 0) for plan_id in PLANS.keys()]
+            initial_capitals = [cfg.plans[plan_id].get('initial_capital', 0) for plan_id in plan_ids]
             f.write(f"{'Изначальная сумма (млн)':<30} | " + " | ".join(f"{v/1e6:>{col_width}.3f}" for v in initial_capitals) + "\n")
             
             potential_values = get_values('initial_capital_potential')
@@ -800,22 +779,24 @@ def save_results_to_text(all_results, filepath):
             profit_values = get_values('initial_capital_profit')
             f.write(f"{'Потенциальная прибыль (млн)':<30} | " + " | ".join(f"{v/1e6:>{col_width}.2f}" for v in profit_values) + "\n")
             
-            f.write("-" * (30 + 3 + (col_width + 3) * len(PLANS) - 3) + "\n")
+            f.write("-" * (30 + 3 + (col_width + 3) * len(plan_ids) - 3) + "\n")
 
 
-def save_shock_analysis_to_text(all_results, filepath):
+def save_shock_analysis_to_text(all_results, filepath, sim_config=None):
     """ОБНОВЛЕНО: теперь работает с планами"""
-    with open(filepath, 'w', encoding='utf-8') as f:
+    cfg = resolve_config(sim_config)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    with _report_buffer(filepath) as f:
         f.write("\n" + "="*70 + "\n")
         f.write(" АНАЛИЗ ПОТЕРЬ ОТ ШОКОВ \n")
         f.write("="*70 + "\n")
         
-        for years in HORIZONS:
+        for years in horizons:
             f.write(f"\n{'='*50}\n")
             f.write(f" {years} ЛЕТ - РАСПРЕДЕЛЕНИЕ ПОТЕРЬ ОТ ШОКОВ \n")
             f.write(f"{'='*50}\n")
             
-            for plan_id in PLANS.keys():
+            for plan_id in plan_ids:
                 data = all_results[plan_id][years]
                 
                 # Получаем данные для анализа
@@ -826,7 +807,7 @@ def save_shock_analysis_to_text(all_results, filepath):
                 if len(direct_losses) == 0:
                     continue
                 
-                f.write(f"\n--- План {plan_id} (начальный доход {PLANS[plan_id]['initial_income']:,}₽, стартовый капитал {PLANS[plan_id].get('initial_capital', 0):,}₽) ---\n")
+                f.write(f"\n--- План {plan_id} (начальный доход {cfg.plans[plan_id]['initial_income']:,}₽, стартовый капитал {cfg.plans[plan_id].get('initial_capital', 0):,}₽) ---\n")
                 
                 # 1. РАСПРЕДЕЛЕНИЕ ПО БИНАМ ПРЯМЫХ ПОТЕРЬ
                 min_loss = np.min(direct_losses)
@@ -834,7 +815,7 @@ def save_shock_analysis_to_text(all_results, filepath):
                 med_loss = np.median(direct_losses)
                 
                 if max_loss - min_loss == 0:
-                    f.write(f"  План {plan_id} (все сценарии: {med_loss:.2f} млн потерь): 100.0% ({N_SCENARIOS})\n")
+                    f.write(f"  План {plan_id} (все сценарии: {med_loss:.2f} млн потерь): 100.0% ({n_scenarios})\n")
                     continue
                 
                 # Критические сценарии (высокие перцентили = худшие случаи)
@@ -875,29 +856,40 @@ def save_shock_analysis_to_text(all_results, filepath):
                 f.write("\n")
 
 
-def save_simulation_parameters(filepath):
-    """Сохранение параметров симуляции для воспроизводимости"""
-    with open(filepath, 'w', encoding='utf-8') as f:
+def save_simulation_parameters(filepath, plan_ids=None, n_scenarios=None, horizons=None, seed=None, sim_config=None):
+    """Сохранение параметров симуляции для воспроизводимости
+    ОБНОВЛЕНО: параметры фактического запуска (планы, сценарии, горизонты, seed)
+    НОВОЕ: по умолчанию - значения sim_config"""
+    cfg = resolve_config(sim_config)
+    if n_scenarios is None:
+        n_scenarios = cfg.n_scenarios
+    if horizons is None:
+        horizons = cfg.horizons
+    if seed is None:
+        seed = cfg.random_seed
+    if plan_ids is None:
+        plan_ids = list(cfg.plans.keys())
+    with _report_buffer(filepath) as f:
         f.write("="*50 + "\n")
         f.write(" ПАРАМЕТРЫ СИМУЛЯЦИИ \n")
         f.write("="*50 + "\n")
         f.write(f"Дата и время запуска: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"Random seed: {RANDOM_SEED}\n")
-        f.write(f"Количество сценариев: {N_SCENARIOS:,}\n")
-        f.write(f"Количество месяцев: {N_MONTHS} (30 лет)\n")
-        f.write(f"Горизонты анализа: {HORIZONS} лет\n\n")
+        f.write(f"Random seed: {seed}\n")
+        f.write(f"Количество сценариев: {n_scenarios:,}\n")
+        f.write(f"Количество месяцев: {max(horizons)*12} ({max(horizons)} лет)\n")
+        f.write(f"Горизонты анализа: {list(horizons)} лет\n\n")
         
         f.write("Финансовые параметры:\n")
-        f.write(f"  ├── Доходность сбережений: {SAVINGS_RETURN_RATE*100:.1f}%/мес (~{SAVINGS_RETURN_RATE*12*100:.0f}% годовых)\n")
-        f.write(f"  ├── Идеальная доходность: {IDEAL_RETURN_RATE*100:.1f}%/мес (~{IDEAL_RETURN_RATE*12*100:.0f}% годовых)\n")
-        f.write(f"  ├── Налог на инвестдоход: {TAX_RATE*100:.0f}%\n")
-        f.write(f"  ├── Подушка безопасности: {CUSHION_AMOUNT:,}₽\n")
-        f.write(f"  ├── Ставка по долгу: {DEBT_INTEREST_RATE*100:.1f}%/мес (~{DEBT_INTEREST_RATE*12*100:.0f}% годовых)\n")
-        f.write(f"  ├── Порог реструктуризации: {RESTRUCTURING_THRESHOLD_RATIO} годовых дохода\n")
-        f.write(f"  └── Порог банкротства: {BANKRUPTCY_THRESHOLD_RATIO} годовых дохода\n\n")
+        f.write(f"  ├── Доходность сбережений: {cfg.savings_return_rate*100:.1f}%/мес (~{cfg.savings_return_rate*12*100:.0f}% годовых)\n")
+        f.write(f"  ├── Идеальная доходность: {cfg.ideal_return_rate*100:.1f}%/мес (~{cfg.ideal_return_rate*12*100:.0f}% годовых)\n")
+        f.write(f"  ├── Налог на инвестдоход: {cfg.tax_rate*100:.0f}%\n")
+        f.write(f"  ├── Подушка безопасности: {cfg.cushion_amount:,}₽\n")
+        f.write(f"  ├── Ставка по долгу: {cfg.debt_interest_rate*100:.1f}%/мес (~{cfg.debt_interest_rate*12*100:.0f}% годовых)\n")
+        f.write(f"  ├── Порог реструктуризации: {cfg.restructuring_threshold_ratio} годовых дохода\n")
+        f.write(f"  └── Порог банкротства: {cfg.bankruptcy_threshold_ratio} годовых дохода\n\n")
         
         f.write("Планы:\n")
-        for plan_id, plan_data in PLANS.items():
+        for plan_id, plan_data in _selected_plans(plan_ids, cfg).items():
             f.write(f"  План {plan_id}:\n")
             f.write(f"    ├── Доход: {plan_data['initial_income']:,}₽/мес\n")
             f.write(f"    ├── Расходы: {plan_data['initial_expenses']:,}₽/мес\n")
@@ -931,10 +923,273 @@ def save_simulation_parameters(filepath):
             f.write("\n")
         
         f.write("Риски ЧП:\n")
-        f.write(f"  ├── Мелкие ({MINOR_EMERGENCY_PROB*100:.1f}%/мес): {MINOR_EMERGENCY_COST:,}₽\n")
-        f.write(f"  ├── Средние ({MEDIUM_EMERGENCY_PROB*100:.1f}%/мес): {MEDIUM_EMERGENCY_COST:,}₽\n")
-        f.write(f"  ├── Крупные ({MAJOR_EMERGENCY_PROB*100:.1f}%/мес): {MAJOR_EMERGENCY_COST:,}₽\n")
-        f.write(f"  ├── Кластеризация мелких/средних: {MINOR_CLUSTER_PROB*100:.0f}%\n")
-        f.write(f"  ├── Кластеризация крупных: Пуассон (λ={MAJOR_CLUSTER_LAMBDA})\n")
-        f.write(f"  ├── Частичная потеря дохода: {PARTIAL_LOSS_PROB*100:.2f}%/мес ({PARTIAL_LOSS_RATE*100:.0f}%, {PARTIAL_LOSS_DURATION:.1f} мес)\n")
-        f.write(f"  └── Полная потеря дохода: {FULL_LOSS_PROB*100:.3f}%/мес ({FULL_LOSS_DURATION_MEAN:.1f} мес)\n")
\ No newline at end of file
+        f.write(f"  ├── Мелкие ({cfg.minor_emergency_prob*100:.1f}%/мес): {cfg.minor_emergency_cost:,}₽\n")
+        f.write(f"  ├── Средние ({cfg.medium_emergency_prob*100:.1f}%/мес): {cfg.medium_emergency_cost:,}₽\n")
+        f.write(f"  ├── Крупные ({cfg.major_emergency_prob*100:.1f}%/мес): {cfg.major_emergency_cost:,}₽\n")
+        f.write(f"  ├── Кластеризация мелких/средних: {cfg.minor_cluster_prob*100:.0f}%\n")
+        f.write(f"  ├── Кластеризация крупных: Пуассон (λ={cfg.major_cluster_lambda})\n")
+        f.write(f"  ├── Частичная потеря дохода: {cfg.partial_loss_prob*100:.2f}%/мес ({cfg.partial_loss_rate*100:.0f}%, {cfg.partial_loss_duration:.1f} мес)\n")
+        f.write(f"  └── Полная потеря дохода: {cfg.full_loss_prob*100:.3f}%/мес ({cfg.full_loss_duration_mean:.1f} мес)\n")
+
+def save_profiling_report(profiles, filepath):
+    """
+    НОВАЯ ФУНКЦИЯ: Сохранение разбивки времени расчета по фазам месячного шага
+
+    Args:
+        profiles: словарь {plan_id: PhaseProfiler.as_dict()}
+        filepath: путь к файлу отчета
+    """
+    from profiling import PHASE_LABELS
+
+    plan_ids = list(profiles.keys())
+    col_width = 16
+
+    with _report_buffer(filepath) as f:
+        f.write("="*70 + "\n")
+        f.write(" ПРОФИЛИРОВАНИЕ ПО ФАЗАМ МЕСЯЧНОГО ШАГА \n")
+        f.write("="*70 + "\n")
+        # В пуле процессов таймеры фаз - сумма по воркерам (процессорное время),
+        # поэтому доли считаются от суммы фаз, а не от времени плана по часам
+        f.write("Формат ячейки: секунды (доля от суммы времени фаз; в пуле процессов - сумма по воркерам)\n\n")
+
+        header_str = f"{'Фаза':<32} | " + " | ".join(f"{'План ' + plan_id:>{col_width}}" for plan_id in plan_ids)
+        separator = "-" * (32 + 3 + (col_width + 3) * len(plan_ids) - 3)
+        f.write(header_str + "\n")
+        f.write(separator + "\n")
+
+        phase_totals = {plan_id: sum(profiles[plan_id]['timers'].values()) for plan_id in plan_ids}
+        for phase, label in PHASE_LABELS.items():
+            cells = []
+            for plan_id in plan_ids:
+                profile = profiles[plan_id]
+                seconds = profile['timers'].get(phase, 0.0)
+                share = seconds / phase_totals[plan_id] * 100 if phase_totals[plan_id] > 0 else 0
+                cells.append(f"{seconds:>8.3f} ({share:>4.1f}%)")
+            f.write(f"{label:<32} | " + " | ".join(f"{c:>{col_width}}" for c in cells) + "\n")
+
+        f.write(separator + "\n")
+        f.write(f"{'Сумма фаз (сек)':<32} | " + " | ".join(f"{phase_totals[plan_id]:>{col_width}.3f}"
+                                                         for plan_id in plan_ids) + "\n")
+        totals = [profiles[plan_id]['total_time'] for plan_id in plan_ids]
+        f.write(f"{'Всего по часам (сек)':<32} | " + " | ".join(f"{v:>{col_width}.3f}" for v in totals) + "\n")
+
+        # Время на один сценарий-месяц - удобно сравнивать запуски разного размера
+        per_step = []
+        for plan_id in plan_ids:
+            profile = profiles[plan_id]
+            steps = profile['counters'].get('scenario_months', 0)
+            per_step.append(profile['total_time'] / steps * 1e6 if steps > 0 else 0)
+        f.write(f"{'мкс на сценарий-месяц':<32} | " + " | ".join(f"{v:>{col_width}.2f}" for v in per_step) + "\n")
+
+        f.write("\nСчетчики:\n")
+        for plan_id in plan_ids:
+            profile = profiles[plan_id]
+            f.write(f"  План {plan_id}:\n")
+            for name, value in profile['counters'].items():
+                f.write(f"    ├── {name}: {value:,}\n")
+            f.write(f"    └── Вызовов фаз: {sum(profile['calls'].values()):,}\n")
+
+
+def save_fan_chart(all_results, filepath):
+    """
+    НОВАЯ ФУНКЦИЯ: Выгрузка веерных диаграмм в .npz
+
+    Для каждого плана с results.fan_chart - массивы "<план>/<показатель>"
+    (месяцы × перцентили, ₽); строка m - конец месяца m + 1. Перцентили - массив "quantiles".
+    """
+    arrays = {}
+    for plan_id, results in all_results.items():
+        fan_chart = getattr(results, 'fan_chart', None)
+        if fan_chart is None:
+            continue
+        arrays['quantiles'] = np.asarray(fan_chart['quantiles'])
+        for metric, bands in fan_chart.items():
+            if isinstance(bands, np.ndarray):
+                arrays[f"{plan_id}/{metric}"] = bands
+    np.savez(filepath, **arrays)
+
+
+def save_trajectories(all_results, filepath):
+    """
+    НОВАЯ ФУНКЦИЯ: Выгрузка выборки траекторий в .npz
+
+    Для каждого плана с results.trajectories:
+        "<план>/sample": (K, TRACE_FIELDS, месяцы), "<план>/sample_scenarios": номера сценариев
+        "<план>/quantile_paths": (перцентили, TRACE_FIELDS, месяцы), "<план>/quantiles",
+        "<план>/quantile_scenarios"
+        "<план>/events": JSON {номер сценария: журнал событий}
+    Порядок показателей - массив "fields".
+    """
+    from trajectories import TRACE_FIELDS
+
+    arrays = {'fields': np.array(TRACE_FIELDS)}
+    for plan_id, results in all_results.items():
+        trajectories = getattr(results, 'trajectories', None)
+        if trajectories is None:
+            continue
+        sample = trajectories['sample']
+        quantile_traces = trajectories['quantiles']
+        arrays[f"{plan_id}/sample"] = np.array([trace.values for trace in sample])
+        arrays[f"{plan_id}/sample_scenarios"] = np.array([trace.scenario for trace in sample], dtype=np.int64)
+        arrays[f"{plan_id}/quantile_paths"] = np.array([trace.values for trace in quantile_traces.values()])
+        arrays[f"{plan_id}/quantiles"] = np.array(list(quantile_traces), dtype=float)
+        arrays[f"{plan_id}/quantile_scenarios"] = np.array([trace.scenario for trace in quantile_traces.values()],
+                                                           dtype=np.int64)
+        events = {trace.scenario: trace.events for trace in list(sample) + list(quantile_traces.values())}
+        arrays[f"{plan_id}/events"] = np.array(json.dumps(events, ensure_ascii=False, default=_json_default))
+    np.savez_compressed(filepath, **arrays)
+
+
+def _json_default(value):
+    """Скаляры NumPy в журналах событий -> числа Python"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def save_summary_json(all_results, filepath):
+    """
+    НОВАЯ ФУНКЦИЯ: Выгрузка скалярных показателей по планам и горизонтам в JSON
+    """
+    from simulation_core import horizon_summary
+
+    summary = {plan_id: horizon_summary(results) for plan_id, results in all_results.items()}
+    with _report_buffer(filepath) as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+def save_paired_comparison(all_results, filepath, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Парное сравнение планов на общих случайных числах
+
+    Для каждого горизонта - матрица P(план-строка богаче плана-столбца) по
+    сценариям и средняя разность чистых активов с 95% интервалом.
+    """
+    from results import paired_comparison
+
+    comparison = paired_comparison(all_results)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    col_width = 10
+    with _report_buffer(filepath) as f:
+        f.write("ПАРНОЕ СРАВНЕНИЕ ПЛАНОВ (ОБЩИЕ СЛУЧАЙНЫЕ ЧИСЛА)\n")
+        f.write("=" * 70 + "\n")
+        f.write(f"Дата: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"Сценариев: {n_scenarios} (одинаковые шоки у всех планов)\n\n")
+        for years in horizons:
+            data = comparison[years]
+            f.write(f"ГОРИЗОНТ {years} ЛЕТ\n")
+            f.write("-" * 70 + "\n")
+            f.write("Вероятность, что план (строка) богаче плана (столбец), %:\n")
+            f.write(f"{'':<10}" + "".join(f"{'План ' + plan_id:>{col_width}}" for plan_id in plan_ids) + "\n")
+            for i, plan_id in enumerate(plan_ids):
+                cells = [f"{'-':>{col_width}}" if i == j else f"{data['prob_beats'][i, j]:>{col_width}.1f}"
+                         for j in range(len(plan_ids))]
+                f.write(f"{'План ' + plan_id:<10}" + "".join(cells) + "\n")
+            f.write("\nСредняя разность чистых активов (млн, 95% интервал):\n")
+            pairs = [(i, j) for i in range(len(plan_ids)) for j in range(i + 1, len(plan_ids))]
+            for k, (i, j) in enumerate(pairs):
+                diff = data['mean_diff'][i, j] / 1e6
+                margin = 1.96 * data['std_err'][i, j] / 1e6
+                branch = "└──" if k == len(pairs) - 1 else "├──"
+                f.write(f"  {branch} {plan_ids[i]} - {plan_ids[j]}: {diff:+.3f} ± {margin:.3f}\n")
+            f.write("\n")
+
+
+def save_time_to_event_analysis(all_results, filepath, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Время до ключевых событий по кривым выживания
+
+    Для каждого события - доля сценариев, где оно наступило к горизонту, и
+    месяцы, к которым оно наступило у 10/25/50% сценариев; для восстановления
+    подушки - длительность по оценке Каплана-Мейера (незавершенные к горизонту
+    периоды цензурированы).
+    """
+    from results import time_to_event_summary
+
+    cfg = resolve_config(sim_config)
+    plan_ids, horizons, n_scenarios = _result_layout(all_results)
+    labels = {
+        'first_debt_month': "Первый долг",
+        'first_restructuring_month': "Первая реструктуризация",
+        'first_bankruptcy_month': "Банкротство",
+        'first_cushion_depletion_month': "Первое истощение подушки",
+    }
+
+    def months(value):
+        return f"мес. {value}" if value is not None else "-"
+
+    with _report_buffer(filepath) as f:
+        f.write("="*70 + "\n")
+        f.write(" ВРЕМЯ ДО СОБЫТИЙ (КРИВЫЕ ВЫЖИВАНИЯ) \n")
+        f.write("="*70 + "\n")
+        f.write(f"Сценариев: {n_scenarios}\n")
+        f.write(f"Подушка безопасности: {cfg.cushion_amount:,}₽ (истощение - падение ниже после заполнения)\n")
+        f.write("Формат: доля сценариев с событием | месяц, к которому событие наступило у 10% / 25% / 50% сценариев\n\n")
+
+        for years in horizons:
+            f.write(f"\n{'='*50}\n")
+            f.write(f" {years} ЛЕТ - ВРЕМЯ ДО СОБЫТИЙ \n")
+            f.write(f"{'='*50}\n")
+
+            for plan_id in plan_ids:
+                summary = time_to_event_summary(all_results[plan_id], years)
+                f.write(f"\n--- План {plan_id} ---\n")
+                rows = [(labels[key], summary[key]) for key in labels]
+                rows += [(f"Покупка '{key.split(':', 1)[1]}'", value) for key, value in summary.items()
+                         if key.startswith('expense:')]
+                for label, data in rows:
+                    q = data['quantiles']
+                    f.write(f"  ├── {label}: {data['hit_pct']:.1f}% | "
+                            f"{months(q[10])} / {months(q[25])} / {months(q[50])}\n")
+
+                recovery = summary['cushion_recovery']
+                max_depletion = np.asarray(all_results[plan_id][years]['max_cushion_depletion_months'])
+                if recovery['spells'] > 0:
+                    q = recovery['quantiles']
+                    f.write(f"  ├── Восстановление подушки после первого истощения: {recovery['hit_pct']:.1f}% "
+                            f"из {recovery['spells']} | {q[10] if q[10] is not None else '-'} / "
+                            f"{q[25] if q[25] is not None else '-'} / {q[50] if q[50] is not None else '-'} мес.\n")
+                    depleted = max_depletion[max_depletion > 0]
+                    f.write(f"  └── Самое долгое истощение подушки: в среднем {depleted.mean():.1f} мес., "
+                            f"максимум {depleted.max()} мес.\n")
+                else:
+                    f.write(f"  └── Истощений подушки: нет\n")
+
+
+def prepare_report_summaries(all_results):
+    """
+    НОВАЯ ФУНКЦИЯ: Общие сводки по (план, горизонт) до параллельной генерации отчетов
+
+    Отсортированные распределения чистых активов (ScenarioResults.distribution)
+    строятся здесь один раз, потоки отчетов только читают их.
+    """
+    for results in all_results.values():
+        if hasattr(results, 'distribution'):
+            for years in results:
+                results.distribution(years)
+
+
+def save_reports(all_results, jobs, max_workers=REPORT_WORKERS):
+    """
+    НОВАЯ ФУНКЦИЯ: Параллельное сохранение отчетов в пуле потоков
+
+    Каждый отчет собирается в своем буфере (_report_buffer) по общим сводкам
+    prepare_report_summaries и записывается одной операцией; отчеты не зависят
+    друг от друга и результаты не изменяют.
+
+    Args:
+        jobs: список (функция сохранения, позиционные аргументы, именованные аргументы)
+        max_workers: число потоков (1 - последовательно, в порядке jobs)
+
+    Raises:
+        Первое исключение отчета (остальные отчеты при этом дописываются)
+    """
+    prepare_report_summaries(all_results)
+    if max_workers <= 1 or len(jobs) <= 1:
+        for function, args, kwargs in jobs:
+            function(*args, **kwargs)
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        futures = [executor.submit(function, *args, **kwargs) for function, args, kwargs in jobs]
+    for future in futures:
+        future.result()
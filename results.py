@@ -0,0 +1,577 @@
+import json
+from collections.abc import Mapping, MutableMapping
+from itertools import combinations
+
+import numpy as np
+
+# ===== СТРУКТУРА РЕЗУЛЬТАТОВ ПЛАНА =====
+# ScenarioResults хранит результаты плана как структуру массивов: по одному
+# непрерывному массиву (горизонты × сценарии) на показатель вместо словаря
+# словарей со списками Python. Счетчики (месяцы, ЧП, события долга) хранятся
+# в int16 - их значения не превышают числа месяцев расчета; денежные
+# показатели и доли шоков (shock_pcts, основная часть объема) - float64 (или
+# float32 в режиме пониженной точности).
+# results[years] возвращает словарь-представление горизонта (HorizonView),
+# поэтому reporting и finalize_horizon_statistics работают без изменений.
+
+# Показатели "одно число на сценарий" и их типы
+SCENARIO_FIELDS = {
+    'net_wealth': np.float64,
+    'final_debt': np.float64,
+    'months_zero': np.int16,
+    'minor_emergencies': np.int16,
+    'medium_emergencies': np.int16,
+    'major_emergencies': np.int16,
+    'scenarios_direct_losses': np.float64,
+    'scenarios_compounding_loss': np.float64,
+    'scenarios_planned_expenses': np.float64,
+    'scenarios_planned_compounding_loss': np.float64,
+    'max_debt': np.float64,
+    'months_in_debt': np.int16,
+    'total_interest_paid': np.float64,
+    'avg_debt_when_in_debt': np.float64,
+    'restructuring_events': np.int16,
+    'bankruptcy_events': np.int16,
+    'months_in_restructuring': np.float64,
+    # НОВОЕ: время до событий - месяц первого наступления (0 = не было к горизонту)
+    'first_debt_month': np.int16,
+    'first_restructuring_month': np.int16,
+    'first_bankruptcy_month': np.int16,
+    'first_cushion_depletion_month': np.int16,
+    # Месяцев от первого истощения подушки до ее восстановления (0 = не восстановлена к горизонту)
+    'first_cushion_recovery_months': np.int16,
+    # Самый долгий период с подушкой ниже цели (незавершенный - до горизонта)
+    'max_cushion_depletion_months': np.int16,
+}
+
+# Показатели "месяц первого наступления события" (кривые выживания - time_to_event_summary)
+FIRST_EVENT_FIELDS = ('first_debt_month', 'first_restructuring_month', 'first_bankruptcy_month',
+                      'first_cushion_depletion_month')
+
+# Остальные сырые показатели горизонта (хранятся отдельно, см. ScenarioResults)
+# planned_expense_months - месяцы первой покупки по названиям расходов (сценарии × расходы, int16)
+AGGREGATE_KEYS = ('total_cash_flow', 'shock_pcts', 'planned_expenses_stats', 'planned_expense_months')
+
+
+class WealthDistribution:
+    """
+    НОВОЕ: Распределение чистых активов одного плана на одном горизонте
+
+    Строится один раз сортировкой (O(n log n)); перцентили, гистограмма,
+    объединение мелких бинов в хвосты и поиск сценария, ближайшего к значению,
+    работают по отсортированному массиву (двоичный поиск по границам) без
+    повторных проходов по сценариям. Результаты совпадают с np.percentile,
+    np.histogram и np.argmin(np.abs(values - value)) по исходному массиву.
+
+    Атрибуты:
+        order: номера сценариев в порядке возрастания (устойчивая сортировка)
+        sorted: значения в порядке возрастания
+    """
+    __slots__ = ('order', 'sorted')
+
+    def __init__(self, values):
+        values = np.asarray(values)
+        self.order = np.argsort(values, kind='stable')
+        self.sorted = values[self.order]
+
+    def __len__(self):
+        return len(self.sorted)
+
+    @property
+    def min(self):
+        return self.sorted[0]
+
+    @property
+    def max(self):
+        return self.sorted[-1]
+
+    def percentile(self, q):
+        """Перцентиль q (как np.percentile; на отсортированном массиве выборка порядковых статистик быстрая)"""
+        return np.percentile(self.sorted, q)
+
+    def median(self):
+        return np.median(self.sorted)
+
+    def nearest_scenario(self, value):
+        """
+        Номер сценария со значением, ближайшим к value (как np.argmin(np.abs(values - value)):
+        при равных расстояниях - наименьший номер)
+        """
+        values = self.sorted
+        position = np.searchsorted(values, value)
+        best = None
+        for neighbour in (position - 1, position):
+            if 0 <= neighbour < len(values):
+                # Первый элемент группы равных значений - наименьший номер сценария
+                first = np.searchsorted(values, values[neighbour], 'left')
+                candidate = (abs(values[first] - value), self.order[first])
+                if best is None or candidate < best:
+                    best = candidate
+        return int(best[1])
+
+    def histogram(self, num_bins=6, scale=1e6):
+        """
+        Гистограмма на num_bins равных бинов от минимума до максимума (значения / scale)
+
+        Returns:
+            tuple: (counts, edges) - как np.histogram с границами np.arange
+        """
+        scaled = self.sorted / scale
+        min_w, max_w = scaled[0], scaled[-1]
+        bin_step = (max_w - min_w) / num_bins
+        edges = np.arange(min_w, max_w + bin_step / 2, bin_step)
+        # Накопленные числа значений левее границ (последний бин включает правую границу)
+        cumulative = np.concatenate((np.searchsorted(scaled, edges[:-1], 'left'),
+                                     np.searchsorted(scaled, edges[-1:], 'right')))
+        return np.diff(cumulative), edges
+
+    def merged_bins(self, num_bins=6, min_pct=5, scale=1e6):
+        """
+        ВЕКТОРИЗОВАНО: Бины гистограммы, где мелкие (< min_pct% сценариев) объединены в хвосты
+
+        Мелкие бины ниже нуля идут в отрицательный хвост, выше нуля - в
+        положительный; бин, пересекающий ноль, делится между хвостами
+        пропорционально ширине частей (число сценариев - с отбрасыванием дробной части).
+
+        Returns:
+            list: словари {'low', 'high', 'pct', 'count', 'tail'} - сначала хвосты
+                  (отрицательный, положительный; tail=True), затем крупные бины по возрастанию
+        """
+        counts, edges = self.histogram(num_bins, scale)
+        pcts = counts / len(self.sorted) * 100
+        low, high = edges[:-1], edges[1:]
+        small = pcts < min_pct
+        negative = small & (high <= 0)
+        positive = small & ~negative & (low >= 0)
+        crossing = small & ~negative & ~positive
+        width = np.where(crossing, high - low, 1)
+        neg_frac = np.where(negative, 1.0, np.where(crossing, -low / width, 0.0))
+        pos_frac = np.where(positive, 1.0, np.where(crossing, high / width, 0.0))
+
+        bins = []
+        for frac, members, bound_low, bound_high in (
+                (neg_frac, negative | crossing, low, np.where(crossing, 0.0, high)),
+                (pos_frac, positive | crossing, np.where(crossing, 0.0, low), high)):
+            tail_pct = np.sum(pcts * frac)
+            if tail_pct > 0:
+                bins.append({'low': bound_low[members].min(), 'high': bound_high[members].max(), 'pct': tail_pct,
+                             'count': int(np.sum(np.trunc(counts * frac))), 'tail': True})
+        for j in np.flatnonzero(~small):
+            bins.append({'low': low[j], 'high': high[j], 'pct': pcts[j], 'count': counts[j], 'tail': False})
+        return bins
+
+
+class HorizonView(MutableMapping):
+    """
+    Словарь-представление одного горизонта ScenarioResults
+
+    Показатели по сценариям - строки массивов результатов (без копирования),
+    запись в них изменяет сами результаты. Итоговые статистики
+    (avg_wealth, ideal_wealth, ...) хранятся в results.stats[индекс горизонта].
+    """
+    __slots__ = ('results', 'index')
+
+    def __init__(self, results, index):
+        self.results = results
+        self.index = index
+
+    def __getitem__(self, key):
+        results = self.results
+        if key in SCENARIO_FIELDS:
+            return getattr(results, key)[self.index]
+        if key == 'total_cash_flow':
+            return results.total_cash_flow[self.index]
+        if key == 'shock_pcts':
+            return results.shock_pcts[self.index]
+        if key == 'planned_expenses_stats':
+            return results.planned_expenses_stats(self.index)
+        if key == 'planned_expense_months':
+            return results.expense_first_month[self.index].T
+        return results.stats[self.index][key]
+
+    def __setitem__(self, key, value):
+        results = self.results
+        if key in SCENARIO_FIELDS:
+            getattr(results, key)[self.index] = value
+        elif key == 'total_cash_flow':
+            results.total_cash_flow[self.index] = value
+        elif key == 'shock_pcts':
+            results.shock_pcts[self.index] = np.asarray(value, dtype=np.float64)
+        elif key == 'planned_expenses_stats':
+            for e, name in enumerate(results.expense_names):
+                results.expense_counts[self.index, e] = value[name]['count']
+                results.expense_amounts[self.index, e] = value[name]['total_amount']
+        elif key == 'planned_expense_months':
+            results.expense_first_month[self.index] = np.asarray(value).T
+        else:
+            results.stats[self.index][key] = value
+
+    def __delitem__(self, key):
+        if key in SCENARIO_FIELDS or key in AGGREGATE_KEYS:
+            raise KeyError(f"Показатель {key} нельзя удалить из результатов")
+        del self.results.stats[self.index][key]
+
+    def __iter__(self):
+        yield from SCENARIO_FIELDS
+        yield from AGGREGATE_KEYS
+        yield from self.results.stats[self.index]
+
+    def __len__(self):
+        return len(SCENARIO_FIELDS) + len(AGGREGATE_KEYS) + len(self.results.stats[self.index])
+
+    def __repr__(self):
+        return f"HorizonView({self.results.horizons[self.index]} лет, {self.results.n_scenarios} сценариев)"
+
+
+class ScenarioResults(Mapping):
+    """
+    НОВОЕ: Результаты плана - структура массивов вместо results_by_horizon
+
+    Атрибуты:
+        horizons: кортеж горизонтов (лет), порядок строк всех массивов
+        n_scenarios: число сценариев
+        <показатель из SCENARIO_FIELDS>: массив (горизонты × сценарии)
+        total_cash_flow: суммарный денежный поток по горизонтам (float64)
+        shock_pcts: список массивов шоков в % по горизонтам (переменной длины)
+        expense_names: названия запланированных расходов
+        expense_counts, expense_amounts: (горизонты × расходы) - число и сумма покупок
+        expense_first_month: (горизонты × расходы × сценарии) - месяц первой покупки (0 = не было), int16
+        stats: список словарей итоговых статистик по горизонтам
+        fan_chart: помесячные перцентили (batch_simulation.fan_chart_bands) или None
+        trajectories: выборка траекторий {'sample': [ScenarioTrace], 'quantiles': {перцентиль:
+                      ScenarioTrace}} (simulation_core.run_simulation) или None
+        random_stream: (seed, поток случайных чисел) расчета - аргументы
+                       simulation_core.replay_scenario; None, если неизвестны
+
+    Словарный интерфейс: results[years] -> HorizonView, results.items() и т.д.
+    """
+    __slots__ = ('horizons', 'n_scenarios', 'total_cash_flow', 'shock_pcts', 'expense_names',
+                 'expense_counts', 'expense_amounts', 'expense_first_month', 'stats', 'fan_chart', 'trajectories', 'random_stream', '_index',
+                 '_distributions') + tuple(SCENARIO_FIELDS)
+
+    def __init__(self, horizons, n_scenarios, expense_names=(), fields=None, float_dtype=np.float64):
+        """
+        fields - готовые массивы показателей {ключ: (горизонты × сценарии)}
+        (например, представления общей памяти); отсутствующие создаются нулевыми
+        float_dtype - тип денежных показателей и долей шоков (np.float32 - режим пониженной точности)
+        """
+        self.horizons = tuple(horizons)
+        self.n_scenarios = n_scenarios
+        self._index = {years: h for h, years in enumerate(self.horizons)}
+        shape = (len(self.horizons), n_scenarios)
+        fields = fields or {}
+        for key, dtype in SCENARIO_FIELDS.items():
+            if dtype == np.float64:
+                dtype = float_dtype
+            values = fields.get(key)
+            setattr(self, key, np.zeros(shape, dtype=dtype) if values is None else values)
+        self.total_cash_flow = np.zeros(len(self.horizons))
+        self.shock_pcts = [np.zeros(0) for _ in self.horizons]
+        self.expense_names = tuple(expense_names)
+        self.expense_counts = np.zeros((len(self.horizons), len(self.expense_names)), dtype=np.int64)
+        self.expense_amounts = np.zeros((len(self.horizons), len(self.expense_names)))
+        self.expense_first_month = np.zeros((len(self.horizons), len(self.expense_names), n_scenarios),
+                                            dtype=np.int16)
+        self.stats = [{} for _ in self.horizons]
+        self.fan_chart = None
+        self.trajectories = None
+        self.random_stream = None
+        self._distributions = {}
+
+    # ----- словарный интерфейс -----
+
+    def __getitem__(self, years):
+        return HorizonView(self, self._index[years])
+
+    def __iter__(self):
+        return iter(self.horizons)
+
+    def __len__(self):
+        return len(self.horizons)
+
+    def __repr__(self):
+        return (f"ScenarioResults(горизонты={list(self.horizons)}, сценариев={self.n_scenarios}, "
+                f"{self.nbytes() / 1e6:.1f} МБ)")
+
+    def distribution(self, years):
+        """
+        Распределение чистых активов горизонта (WealthDistribution) - строится при
+        первом обращении и переиспользуется статистиками, отчетами и экспортами
+        """
+        distribution = self._distributions.get(years)
+        if distribution is None:
+            distribution = WealthDistribution(self.net_wealth[self._index[years]])
+            self._distributions[years] = distribution
+        return distribution
+
+    def planned_expenses_stats(self, index):
+        """Статистика запланированных расходов горизонта в формате planned_expenses_stats"""
+        stats = {}
+        for e, name in enumerate(self.expense_names):
+            count = int(self.expense_counts[index, e])
+            total_amount = self.expense_amounts[index, e].item()
+            stats[name] = {
+                'count': count,
+                'total_amount': total_amount,
+                'avg_amount': total_amount / count if count > 0 else 0,
+                'frequency': count / self.n_scenarios * 100 if count > 0 else 0,
+            }
+        return stats
+
+    def nbytes(self):
+        """Объем памяти массивов результатов (байт)"""
+        total = sum(getattr(self, key).nbytes for key in SCENARIO_FIELDS)
+        total += sum(array.nbytes for array in self.shock_pcts)
+        total += self.expense_first_month.nbytes
+        return total + self.total_cash_flow.nbytes + self.expense_counts.nbytes + self.expense_amounts.nbytes
+
+    # ----- построение -----
+
+    @classmethod
+    def from_raw(cls, results_by_horizon, fields=None, float_dtype=np.float64):
+        """
+        Из сырых результатов по горизонтам (simulate_scenarios / merge_scenario_results)
+
+        fields - уже заполненные массивы показателей (например, из общей памяти);
+        тогда из results_by_horizon берутся только AGGREGATE_KEYS
+        float_dtype - тип денежных показателей (см. __init__)
+        """
+        horizons = list(results_by_horizon)
+        first = results_by_horizon[horizons[0]]
+        if fields is not None:
+            n_scenarios = next(iter(fields.values())).shape[1]
+        else:
+            n_scenarios = len(first['net_wealth'])
+        results = cls(horizons, n_scenarios, tuple(first['planned_expenses_stats']), fields, float_dtype)
+        for h, years in enumerate(horizons):
+            horizon_data = results_by_horizon[years]
+            if fields is None:
+                for key in SCENARIO_FIELDS:
+                    getattr(results, key)[h] = horizon_data[key]
+            results.total_cash_flow[h] = horizon_data['total_cash_flow']
+            # Доли шоков - самый большой массив результатов, хранятся в типе денежных показателей
+            results.shock_pcts[h] = np.asarray(horizon_data['shock_pcts'], dtype=float_dtype)
+            HorizonView(results, h)['planned_expenses_stats'] = horizon_data['planned_expenses_stats']
+            HorizonView(results, h)['planned_expense_months'] = horizon_data['planned_expense_months']
+        return results
+
+    @classmethod
+    def merge(cls, parts):
+        """
+        Объединяет результаты диапазонов сценариев (в порядке диапазонов);
+        итоговые статистики не переносятся - их нужно пересчитать
+        """
+        first = parts[0]
+        merged = cls(first.horizons, sum(part.n_scenarios for part in parts), first.expense_names, {
+            key: np.concatenate([getattr(part, key) for part in parts], axis=1) for key in SCENARIO_FIELDS
+        })
+        merged.total_cash_flow = sum(part.total_cash_flow for part in parts)
+        merged.shock_pcts = [np.concatenate([part.shock_pcts[h] for part in parts])
+                             for h in range(len(first.horizons))]
+        merged.expense_counts = sum(part.expense_counts for part in parts)
+        merged.expense_amounts = sum(part.expense_amounts for part in parts)
+        merged.expense_first_month = np.concatenate([part.expense_first_month for part in parts], axis=2)
+        merged.random_stream = first.random_stream
+        return merged
+
+    # ----- срезы -----
+
+    def select(self, horizons):
+        """Подмножество горизонтов (строки массивов; для подряд идущих горизонтов - без копирования)"""
+        rows = [self._index[years] for years in horizons]
+        if rows == list(range(rows[0], rows[0] + len(rows))):
+            rows = slice(rows[0], rows[0] + len(rows))
+        selected = ScenarioResults(horizons, self.n_scenarios, self.expense_names,
+                                   {key: getattr(self, key)[rows] for key in SCENARIO_FIELDS})
+        selected.total_cash_flow = self.total_cash_flow[rows]
+        selected.shock_pcts = [self.shock_pcts[self._index[years]] for years in horizons]
+        selected.expense_counts = self.expense_counts[rows]
+        selected.expense_amounts = self.expense_amounts[rows]
+        selected.expense_first_month = self.expense_first_month[rows]
+        selected.stats = [self.stats[self._index[years]] for years in horizons]
+        selected.random_stream = self.random_stream
+        return selected
+
+    def scenarios(self, start, stop):
+        """
+        Диапазон сценариев [start, stop) - представления массивов без копирования
+
+        Сумма денежного потока, шоки в % и статистика покупок не делятся по
+        сценариям: в срезе они обнулены, итоговые статистики не переносятся.
+        """
+        sliced = ScenarioResults(self.horizons, stop - start, self.expense_names,
+                                 {key: getattr(self, key)[:, start:stop] for key in SCENARIO_FIELDS})
+        sliced.expense_first_month = self.expense_first_month[:, :, start:stop]
+        return sliced
+
+    # ----- сохранение -----
+
+    def save(self, filepath):
+        """Сохраняет результаты в .npz (массивы как есть, статистики - JSON)"""
+        arrays = {key: getattr(self, key) for key in SCENARIO_FIELDS}
+        for h, shock_pcts in enumerate(self.shock_pcts):
+            arrays[f'shock_pcts_{h}'] = shock_pcts
+        meta = {
+            'horizons': list(self.horizons),
+            'n_scenarios': self.n_scenarios,
+            'expense_names': list(self.expense_names),
+            'stats': [{key: _json_value(value) for key, value in stats.items()} for stats in self.stats],
+            'random_stream': self.random_stream,
+        }
+        np.savez(filepath, total_cash_flow=self.total_cash_flow, expense_counts=self.expense_counts,
+                 expense_amounts=self.expense_amounts, expense_first_month=self.expense_first_month, meta=np.array(json.dumps(meta, ensure_ascii=False)),
+                 **arrays)
+
+    @classmethod
+    def load(cls, filepath):
+        """Загружает результаты, сохраненные save()"""
+        with np.load(filepath) as data:
+            meta = json.loads(str(data['meta']))
+            results = cls(meta['horizons'], meta['n_scenarios'], meta['expense_names'],
+                          {key: data[key] for key in SCENARIO_FIELDS})
+            results.total_cash_flow = data['total_cash_flow']
+            results.shock_pcts = [data[f'shock_pcts_{h}'] for h in range(len(results.horizons))]
+            results.expense_counts = data['expense_counts']
+            results.expense_amounts = data['expense_amounts']
+            results.expense_first_month = data['expense_first_month']
+        results.stats = meta['stats']
+        if meta.get('random_stream') is not None:
+            results.random_stream = tuple(meta['random_stream'])
+        return results
+
+
+def _json_value(value):
+    """Скаляры NumPy -> числа Python для JSON"""
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def paired_comparison(all_results, metric='net_wealth'):
+    """
+    НОВАЯ ФУНКЦИЯ: Парное сравнение планов по сценариям
+
+    Имеет смысл для результатов на общих случайных числах (run_simulation_batch
+    с одним потоком шоков): сценарий i у всех планов - одна и та же жизнь, поэтому
+    разность планов считается по парам и не содержит шума выборки шоков.
+
+    Returns:
+        dict: {years: {'plans': [ключи], 'prob_beats': (P, P) доля сценариев (%),
+               где metric плана-строки больше, чем у плана-столбца, 'mean_diff': (P, P)
+               средняя разность строка - столбец, 'std_err': (P, P) ее стандартная ошибка}}
+    """
+    plan_ids = list(all_results)
+    horizons = sorted(all_results[plan_ids[0]].keys())
+    comparison = {}
+    for years in horizons:
+        values = np.array([np.asarray(all_results[plan_id][years][metric], dtype=np.float64)
+                           for plan_id in plan_ids])
+        n_plans, n_scenarios = values.shape
+        prob_beats = np.zeros((n_plans, n_plans))
+        mean_diff = np.zeros((n_plans, n_plans))
+        std_err = np.zeros((n_plans, n_plans))
+        # ОПТИМИЗИРОВАНО: одна разность на пару планов (P·(P-1)/2 векторов вместо P×P×N);
+        # разность столбец - строка - та же с обратным знаком
+        for i, j in combinations(range(n_plans), 2):
+            difference = values[i] - values[j]
+            prob_beats[i, j] = (difference > 0).mean() * 100
+            prob_beats[j, i] = (difference < 0).mean() * 100
+            mean_diff[i, j] = difference.mean()
+            mean_diff[j, i] = -mean_diff[i, j]
+            if n_scenarios > 1:
+                std_err[i, j] = std_err[j, i] = difference.std(ddof=1) / np.sqrt(n_scenarios)
+        comparison[years] = {
+            'plans': plan_ids,
+            'prob_beats': prob_beats,
+            'mean_diff': mean_diff,
+            'std_err': std_err,
+        }
+    return comparison
+
+
+def survival_curve(first_months, horizon_months):
+    """
+    НОВАЯ ФУНКЦИЯ: Кривая выживания для месяцев первого наступления события
+
+    Все сценарии наблюдаются до конца горизонта (цензурирование одинаковое),
+    поэтому S(t) - доля сценариев, в которых событие не наступило к концу месяца t.
+
+    Args:
+        first_months: месяц первого наступления по сценариям (0 = не наступило)
+        horizon_months: длина горизонта в месяцах
+
+    Returns:
+        np.ndarray: S(t) для t = 0..horizon_months (S(0) = 1)
+    """
+    first_months = np.asarray(first_months, dtype=np.int64)
+    hits = np.bincount(first_months[first_months > 0], minlength=horizon_months + 1)[:horizon_months + 1]
+    return 1 - np.cumsum(hits) / max(len(first_months), 1)
+
+
+def kaplan_meier(durations, observed, max_duration):
+    """
+    НОВАЯ ФУНКЦИЯ: Оценка Каплана-Мейера для длительностей с цензурированием
+
+    Args:
+        durations: длительности (месяцев) - до события или до конца наблюдения
+        observed: True - событие наступило, False - наблюдение оборвано горизонтом
+        max_duration: последняя точка кривой
+
+    Returns:
+        np.ndarray: S(t) для t = 0..max_duration - доля периодов, не завершившихся к t
+    """
+    durations = np.clip(np.asarray(durations, dtype=np.int64), 0, max_duration)
+    observed = np.asarray(observed, dtype=bool)
+    events = np.bincount(durations[observed], minlength=max_duration + 1)
+    leaving = np.bincount(durations, minlength=max_duration + 1)
+    # Под риском в t - периоды длительностью не меньше t
+    at_risk = len(durations) - np.concatenate(([0], np.cumsum(leaving)[:-1]))
+    hazard = np.divide(events, at_risk, out=np.zeros(max_duration + 1), where=at_risk > 0)
+    return np.cumprod(1 - hazard)
+
+
+def survival_quantile(survival, share):
+    """Первый месяц, к которому событие наступило у доли share сценариев (None - не достигается)"""
+    reached = np.flatnonzero(survival <= 1 - share)
+    return int(reached[0]) if len(reached) else None
+
+
+def time_to_event_summary(results, years):
+    """
+    НОВАЯ ФУНКЦИЯ: Кривые выживания времени до событий плана на горизонте years
+
+    Returns:
+        dict: {событие: {'hit_pct': доля сценариев с событием (%), 'survival': S(t),
+               'quantiles': {10/25/50: месяц, к которому событие наступило у этой доли
+               сценариев, или None}}}; события - FIRST_EVENT_FIELDS, 'cushion_recovery'
+               (Каплан-Мейер по длительности восстановления после первого истощения
+               подушки, плюс 'spells' - число истощений) и 'expense:<название>'
+    """
+    horizon = results[years]
+    horizon_months = years * 12
+
+    def summary(survival, hit_pct):
+        return {'hit_pct': hit_pct, 'survival': survival,
+                'quantiles': {q: survival_quantile(survival, q / 100) for q in (10, 25, 50)}}
+
+    summaries = {}
+    for field in FIRST_EVENT_FIELDS:
+        first_months = np.asarray(horizon[field])
+        summaries[field] = summary(survival_curve(first_months, horizon_months), np.mean(first_months > 0) * 100)
+
+    # Восстановление подушки: незавершенные к горизонту периоды цензурированы
+    depletion = np.asarray(horizon['first_cushion_depletion_month'], dtype=np.int64)
+    recovery = np.asarray(horizon['first_cushion_recovery_months'], dtype=np.int64)
+    depleted = depletion > 0
+    recovered = recovery[depleted] > 0
+    durations = np.where(recovered, recovery[depleted], horizon_months - depletion[depleted])
+    recovery_summary = summary(kaplan_meier(durations, recovered, horizon_months),
+                               np.mean(recovered) * 100 if depleted.any() else 0.0)
+    recovery_summary['spells'] = int(depleted.sum())
+    summaries['cushion_recovery'] = recovery_summary
+
+    expense_months = np.asarray(horizon['planned_expense_months'])
+    for e, name in enumerate(results.expense_names):
+        summaries[f'expense:{name}'] = summary(survival_curve(expense_months[:, e], horizon_months),
+                                               np.mean(expense_months[:, e] > 0) * 100)
+    return summaries
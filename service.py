@@ -0,0 +1,629 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import queue as queue_module
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from config import (
+    N_SCENARIOS, RANDOM_SEED,
+    SERVICE_HOST, SERVICE_PORT, SERVICE_WORKERS, SERVICE_MAX_CONCURRENT,
+    SERVICE_MAX_PENDING, SERVICE_REQUEST_TIMEOUT, SERVICE_MAX_SCENARIOS,
+    SERVICE_BATCH_WINDOW, SERVICE_MAX_BATCH
+)
+import simulation_core as sc
+import batch_simulation
+from shocks import get_shock_timeline
+from simulation_config import resolve_config
+
+# ===== HTTP-СЕРВИС СИМУЛЯЦИИ =====
+# Долгоживущий процесс: пул воркеров прогревается один раз (импорт движка,
+# шкалы шоков в кэше), дальше каждый запрос - только помесячный расчет.
+# Запросы, пришедшие в течение окна SERVICE_BATCH_WINDOW, объединяются в пакет
+# и считаются одним векторизованным проходом (batch_simulation).
+#
+#   POST /simulate  {"plan": {...}, "plan_id": "service", "horizons": [5, 10],
+#                    "n_scenarios": 1000, "seed": 42, "timeout": 30, "mode_stats": false}
+#       -> {"plan_id": ..., "n_scenarios": ..., "batch_size": ..., "elapsed": ...,
+#           "horizons": {"5": {...}}}
+#   POST /simulate/stream  (тело как у /simulate)
+#       -> NDJSON по мере готовности горизонтов (chunked):
+#          {"years": 5, "elapsed": ..., "stats": {...}}  ...  {"done": true, "elapsed": ...}
+#          ошибка после начала ответа - строка {"error": "..."}
+#   GET  /health    -> состояние пула и счетчики запросов
+#
+# plan_id задает поток случайных чисел: запросы с одинаковым plan_id, seed и
+# n_scenarios получают одни и те же шоки (общие случайные числа для сравнения
+# планов), попадают в один пакет и переиспользуют кэш шкал шоков воркеров.
+# Запуск: python service.py [--port 8765] [--workers 4]
+
+DEFAULT_STREAM = 'service'
+MAX_BODY_BYTES = 1024 * 1024
+
+HTTP_REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    413: 'Payload Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable', 504: 'Gateway Timeout',
+}
+
+
+class ServiceError(Exception):
+    """Ошибка запроса с HTTP-статусом"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _warm_worker(seed, plan_id, shards, sim_config=None):
+    """
+    Инициализатор воркера пула: импорт движка и прогрев кэша шкал шоков
+    для диапазонов, на которые сервис делит запрос по умолчанию
+    """
+    cfg = resolve_config(sim_config)
+    for shard_start, shard_stop in shards:
+        get_shock_timeline(seed, plan_id, shard_start, shard_stop, cfg.n_months, sim_config)
+    # Короткий прогон прогревает остальной код помесячного шага
+    warm_plan = next(iter(cfg.plans.values()))
+    batch_simulation.simulate_plan_batch([warm_plan], 0, 1, [min(cfg.horizons)], seed, stream_id=plan_id,
+                                         sim_config=sim_config)
+
+
+def _queue_get(queue, timeout):
+    """Чтение очереди с таймаутом: None, если сообщений не было"""
+    try:
+        return queue.get(timeout=timeout)
+    except queue_module.Empty:
+        return None
+
+
+def _worker_pid(hold=0.2):
+    """
+    Пустая задача: заставляет пул поднять воркер (и выполнить прогрев).
+    Задержка держит воркер занятым, чтобы следующая задача подняла новый процесс
+    """
+    time.sleep(hold)
+    return os.getpid()
+
+
+class MicroBatcher:
+    """
+    НОВОЕ: Сборщик запросов в пакеты (micro-batching)
+
+    Запросы с одинаковым ключом (plan_id, seed, n_scenarios), т.е. с общей
+    шкалой шоков, копятся не дольше window секунд или до max_batch планов,
+    затем весь пакет передается в run_batch(group) одной задачей.
+    group - список пар (запрос, asyncio.Future для его результата).
+    """
+    def __init__(self, run_batch, window=SERVICE_BATCH_WINDOW, max_batch=SERVICE_MAX_BATCH):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self.tasks = set()
+        self._groups = {}
+        self._timers = {}
+
+    def submit(self, request):
+        """Ставит запрос в пакет; возвращает future результата"""
+        loop = asyncio.get_running_loop()
+        key = (request['plan_id'], request['seed'], request['n_scenarios'])
+        future = loop.create_future()
+        group = self._groups.setdefault(key, [])
+        group.append((request, future))
+        if len(group) >= self.max_batch or self.window <= 0:
+            self.flush(key)
+        elif len(group) == 1:
+            self._timers[key] = loop.call_later(self.window, self.flush, key)
+        return future
+
+    def flush(self, key):
+        """Отправляет накопленный пакет на расчет"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(key, None)
+        if group:
+            task = asyncio.ensure_future(self.run_batch(group))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def cancel_all(self):
+        """Отменяет ожидающие и выполняющиеся пакеты (остановка сервиса)"""
+        for timer in self._timers.values():
+            timer.cancel()
+        for group in self._groups.values():
+            for _, future in group:
+                future.cancel()
+        self._timers.clear()
+        self._groups.clear()
+        for task in self.tasks:
+            task.cancel()
+
+
+class SimulationService:
+    """
+    НОВОЕ: asyncio-сервис поверх run_simulation-конвейера
+
+    Запросы собираются MicroBatcher в пакеты планов с общей шкалой шоков.
+    Пакет делится на диапазоны сценариев (по числу воркеров), диапазоны
+    считаются векторизованно в прогретом пуле процессов, результаты
+    раздаются по запросам. Ограничения: не более max_concurrent пакетов в
+    работе, не более max_pending запросов в работе и очереди (дальше 503),
+    таймаут на запрос (504). Отмена: запрос, ушедший по таймауту или из-за
+    разрыва соединения, просто не получает результата; если отменены все
+    запросы пакета, еще не начатые диапазоны снимаются с пула.
+    НОВОЕ: sim_config (SimulationConfig) - параметры модели всех запросов сервиса
+    (None = константы config); в одном процессе можно держать несколько сервисов
+    с разными параметрами.
+    """
+    def __init__(self, workers=SERVICE_WORKERS, max_concurrent=SERVICE_MAX_CONCURRENT,
+                 max_pending=SERVICE_MAX_PENDING, request_timeout=SERVICE_REQUEST_TIMEOUT,
+                 n_scenarios=N_SCENARIOS, seed=RANDOM_SEED, stream=DEFAULT_STREAM,
+                 batch_window=SERVICE_BATCH_WINDOW, max_batch=SERVICE_MAX_BATCH, sim_config=None):
+        self.workers = workers
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.n_scenarios = n_scenarios
+        self.seed = seed
+        self.stream = stream
+        self.sim_config = sim_config
+        self.executor = None
+        self.server = None
+        self._manager = None
+        self._semaphore = None
+        self._in_flight = 0
+        self._tasks = set()
+        self.batcher = MicroBatcher(self._run_batch, batch_window, max_batch)
+        self.stats = {'requests': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+                      'timeouts': 0, 'cancelled': 0, 'batches': 0, 'batched_plans': 0,
+                      'cancelled_batches': 0, 'streams': 0,
+                      'validation_checks': 0, 'validation_anomalies': 0}
+
+    async def start(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        """Поднимает и прогревает пул, затем открывает сокет"""
+        start_time = time.time()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_warm_worker,
+            initargs=(self.seed, self.stream, sc.split_scenarios(self.n_scenarios, self.workers), self.sim_config)
+        )
+        # Очереди для передачи готовых горизонтов из воркеров (/simulate/stream)
+        self._manager = multiprocessing.Manager()
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(self.executor, _worker_pid)
+                                      for _ in range(self.workers)))
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        self.warmup_time = time.time() - start_time
+        print(f"✓ Пул прогрет: {len(set(pids))} воркеров за {self.warmup_time:.1f} сек")
+        return self.server
+
+    @property
+    def address(self):
+        """(host, port) фактически открытого сокета"""
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """Останавливает прием, отменяет запросы в работе и гасит пул"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.batcher.cancel_all()
+        for task in list(self._tasks):
+            task.cancel()
+        pending = list(self._tasks) + list(self.batcher.tasks)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'in_flight': self._in_flight,
+            'max_concurrent': self.max_concurrent,
+            'max_pending': self.max_pending,
+            'batch_window': self.batcher.window,
+            'max_batch': self.batcher.max_batch,
+            'default_n_scenarios': self.n_scenarios,
+            'stats': dict(self.stats),
+        }
+
+    def parse_request(self, payload):
+        """Проверяет тело запроса /simulate и подставляет значения по умолчанию"""
+        if not isinstance(payload, dict) or 'plan' not in payload:
+            raise ServiceError(400, "Ожидается JSON-объект с полем plan")
+        try:
+            plan = sc.validate_plan_data(payload['plan'])
+            horizons = sc.normalize_horizons(payload.get('horizons'), self.sim_config)
+        except ValueError as e:
+            raise ServiceError(400, str(e))
+        n_scenarios = payload.get('n_scenarios', self.n_scenarios)
+        if not isinstance(n_scenarios, int) or not 1 <= n_scenarios <= SERVICE_MAX_SCENARIOS:
+            raise ServiceError(400, f"n_scenarios должно быть целым от 1 до {SERVICE_MAX_SCENARIOS}")
+        seed = payload.get('seed', self.seed)
+        timeout = payload.get('timeout', self.request_timeout)
+        if not isinstance(seed, int) or not isinstance(timeout, (int, float)) or timeout <= 0:
+            raise ServiceError(400, "seed должен быть целым, timeout - положительным числом")
+        return {
+            'plan_id': str(payload.get('plan_id', self.stream)),
+            'plan': plan,
+            'horizons': horizons,
+            'n_scenarios': n_scenarios,
+            'seed': seed,
+            'timeout': float(timeout),
+            'mode_stats': bool(payload.get('mode_stats', False)),
+        }
+
+    async def simulate(self, request):
+        """Выполняет разобранный запрос с учетом очереди и таймаута"""
+        if self._in_flight >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise ServiceError(503, "Очередь запросов переполнена")
+        self._in_flight += 1
+        start_time = time.time()
+        future = self.batcher.submit(request)
+        try:
+            result = await asyncio.wait_for(future, request['timeout'])
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise ServiceError(504, f"Расчет не уложился в {request['timeout']:.1f} сек")
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+        result['elapsed'] = time.time() - start_time
+        return result
+
+    async def _run_batch(self, group):
+        """Считает пакет запросов и раздает результаты по их future"""
+        async with self._semaphore:
+            # Запросы, отмененные за время ожидания в очереди, не считаются
+            group = [(request, future) for request, future in group if not future.done()]
+            if not group:
+                return
+            batch_task = asyncio.current_task()
+            computing = True
+
+            def cancel_if_abandoned(_):
+                # Все запросы пакета отменены - результат никому не нужен
+                if computing and all(future.done() for _, future in group):
+                    batch_task.cancel()
+
+            for _, future in group:
+                future.add_done_callback(cancel_if_abandoned)
+            try:
+                results = await self._compute_batch([request for request, _ in group])
+            except asyncio.CancelledError:
+                self.stats['cancelled_batches'] += 1
+                for _, future in group:
+                    future.cancel()
+                return
+            except Exception as e:
+                self.stats['failed'] += len(group)
+                for _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            finally:
+                computing = False
+            for (_, future), result in zip(group, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def _compute_batch(self, requests):
+        loop = asyncio.get_running_loop()
+        first = requests[0]
+        stream_id, seed, n_scenarios = first['plan_id'], first['seed'], first['n_scenarios']
+        plans = [request['plan'] for request in requests]
+        horizons = sorted(set().union(*(request['horizons'] for request in requests)))
+        self.stats['batches'] += 1
+        self.stats['batched_plans'] += len(requests)
+
+        # Диапазоны совпадают с прогретыми, если n_scenarios равно значению по умолчанию
+        shards = sc.split_scenarios(n_scenarios, self.workers)
+        futures = [self.executor.submit(batch_simulation._simulate_batch_shard, stream_id, plans,
+                                        shard_start, shard_stop, horizons, seed, None, True, None, None,
+                                        self.sim_config)
+                   for shard_start, shard_stop in shards]
+        try:
+            outputs = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        except asyncio.CancelledError:
+            # Еще не начатые диапазоны снимаются с пула, начатые досчитаются и будут отброшены
+            for future in futures:
+                future.cancel()
+            raise
+
+        for _, (checks, anomalies) in outputs:
+            self.stats['validation_checks'] += checks
+            self.stats['validation_anomalies'] += anomalies
+
+        def finalize():
+            summaries = []
+            for p, request in enumerate(requests):
+                merged = sc.merge_scenario_results([raw[p] for raw, _ in outputs])
+                results_by_horizon = {years: merged[years] for years in request['horizons']}
+                baselines = sc.compute_baselines(request['plan'], request['horizons'], self.sim_config)
+                for years in request['horizons']:
+                    results_by_horizon[years].update(baselines[years])
+                sc.finalize_horizon_statistics(results_by_horizon, request['plan'], n_scenarios,
+                                               request['mode_stats'], self.sim_config)
+                summaries.append({
+                    'plan_id': stream_id,
+                    'n_scenarios': n_scenarios,
+                    'seed': seed,
+                    'batch_size': len(requests),
+                    'horizons': sc.horizon_summary(results_by_horizon),
+                })
+            return summaries
+
+        return await loop.run_in_executor(None, finalize)
+
+    async def simulate_stream(self, request, writer):
+        """
+        НОВОЕ: Потоковый расчет одного плана - горизонт отправляется клиенту,
+        как только все диапазоны сценариев прошли его месяц
+
+        Ответ - chunked NDJSON. Пакетирование не применяется: запрос сразу
+        делится на диапазоны по воркерам под общим ограничением max_concurrent.
+        """
+        if self._in_flight >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise ServiceError(503, "Очередь запросов переполнена")
+        self._in_flight += 1
+        self.stats['streams'] += 1
+        start_time = time.time()
+        deadline = start_time + request['timeout']
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), request['timeout'])
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                raise ServiceError(504, f"Расчет не уложился в {request['timeout']:.1f} сек")
+            try:
+                await _write_chunked_head(writer, 200)
+                horizons = self._stream_horizons(request, deadline)
+                try:
+                    async for years, summary in horizons:
+                        await _write_chunk(writer, {'years': years, 'elapsed': time.time() - start_time,
+                                                    'stats': summary})
+                    await _write_chunk(writer, {'done': True, 'elapsed': time.time() - start_time})
+                    self.stats['completed'] += 1
+                except ServiceError as e:
+                    # Заголовки уже отправлены - ошибка передается строкой потока
+                    await _write_chunk(writer, {'error': e.message})
+                except (ConnectionError, asyncio.CancelledError):
+                    raise
+                except Exception as e:
+                    self.stats['failed'] += 1
+                    await _write_chunk(writer, {'error': f"{type(e).__name__}: {e}"})
+                finally:
+                    await horizons.aclose()
+                await _write_chunk_end(writer)
+            finally:
+                self._semaphore.release()
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def _stream_horizons(self, request, deadline):
+        """
+        Асинхронный генератор (years, итоговая сводка горизонта)
+
+        Воркеры кладут сырые результаты каждого горизонта в очередь менеджера;
+        горизонт объединяется и финализируется, когда его прислали все диапазоны.
+        """
+        loop = asyncio.get_running_loop()
+        plan_id, seed, n_scenarios = request['plan_id'], request['seed'], request['n_scenarios']
+        horizons = request['horizons']
+        shards = sc.split_scenarios(n_scenarios, self.workers)
+        queue = self._manager.Queue()
+        futures = [self.executor.submit(batch_simulation._stream_batch_shard, queue, shard_index, plan_id,
+                                        [request['plan']], shard_start, shard_stop, horizons, seed, None, True,
+                                        None, self.sim_config)
+                   for shard_index, (shard_start, shard_stop) in enumerate(shards)]
+        received = {years: [None] * len(shards) for years in horizons}
+        counts = dict.fromkeys(horizons, 0)
+        try:
+            for years in horizons:
+                while counts[years] < len(shards):
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise ServiceError(504, f"Расчет не уложился в {request['timeout']:.1f} сек")
+                    message = await loop.run_in_executor(None, _queue_get, queue, min(remaining, 0.5))
+                    if message is None:
+                        for future in futures:
+                            if future.done() and future.exception() is not None:
+                                raise future.exception()
+                        continue
+                    shard_index, shard_years, (raw,) = message
+                    received[shard_years][shard_index] = raw
+                    counts[shard_years] += 1
+
+                merged = sc.merge_scenario_results([{years: raw} for raw in received.pop(years)])[years]
+                horizon_data = await loop.run_in_executor(None, batch_simulation.finalize_horizon, years, merged,
+                                                          request['plan'], n_scenarios, request['mode_stats'],
+                                                          self.sim_config)
+                yield years, sc.horizon_summary({years: horizon_data})[str(years)]
+
+            for checks, anomalies in await asyncio.gather(*(asyncio.wrap_future(f) for f in futures)):
+                self.stats['validation_checks'] += checks
+                self.stats['validation_anomalies'] += anomalies
+        finally:
+            # Клиент ушел или таймаут: еще не начатые диапазоны снимаются с пула
+            for future in futures:
+                future.cancel()
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            try:
+                method, path, body = await _read_http_request(reader)
+                status, response = await self._dispatch(method, path, body, reader, writer)
+            except ServiceError as e:
+                status, response = e.status, {'error': e.message}
+            if status is not None:
+                await _write_http_response(writer, status, response)
+        except asyncio.CancelledError:
+            pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            self.stats['failed'] += 1
+            try:
+                await _write_http_response(writer, 500, {'error': f"{type(e).__name__}: {e}"})
+            except ConnectionError:
+                pass
+        finally:
+            self._tasks.discard(task)
+            writer.close()
+
+    async def _dispatch(self, method, path, body, reader, writer):
+        if path == '/health':
+            if method != 'GET':
+                raise ServiceError(405, "Используйте GET")
+            return 200, self.health()
+        if path not in ('/simulate', '/simulate/stream'):
+            raise ServiceError(404, f"Неизвестный путь {path}")
+        if method != 'POST':
+            raise ServiceError(405, "Используйте POST")
+
+        self.stats['requests'] += 1
+        try:
+            payload = json.loads(body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ServiceError(400, f"Некорректный JSON: {e}")
+        request = self.parse_request(payload)
+
+        if path == '/simulate/stream':
+            # Разрыв соединения обнаруживается при записи очередного горизонта
+            await self.simulate_stream(request, writer)
+            return None, None
+
+        # Расчет идет параллельно с ожиданием EOF: если клиент закрыл соединение,
+        # результат уже никому не нужен - расчет отменяется
+        compute = asyncio.ensure_future(self.simulate(request))
+        disconnect = asyncio.ensure_future(reader.read(1))
+        done, _ = await asyncio.wait({compute, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        if compute not in done and (disconnect.exception() is not None or not disconnect.result()):
+            compute.cancel()
+            await asyncio.gather(compute, return_exceptions=True)
+            return None, None
+        disconnect.cancel()
+        result = await compute
+        self.stats['completed'] += 1
+        return 200, result
+
+
+async def _read_http_request(reader):
+    """Минимальный разбор HTTP/1.1 запроса: (метод, путь, тело)"""
+    request_line = await reader.readline()
+    if not request_line:
+        raise ConnectionError("Соединение закрыто")
+    try:
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise ServiceError(400, "Некорректная строка запроса")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0) or 0)
+    if length > MAX_BODY_BYTES:
+        raise ServiceError(413, f"Тело запроса больше {MAX_BODY_BYTES} байт")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target.split('?', 1)[0], body
+
+
+async def _write_http_response(writer, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+async def _write_chunked_head(writer, status):
+    head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/x-ndjson; charset=utf-8\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Connection: close\r\n\r\n")
+    writer.write(head.encode('latin-1'))
+    await writer.drain()
+
+
+async def _write_chunk(writer, payload):
+    """Одна строка NDJSON отдельным chunk"""
+    line = json.dumps(payload, ensure_ascii=False).encode('utf-8') + b'\n'
+    writer.write(f"{len(line):x}\r\n".encode('latin-1') + line + b'\r\n')
+    await writer.drain()
+
+
+async def _write_chunk_end(writer):
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP-сервис Монте-Карло симуляции")
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--workers', type=int, default=SERVICE_WORKERS, help="размер пула процессов")
+    parser.add_argument('--max-concurrent', type=int, default=SERVICE_MAX_CONCURRENT,
+                        help="одновременно выполняемых пакетов")
+    parser.add_argument('--max-pending', type=int, default=SERVICE_MAX_PENDING,
+                        help="запросов в работе и в очереди (дальше - 503)")
+    parser.add_argument('--batch-window', type=float, default=SERVICE_BATCH_WINDOW,
+                        help="окно сбора пакета, сек (0 = без объединения)")
+    parser.add_argument('--max-batch', type=int, default=SERVICE_MAX_BATCH,
+                        help="максимум планов в пакете")
+    parser.add_argument('--timeout', type=float, default=SERVICE_REQUEST_TIMEOUT,
+                        help="таймаут запроса по умолчанию, сек")
+    parser.add_argument('--scenarios', type=int, default=N_SCENARIOS,
+                        help="n_scenarios по умолчанию (под него прогревается кэш шоков)")
+    parser.add_argument('--seed', type=int, default=RANDOM_SEED)
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    service = SimulationService(workers=args.workers, max_concurrent=args.max_concurrent,
+                                max_pending=args.max_pending, request_timeout=args.timeout,
+                                n_scenarios=args.scenarios, seed=args.seed,
+                                batch_window=args.batch_window, max_batch=args.max_batch)
+    await service.start(args.host, args.port)
+    host, port = service.address
+    print(f"✓ Сервис слушает http://{host}:{port} (POST /simulate, POST /simulate/stream, GET /health)")
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.close()
+        print("✓ Сервис остановлен")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
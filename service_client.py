@@ -0,0 +1,227 @@
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+import config
+from config import SERVICE_HOST, SERVICE_PORT, N_SCENARIOS, RANDOM_SEED
+
+# ===== НАГРУЗОЧНЫЙ КЛИЕНТ СЕРВИСА =====
+# Шлет в service.py поток запросов /simulate с вариациями планов из config.PLANS
+# и печатает задержки (p50/p95/p99), пропускную способность и коды ответов.
+# --local поднимает сервис в этом же процессе на свободном порту, чтобы
+# нагрузочный прогон не требовал отдельного запуска сервера.
+# --cancel-every K: каждый K-й клиент рвет соединение, не дождавшись ответа
+# (проверка отмены расчетов на стороне сервиса).
+# --stream: запросы идут в /simulate/stream, дополнительно печатается время
+# до первого горизонта.
+# Запуск: python service_client.py --local --requests 40 --concurrency 8 --scenarios 500
+
+
+async def request_json(host, port, method, path, payload=None, timeout=None, abort_after=None):
+    """
+    Один HTTP-запрос с JSON-телом
+
+    Returns:
+        tuple: (статус или None при обрыве, тело ответа (dict) или None)
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+        if abort_after is not None:
+            # Имитация клиента, который ушел до ответа
+            await asyncio.sleep(abort_after)
+            return None, None
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(body.decode('utf-8')) if body else None
+
+
+async def stream_json(host, port, path, payload, timeout=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Потоковый запрос - асинхронный генератор строк NDJSON ответа
+
+    Yields:
+        dict: очередная строка (горизонт, {"done": ...} или {"error": ...});
+              при статусе, отличном от 200, одна строка {"status": ..., ...тело}
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"POST {path} HTTP/1.1\r\nHost: {host}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        status = int(head.split(b" ", 2)[1])
+        if status != 200:
+            raw = await asyncio.wait_for(reader.read(), timeout)
+            yield {'status': status, **(json.loads(raw.decode('utf-8')) if raw else {})}
+            return
+        while True:
+            size = int((await asyncio.wait_for(reader.readline(), timeout)).strip() or b'0', 16)
+            if size == 0:
+                return
+            chunk = await asyncio.wait_for(reader.readexactly(size + 2), timeout)
+            yield json.loads(chunk[:-2].decode('utf-8'))
+    finally:
+        writer.close()
+
+
+def make_payload(rng, n_scenarios, horizons, plan_id):
+    """Случайная вариация одного из планов config.PLANS (доход/расходы ±10%)"""
+    plan = dict(rng.choice(list(config.PLANS.values())))
+    plan['initial_income'] = round(plan['initial_income'] * rng.uniform(0.9, 1.1))
+    plan['initial_expenses'] = round(plan['initial_expenses'] * rng.uniform(0.9, 1.1))
+    payload = {'plan': plan, 'n_scenarios': n_scenarios, 'plan_id': plan_id}
+    if horizons:
+        payload['horizons'] = horizons
+    return payload
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def run_load(host, port, n_requests, concurrency, n_scenarios, horizons=None, timeout=300.0,
+                   cancel_every=0, plan_id='service', seed=RANDOM_SEED, stream=False):
+    """
+    Гонит n_requests запросов, держа не более concurrency одновременно
+
+    stream=True - запросы в /simulate/stream (time_to_first - задержка до первого горизонта)
+
+    Returns:
+        dict: latencies, time_to_first, statuses, aborted, wall_time
+    """
+    rng = random.Random(seed)
+    payloads = [make_payload(rng, n_scenarios, horizons, plan_id) for _ in range(n_requests)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    time_to_first = []
+    statuses = {}
+    aborted = 0
+
+    async def one(i, payload):
+        nonlocal aborted
+        async with semaphore:
+            abort_after = 0.05 if cancel_every and (i + 1) % cancel_every == 0 else None
+            start = time.perf_counter()
+            try:
+                if stream and abort_after is None:
+                    status, first = 200, None
+                    async for line in stream_json(host, port, '/simulate/stream', payload, timeout):
+                        if 'status' in line:
+                            status = line['status']
+                        elif 'error' in line:
+                            status = 'stream_error'
+                        elif 'years' in line and first is None:
+                            first = time.perf_counter() - start
+                    if status == 200 and first is not None:
+                        time_to_first.append(first)
+                else:
+                    path = '/simulate/stream' if stream else '/simulate'
+                    status, _ = await request_json(host, port, 'POST', path, payload,
+                                                   timeout=timeout, abort_after=abort_after)
+            except (ConnectionError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            if abort_after is not None:
+                aborted += 1
+                return
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i, payload) for i, payload in enumerate(payloads)))
+    return {'latencies': latencies, 'time_to_first': time_to_first, 'statuses': statuses, 'aborted': aborted,
+            'wall_time': time.perf_counter() - start}
+
+
+def print_report(report, n_scenarios):
+    latencies = report['latencies']
+    wall_time = report['wall_time']
+    print("="*70)
+    print(" НАГРУЗОЧНЫЙ ПРОГОН СЕРВИСА ")
+    print("="*70)
+    print(f"Коды ответов: {report['statuses']}, оборвано клиентом: {report['aborted']}")
+    if latencies:
+        print(f"Задержка, сек: p50 {percentile(latencies, 50):.2f} | p95 {percentile(latencies, 95):.2f} | "
+              f"p99 {percentile(latencies, 99):.2f} | среднее {statistics.mean(latencies):.2f}")
+    time_to_first = report.get('time_to_first')
+    if time_to_first:
+        print(f"До первого горизонта, сек: p50 {percentile(time_to_first, 50):.2f} | "
+              f"p95 {percentile(time_to_first, 95):.2f}")
+    print(f"Время прогона: {wall_time:.1f} сек")
+    if wall_time > 0:
+        print(f"Пропускная способность: {len(latencies)/wall_time:.2f} запросов/сек, "
+              f"{len(latencies)*n_scenarios/wall_time:.0f} сценариев/сек")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный клиент сервиса симуляции")
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--local', action='store_true',
+                        help="поднять сервис в этом процессе на свободном порту")
+    parser.add_argument('--workers', type=int, default=config.SERVICE_WORKERS, help="воркеров для --local")
+    parser.add_argument('--batch-window', type=float, default=config.SERVICE_BATCH_WINDOW,
+                        help="окно сбора пакета для --local, сек (0 = без объединения)")
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--scenarios', type=int, default=N_SCENARIOS)
+    parser.add_argument('--horizons', type=int, nargs='+', choices=config.HORIZONS)
+    parser.add_argument('--timeout', type=float, default=300.0, help="таймаут ожидания ответа, сек")
+    parser.add_argument('--cancel-every', type=int, default=0,
+                        help="каждый K-й клиент обрывает соединение (0 = никогда)")
+    parser.add_argument('--plan-id', default='service', help="поток случайных чисел запросов")
+    parser.add_argument('--stream', action='store_true', help="запросы в /simulate/stream")
+    return parser.parse_args(argv)
+
+
+async def main_async(args):
+    service = None
+    host, port = args.host, args.port
+    if args.local:
+        from service import SimulationService
+        service = SimulationService(workers=args.workers, n_scenarios=args.scenarios, stream=args.plan_id,
+                                    batch_window=args.batch_window)
+        await service.start(host, 0)
+        host, port = service.address
+    try:
+        report = await run_load(host, port, args.requests, args.concurrency, args.scenarios,
+                                args.horizons, args.timeout, args.cancel_every, args.plan_id,
+                                stream=args.stream)
+        print_report(report, args.scenarios)
+        _, health = await request_json(host, port, 'GET', '/health', timeout=args.timeout)
+        print(f"Счетчики сервиса: {health['stats']}")
+    finally:
+        if service is not None:
+            await service.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        asyncio.run(main_async(args))
+    except ConnectionRefusedError:
+        print(f"✗ Сервис недоступен на {args.host}:{args.port} (запустите service.py или используйте --local)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+from results import SCENARIO_FIELDS
+
+# ===== ОБЩАЯ ПАМЯТЬ ДЛЯ РЕЗУЛЬТАТОВ ДИАПАЗОНОВ =====
+# При расчете в пуле процессов показатели "одно число на сценарий" не
+# возвращаются через pickle: воркер пишет свой диапазон сценариев прямо в
+# заранее выделенный блок (метрика × горизонт × сценарий; у каждой метрики свой
+# тип из results.SCENARIO_FIELDS), а основной процесс собирает из представлений
+# блока ScenarioResults без копирования.
+# Через pickle возвращается только небольшой остаток: total_cash_flow,
+# shock_pcts (переменной длины) и planned_expenses_stats.
+
+# Выравнивание начала сегмента каждой метрики (байт)
+SEGMENT_ALIGN = 64
+
+
+class _SharedBuffer:
+    """
+    Владелец отображения общей памяти для NumPy (через __array_interface__)
+
+    Массив, построенный из этого объекта, хранит его в array.base, а все
+    представления - сам массив, поэтому блок закрывается (SharedMemory.__del__)
+    только после удаления последнего представления.
+    """
+    def __init__(self, shm, shape, dtype, offset):
+        self.shm = shm
+        # Временный массив нужен только для адреса начала блока
+        address = np.frombuffer(shm.buf, dtype=np.uint8).ctypes.data
+        self.__array_interface__ = {
+            'version': 3, 'shape': shape, 'typestr': np.dtype(dtype).str, 'data': (address + offset, False),
+        }
+
+
+class SharedResultsBlock:
+    """
+    НОВОЕ: Блок multiprocessing.shared_memory под показатели по сценариям
+
+    Создается основным процессом (name=None), воркеры подключаются к нему через
+    attach(descriptor()). Массивы fields сами держат отображение, так что
+    собранный из них ScenarioResults может пережить объект блока.
+
+    Атрибуты:
+        fields: {метрика: массив (горизонты × сценарии)} - сегменты блока
+    """
+    def __init__(self, horizons, n_scenarios, name=None):
+        self.horizons = tuple(horizons)
+        self.n_scenarios = n_scenarios
+        shape = (len(self.horizons), n_scenarios)
+        offsets = {}
+        size = 0
+        for key, dtype in SCENARIO_FIELDS.items():
+            offsets[key] = size
+            segment = len(self.horizons) * n_scenarios * np.dtype(dtype).itemsize
+            size += -(-segment // SEGMENT_ALIGN) * SEGMENT_ALIGN
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(1, size))
+        self.fields = {key: np.asarray(_SharedBuffer(self.shm, shape, dtype, offsets[key]))
+                       for key, dtype in SCENARIO_FIELDS.items()}
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def descriptor(self):
+        """Все, что нужно воркеру для подключения (передается через pickle)"""
+        return self.name, self.horizons, self.n_scenarios
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Подключение воркера к блоку основного процесса"""
+        name, horizons, n_scenarios = descriptor
+        return cls(horizons, n_scenarios, name=name)
+
+    def write(self, raw, scenario_start):
+        """
+        Переносит показатели по сценариям из сырых результатов диапазона в блок
+
+        Returns:
+            dict: {years: остаток сырых результатов (без SCENARIO_FIELDS)}
+        """
+        rest = {}
+        for years, horizon_data in raw.items():
+            h = self.horizons.index(years)
+            for key, array in self.fields.items():
+                values = horizon_data[key]
+                array[h, scenario_start:scenario_start + len(values)] = values
+            rest[years] = {key: value for key, value in horizon_data.items() if key not in SCENARIO_FIELDS}
+        return rest
+
+    def read(self, rest, scenario_start, scenario_stop):
+        """
+        Обратная операция к write: полные сырые результаты диапазона (копии
+        показателей из блока + остаток), например для контрольной точки
+
+        Returns:
+            dict: {years: сырые результаты диапазона}
+        """
+        raw = {}
+        for years, horizon_rest in rest.items():
+            h = self.horizons.index(years)
+            horizon_data = {key: array[h, scenario_start:scenario_stop].copy() for key, array in self.fields.items()}
+            horizon_data.update(horizon_rest)
+            raw[years] = horizon_data
+        return raw
+
+    def close(self):
+        """Отключает блок от процесса воркера (в основном процессе блок закрывается вместе с представлениями)"""
+        self.fields = None
+        self.shm.close()
+
+    def unlink(self):
+        """
+        Удаляет имя блока (только основной процесс, после завершения воркеров).
+        Память остается доступной этому процессу, пока живы представления
+        """
+        self.shm.unlink()
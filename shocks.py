@@ -0,0 +1,231 @@
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from config import SHOCK_CACHE_SIZE
+from simulation_config import resolve_config
+
+
+class RandomBatchManager:
+    """
+    Класс для эффективного управления батчами случайных чисел
+    Ускоряет симуляцию за счет предгенерации случайных чисел
+    """
+    def __init__(self, batch_size=1000, rng=None, sim_config=None):
+        self.batch_size = batch_size
+        # НОВОЕ: параметры распределений берутся из конфигурации симуляции
+        self.sim_config = resolve_config(sim_config)
+        # НОВОЕ: источник случайных чисел (np.random.Generator); None = глобальный np.random
+        self.rng = rng if rng is not None else np.random
+        self.batch_idx = 0
+        self.current_batch = None
+        # Индексы для разных типов событий
+        self.MINOR_EM_IDX = 0
+        self.MEDIUM_EM_IDX = 1
+        self.MAJOR_EM_IDX = 2
+        self.CLUSTER_CONTINUE_IDX = 3
+        self.CLUSTER_TYPE_IDX = 4
+        self.PARTIAL_LOSS_IDX = 5
+        self.FULL_LOSS_IDX = 6
+        self._generate_new_batch()
+
+    def _generate_new_batch(self):
+        """Генерирует новый батч случайных чисел"""
+        # 7 колонок для основных событий + дополнительные для нормальных/экспоненциальных распределений
+        self.current_batch = self.rng.random((self.batch_size, 7))
+        # Предгенерируем также специальные распределения
+        cfg = self.sim_config
+        self.poisson_batch = self.rng.poisson(cfg.major_cluster_lambda, self.batch_size)
+        self.exponential_batch = self.rng.exponential(cfg.partial_loss_duration, self.batch_size)
+        self.normal_batch = self.rng.normal(cfg.full_loss_duration_mean, cfg.full_loss_duration_sd, self.batch_size)
+        self.batch_idx = 0
+
+    def get_randoms(self):
+        """Возвращает следующий набор случайных чисел"""
+        if self.batch_idx >= self.batch_size:
+            self._generate_new_batch()
+
+        result = {
+            'uniform': self.current_batch[self.batch_idx],
+            'poisson': self.poisson_batch[self.batch_idx],
+            'exponential': self.exponential_batch[self.batch_idx],
+            'normal': self.normal_batch[self.batch_idx]
+        }
+        self.batch_idx += 1
+        return result
+
+
+def scenario_rng(seed, plan_id, scenario):
+    """
+    НОВАЯ ФУНКЦИЯ: Независимый поток случайных чисел для сценария
+
+    Поток определяется только (seed, plan_id, номер сценария), поэтому результат
+    не зависит от числа воркеров, порядка расчета и выбранных горизонтов.
+    """
+    plan_key = zlib.crc32(str(plan_id).encode('utf-8'))
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(plan_key, scenario)))
+
+
+class ShockTimeline:
+    """
+    НОВОЕ: Предрассчитанная шкала шоков для диапазона сценариев
+
+    ЧП и потери дохода зависят только от случайных чисел, но не от состояния
+    плана (сбережений, долга), поэтому шкалу можно построить заранее и
+    переиспользовать между запросами с тем же (seed, поток, диапазон).
+    Все массивы имеют форму (сценарии, месяцы); строка i - сценарий scenario_start + i.
+
+    Атрибуты:
+        emergency_cost: сумма ЧП за месяц (int32, ₽)
+        minor_count, medium_count, major_count: число ЧП каждого типа за месяц (int8)
+        partial_loss, full_loss: активна ли частичная/полная потеря дохода (bool)
+    """
+    def __init__(self, scenario_start, emergency_cost, minor_count, medium_count, major_count,
+                 partial_loss, full_loss):
+        self.scenario_start = scenario_start
+        self.emergency_cost = emergency_cost
+        self.minor_count = minor_count
+        self.medium_count = medium_count
+        self.major_count = major_count
+        self.partial_loss = partial_loss
+        self.full_loss = full_loss
+
+    @property
+    def n_scenarios(self):
+        return self.emergency_cost.shape[0]
+
+    @property
+    def n_months(self):
+        return self.emergency_cost.shape[1]
+
+    @property
+    def scenario_stop(self):
+        return self.scenario_start + self.n_scenarios
+
+    def covers(self, scenario_start, scenario_stop, n_months):
+        """Покрывает ли шкала диапазон сценариев и число месяцев"""
+        return (self.scenario_start <= scenario_start and scenario_stop <= self.scenario_stop
+                and n_months <= self.n_months)
+
+    def nbytes(self):
+        """Объем памяти массивов шкалы (байт)"""
+        return sum(array.nbytes for array in (self.emergency_cost, self.minor_count, self.medium_count,
+                                              self.major_count, self.partial_loss, self.full_loss))
+
+
+def generate_shock_timeline(seed, plan_id, scenario_start, scenario_stop, n_months=None, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Строит шкалу шоков для сценариев [scenario_start, scenario_stop)
+
+    Случайные числа берутся из тех же потоков scenario_rng и в том же порядке,
+    что и в помесячном цикле (один батч RandomBatchManager на n_months месяцев конфигурации),
+    поэтому события совпадают с прежним расчетом. Логика кластеров
+    ВЕКТОРИЗОВАНА по сценариям, цикл остается только по месяцам.
+    НОВОЕ: вероятности и суммы ЧП - из sim_config (по умолчанию константы config)
+    """
+    cfg = resolve_config(sim_config)
+    if n_months is None:
+        n_months = cfg.n_months
+    n = scenario_stop - scenario_start
+    uniform = np.empty((n, n_months, 7))
+    poisson = np.empty((n, n_months), dtype=np.int64)
+    exponential = np.empty((n, n_months))
+    normal = np.empty((n, n_months))
+    for i in range(n):
+        batch = RandomBatchManager(batch_size=max(cfg.n_months, n_months),
+                                   rng=scenario_rng(seed, plan_id, scenario_start + i), sim_config=cfg)
+        uniform[i] = batch.current_batch[:n_months]
+        poisson[i] = batch.poisson_batch[:n_months]
+        exponential[i] = batch.exponential_batch[:n_months]
+        normal[i] = batch.normal_batch[:n_months]
+
+    # Длительности потерь дохода (как max(1, int(...)) в скалярном цикле)
+    partial_duration = np.maximum(1, exponential.astype(np.int64))
+    full_duration = np.maximum(1, np.round(normal).astype(np.int64))
+
+    emergency_cost = np.zeros((n, n_months), dtype=np.int32)
+    minor_count = np.zeros((n, n_months), dtype=np.int8)
+    medium_count = np.zeros((n, n_months), dtype=np.int8)
+    major_count = np.zeros((n, n_months), dtype=np.int8)
+    partial_loss = np.zeros((n, n_months), dtype=bool)
+    full_loss = np.zeros((n, n_months), dtype=bool)
+
+    minor_cluster_active = np.zeros(n, dtype=bool)
+    major_cluster_remaining = np.zeros(n, dtype=np.int64)
+    active_partial_loss = np.zeros(n, dtype=np.int64)
+    active_full_loss = np.zeros(n, dtype=np.int64)
+
+    for m in range(n_months):
+        r_uniform = uniform[:, m]
+        cost = emergency_cost[:, m]
+        minor = minor_count[:, m]
+        medium = medium_count[:, m]
+        major = major_count[:, m]
+
+        # Продолжение кластера крупных ЧП
+        mask = major_cluster_remaining > 0
+        cost[mask] += cfg.major_emergency_cost
+        major[mask] += 1
+        major_cluster_remaining[mask] -= 1
+
+        # Мелкие ЧП
+        mask = ~minor_cluster_active & (r_uniform[:, 0] < cfg.minor_emergency_prob)
+        cost[mask] += cfg.minor_emergency_cost
+        minor[mask] += 1
+        minor_cluster_active |= mask
+
+        # Средние ЧП (проверка после возможного запуска кластера мелкими)
+        mask = ~minor_cluster_active & (r_uniform[:, 1] < cfg.medium_emergency_prob)
+        cost[mask] += cfg.medium_emergency_cost
+        medium[mask] += 1
+        minor_cluster_active |= mask
+
+        # Крупные ЧП (только если нет активного кластера) с кластером Пуассона
+        mask = (major_cluster_remaining == 0) & (r_uniform[:, 2] < cfg.major_emergency_prob)
+        cost[mask] += cfg.major_emergency_cost
+        major[mask] += 1
+        major_cluster_remaining[mask] = poisson[mask, m]
+
+        # Кластер мелких/средних ЧП
+        cluster_continue = minor_cluster_active & (r_uniform[:, 3] < cfg.minor_cluster_prob)
+        cluster_minor = cluster_continue & (r_uniform[:, 4] < 0.651)
+        cluster_medium = cluster_continue & ~cluster_minor
+        cost[cluster_minor] += cfg.minor_emergency_cost
+        minor[cluster_minor] += 1
+        cost[cluster_medium] += cfg.medium_emergency_cost
+        medium[cluster_medium] += 1
+        minor_cluster_active &= cluster_continue
+
+        # Потери дохода
+        mask = (active_partial_loss == 0) & (r_uniform[:, 5] < cfg.partial_loss_prob)
+        active_partial_loss[mask] = partial_duration[mask, m]
+        mask = (active_full_loss == 0) & (r_uniform[:, 6] < cfg.full_loss_prob)
+        active_full_loss[mask] = full_duration[mask, m]
+
+        partial_loss[:, m] = active_partial_loss > 0
+        full_loss[:, m] = active_full_loss > 0
+        active_partial_loss[partial_loss[:, m]] -= 1
+        active_full_loss[full_loss[:, m]] -= 1
+
+    return ShockTimeline(scenario_start, emergency_cost, minor_count, medium_count, major_count,
+                         partial_loss, full_loss)
+
+
+@lru_cache(maxsize=SHOCK_CACHE_SIZE)
+def get_shock_timeline(seed=None, plan_id='A', scenario_start=0, scenario_stop=1000, n_months=None, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Кэшированная шкала шоков
+
+    Воркеры сервиса и пула процессов строят шкалу один раз на
+    (seed, поток, диапазон, месяцы, конфигурация) и далее только читают ее.
+    Массивы шкалы помечены только для чтения, так как разделяются между вызовами.
+    """
+    cfg = resolve_config(sim_config)
+    if seed is None:
+        seed = cfg.random_seed
+    timeline = generate_shock_timeline(seed, plan_id, scenario_start, scenario_stop, n_months, cfg)
+    for array in (timeline.emergency_cost, timeline.minor_count, timeline.medium_count,
+                  timeline.major_count, timeline.partial_loss, timeline.full_loss):
+        array.setflags(write=False)
+    return timeline
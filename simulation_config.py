@@ -0,0 +1,118 @@
+from dataclasses import dataclass, field, replace
+
+import config
+
+# ===== НЕИЗМЕНЯЕМАЯ КОНФИГУРАЦИЯ СИМУЛЯЦИИ =====
+# SimulationConfig собирает параметры модели (ставки, пороги долга, ЧП, потери
+# дохода, горизонты) в один замороженный объект, который явно передается в
+# run_simulation, базовые сценарии, пакетный движок и отчеты. Так в одном
+# процессе можно считать несколько по-разному настроенных симуляций (перебор
+# параметров, сервис) без изменения модуля config.
+# Константы config остаются источником значений по умолчанию: DEFAULT_CONFIG
+# собран из них и используется везде, где sim_config не передан.
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    """
+    НОВОЕ: Параметры модели и производные величины, посчитанные один раз
+
+    Поля повторяют константы config (в нижнем регистре). Производные величины
+    (init=False) считаются в __post_init__ и не участвуют в сравнении:
+        savings_growth_factors: (1 + savings_return_rate) ** k для k = 0..n_months
+        ideal_growth_factors: (1 + ideal_return_rate) ** k для k = 0..n_months
+        expected_emergency_cost: ожидаемая сумма ЧП за месяц без учета кластеров, ₽
+
+    Изменение параметров - только через replace(), который пересчитывает
+    производные величины.
+    """
+    # Параметры симуляции
+    n_scenarios: int = config.N_SCENARIOS
+    n_months: int = config.N_MONTHS
+    horizons: tuple = tuple(config.HORIZONS)
+    random_seed: int = config.RANDOM_SEED
+
+    # Финансовые параметры
+    savings_return_rate: float = config.SAVINGS_RETURN_RATE
+    ideal_return_rate: float = config.IDEAL_RETURN_RATE
+    tax_rate: float = config.TAX_RATE
+    cushion_amount: float = config.CUSHION_AMOUNT
+    debt_interest_rate: float = config.DEBT_INTEREST_RATE
+    restructuring_threshold_ratio: float = config.RESTRUCTURING_THRESHOLD_RATIO
+    bankruptcy_threshold_ratio: float = config.BANKRUPTCY_THRESHOLD_RATIO
+
+    # ЧП и кластеризация
+    minor_emergency_prob: float = config.MINOR_EMERGENCY_PROB
+    minor_emergency_cost: float = config.MINOR_EMERGENCY_COST
+    medium_emergency_prob: float = config.MEDIUM_EMERGENCY_PROB
+    medium_emergency_cost: float = config.MEDIUM_EMERGENCY_COST
+    major_emergency_prob: float = config.MAJOR_EMERGENCY_PROB
+    major_emergency_cost: float = config.MAJOR_EMERGENCY_COST
+    minor_cluster_prob: float = config.MINOR_CLUSTER_PROB
+    major_cluster_lambda: float = config.MAJOR_CLUSTER_LAMBDA
+
+    # Потеря дохода
+    partial_loss_prob: float = config.PARTIAL_LOSS_PROB
+    partial_loss_rate: float = config.PARTIAL_LOSS_RATE
+    partial_loss_duration: float = config.PARTIAL_LOSS_DURATION
+    full_loss_prob: float = config.FULL_LOSS_PROB
+    full_loss_duration_mean: float = config.FULL_LOSS_DURATION_MEAN
+    full_loss_duration_sd: float = config.FULL_LOSS_DURATION_SD
+
+    # Движок: пропуск месяцев без событий (см. config.EVENT_SKIP_AHEAD)
+    event_skip_ahead: bool = config.EVENT_SKIP_AHEAD
+
+    # Планы по умолчанию (словарь не участвует в сравнении и хэше)
+    plans: dict = field(default_factory=lambda: config.PLANS, compare=False, hash=False, repr=False)
+
+    # Производные величины
+    savings_growth_factors: tuple = field(init=False, compare=False, repr=False)
+    ideal_growth_factors: tuple = field(init=False, compare=False, repr=False)
+    expected_emergency_cost: float = field(init=False, compare=False, repr=False)
+
+    def __post_init__(self):
+        horizons = tuple(sorted(set(self.horizons)))
+        if not horizons or horizons[0] <= 0:
+            raise ValueError(f"Горизонты должны быть положительными: {list(self.horizons)}")
+        if self.n_months < horizons[-1] * 12:
+            raise ValueError(f"n_months={self.n_months} меньше последнего горизонта ({horizons[-1]} лет)")
+        if self.n_scenarios <= 0:
+            raise ValueError("n_scenarios должно быть положительным")
+        for name in ('minor_emergency_prob', 'medium_emergency_prob', 'major_emergency_prob',
+                     'minor_cluster_prob', 'partial_loss_prob', 'full_loss_prob'):
+            if not 0 <= getattr(self, name) <= 1:
+                raise ValueError(f"{name} должна быть в [0, 1]")
+        if self.cushion_amount < 0:
+            raise ValueError("cushion_amount не может быть отрицательной")
+
+        # Поля замороженного объекта задаются через object.__setattr__
+        object.__setattr__(self, 'horizons', horizons)
+        object.__setattr__(self, 'savings_growth_factors',
+                           tuple((1 + self.savings_return_rate) ** k for k in range(self.n_months + 1)))
+        object.__setattr__(self, 'ideal_growth_factors',
+                           tuple((1 + self.ideal_return_rate) ** k for k in range(self.n_months + 1)))
+        object.__setattr__(self, 'expected_emergency_cost',
+                           self.minor_emergency_prob * self.minor_emergency_cost
+                           + self.medium_emergency_prob * self.medium_emergency_cost
+                           + self.major_emergency_prob * self.major_emergency_cost)
+
+    def replace(self, **changes):
+        """Копия с измененными параметрами (производные величины пересчитываются)"""
+        return replace(self, **changes)
+
+    @classmethod
+    def from_module(cls, module=config):
+        """Конфигурация из текущих значений констант модуля (по умолчанию config)"""
+        values = {name: getattr(module, name.upper()) for name in cls.__dataclass_fields__
+                  if cls.__dataclass_fields__[name].init and name != 'plans'}
+        values['horizons'] = tuple(values['horizons'])
+        return cls(plans=module.PLANS, **values)
+
+
+# Экземпляр по умолчанию - значения констант config
+DEFAULT_CONFIG = SimulationConfig()
+
+
+def resolve_config(sim_config=None):
+    """sim_config или конфигурация по умолчанию"""
+    return DEFAULT_CONFIG if sim_config is None else sim_config
@@ -1,32 +1,47 @@
 import numpy as np
-import random
 import time
 import datetime
 import os
-from scipy.stats import gaussian_kde
+import heapq
+import math
+from concurrent.futures import as_completed
 
 # Импорты из config.py (будут доступны после создания config.py) слово
-from config import (
-    N_SCENARIOS, N_MONTHS, HORIZONS,
-    CUSHION_AMOUNT, SAVINGS_RETURN_RATE, IDEAL_RETURN_RATE, TAX_RATE,
-    DEBT_INTEREST_RATE, RESTRUCTURING_THRESHOLD_RATIO, BANKRUPTCY_THRESHOLD_RATIO,
-    MINOR_EMERGENCY_PROB, MINOR_EMERGENCY_COST,
-    MEDIUM_EMERGENCY_PROB, MEDIUM_EMERGENCY_COST,
-    MAJOR_EMERGENCY_PROB, MAJOR_EMERGENCY_COST,
-    MINOR_CLUSTER_PROB, MAJOR_CLUSTER_LAMBDA,
-    PARTIAL_LOSS_PROB, PARTIAL_LOSS_RATE, PARTIAL_LOSS_DURATION,
-    FULL_LOSS_PROB, FULL_LOSS_DURATION_MEAN, FULL_LOSS_DURATION_SD,
-    VALIDATION_STATS, RANDOM_SEED
-)
+from config import VALIDATION_STATS, PROGRESS_INTERVAL, SHARED_MEMORY_RESULTS, TRAJECTORY_SAMPLES, TRAJECTORY_QUANTILES
+# НОВОЕ: параметры модели передаются явно (SimulationConfig), константы config - значения по умолчанию
+from simulation_config import DEFAULT_CONFIG, resolve_config
+from debt_kernel import withdraw_savings, repay_from_assets, accrue_debt, settle_tax
+from telemetry import make_progress_info
+# НОВОЕ: генерация шоков вынесена в shocks.py (RandomBatchManager реэкспортируется для совместимости)
+from shocks import RandomBatchManager, generate_shock_timeline
+from shared_results import SharedResultsBlock
+from results import ScenarioResults, WealthDistribution
+from trajectories import TrajectoryReservoir
 import config  # Импортируем модуль целиком для доступа к ANOMALY_LOG_FILE
 
+# Публичные имена модуля (RandomBatchManager - реэкспорт из shocks)
+__all__ = [
+    'DEBUG_VALIDATION', 'RandomBatchManager', 'PlannedExpenseTriggers',
+    'initialize_validation_log', 'finalize_validation_log', 'validate_financial_state',
+    'skip_quiet_months', 'months_until_savings', 'check_plan_changes', 'calculate_mode_with_probabilities',
+    'calculate_ideal_scenario', 'calculate_linear_scenario', 'validate_plan_data', 'normalize_horizons',
+    'simulate_scenarios', 'first_expense_months', 'merge_scenario_results', 'replay_scenario', 'check_replay',
+    'sample_quantile_trajectories', 'split_scenarios', 'compute_baselines', 'run_simulation',
+    'finalize_horizon_statistics', 'compute_all_results', 'horizon_summary',
+]
+
 # Включение/выключение валидации (для отладки)
 DEBUG_VALIDATION = True  # Установите True для включения валидации
 
 
-def initialize_validation_log():
+def initialize_validation_log(n_scenarios=DEFAULT_CONFIG.n_scenarios, horizons=DEFAULT_CONFIG.horizons,
+                              seed=DEFAULT_CONFIG.random_seed, resume=False):
     """
     НОВАЯ ФУНКЦИЯ: Инициализирует лог валидации с заголовком
+    ОБНОВЛЕНО: в заголовок пишутся параметры фактического запуска
+    НОВОЕ: resume=True - продолжение прерванного запуска: существующий лог
+           дополняется отметкой о продолжении (аномалии сохраненных диапазонов
+           уже в нем; записи диапазона, прерванного на середине, могут повториться)
     """
     if not config.ANOMALY_LOG_FILE:
         print("✗ Путь к логу валидации не установлен")
@@ -46,16 +61,24 @@ def initialize_validation_log():
         
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
+        if resume and os.path.exists(config.ANOMALY_LOG_FILE):
+            with open(config.ANOMALY_LOG_FILE, 'a', encoding='utf-8') as f:
+                f.write("-" * 80 + "\n")
+                f.write(f"ПРОДОЛЖЕНИЕ ПРЕРВАННОГО ЗАПУСКА: {timestamp}\n")
+                f.write("-" * 80 + "\n")
+            print(f"✓ Лог валидации продолжен: {config.ANOMALY_LOG_FILE}")
+            return
+        
         # Создаем новый лог с заголовком
         with open(config.ANOMALY_LOG_FILE, 'w', encoding='utf-8') as f:
             f.write("="*80 + "\n")
             f.write(" ОТЧЕТ ВАЛИДАЦИИ ФИНАНСОВЫХ СОСТОЯНИЙ \n")
             f.write("="*80 + "\n")
             f.write(f"Дата и время запуска: {timestamp}\n")
-            f.write(f"Random seed: {RANDOM_SEED}\n")
-            f.write(f"Количество сценариев: {N_SCENARIOS:,}\n")
-            f.write(f"Количество месяцев: {N_MONTHS} (30 лет)\n")
-            f.write(f"Горизонты анализа: {HORIZONS} лет\n")
+            f.write(f"Random seed: {seed}\n")
+            f.write(f"Количество сценариев: {n_scenarios:,}\n")
+            f.write(f"Количество месяцев: {max(horizons)*12} ({max(horizons)} лет)\n")
+            f.write(f"Горизонты анализа: {list(horizons)} лет\n")
             f.write(f"Валидация включена: {DEBUG_VALIDATION}\n")
             f.write("="*80 + "\n\n")
             f.write("ОПИСАНИЕ ВАЛИДАЦИИ:\n")
@@ -111,7 +134,7 @@ def finalize_validation_log():
                 f.write(f"Найдено {VALIDATION_STATS['total_anomalies']} финансовых аномалий\n")
                 f.write("Рекомендуется проанализировать детали выше\n")
                 f.write("Возможные причины:\n")
-                f.write("- Ошибка в функции handle_savings_withdrawal\n")
+                f.write("- Ошибка в функции withdraw_savings (debt_kernel)\n")
                 f.write("- Некорректная обработка налогообложения\n")
                 f.write("- Проблемы с синхронизацией savings и annual_growth\n")
             
@@ -129,50 +152,6 @@ def finalize_validation_log():
         traceback.print_exc()
 
 
-class RandomBatchManager:
-    """
-    Класс для эффективного управления батчами случайных чисел
-    Ускоряет симуляцию за счет предгенерации случайных чисел
-    """
-    def __init__(self, batch_size=1000):
-        self.batch_size = batch_size
-        self.batch_idx = 0
-        self.current_batch = None
-        # Индексы для разных типов событий
-        self.MINOR_EM_IDX = 0
-        self.MEDIUM_EM_IDX = 1  
-        self.MAJOR_EM_IDX = 2
-        self.CLUSTER_CONTINUE_IDX = 3
-        self.CLUSTER_TYPE_IDX = 4
-        self.PARTIAL_LOSS_IDX = 5
-        self.FULL_LOSS_IDX = 6
-        self._generate_new_batch()
-    
-    def _generate_new_batch(self):
-        """Генерирует новый батч случайных чисел"""
-        # 7 колонок для основных событий + дополнительные для нормальных/экспоненциальных распределений
-        self.current_batch = np.random.random((self.batch_size, 7))
-        # Предгенерируем также специальные распределения
-        self.poisson_batch = np.random.poisson(MAJOR_CLUSTER_LAMBDA, self.batch_size)
-        self.exponential_batch = np.random.exponential(PARTIAL_LOSS_DURATION, self.batch_size)
-        self.normal_batch = np.random.normal(FULL_LOSS_DURATION_MEAN, FULL_LOSS_DURATION_SD, self.batch_size)
-        self.batch_idx = 0
-    
-    def get_randoms(self):
-        """Возвращает следующий набор случайных чисел"""
-        if self.batch_idx >= self.batch_size:
-            self._generate_new_batch()
-        
-        result = {
-            'uniform': self.current_batch[self.batch_idx],
-            'poisson': self.poisson_batch[self.batch_idx],
-            'exponential': self.exponential_batch[self.batch_idx],
-            'normal': self.normal_batch[self.batch_idx]
-        }
-        self.batch_idx += 1
-        return result
-
-
 def validate_financial_state(savings, annual_growth, context=""):
     """
     ОБНОВЛЕНО: Проверяет логическую консистентность финансового состояния
@@ -222,46 +201,121 @@ def validate_financial_state(savings, annual_growth, context=""):
     return True
 
 
-def handle_savings_withdrawal(savings, annual_growth, withdrawal_amount):
+def skip_quiet_months(savings, annual_growth, contribution, months, rate, growth_factors):
     """
-    ИСПРАВЛЕНО: Корректная обработка изъятия из savings с учетом налогов
-    Устранена аномалия с annual_growth > 0 при savings = 0
-    
+    НОВАЯ ФУНКЦИЯ: months месяцев без событий одной формулой геометрического ряда
+
+    Каждый месяц savings растет на rate, затем пополняется на contribution:
+        savings_k = savings * (1 + rate)^k + contribution * ((1 + rate)^k - 1) / rate
+
     Args:
-        savings: текущая сумма сбережений
-        annual_growth: накопленный за год рост (для налогов)
-        withdrawal_amount: сумма изъятия
-    
+        growth_factors: таблица (1 + rate) ** k (SimulationConfig.*_growth_factors)
+
     Returns:
-        tuple: (new_savings, new_annual_growth, debt_increase)
+        tuple: (new_savings, new_annual_growth) - рост за отрезок добавлен к annual_growth
     """
-    if withdrawal_amount <= 0:
-        return savings, annual_growth, 0
-    
-    # ИСПРАВЛЕНИЕ: Если нет сбережений, то не должно быть и накопленного роста
-    if savings <= 0:
-        # Любое изъятие из пустых сбережений полностью идет в долг
-        return 0, 0, withdrawal_amount
-    
-    if savings >= withdrawal_amount:
-        # Частичное изъятие - пропорционально уменьшаем annual_growth
-        withdrawal_ratio = withdrawal_amount / savings
-        new_annual_growth = annual_growth * (1 - withdrawal_ratio)
-        new_savings = savings - withdrawal_amount
-        debt_increase = 0
-        
-        # Дополнительная проверка консистентности
-        if new_savings <= 0:
-            new_savings = 0
-            new_annual_growth = 0
-            
+    factor = growth_factors[months]
+    if rate:
+        new_savings = savings * factor + contribution * (factor - 1) / rate
     else:
-        # Полное изъятие - обнуляем annual_growth, остаток в долг
-        debt_increase = withdrawal_amount - savings
-        new_savings = 0
-        new_annual_growth = 0  # Весь накопленный рост "съеден"
-    
-    return new_savings, new_annual_growth, debt_increase
+        new_savings = savings + contribution * months
+    return new_savings, annual_growth + (new_savings - savings - contribution * months)
+
+
+def months_until_savings(savings, contribution, threshold, rate):
+    """
+    НОВАЯ ФУНКЦИЯ: Через сколько месяцев без событий savings после роста достигнут threshold
+
+    Обратная к skip_quiet_months: наименьшее i >= 0, при котором
+    savings_i * (1 + rate) >= threshold (покупки проверяются после роста, до взноса).
+    При отрицательной доходности возвращает 0 (без прогноза).
+    """
+    if rate < 0:
+        return 0
+    if rate == 0:
+        return max(0, math.ceil((threshold - savings) / contribution))
+    base = savings + contribution / rate
+    target = threshold / (1 + rate) + contribution / rate
+    if base >= target:
+        return 0
+    return math.ceil(math.log(target / base) / math.log1p(rate))
+
+
+def _time_expense_month(expense):
+    """Первый месяц, когда покупка типа 'time' может состояться (год >= condition)"""
+    return max(1, math.ceil(expense['condition'] - 1) * 12 + 1)
+
+
+class PlannedExpenseTriggers:
+    """
+    НОВОЕ: Индекс срабатывания запланированных расходов одного сценария
+
+    Покупки 'time' упорядочены по месяцу наступления, наступившие лежат в куче
+    по сумме; покупки 'savings_target' - в куче по порогу savings. Месяц стоит
+    O(сработавших) вместо перебора всех расходов плана.
+
+    Использование (порядок покупок внутри месяца - по индексу в плане, как при
+    полном переборе; savings за месяц только уменьшаются):
+        if savings >= triggers.floor or month >= triggers.next_month:
+            for i in triggers.candidates(month, savings):
+                if savings < triggers.thresholds[i]:
+                    triggers.defer(i)  # условие перестало выполняться после прошлых покупок
+                    continue
+                ...покупка plan_expenses[i]...
+
+    Атрибуты:
+        thresholds: порог savings каждой покупки (сумма для 'time', condition для 'savings_target')
+        floor: наименьший порог среди доступных покупок (inf - таких нет)
+        next_month: месяц наступления ближайшей покупки 'time' (inf - таких нет)
+    """
+    __slots__ = ('thresholds', 'is_target', 'upcoming', 'ready', 'targets', 'floor', 'next_month')
+
+    def __init__(self, plan_expenses):
+        self.is_target = [expense['type'] == 'savings_target' for expense in plan_expenses]
+        self.thresholds = [expense['amount'] if expense['type'] == 'time' else expense['condition']
+                           for expense in plan_expenses]
+        # Стек: ближайший месяц наступления - в конце списка
+        self.upcoming = sorted(((_time_expense_month(expense), i) for i, expense in enumerate(plan_expenses)
+                                if expense['type'] == 'time'), reverse=True)
+        self.ready = []
+        self.targets = [(expense['condition'], i) for i, expense in enumerate(plan_expenses)
+                        if expense['type'] == 'savings_target']
+        heapq.heapify(self.targets)
+        self.next_month = self.upcoming[-1][0] if self.upcoming else math.inf
+        self._update_floor()
+
+    def _update_floor(self):
+        floor = self.ready[0][0] if self.ready else math.inf
+        if self.targets and self.targets[0][0] < floor:
+            floor = self.targets[0][0]
+        self.floor = floor
+
+    def advance(self, month):
+        """Переносит наступившие к month покупки 'time' в кучу по сумме"""
+        upcoming = self.upcoming
+        while upcoming and upcoming[-1][0] <= month:
+            i = upcoming.pop()[1]
+            heapq.heappush(self.ready, (self.thresholds[i], i))
+        self.next_month = upcoming[-1][0] if upcoming else math.inf
+        self._update_floor()
+
+    def candidates(self, month, savings):
+        """Индексы (по возрастанию) доступных покупок с порогом не выше savings; извлекаются из куч"""
+        if month >= self.next_month:
+            self.advance(month)
+        found = []
+        for heap in (self.ready, self.targets):
+            while heap and heap[0][0] <= savings:
+                found.append(heapq.heappop(heap)[1])
+        if found:
+            found.sort()
+            self._update_floor()
+        return found
+
+    def defer(self, i):
+        """Возвращает несработавшего кандидата в его кучу"""
+        heapq.heappush(self.targets if self.is_target[i] else self.ready, (self.thresholds[i], i))
+        self._update_floor()
 
 
 def check_plan_changes(month, plan_data):
@@ -294,6 +348,7 @@ def check_plan_changes(month, plan_data):
 def calculate_mode_with_probabilities(data, n_points=1000):
     """
     Расчет моды и связанных вероятностей с использованием scipy KDE
+    ОПТИМИЗИРОВАНО: scipy импортируется только здесь, при первом расчете моды
     
     Args:
         data: массив данных
@@ -339,6 +394,9 @@ def calculate_mode_with_probabilities(data, n_points=1000):
         }
     
     try:
+        # Отложенный импорт: scipy нужен только для моды, а стоит сотни миллисекунд на старте
+        from scipy.stats import gaussian_kde
+        
         # Создаем KDE используя scipy (профессиональная реализация)
         kde = gaussian_kde(data)
         
@@ -431,16 +489,22 @@ def calculate_mode_with_probabilities(data, n_points=1000):
         }
 
 
-def calculate_ideal_scenario(plan_data, months, planned_expenses_enabled=True):
+def calculate_ideal_scenario(plan_data, months, planned_expenses_enabled=True, sim_config=None):
     """
     ИСПРАВЛЕНО: Помесячная симуляция с полной системой долгов и правильной логикой подушки
     """
+    # НОВОЕ: параметры модели - из sim_config (по умолчанию константы config)
+    cfg = resolve_config(sim_config)
+    cushion_amount = cfg.cushion_amount
+    ideal_return_rate = cfg.ideal_return_rate
+    tax_rate = cfg.tax_rate
+    
     # Инициализация стартового капитала с защитой от некорректных значений
     initial_capital = plan_data.get('initial_capital', 0) or 0
     initial_capital = max(0, initial_capital)
     
-    cushion = min(CUSHION_AMOUNT, initial_capital)
-    savings = max(0, initial_capital - CUSHION_AMOUNT)
+    cushion = min(cushion_amount, initial_capital)
+    savings = max(0, initial_capital - cushion_amount)
     debt = 0
     annual_growth = 0
     
@@ -449,7 +513,7 @@ def calculate_ideal_scenario(plan_data, months, planned_expenses_enabled=True):
     
     # Запланированные расходы из плана
     plan_expenses = plan_data.get('planned_expenses', [])
-    planned_completed = {i: False for i in range(len(plan_expenses))}
+    triggers = PlannedExpenseTriggers(plan_expenses)
     
     for month in range(1, months + 1):
         # Получаем текущий доход и расходы согласно плану
@@ -461,49 +525,16 @@ def calculate_ideal_scenario(plan_data, months, planned_expenses_enabled=True):
         
         # Погашение долга из активов в начале месяца (сначала cushion, потом savings)
         if debt > 0:
-            if cushion > 0:
-                repayment = min(cushion, debt)
-                cushion -= repayment
-                debt -= repayment
-            elif savings > 0:
-                repayment = min(savings, debt)
-                # ИСПРАВЛЕНИЕ: Корректируем annual_growth при погашении долга из savings
-                savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, repayment)
-                debt -= repayment
+            cushion, savings, annual_growth, debt = repay_from_assets(cushion, savings, annual_growth, debt)
         
         # Полная система управления долгом и начисление процентов
         if debt > 0:
-            annual_income = current_income * 12
-            restructuring_threshold = annual_income * RESTRUCTURING_THRESHOLD_RATIO
-            bankruptcy_threshold = annual_income * BANKRUPTCY_THRESHOLD_RATIO
-            
-            # Этап 3: Банкротство (свыше 3 годовых доходов)
-            if debt > bankruptcy_threshold:
-                debt = 0
-                cushion = 0
-                savings = 0
-                annual_growth = 0  # ИСПРАВЛЕНИЕ: Обнуляем при банкротстве
-                is_restructured = False
-                
-            # Этап 2: Реструктуризация (1-3 годовых дохода)
-            elif debt > restructuring_threshold:
-                if not is_restructured:
-                    is_restructured = True
-                
-                debt_interest = debt * (DEBT_INTEREST_RATE * 0.5)  # 12% годовых
-                debt += debt_interest
-                
-            # Этап 1: Нормальное кредитование (до 1 годового дохода)
-            else:
-                if is_restructured:
-                    is_restructured = False
-                
-                debt_interest = debt * DEBT_INTEREST_RATE  # 24% годовых
-                debt += debt_interest
+            debt, cushion, savings, annual_growth, is_restructured, _ = accrue_debt(
+                debt, cushion, savings, annual_growth, is_restructured, current_income, cfg)
         
         # Начисление доходности только на savings (подушка не растет)
         if savings > 0:
-            growth = savings * IDEAL_RETURN_RATE
+            growth = savings * ideal_return_rate
             annual_growth += growth
             savings += growth
         
@@ -517,8 +548,8 @@ def calculate_ideal_scenario(plan_data, months, planned_expenses_enabled=True):
         
         # Формирование активов - сначала подушка, потом savings
         if available > 0:
-            if cushion < CUSHION_AMOUNT:
-                cushion_need = min(available, CUSHION_AMOUNT - cushion)
+            if cushion < cushion_amount:
+                cushion_need = min(available, cushion_amount - cushion)
                 cushion += cushion_need
                 available -= cushion_need
             
@@ -533,91 +564,59 @@ def calculate_ideal_scenario(plan_data, months, planned_expenses_enabled=True):
                 deficit -= cushion
                 cushion = 0
                 # Изъятие из savings с корректировкой annual_growth
-                savings, annual_growth, debt_increase = handle_savings_withdrawal(savings, annual_growth, deficit)
+                savings, annual_growth, debt_increase = withdraw_savings(savings, annual_growth, deficit)
                 debt += debt_increase
             else:
                 # Изъятие только из savings
-                savings, annual_growth, debt_increase = handle_savings_withdrawal(savings, annual_growth, deficit)
+                savings, annual_growth, debt_increase = withdraw_savings(savings, annual_growth, deficit)
                 debt += debt_increase
         
         # Обработка запланированных расходов из плана (только из savings)
-        if planned_expenses_enabled and plan_expenses:
-            current_year = (month - 1) // 12 + 1
-            
-            for i, expense in enumerate(plan_expenses):
-                if planned_completed[i]:
+        # ОПТИМИЗИРОВАНО: индекс срабатывания вместо перебора всех расходов
+        if planned_expenses_enabled and (savings >= triggers.floor or month >= triggers.next_month):
+            for i in triggers.candidates(month, savings):
+                if savings < triggers.thresholds[i]:
+                    triggers.defer(i)
                     continue
-                    
-                should_spend = False
-                
-                if expense['type'] == 'time' and current_year >= expense['condition'] and savings >= expense['amount']:
-                    should_spend = True
-                elif expense['type'] == 'savings_target' and savings >= expense['condition']:
-                    should_spend = True
-                
-                if should_spend:
-                    # ИСПРАВЛЕНИЕ: Запланированные расходы тоже корректируют annual_growth
-                    savings, annual_growth, debt_increase = handle_savings_withdrawal(savings, annual_growth, expense['amount'])
-                    debt += debt_increase
-                    planned_completed[i] = True
+                # ИСПРАВЛЕНИЕ: Запланированные расходы тоже корректируют annual_growth
+                savings, annual_growth, debt_increase = withdraw_savings(savings, annual_growth, plan_expenses[i]['amount'])
+                debt += debt_increase
         
         # Погашение долга из активов в конце месяца
         if debt > 0:
-            if cushion > 0:
-                repayment = min(cushion, debt)
-                cushion -= repayment
-                debt -= repayment
-            elif savings > 0:
-                repayment = min(savings, debt)
-                # ИСПРАВЛЕНИЕ: Корректируем annual_growth при погашении долга
-                savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, repayment)
-                debt -= repayment
+            cushion, savings, annual_growth, debt = repay_from_assets(cushion, savings, annual_growth, debt)
         
         # Уплата налога (в конце года)
         if month % 12 == 0 and annual_growth > 0:
-            tax_payment = annual_growth * TAX_RATE
             # ИСПРАВЛЕНИЕ: Выплата налога тоже корректирует annual_growth
-            if savings >= tax_payment:
-                savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, tax_payment)
-            else:
-                savings, annual_growth, debt_increase = handle_savings_withdrawal(savings, annual_growth, tax_payment)
-                debt += debt_increase
+            savings, annual_growth, debt_increase = settle_tax(savings, annual_growth, tax_rate)
+            debt += debt_increase
             
             # Погашение долга из активов после налога
             if debt > 0:
-                if cushion > 0:
-                    repayment = min(cushion, debt)
-                    cushion -= repayment
-                    debt -= repayment
-                elif savings > 0:
-                    repayment = min(savings, debt)
-                    savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, repayment)
-                    debt -= repayment
+                cushion, savings, annual_growth, debt = repay_from_assets(cushion, savings, annual_growth, debt)
     
     # Финальное погашение долга из активов
     if debt > 0:
-        if cushion > 0:
-            repayment = min(cushion, debt)
-            cushion -= repayment
-            debt -= repayment
-        if debt > 0 and savings > 0:
-            repayment = min(savings, debt)
-            savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, repayment)
-            debt -= repayment
+        cushion, savings, annual_growth, debt = repay_from_assets(cushion, savings, annual_growth, debt, both_sources=True)
     
     return cushion + savings - debt
 
 
-def calculate_linear_scenario(plan_data, months, planned_expenses_enabled=True):
+def calculate_linear_scenario(plan_data, months, planned_expenses_enabled=True, sim_config=None):
     """
     ИСПРАВЛЕНО: Помесячная симуляция с полной системой долгов, но без роста savings
     """
+    # НОВОЕ: параметры модели - из sim_config (по умолчанию константы config)
+    cfg = resolve_config(sim_config)
+    cushion_amount = cfg.cushion_amount
+    
     # Инициализация стартового капитала с защитой от некорректных значений
     initial_capital = plan_data.get('initial_capital', 0) or 0
     initial_capital = max(0, initial_capital)
     
-    cushion = min(CUSHION_AMOUNT, initial_capital)
-    savings = max(0, initial_capital - CUSHION_AMOUNT)
+    cushion = min(cushion_amount, initial_capital)
+    savings = max(0, initial_capital - cushion_amount)
     debt = 0
     annual_growth = 0  # В линейном сценарии роста нет, но переменная нужна для единообразия
     
@@ -626,7 +625,7 @@ def calculate_linear_scenario(plan_data, months, planned_expenses_enabled=True):
     
     # Запланированные расходы из плана
     plan_expenses = plan_data.get('planned_expenses', [])
-    planned_completed = {i: False for i in range(len(plan_expenses))}
+    triggers = PlannedExpenseTriggers(plan_expenses)
     
     for month in range(1, months + 1):
         # Получаем текущий доход и расходы согласно плану
@@ -634,43 +633,12 @@ def calculate_linear_scenario(plan_data, months, planned_expenses_enabled=True):
         
         # Погашение долга из активов в начале месяца (сначала cushion, потом savings)
         if debt > 0:
-            if cushion > 0:
-                repayment = min(cushion, debt)
-                cushion -= repayment
-                debt -= repayment
-            elif savings > 0:
-                repayment = min(savings, debt)
-                savings -= repayment
-                debt -= repayment
+            cushion, savings, _, debt = repay_from_assets(cushion, savings, 0, debt)
         
         # Полная система управления долгом и начисление процентов
         if debt > 0:
-            annual_income = current_income * 12
-            restructuring_threshold = annual_income * RESTRUCTURING_THRESHOLD_RATIO
-            bankruptcy_threshold = annual_income * BANKRUPTCY_THRESHOLD_RATIO
-            
-            # Этап 3: Банкротство (свыше 3 годовых доходов)
-            if debt > bankruptcy_threshold:
-                debt = 0
-                cushion = 0
-                savings = 0
-                is_restructured = False
-                
-            # Этап 2: Реструктуризация (1-3 годовых дохода)
-            elif debt > restructuring_threshold:
-                if not is_restructured:
-                    is_restructured = True
-                
-                debt_interest = debt * (DEBT_INTEREST_RATE * 0.5)  # 12% годовых
-                debt += debt_interest
-                
-            # Этап 1: Нормальное кредитование (до 1 годового дохода)
-            else:
-                if is_restructured:
-                    is_restructured = False
-                
-                debt_interest = debt * DEBT_INTEREST_RATE  # 24% годовых
-                debt += debt_interest
+            debt, cushion, savings, _, is_restructured, _ = accrue_debt(
+                debt, cushion, savings, 0, is_restructured, current_income, cfg)
         
         # НЕТ роста savings (0% доходности) - это отличие от идеального сценария
         
@@ -684,108 +652,58 @@ def calculate_linear_scenario(plan_data, months, planned_expenses_enabled=True):
         
         # Формирование активов - сначала подушка, потом savings
         if available > 0:
-            if cushion < CUSHION_AMOUNT:
-                cushion_need = min(available, CUSHION_AMOUNT - cushion)
+            if cushion < cushion_amount:
+                cushion_need = min(available, cushion_amount - cushion)
                 cushion += cushion_need
                 available -= cushion_need
             
             if available > 0:
                 savings += available
         elif available < 0:
-            # Покрытие дефицита из активов - сначала cushion, потом savings
+            # Покрытие дефицита из активов - сначала cushion, потом savings (нехватка - в долг)
             deficit = -available
             if cushion >= deficit:
                 cushion -= deficit
-            elif cushion > 0:
+            else:
                 deficit -= cushion
                 cushion = 0
-                if savings >= deficit:
-                    savings -= deficit
-                else:
-                    debt += deficit - savings
-                    savings = 0
-            else:
-                if savings >= deficit:
-                    savings -= deficit
-                else:
-                    debt += deficit - savings
-                    savings = 0
+                savings, _, debt_increase = withdraw_savings(savings, 0, deficit)
+                debt += debt_increase
         
         # Обработка запланированных расходов из плана (только из savings)
-        if planned_expenses_enabled and plan_expenses:
-            current_year = (month - 1) // 12 + 1
-            
-            for i, expense in enumerate(plan_expenses):
-                if planned_completed[i]:
+        # ОПТИМИЗИРОВАНО: индекс срабатывания вместо перебора всех расходов
+        if planned_expenses_enabled and (savings >= triggers.floor or month >= triggers.next_month):
+            for i in triggers.candidates(month, savings):
+                if savings < triggers.thresholds[i]:
+                    triggers.defer(i)
                     continue
-                    
-                should_spend = False
-                
-                if expense['type'] == 'time' and current_year >= expense['condition'] and savings >= expense['amount']:
-                    should_spend = True
-                elif expense['type'] == 'savings_target' and savings >= expense['condition']:
-                    should_spend = True
-                
-                if should_spend:
-                    if savings >= expense['amount']:
-                        savings -= expense['amount']
-                        planned_completed[i] = True
-                    else:
-                        # Если не хватает сбережений, добавляем в долг
-                        debt += expense['amount'] - savings
-                        savings = 0
-                        planned_completed[i] = True
+                # Если не хватает сбережений, остаток добавляется в долг
+                savings, _, debt_increase = withdraw_savings(savings, 0, plan_expenses[i]['amount'])
+                debt += debt_increase
         
         # Погашение долга из активов в конце месяца
         if debt > 0:
-            if cushion > 0:
-                repayment = min(cushion, debt)
-                cushion -= repayment
-                debt -= repayment
-            elif savings > 0:
-                repayment = min(savings, debt)
-                savings -= repayment
-                debt -= repayment
+            cushion, savings, _, debt = repay_from_assets(cushion, savings, 0, debt)
     
     # Финальное погашение долга из активов
     if debt > 0:
-        if cushion > 0:
-            repayment = min(cushion, debt)
-            cushion -= repayment
-            debt -= repayment
-        if debt > 0 and savings > 0:
-            repayment = min(savings, debt)
-            savings -= repayment
-            debt -= repayment
+        cushion, savings, _, debt = repay_from_assets(cushion, savings, 0, debt, both_sources=True)
     
     return cushion + savings - debt
 
 
-def run_simulation(plan_id, plan_data):
-    """
-    ВЕКТОРИЗОВАНО: добавлен батчевый менеджер случайных чисел для ускорения
-    ИСПРАВЛЕНО: Налогообложение фантомного роста
-    """
-    print(f"\nЗапуск модели для Плана {plan_id} (начальный доход {plan_data['initial_income']}₽/мес, стартовый капитал {plan_data.get('initial_capital', 0):,}₽)...")
-    start_time = time.time()
-    
-    # НОВОЕ: Инициализация батчевого менеджера случайных чисел
-    batch_manager = RandomBatchManager(batch_size=500)  # Размер батча оптимизирован для веб-версии
-    
-    # НОВОЕ: Получаем запланированные расходы из плана
-    plan_expenses = plan_data.get('planned_expenses', [])
-    
-    results_by_horizon = {years: {
-        'net_wealth': np.zeros(N_SCENARIOS),
-        'final_debt': np.zeros(N_SCENARIOS),
+def _empty_scenario_results(n, plan_expenses, horizons):
+    """Заготовка результатов по горизонтам для n сценариев"""
+    n_names = len(dict.fromkeys(exp['name'] for exp in plan_expenses))
+    return {years: {
+        'net_wealth': np.zeros(n),
+        'final_debt': np.zeros(n),
         'total_cash_flow': 0,
-        'months_zero': np.zeros(N_SCENARIOS),
-        'minor_emergencies': np.zeros(N_SCENARIOS),
-        'medium_emergencies': np.zeros(N_SCENARIOS),
-        'major_emergencies': np.zeros(N_SCENARIOS),
+        'months_zero': np.zeros(n),
+        'minor_emergencies': np.zeros(n),
+        'medium_emergencies': np.zeros(n),
+        'major_emergencies': np.zeros(n),
         'shock_pcts': [],  # List для всех shock_pct по месяцам/сценариям (flatten позже)
-        'ideal_wealth': 0,  # Новый показатель
-        'linear_wealth': 0,  # Новый показатель
         # ДОБАВЛЕНО: отслеживание потери компаундинга
         'scenarios_direct_losses': [],
         'scenarios_compounding_loss': [],
@@ -794,34 +712,195 @@ def run_simulation(plan_id, plan_data):
         'scenarios_planned_compounding_loss': [],
         'planned_expenses_stats': {exp['name']: {'count': 0, 'total_amount': 0} for exp in plan_expenses},
         # НОВОЕ: детальная статистика по долгу
-        'max_debt': np.zeros(N_SCENARIOS),  # Максимальный долг за период
-        'months_in_debt': np.zeros(N_SCENARIOS),  # Количество месяцев в долгу
-        'total_interest_paid': np.zeros(N_SCENARIOS),  # Общая сумма процентов
-        'avg_debt_when_in_debt': np.zeros(N_SCENARIOS),  # Средний размер долга (когда он был)
+        'max_debt': np.zeros(n),  # Максимальный долг за период
+        'months_in_debt': np.zeros(n),  # Количество месяцев в долгу
+        'total_interest_paid': np.zeros(n),  # Общая сумма процентов
+        'avg_debt_when_in_debt': np.zeros(n),  # Средний размер долга (когда он был)
         # НОВОЕ: события управления долгом
-        'restructuring_events': np.zeros(N_SCENARIOS),  # Количество реструктуризаций
-        'bankruptcy_events': np.zeros(N_SCENARIOS),     # Количество банкротств
-        'months_in_restructuring': np.zeros(N_SCENARIOS),  # Месяцев под реструктуризацией
-    } for years in HORIZONS}
+        'restructuring_events': np.zeros(n),  # Количество реструктуризаций
+        'bankruptcy_events': np.zeros(n),     # Количество банкротств
+        'months_in_restructuring': np.zeros(n),  # Месяцев под реструктуризацией
+        # НОВОЕ: время до событий (месяц первого наступления, 0 = не было)
+        'first_debt_month': np.zeros(n),
+        'first_restructuring_month': np.zeros(n),
+        'first_bankruptcy_month': np.zeros(n),
+        'first_cushion_depletion_month': np.zeros(n),
+        'first_cushion_recovery_months': np.zeros(n),
+        'max_cushion_depletion_months': np.zeros(n),
+        # Месяц первой покупки по названиям расходов (сценарии × расходы)
+        'planned_expense_months': np.zeros((n, n_names), dtype=np.int16),
+    } for years in horizons}
+
+
+def validate_plan_data(plan_data):
+    """
+    НОВАЯ ФУНКЦИЯ: Проверяет план из внешнего источника (JSON запроса) и
+    возвращает нормализованную копию в формате PLANS
+
+    Raises:
+        ValueError: при отсутствии обязательных полей или неверных типах
+    """
+    if not isinstance(plan_data, dict):
+        raise ValueError("План должен быть объектом")
     
-    # Расчет идеальных и линейных сценариев для всех горизонтов
-    for years in HORIZONS:
-        months = years * 12
-        results_by_horizon[years]['ideal_wealth'] = calculate_ideal_scenario(plan_data, months, True)
-        results_by_horizon[years]['linear_wealth'] = calculate_linear_scenario(plan_data, months, True)
+    def number(value, field):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Поле {field} должно быть числом")
+        return value
+    
+    for field in ('initial_income', 'initial_expenses'):
+        if field not in plan_data:
+            raise ValueError(f"Отсутствует обязательное поле {field}")
+    
+    plan = {
+        'initial_income': number(plan_data['initial_income'], 'initial_income'),
+        'initial_expenses': number(plan_data['initial_expenses'], 'initial_expenses'),
+        'initial_capital': number(plan_data.get('initial_capital', 0) or 0, 'initial_capital'),
+        'income_changes': [],
+        'expense_changes': [],
+        'planned_expenses': [],
+    }
+    for field, value_key in (('income_changes', 'new_income'), ('expense_changes', 'new_expenses')):
+        for change in plan_data.get(field, []):
+            if not isinstance(change, dict) or 'month' not in change or value_key not in change:
+                raise ValueError(f"Элемент {field} должен содержать month и {value_key}")
+            plan[field].append({'month': int(number(change['month'], f'{field}.month')),
+                                value_key: number(change[value_key], f'{field}.{value_key}')})
+    for expense in plan_data.get('planned_expenses', []):
+        if not isinstance(expense, dict):
+            raise ValueError("Элемент planned_expenses должен быть объектом")
+        if expense.get('type') not in ('time', 'savings_target'):
+            raise ValueError("Тип запланированного расхода: 'time' или 'savings_target'")
+        plan['planned_expenses'].append({
+            'name': str(expense.get('name', f"Расход {len(plan['planned_expenses']) + 1}")),
+            'amount': number(expense.get('amount'), 'planned_expenses.amount'),
+            'type': expense['type'],
+            'condition': number(expense.get('condition'), 'planned_expenses.condition'),
+            'repeat': bool(expense.get('repeat', False)),
+        })
+    return plan
+
+
+def normalize_horizons(horizons=None, sim_config=None):
+    """
+    Проверяет и упорядочивает запрошенные горизонты (подмножество горизонтов конфигурации)
+    """
+    available = list(resolve_config(sim_config).horizons)
+    if horizons is None:
+        return available
+    unknown = [years for years in horizons if years not in available]
+    if unknown:
+        raise ValueError(f"Неизвестные горизонты {unknown}, доступны: {available}")
+    return sorted(set(horizons))
+
+
+def simulate_scenarios(plan_id, plan_data, scenario_start, scenario_stop, horizons=None, seed=None,
+                       profiler=None, observer=None, progress_interval=PROGRESS_INTERVAL,
+                       start_time=None, progress_total=None, timeline=None, sim_config=None, reservoir=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Помесячная симуляция диапазона сценариев [scenario_start, scenario_stop)
+
+    Возвращает "сырые" результаты по горизонтам (массивы длиной scenario_stop - scenario_start,
+    списки и накопители) без итоговых статистик. Диапазоны можно считать в разных
+    процессах и объединить через merge_scenario_results.
+    ОПТИМИЗИРОВАНО: месяцы моделируются только до последнего запрошенного горизонта
+    НОВОЕ: timeline (shocks.ShockTimeline) - готовая шкала шоков, покрывающая диапазон
+           (например, из кэша воркера); None = шкала строится здесь
+    НОВОЕ: sim_config (SimulationConfig) - параметры модели; seed=None - sim_config.random_seed
+    НОВОЕ: sim_config.event_skip_ahead - дискретно-событийный режим: у сценария есть
+           календарь событий (куча месяцев ЧП и потерь дохода, смен плана, концов года
+           с налогом и фиксацией горизонтов, наступления покупок 'time'); отрезки между
+           событиями при отсутствии долга считаются одной формулой skip_quiet_months,
+           месяцы событий и месяцы с долгом - обычным помесячным шагом
+    НОВОЕ: reservoir (trajectories.TrajectoryReservoir) - выборка сценариев, для которых
+           записываются помесячные траектории и журнал событий; на результаты не влияет
+    """
+    # НОВОЕ: параметры модели - из sim_config (по умолчанию константы config)
+    cfg = resolve_config(sim_config)
+    cushion_amount = cfg.cushion_amount
+    savings_return_rate = cfg.savings_return_rate
+    ideal_return_rate = cfg.ideal_return_rate
+    tax_rate = cfg.tax_rate
+    partial_loss_rate = cfg.partial_loss_rate
+    savings_growth_factors = cfg.savings_growth_factors
+    ideal_growth_factors = cfg.ideal_growth_factors
+    skip_ahead = cfg.event_skip_ahead
+    skip_ahead_min_months = config.SKIP_AHEAD_MIN_MONTHS
+    
+    if seed is None:
+        seed = cfg.random_seed
+    horizons = normalize_horizons(horizons, cfg)
+    n_months = max(horizons) * 12
+    snapshot_months = {years * 12 for years in cfg.horizons if years * 12 <= n_months}
+    if start_time is None:
+        start_time = time.time()
+    if progress_total is None:
+        progress_total = scenario_stop
+    
+    profiling = profiler is not None
+    if profiling:
+        profiler.start()
+    
+    # НОВОЕ: Получаем запланированные расходы из плана
+    plan_expenses = plan_data.get('planned_expenses', [])
+    
+    results_by_horizon = _empty_scenario_results(scenario_stop - scenario_start, plan_expenses, horizons)
+    # ВЕКТОРИЗОВАНО: покупки всех сценариев диапазона - массивы событий
+    # (позиция сценария, месяц, индекс расхода) в хронологическом порядке внутри сценария
+    purchase_scenario = []
+    purchase_month = []
+    purchase_expense = []
+    
+    # НОВОЕ: ЧП и потери дохода не зависят от состояния плана - берем их из шкалы шоков
+    if timeline is None or not timeline.covers(scenario_start, scenario_stop, n_months):
+        timeline = generate_shock_timeline(seed, plan_id, scenario_start, scenario_stop, n_months, cfg)
+    if profiling:
+        profiler.lap('events')
+    
+    # НОВОЕ: события, общие для всех сценариев плана: смены дохода/расходов, месяцы
+    # фиксации горизонтов, наступление покупок 'time' и ограничитель (налог в конце
+    # года пропуск отрезка считает сам)
+    if skip_ahead:
+        plan_event_months = sorted(
+            {change['month'] for change in plan_data['income_changes']}
+            | {change['month'] for change in plan_data['expense_changes']}
+            | snapshot_months
+            | {_time_expense_month(expense) for expense in plan_expenses if expense['type'] == 'time'}
+            | {n_months + 1})
+        # Месяцы с ЧП (включая продолжения кластеров) или потерей дохода (сценарии × месяцы)
+        eventful = ((timeline.emergency_cost[:, :n_months] != 0)
+                    | (timeline.minor_count[:, :n_months] != 0)
+                    | (timeline.medium_count[:, :n_months] != 0)
+                    | (timeline.major_count[:, :n_months] != 0)
+                    | timeline.partial_loss[:, :n_months] | timeline.full_loss[:, :n_months])
     
-    for scenario in range(N_SCENARIOS):
+    for scenario in range(scenario_start, scenario_stop):
+        # Позиция сценария в массивах этого диапазона
+        idx = scenario - scenario_start
+        
+        # Шоки сценария по месяцам (списки Python - быстрый скалярный доступ в цикле)
+        row = scenario - timeline.scenario_start
+        month_emergency_cost = timeline.emergency_cost[row].tolist()
+        month_minor = timeline.minor_count[row].tolist()
+        month_medium = timeline.medium_count[row].tolist()
+        month_major = timeline.major_count[row].tolist()
+        month_partial_loss = timeline.partial_loss[row].tolist()
+        month_full_loss = timeline.full_loss[row].tolist()
+        
+        # НОВОЕ: календарь событий сценария - отсортированный список уже является кучей
+        if skip_ahead:
+            calendar = list(heapq.merge((np.flatnonzero(eventful[row]) + 1).tolist(), plan_event_months))
+        
+        # НОВОЕ: траектория сценария, если он попал в выборку (иначе None)
+        trace = reservoir.offer(scenario) if reservoir is not None else None
+        
         # Инициализация стартового капитала с защитой от некорректных значений
         initial_capital = plan_data.get('initial_capital', 0) or 0
         initial_capital = max(0, initial_capital)
         
-        cushion = min(CUSHION_AMOUNT, initial_capital)
-        savings = max(0, initial_capital - CUSHION_AMOUNT)
+        cushion = min(cushion_amount, initial_capital)
+        savings = max(0, initial_capital - cushion_amount)
         debt = 0
-        minor_cluster_active = False
-        major_cluster_remaining = 0
-        active_partial_loss = 0
-        active_full_loss = 0
         scenario_cash_flow = 0
         annual_growth = 0
         start_of_year_savings = 0
@@ -830,19 +909,24 @@ def run_simulation(plan_id, plan_data):
         medium_em_count = 0
         major_em_count = 0
         
-        horizon_counters = {years: {'zero': 0} for years in HORIZONS}
+        horizon_counters = {years: {'zero': 0} for years in horizons}
         
         shock_pcts_scenario = []
         
-        # Отслеживание шоков с временными метками
-        shock_history = []
+        # Накопленные прямые потери от шоков (ЧП + потери дохода)
+        direct_losses_total = 0
         
         # Отслеживание запланированных расходов
-        planned_expenses_history = []
-        planned_completed = {i: False for i in range(len(plan_expenses))}
+        # НОВОЕ: покупки по месяцам (для синхронизации виртуального сценария) и индекс срабатывания
+        planned_by_month = {}
+        triggers = PlannedExpenseTriggers(plan_expenses)
         
         # Отслеживание статистики по долгу
-        debt_history = []
+        # ОПТИМИЗИРОВАНО: накопители вместо помесячной истории долга - на горизонте
+        # читаются как есть, а пропуск отрезка без долга их не меняет
+        max_debt = 0
+        months_with_debt = 0
+        debt_sum = 0
         total_interest_paid = 0
         
         # События управления долгом
@@ -851,6 +935,16 @@ def run_simulation(plan_id, plan_data):
         months_restructuring = 0
         is_restructured = False
         
+        # НОВОЕ: время до событий - месяцы первого наступления и периоды истощения подушки
+        first_debt_month = 0
+        first_restructuring_month = 0
+        first_bankruptcy_month = 0
+        first_depletion_month = 0
+        first_recovery_months = 0
+        max_depletion_months = 0
+        depleted_since = 0  # Месяц начала текущего истощения подушки (0 = подушка полна)
+        cushion_full = cushion >= cushion_amount
+        
         # НОВОЕ: Виртуальный сценарий для правильного расчета потерь компаундинга
         virtual_cushion = cushion
         virtual_savings = savings
@@ -858,7 +952,11 @@ def run_simulation(plan_id, plan_data):
         virtual_annual_growth = 0
         virtual_is_restructured = False
         
-        for month in range(1, N_MONTHS + 1):
+        # НОВОЕ: while вместо range - отрезки без событий перескакиваются целиком
+        month = 0
+        while month < n_months:
+            month += 1
+            
             # Получаем текущий доход и расходы согласно плану
             current_income, current_expenses = check_plan_changes(month, plan_data)
             
@@ -870,171 +968,168 @@ def run_simulation(plan_id, plan_data):
                 start_of_year_savings = savings
                 annual_growth = 0
                 virtual_annual_growth = 0
+            if profiling:
+                profiler.lap('plan_changes')
+            
+            # НОВОЕ: Пропуск отрезка без событий. Долга нет, подушки полны, взнос
+            # положителен - до ближайшего события календаря месяц отличается только
+            # ростом и взносом, а конец года - еще налогом из savings
+            if (skip_ahead and debt == 0 and virtual_debt == 0 and target_savings > 0
+                    and cushion >= cushion_amount and virtual_cushion >= cushion_amount):
+                while calendar[0] < month:
+                    heapq.heappop(calendar)
+                skip_end = calendar[0]
+                # Покупки по порогу savings: месяц срабатывания наименьшего порога -
+                # аналитически, с запасом в месяц на округление (тот месяц считается
+                # помесячно); месяцы наступления покупок 'time' уже в календаре
+                if month >= triggers.next_month:
+                    triggers.advance(month)
+                if triggers.floor < math.inf:
+                    skip_end = min(skip_end, month - 1 + months_until_savings(
+                        savings, target_savings, triggers.floor, savings_return_rate))
+                quiet_months = skip_end - month
+                if quiet_months >= skip_ahead_min_months:
+                    # ИСПРАВЛЕНО: отрезок идет через концы лет - закрытая формула по годам,
+                    # между ними налог из savings и январский сброс роста
+                    while month < skip_end:
+                        segment_end = min(skip_end - 1, month + (-month) % 12)
+                        segment = segment_end - month + 1
+                        quiet_savings, quiet_growth = skip_quiet_months(
+                            savings, annual_growth, target_savings, segment,
+                            savings_return_rate, savings_growth_factors)
+                        quiet_virtual_savings, quiet_virtual_growth = skip_quiet_months(
+                            virtual_savings, virtual_annual_growth, target_savings, segment,
+                            ideal_return_rate, ideal_growth_factors)
+                        year_end = segment_end % 12 == 0
+                        # Налог не покрывается сбережениями - этот год дальше считается помесячно
+                        if year_end and not (quiet_growth * tax_rate < quiet_savings
+                                             and quiet_virtual_growth * tax_rate < quiet_virtual_savings):
+                            break
+                        # Проверки после роста - в каждом месяце с ненулевыми savings
+                        if DEBUG_VALIDATION:
+                            VALIDATION_STATS['total_checks'] += segment if savings > 0 else segment - 1
+                        if trace is not None:
+                            _trace_quiet_months(trace, month, segment, cushion, savings, annual_growth, debt,
+                                                virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt,
+                                                current_income, current_expenses, cfg)
+                        savings, annual_growth = quiet_savings, quiet_growth
+                        virtual_savings, virtual_annual_growth = quiet_virtual_savings, quiet_virtual_growth
+                        scenario_cash_flow += target_savings * segment
+                        month = segment_end + 1
+                        if not year_end:
+                            continue
+                        # Налог (проверки до и после, как в помесячном расчете) и сброс года
+                        if annual_growth > 0:
+                            if DEBUG_VALIDATION:
+                                VALIDATION_STATS['total_checks'] += 2
+                            if trace is not None:
+                                trace.event(segment_end, 'tax', annual_growth * tax_rate, base=annual_growth)
+                            savings, annual_growth, _ = settle_tax(savings, annual_growth, tax_rate)
+                        if virtual_annual_growth > 0:
+                            if DEBUG_VALIDATION:
+                                VALIDATION_STATS['total_checks'] += 2
+                            virtual_savings, virtual_annual_growth, _ = settle_tax(
+                                virtual_savings, virtual_annual_growth, tax_rate)
+                        if trace is not None:
+                            trace.record(segment_end, cushion, savings, debt, virtual_cushion, virtual_savings,
+                                         virtual_debt, current_income, current_expenses, 0, 0, annual_growth, False)
+                        start_of_year_savings = savings
+                        annual_growth = 0
+                        virtual_annual_growth = 0
+                    if profiling:
+                        profiler.lap('skip_ahead')
+                    if month == skip_end:
+                        month = skip_end - 1
+                        continue
             
             # РЕАЛЬНЫЙ СЦЕНАРИЙ
             
             # Погашение долга из активов в начале месяца (сначала cushion, потом savings)
             if debt > 0:
-                if cushion > 0:
-                    repayment = min(cushion, debt)
-                    cushion -= repayment
-                    debt -= repayment
-                elif savings > 0:
-                    repayment = min(savings, debt)
-                    # ИСПРАВЛЕНИЕ: Корректируем annual_growth при погашении долга
-                    savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, repayment)
-                    debt -= repayment
+                cushion, savings, annual_growth, debt = repay_from_assets(cushion, savings, annual_growth, debt)
             
             # Поэтапное управление долгом и начисление процентов
             if debt > 0:
-                annual_income = current_income * 12
-                restructuring_threshold = annual_income * RESTRUCTURING_THRESHOLD_RATIO
-                bankruptcy_threshold = annual_income * BANKRUPTCY_THRESHOLD_RATIO
-                
-                # Этап 3: Банкротство (свыше 3 годовых доходов)
-                if debt > bankruptcy_threshold:
-                    bankruptcy_count += 1
-                    debt = 0
-                    cushion = 0
-                    savings = 0
-                    annual_growth = 0  # ИСПРАВЛЕНИЕ: Обнуляем при банкротстве
-                    is_restructured = False
-                    
-                # Этап 2: Реструктуризация (1-3 годовых дохода)
-                elif debt > restructuring_threshold:
-                    if not is_restructured:
-                        restructuring_count += 1
-                        is_restructured = True
-                    
-                    months_restructuring += 1
-                    debt_interest = debt * (DEBT_INTEREST_RATE * 0.5)  # 12% годовых (1% в месяц)
-                    debt += debt_interest
-                    total_interest_paid += debt_interest
-                    
-                # Этап 1: Нормальное кредитование (до 1 годового дохода)
-                else:
-                    if is_restructured:
-                        is_restructured = False  # Выход из реструктуризации
-                    
-                    debt_interest = debt * DEBT_INTEREST_RATE  # 24% годовых (2% в месяц)
-                    debt += debt_interest
-                    total_interest_paid += debt_interest
+                debt_before = debt
+                debt, cushion, savings, annual_growth, is_restructured, events = accrue_debt(
+                    debt, cushion, savings, annual_growth, is_restructured, current_income, cfg)
+                bankrupt, newly_restructured, restructured, debt_interest = events
+                bankruptcy_count += bankrupt
+                restructuring_count += newly_restructured
+                months_restructuring += restructured
+                total_interest_paid += debt_interest
+                if bankrupt and not first_bankruptcy_month:
+                    first_bankruptcy_month = month
+                if newly_restructured and not first_restructuring_month:
+                    first_restructuring_month = month
+                if trace is not None and (bankrupt or newly_restructured):
+                    trace.event(month, 'bankruptcy' if bankrupt else 'restructuring', debt_before)
             
             # Начисление доходности только на savings (подушка не растет)
             if savings > 0:
-                growth = savings * SAVINGS_RETURN_RATE
+                growth = savings * savings_return_rate
                 annual_growth += growth
                 savings += growth
                 # ВАЛИДАЦИЯ: Проверяем состояние после начисления роста
                 if DEBUG_VALIDATION:
+                    if profiling:
+                        profiler.lap('debt')
                     validate_financial_state(savings, annual_growth, f"Plan {plan_id}, scenario {scenario}, month {month} - after growth")
+                    if profiling:
+                        profiler.lap('validation')
+            if profiling:
+                profiler.lap('debt')
             
             available = current_income - current_expenses
-            emergency_cost = 0
-            minor_em_occurred = False
-            medium_em_occurred = False
-            major_em_occurred = False
-            
-            # ВЕКТОРИЗОВАННАЯ ГЕНЕРАЦИЯ ЧП: Получаем батч случайных чисел
-            randoms = batch_manager.get_randoms()
-            r_uniform = randoms['uniform']
-            
-            # Обработка крупных ЧП с кластеризацией Пуассона
-            if major_cluster_remaining > 0:
-                emergency_cost += MAJOR_EMERGENCY_COST
-                shock_history.append((month, MAJOR_EMERGENCY_COST, 'major_emergency'))
-                major_em_count += 1
-                major_em_occurred = True
-                major_cluster_remaining -= 1
-            
-            # ВЕКТОРИЗОВАННАЯ ГЕНЕРАЦИЯ: Генерация новых ЧП (используем предгенерированные числа)
-            # Мелкие ЧП
-            if not minor_cluster_active and r_uniform[batch_manager.MINOR_EM_IDX] < MINOR_EMERGENCY_PROB:
-                emergency_cost += MINOR_EMERGENCY_COST
-                shock_history.append((month, MINOR_EMERGENCY_COST, 'minor_emergency'))
-                minor_em_count += 1
-                minor_em_occurred = True
-                minor_cluster_active = True
-            
-            # Средние ЧП
-            if not minor_cluster_active and r_uniform[batch_manager.MEDIUM_EM_IDX] < MEDIUM_EMERGENCY_PROB:
-                emergency_cost += MEDIUM_EMERGENCY_COST
-                shock_history.append((month, MEDIUM_EMERGENCY_COST, 'medium_emergency'))
-                medium_em_count += 1
-                medium_em_occurred = True
-                minor_cluster_active = True
             
-            # Крупные ЧП (только если нет активного кластера)
-            if major_cluster_remaining == 0 and r_uniform[batch_manager.MAJOR_EM_IDX] < MAJOR_EMERGENCY_PROB:
-                emergency_cost += MAJOR_EMERGENCY_COST
-                shock_history.append((month, MAJOR_EMERGENCY_COST, 'major_emergency'))
-                major_em_count += 1
-                major_em_occurred = True
-                # ВЕКТОРИЗОВАННАЯ ГЕНЕРАЦИЯ: Запуск кластера Пуассона для крупных ЧП
-                major_cluster_remaining = randoms['poisson']
-            
-            # Обработка кластера для мелких/средних ЧП
-            if minor_cluster_active:
-                # ВЕКТОРИЗОВАННАЯ ГЕНЕРАЦИЯ: С вероятностью 38% генерируем дополнительное ЧП в кластере
-                if r_uniform[batch_manager.CLUSTER_CONTINUE_IDX] < MINOR_CLUSTER_PROB:
-                    cluster_type = r_uniform[batch_manager.CLUSTER_TYPE_IDX]
-                    if cluster_type < 0.651:  # Мелкие (65.1%)
-                        emergency_cost += MINOR_EMERGENCY_COST
-                        shock_history.append((month, MINOR_EMERGENCY_COST, 'minor_cluster'))
-                        minor_em_count += 1
-                        minor_em_occurred = True
-                    else:  # Средние (34.9%)
-                        emergency_cost += MEDIUM_EMERGENCY_COST
-                        shock_history.append((month, MEDIUM_EMERGENCY_COST, 'medium_cluster'))
-                        medium_em_count += 1
-                        medium_em_occurred = True
-                else:
-                    minor_cluster_active = False
+            # ЧП месяца (с учетом кластеров) из шкалы шоков
+            emergency_cost = month_emergency_cost[month - 1]
+            minor_em_count += month_minor[month - 1]
+            medium_em_count += month_medium[month - 1]
+            major_em_count += month_major[month - 1]
             
             available -= emergency_cost
             
-            # ВЕКТОРИЗОВАННАЯ ГЕНЕРАЦИЯ: Генерация потерь дохода
+            # Потери дохода: длительность из шкалы, сумма - от текущего дохода
             loss = 0
-            if active_partial_loss == 0 and r_uniform[batch_manager.PARTIAL_LOSS_IDX] < PARTIAL_LOSS_PROB:
-                active_partial_loss = max(1, int(randoms['exponential']))
-            
-            if active_full_loss == 0 and r_uniform[batch_manager.FULL_LOSS_IDX] < FULL_LOSS_PROB:
-                duration = randoms['normal']
-                active_full_loss = max(1, int(np.round(duration)))
+            if month_partial_loss[month - 1]:
+                loss += current_income * partial_loss_rate
             
-            if active_partial_loss > 0:
-                loss += current_income * PARTIAL_LOSS_RATE
-                shock_history.append((month, current_income * PARTIAL_LOSS_RATE, 'partial_income_loss'))
-                active_partial_loss -= 1
-            
-            if active_full_loss > 0:
+            if month_full_loss[month - 1]:
                 loss += current_income
-                shock_history.append((month, current_income, 'full_income_loss'))
-                active_full_loss -= 1
+            
+            direct_losses_total += emergency_cost + loss
             
             available -= loss
+            if trace is not None:
+                if emergency_cost > 0:
+                    trace.event(month, 'emergency', emergency_cost, minor=month_minor[month - 1],
+                                medium=month_medium[month - 1], major=month_major[month - 1])
+                if loss > 0:
+                    trace.event(month, 'income_loss', loss, partial=month_partial_loss[month - 1],
+                                full=month_full_loss[month - 1])
+            if profiling:
+                profiler.lap('events')
             
             # Обработка запланированных расходов из плана (только из savings, не из подушки)
-            if plan_expenses:
-                current_year = (month - 1) // 12 + 1
-                
-                for i, expense in enumerate(plan_expenses):
-                    if planned_completed[i]:
+            # ОПТИМИЗИРОВАНО: индекс срабатывания - проверяются только покупки, чей порог достигнут
+            if savings >= triggers.floor or month >= triggers.next_month:
+                for i in triggers.candidates(month, savings):
+                    if savings < triggers.thresholds[i]:
+                        triggers.defer(i)
                         continue
-                        
-                    should_spend = False
-                    
-                    if expense['type'] == 'time' and current_year >= expense['condition'] and savings >= expense['amount']:
-                        should_spend = True
-                    elif expense['type'] == 'savings_target' and savings >= expense['condition']:
-                        should_spend = True
-                    
-                    if should_spend:
-                        # ИСПРАВЛЕНИЕ: Запланированные расходы корректируют annual_growth
-                        savings, annual_growth, debt_increase = handle_savings_withdrawal(savings, annual_growth, expense['amount'])
-                        debt += debt_increase
-                        planned_expenses_history.append((month, expense['amount'], expense['name']))
-                        planned_completed[i] = True
+                    expense = plan_expenses[i]
+                    # ИСПРАВЛЕНИЕ: Запланированные расходы корректируют annual_growth
+                    savings, annual_growth, debt_increase = withdraw_savings(savings, annual_growth, expense['amount'])
+                    debt += debt_increase
+                    purchase_scenario.append(idx)
+                    purchase_month.append(month)
+                    purchase_expense.append(i)
+                    planned_by_month.setdefault(month, []).append(expense['amount'])
+                    if trace is not None:
+                        trace.event(month, 'purchase', expense['amount'], name=expense['name'])
+            if profiling:
+                profiler.lap('planned_expenses')
             
             # Новая метрика: Если шок >0, рассчитываем %
             shock_total = emergency_cost + loss
@@ -1050,8 +1145,8 @@ def run_simulation(plan_id, plan_data):
             
             # Формирование активов - сначала подушка, потом savings
             if available > 0:
-                if cushion < CUSHION_AMOUNT:
-                    cushion_need = min(available, CUSHION_AMOUNT - cushion)
+                if cushion < cushion_amount:
+                    cushion_need = min(available, cushion_amount - cushion)
                     cushion += cushion_need
                     available -= cushion_need
                     contribution_type = 'positive' if available > 0 else ('positive' if cushion_need > 0 else 'zero')
@@ -1069,11 +1164,11 @@ def run_simulation(plan_id, plan_data):
                     deficit -= cushion
                     cushion = 0
                     # Изъятие из savings с корректировкой annual_growth
-                    savings, annual_growth, debt_increase = handle_savings_withdrawal(savings, annual_growth, deficit)
+                    savings, annual_growth, debt_increase = withdraw_savings(savings, annual_growth, deficit)
                     debt += debt_increase
                 else:
                     # Изъятие только из savings
-                    savings, annual_growth, debt_increase = handle_savings_withdrawal(savings, annual_growth, deficit)
+                    savings, annual_growth, debt_increase = withdraw_savings(savings, annual_growth, deficit)
                     debt += debt_increase
                 contribution_type = 'zero'
             else:
@@ -1081,90 +1176,61 @@ def run_simulation(plan_id, plan_data):
             
             # Погашение долга из активов в конце месяца (сначала cushion, потом savings)
             if debt > 0:
-                if cushion > 0:
-                    repayment = min(cushion, debt)
-                    cushion -= repayment
-                    debt -= repayment
-                elif savings > 0:
-                    repayment = min(savings, debt)
-                    # ИСПРАВЛЕНИЕ: Корректируем annual_growth при погашении долга
-                    savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, repayment)
-                    debt -= repayment
+                cushion, savings, annual_growth, debt = repay_from_assets(cushion, savings, annual_growth, debt)
             
             # Денежный поток
             cash_flow = current_income - current_expenses - loss - emergency_cost
             scenario_cash_flow += cash_flow
+            if profiling:
+                profiler.lap('cash_flow')
             
             # Уплата налога (в конце года)
             if month % 12 == 0 and annual_growth > 0:
-                tax_payment = annual_growth * TAX_RATE
                 # ВАЛИДАЦИЯ: Проверяем состояние перед выплатой налога
                 if DEBUG_VALIDATION:
+                    if profiling:
+                        profiler.lap('tax')
                     validate_financial_state(savings, annual_growth, f"Plan {plan_id}, scenario {scenario}, month {month} - before tax")
+                    if profiling:
+                        profiler.lap('validation')
+                
+                if trace is not None:
+                    trace.event(month, 'tax', annual_growth * tax_rate, base=annual_growth)
                 
                 # ИСПРАВЛЕНИЕ: Выплата налога корректирует annual_growth
-                if savings >= tax_payment:
-                    savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, tax_payment)
-                else:
-                    savings, annual_growth, debt_increase = handle_savings_withdrawal(savings, annual_growth, tax_payment)
-                    debt += debt_increase
+                savings, annual_growth, debt_increase = settle_tax(savings, annual_growth, tax_rate)
+                debt += debt_increase
                 
                 # ВАЛИДАЦИЯ: Проверяем состояние после выплаты налога
                 if DEBUG_VALIDATION:
+                    if profiling:
+                        profiler.lap('tax')
                     validate_financial_state(savings, annual_growth, f"Plan {plan_id}, scenario {scenario}, month {month} - after tax")
+                    if profiling:
+                        profiler.lap('validation')
                 
                 # Погашение долга из активов после налога (сначала cushion, потом savings)
                 if debt > 0:
-                    if cushion > 0:
-                        repayment = min(cushion, debt)
-                        cushion -= repayment
-                        debt -= repayment
-                    elif savings > 0:
-                        repayment = min(savings, debt)
-                        # ИСПРАВЛЕНИЕ: Корректируем annual_growth при погашении долга
-                        savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, repayment)
-                        debt -= repayment
+                    cushion, savings, annual_growth, debt = repay_from_assets(cushion, savings, annual_growth, debt)
+            if profiling:
+                profiler.lap('tax')
             
             # ВИРТУАЛЬНЫЙ СЦЕНАРИЙ (параллельно)
             
             # Погашение долга из активов в начале месяца
             if virtual_debt > 0:
-                if virtual_cushion > 0:
-                    virtual_repayment = min(virtual_cushion, virtual_debt)
-                    virtual_cushion -= virtual_repayment
-                    virtual_debt -= virtual_repayment
-                elif virtual_savings > 0:
-                    virtual_repayment = min(virtual_savings, virtual_debt)
-                    # ИСПРАВЛЕНИЕ: Виртуальный сценарий тоже использует корректировку
-                    virtual_savings, virtual_annual_growth, _ = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, virtual_repayment)
-                    virtual_debt -= virtual_repayment
+                virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt = repay_from_assets(virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt)
             
             # Полная система управления долгом (как в реальном)
             if virtual_debt > 0:
-                annual_income = current_income * 12
-                restructuring_threshold = annual_income * RESTRUCTURING_THRESHOLD_RATIO
-                bankruptcy_threshold = annual_income * BANKRUPTCY_THRESHOLD_RATIO
-                
-                if virtual_debt > bankruptcy_threshold:
-                    virtual_debt = 0
-                    virtual_cushion = 0
-                    virtual_savings = 0
-                    virtual_annual_growth = 0  # ИСПРАВЛЕНИЕ
-                    virtual_is_restructured = False
-                elif virtual_debt > restructuring_threshold:
-                    if not virtual_is_restructured:
-                        virtual_is_restructured = True
-                    virtual_debt_interest = virtual_debt * (DEBT_INTEREST_RATE * 0.5)
-                    virtual_debt += virtual_debt_interest
-                else:
-                    if virtual_is_restructured:
-                        virtual_is_restructured = False
-                    virtual_debt_interest = virtual_debt * DEBT_INTEREST_RATE
-                    virtual_debt += virtual_debt_interest
+                (virtual_debt, virtual_cushion, virtual_savings, virtual_annual_growth,
+                 virtual_is_restructured, _) = accrue_debt(virtual_debt, virtual_cushion, virtual_savings,
+                                                           virtual_annual_growth, virtual_is_restructured,
+                                                           current_income, cfg)
             
             # Рост по идеальной доходности (только savings)
             if virtual_savings > 0:
-                virtual_growth = virtual_savings * IDEAL_RETURN_RATE
+                virtual_growth = virtual_savings * ideal_return_rate
                 virtual_annual_growth += virtual_growth
                 virtual_savings += virtual_growth
             
@@ -1179,8 +1245,8 @@ def run_simulation(plan_id, plan_data):
             
             # Формирование активов
             if virtual_available > 0:
-                if virtual_cushion < CUSHION_AMOUNT:
-                    cushion_need = min(virtual_available, CUSHION_AMOUNT - virtual_cushion)
+                if virtual_cushion < cushion_amount:
+                    cushion_need = min(virtual_available, cushion_amount - virtual_cushion)
                     virtual_cushion += cushion_need
                     virtual_available -= cushion_need
                 
@@ -1194,119 +1260,116 @@ def run_simulation(plan_id, plan_data):
                 elif virtual_cushion > 0:
                     deficit -= virtual_cushion
                     virtual_cushion = 0
-                    virtual_savings, virtual_annual_growth, virtual_debt_increase = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, deficit)
+                    virtual_savings, virtual_annual_growth, virtual_debt_increase = withdraw_savings(virtual_savings, virtual_annual_growth, deficit)
                     virtual_debt += virtual_debt_increase
                 else:
-                    virtual_savings, virtual_annual_growth, virtual_debt_increase = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, deficit)
+                    virtual_savings, virtual_annual_growth, virtual_debt_increase = withdraw_savings(virtual_savings, virtual_annual_growth, deficit)
                     virtual_debt += virtual_debt_increase
             
             # КЛЮЧЕВОЕ: Синхронизированные траты из реального сценария
-            for planned_month, planned_amount, planned_name in planned_expenses_history:
-                if planned_month == month:
-                    # ИСПРАВЛЕНИЕ: Виртуальный сценарий тоже корректирует annual_growth
-                    virtual_savings, virtual_annual_growth, virtual_debt_increase = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, planned_amount)
-                    virtual_debt += virtual_debt_increase
+            # ОПТИМИЗИРОВАНО: покупки месяца - по ключу, без перебора всей истории
+            for planned_amount in planned_by_month.get(month, ()):
+                # ИСПРАВЛЕНИЕ: Виртуальный сценарий тоже корректирует annual_growth
+                virtual_savings, virtual_annual_growth, virtual_debt_increase = withdraw_savings(virtual_savings, virtual_annual_growth, planned_amount)
+                virtual_debt += virtual_debt_increase
             
             # Погашение долга в конце месяца
             if virtual_debt > 0:
-                if virtual_cushion > 0:
-                    virtual_repayment = min(virtual_cushion, virtual_debt)
-                    virtual_cushion -= virtual_repayment
-                    virtual_debt -= virtual_repayment
-                elif virtual_savings > 0:
-                    virtual_repayment = min(virtual_savings, virtual_debt)
-                    # ИСПРАВЛЕНИЕ: Корректируем annual_growth при погашении долга
-                    virtual_savings, virtual_annual_growth, _ = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, virtual_repayment)
-                    virtual_debt -= virtual_repayment
+                virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt = repay_from_assets(virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt)
             
             # Уплата налога (в конце года)
             if month % 12 == 0 and virtual_annual_growth > 0:
-                virtual_tax_payment = virtual_annual_growth * TAX_RATE
                 # ВАЛИДАЦИЯ: Проверяем виртуальное состояние перед выплатой налога
                 if DEBUG_VALIDATION:
+                    if profiling:
+                        profiler.lap('virtual')
                     validate_financial_state(virtual_savings, virtual_annual_growth, f"Plan {plan_id}, scenario {scenario}, month {month} - virtual before tax")
+                    if profiling:
+                        profiler.lap('validation')
                 
                 # ИСПРАВЛЕНИЕ: Виртуальный сценарий тоже корректирует annual_growth при выплате налога
-                if virtual_savings >= virtual_tax_payment:
-                    virtual_savings, virtual_annual_growth, _ = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, virtual_tax_payment)
-                else:
-                    virtual_savings, virtual_annual_growth, virtual_debt_increase = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, virtual_tax_payment)
-                    virtual_debt += virtual_debt_increase
+                virtual_savings, virtual_annual_growth, virtual_debt_increase = settle_tax(virtual_savings, virtual_annual_growth, tax_rate)
+                virtual_debt += virtual_debt_increase
                 
                 # ВАЛИДАЦИЯ: Проверяем виртуальное состояние после выплаты налога
                 if DEBUG_VALIDATION:
+                    if profiling:
+                        profiler.lap('virtual')
                     validate_financial_state(virtual_savings, virtual_annual_growth, f"Plan {plan_id}, scenario {scenario}, month {month} - virtual after tax")
+                    if profiling:
+                        profiler.lap('validation')
                 
                 # Погашение долга после налога
                 if virtual_debt > 0:
-                    if virtual_cushion > 0:
-                        virtual_repayment = min(virtual_cushion, virtual_debt)
-                        virtual_cushion -= virtual_repayment
-                        virtual_debt -= virtual_repayment
-                    elif virtual_savings > 0:
-                        virtual_repayment = min(virtual_savings, virtual_debt)
-                        virtual_savings, virtual_annual_growth, _ = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, virtual_repayment)
-                        virtual_debt -= virtual_repayment
+                    virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt = repay_from_assets(virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt)
+            if profiling:
+                profiler.lap('virtual')
             
             # Обновление счетчиков
-            for years in HORIZONS:
+            for years in horizons:
                 if month <= years * 12:
                     if contribution_type == 'zero':
                         horizon_counters[years]['zero'] += 1
             
-            # Сохранение истории долга для каждого горизонта
-            debt_history.append(debt)
+            # Накопители статистики долга (месяцы без долга их не меняют)
+            if debt > 0:
+                max_debt = max(max_debt, debt)
+                months_with_debt += 1
+                debt_sum += debt
+            
+            # НОВОЕ: Время до событий. Истощение подушки - падение ниже цели после того,
+            # как она была полна (первичное накопление не считается); восстановление -
+            # возврат к цели. Финальное погашение на горизонте подушку не меняет:
+            # долг после погашения в конце месяца остается только при пустой подушке
+            if debt > 0 and not first_debt_month:
+                first_debt_month = month
+            if cushion < cushion_amount:
+                if cushion_full:
+                    cushion_full = False
+                    depleted_since = month
+                    if not first_depletion_month:
+                        first_depletion_month = month
+            elif not cushion_full:
+                cushion_full = True
+                if depleted_since:
+                    if depleted_since == first_depletion_month:
+                        first_recovery_months = month - depleted_since
+                    max_depletion_months = max(max_depletion_months, month - depleted_since)
+                    depleted_since = 0
             
             # Фиксация результатов
-            for years in HORIZONS:
-                if month == years * 12:
-                    # Финальное погашение долга из активов в конце периода (сначала cushion, потом savings)
-                    if debt > 0:
-                        if cushion > 0:
-                            repayment = min(cushion, debt)
-                            cushion -= repayment
-                            debt -= repayment
-                        if debt > 0 and savings > 0:
-                            repayment = min(savings, debt)
-                            # ИСПРАВЛЕНИЕ: Финальное погашение тоже корректирует annual_growth
-                            savings, annual_growth, _ = handle_savings_withdrawal(savings, annual_growth, repayment)
-                            debt -= repayment
-                    
-                    # Финальное погашение долга для виртуального сценария
-                    if virtual_debt > 0:
-                        if virtual_cushion > 0:
-                            virtual_repayment = min(virtual_cushion, virtual_debt)
-                            virtual_cushion -= virtual_repayment
-                            virtual_debt -= virtual_repayment
-                        if virtual_debt > 0 and virtual_savings > 0:
-                            virtual_repayment = min(virtual_savings, virtual_debt)
-                            virtual_savings, virtual_annual_growth, _ = handle_savings_withdrawal(virtual_savings, virtual_annual_growth, virtual_repayment)
-                            virtual_debt -= virtual_repayment
-                    
+            # ОПТИМИЗИРОВАНО: финальное погашение выполняется на всех горизонтах конфигурации
+            # (оно меняет состояние и влияет на следующие горизонты), а статистика
+            # собирается только для запрошенных горизонтов
+            if month in snapshot_months:
+                # Финальное погашение долга из активов в конце периода (сначала cushion, потом savings)
+                if debt > 0:
+                    cushion, savings, annual_growth, debt = repay_from_assets(cushion, savings, annual_growth, debt, both_sources=True)
+                
+                # Финальное погашение долга для виртуального сценария
+                if virtual_debt > 0:
+                    virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt = repay_from_assets(virtual_cushion, virtual_savings, virtual_annual_growth, virtual_debt, both_sources=True)
+                
+                years = month // 12
+                if years in results_by_horizon:
                     horizon_data = results_by_horizon[years]
                     # Общие активы = подушка + сбережения
                     total_wealth = cushion + savings
-                    horizon_data['net_wealth'][scenario] = total_wealth - debt
-                    horizon_data['final_debt'][scenario] = debt
+                    horizon_data['net_wealth'][idx] = total_wealth - debt
+                    horizon_data['final_debt'][idx] = debt
                     horizon_data['total_cash_flow'] += scenario_cash_flow
-                    horizon_data['minor_emergencies'][scenario] = minor_em_count
-                    horizon_data['medium_emergencies'][scenario] = medium_em_count
-                    horizon_data['major_emergencies'][scenario] = major_em_count
-                    horizon_data['months_zero'][scenario] = horizon_counters[years]['zero']
+                    horizon_data['minor_emergencies'][idx] = minor_em_count
+                    horizon_data['medium_emergencies'][idx] = medium_em_count
+                    horizon_data['major_emergencies'][idx] = major_em_count
+                    horizon_data['months_zero'][idx] = horizon_counters[years]['zero']
                     # Добавляем shock_pcts_scenario в общий list (копируем, чтобы не мутировать)
                     horizon_data['shock_pcts'].extend(shock_pcts_scenario[:years*12])  # Только до horizon месяцев
                     
                     # Расчет прямых потерь для каждого горизонта
                     horizon_months = years * 12
-                    horizon_direct_losses = sum(amount for month_shock, amount, shock_type in shock_history 
-                                               if month_shock <= horizon_months) / 1000000  # в млн
+                    horizon_direct_losses = direct_losses_total / 1000000  # в млн
                     horizon_data['scenarios_direct_losses'].append(horizon_direct_losses)
                     
-                    # Расчет запланированных расходов для каждого горизонта
-                    horizon_planned_expenses = sum(amount for month_exp, amount, name in planned_expenses_history
-                                                  if month_exp <= horizon_months) / 1000000  # в млн
-                    horizon_data['scenarios_planned_expenses'].append(horizon_planned_expenses)
-                    
                     # НОВОЕ: Правильный расчет потерь компаундинга через виртуальный сценарий
                     virtual_total_wealth = virtual_cushion + virtual_savings
                     virtual_net_wealth = virtual_total_wealth - virtual_debt
@@ -1317,108 +1380,638 @@ def run_simulation(plan_id, plan_data):
                     compounding_loss = max(0, compounding_loss)  # не может быть отрицательной
                     horizon_data['scenarios_compounding_loss'].append(compounding_loss)
                     
-                    # ИСПРАВЛЕНО: правильный расчет потери компаундинга от запланированных расходов
-                    planned_compounding_loss = 0
-                    for month_exp, amount, name in planned_expenses_history:
-                        if month_exp <= horizon_months:
-                            # Сколько месяцев осталось от момента покупки до конца горизонта
-                            remaining_months = horizon_months - month_exp
-                            if remaining_months > 0:
-                                # Потеря компаундинга = сколько бы выросли эти деньги за оставшееся время
-                                compounding_growth = amount * ((1 + SAVINGS_RETURN_RATE) ** remaining_months - 1)
-                                planned_compounding_loss += compounding_growth
-                    
-                    horizon_data['scenarios_planned_compounding_loss'].append(planned_compounding_loss / 1000000)  # в млн
-                    
-                    # Статистика по типам запланированных расходов
-                    for month_exp, amount, name in planned_expenses_history:
-                        if month_exp <= horizon_months:
-                            if name in horizon_data['planned_expenses_stats']:
-                                horizon_data['planned_expenses_stats'][name]['count'] += 1
-                                horizon_data['planned_expenses_stats'][name]['total_amount'] += amount
-                    
-                    # Расчет статистики по долгу для данного горизонта
-                    horizon_debt_history = debt_history[:horizon_months]
-                    
-                    # Максимальный долг за период
-                    horizon_data['max_debt'][scenario] = max(horizon_debt_history) if horizon_debt_history else 0
-                    
-                    # Количество месяцев в долгу
-                    months_with_debt = sum(1 for debt_amount in horizon_debt_history if debt_amount > 0)
-                    horizon_data['months_in_debt'][scenario] = months_with_debt
+                    # Статистика по долгу для данного горизонта - накопители на его месяц
+                    horizon_data['max_debt'][idx] = max_debt
+                    horizon_data['months_in_debt'][idx] = months_with_debt
                     
                     # Общая сумма процентов за период (пропорционально)
-                    if N_MONTHS > 0:
-                        horizon_interest_paid = total_interest_paid * (horizon_months / N_MONTHS)
+                    if cfg.n_months > 0:
+                        horizon_interest_paid = total_interest_paid * (horizon_months / cfg.n_months)
                     else:
                         horizon_interest_paid = 0
-                    horizon_data['total_interest_paid'][scenario] = horizon_interest_paid
+                    horizon_data['total_interest_paid'][idx] = horizon_interest_paid
                     
                     # Средний размер долга (когда он был)
                     if months_with_debt > 0:
-                        debt_sum = sum(debt_amount for debt_amount in horizon_debt_history if debt_amount > 0)
-                        horizon_data['avg_debt_when_in_debt'][scenario] = debt_sum / months_with_debt
+                        horizon_data['avg_debt_when_in_debt'][idx] = debt_sum / months_with_debt
                     else:
-                        horizon_data['avg_debt_when_in_debt'][scenario] = 0
+                        horizon_data['avg_debt_when_in_debt'][idx] = 0
                     
                     # События управления долгом
-                    horizon_data['restructuring_events'][scenario] = restructuring_count
-                    horizon_data['bankruptcy_events'][scenario] = bankruptcy_count
+                    horizon_data['restructuring_events'][idx] = restructuring_count
+                    horizon_data['bankruptcy_events'][idx] = bankruptcy_count
                     
                     # Месяцев в реструктуризации (пропорционально для горизонта)
-                    if N_MONTHS > 0:
-                        horizon_months_restructuring = months_restructuring * (horizon_months / N_MONTHS)
+                    if cfg.n_months > 0:
+                        horizon_months_restructuring = months_restructuring * (horizon_months / cfg.n_months)
                     else:
                         horizon_months_restructuring = 0
-                    horizon_data['months_in_restructuring'][scenario] = horizon_months_restructuring
-        
-        if (scenario + 1) % 200 == 0:  # Прогресс каждые 200 сценариев для 1000 всего
-            elapsed = time.time() - start_time
-            progress = (scenario + 1) / N_SCENARIOS * 100
-            print(f"  {scenario+1}/{N_SCENARIOS} ({progress:.0f}%) - {elapsed:.1f} сек")
+                    horizon_data['months_in_restructuring'][idx] = horizon_months_restructuring
+                    
+                    # НОВОЕ: Время до событий (незавершенное истощение подушки - до горизонта)
+                    horizon_data['first_debt_month'][idx] = first_debt_month
+                    horizon_data['first_restructuring_month'][idx] = first_restructuring_month
+                    horizon_data['first_bankruptcy_month'][idx] = first_bankruptcy_month
+                    horizon_data['first_cushion_depletion_month'][idx] = first_depletion_month
+                    horizon_data['first_cushion_recovery_months'][idx] = first_recovery_months
+                    horizon_data['max_cushion_depletion_months'][idx] = max(
+                        max_depletion_months, month - depleted_since if depleted_since else 0)
+            if trace is not None:
+                trace.record(month, cushion, savings, debt, virtual_cushion, virtual_savings, virtual_debt,
+                             current_income, current_expenses, emergency_cost, loss, annual_growth, is_restructured)
+            if profiling:
+                profiler.lap('horizons')
+        
+        if observer is not None and (scenario + 1) % progress_interval == 0:
+            observer.on_progress(make_progress_info(plan_id, scenario + 1, progress_total, start_time, VALIDATION_STATS))
+    
+    _record_planned_expenses(results_by_horizon, plan_expenses, scenario_stop - scenario_start,
+                             purchase_scenario, purchase_month, purchase_expense, savings_growth_factors)
+    if profiling:
+        profiler.lap('horizons')
+    return results_by_horizon
+
+
+def _trace_quiet_months(trace, month, quiet_months, cushion, savings, annual_growth, debt, virtual_cushion,
+                        virtual_savings, virtual_annual_growth, virtual_debt, income, expenses, sim_config):
+    """
+    Траектория отрезка, пропущенного skip_quiet_months: savings на конец каждого
+    месяца - та же закрытая формула на k = 1..quiet_months месяцев (подушки и долг
+    на отрезке не меняются, шоков нет)
+    """
+    contribution = income - expenses
+    for k in range(1, quiet_months + 1):
+        quiet_savings, quiet_growth = skip_quiet_months(savings, annual_growth, contribution, k,
+                                                        sim_config.savings_return_rate,
+                                                        sim_config.savings_growth_factors)
+        trace.record(month + k - 1, cushion, quiet_savings, debt, virtual_cushion,
+                     skip_quiet_months(virtual_savings, virtual_annual_growth, contribution, k,
+                                       sim_config.ideal_return_rate, sim_config.ideal_growth_factors)[0],
+                     virtual_debt, income, expenses, 0, 0, quiet_growth, False)
+
+
+def _record_planned_expenses(results_by_horizon, plan_expenses, n, purchase_scenario, purchase_month,
+                             purchase_expense, growth_factors):
+    """
+    ВЕКТОРИЗОВАНО: Запланированные расходы и потеря компаундинга от них по горизонтам
+
+    Одно выражение над массивами покупок всех сценариев вместо цикла по истории
+    каждого сценария: потеря компаундинга покупки = сумма * (growth_factors[оставшиеся
+    месяцы] - 1), np.bincount суммирует покупки сценария в хронологическом порядке
+    (как поэлементное сложение в цикле).
+
+    Args:
+        n: число сценариев диапазона
+        purchase_scenario, purchase_month, purchase_expense: массивы событий покупок
+        growth_factors: таблица (1 + savings_return_rate) ** k (SimulationConfig.savings_growth_factors)
+    """
+    purchase_scenario = np.asarray(purchase_scenario, dtype=np.int64)
+    purchase_month = np.asarray(purchase_month, dtype=np.int64)
+    amounts = np.array([expense['amount'] for expense in plan_expenses], dtype=np.float64)
+    purchase_amount = amounts[np.asarray(purchase_expense, dtype=np.int64)]
+    # Одинаковые названия расходов делят одну строку статистики (как ключи словаря)
+    names = list(dict.fromkeys(expense['name'] for expense in plan_expenses))
+    name_index = [names.index(expense['name']) for expense in plan_expenses]
+    purchase_name = np.array([name_index[i] for i in purchase_expense], dtype=np.int64)
+    growth_factors = np.asarray(growth_factors)
+    # Месяц покупки (сценарии × расходы плана); каждый расход срабатывает в сценарии не более раза
+    expense_month = np.zeros((n, len(plan_expenses)), dtype=np.int16)
+    expense_month[purchase_scenario, np.asarray(purchase_expense, dtype=np.int64)] = purchase_month
+    
+    for years, horizon_data in results_by_horizon.items():
+        horizon_months = years * 12
+        bought = purchase_month <= horizon_months
+        scenario = purchase_scenario[bought]
+        amount = purchase_amount[bought]
+        remaining_months = horizon_months - purchase_month[bought]
+        
+        horizon_data['scenarios_planned_expenses'] = (np.bincount(scenario, weights=amount, minlength=n) / 1000000).tolist()
+        # Потеря компаундинга = сколько бы выросли эти деньги за оставшееся время
+        compounding_growth = amount * (growth_factors[remaining_months] - 1)
+        horizon_data['scenarios_planned_compounding_loss'] = (
+            np.bincount(scenario, weights=compounding_growth, minlength=n) / 1000000).tolist()  # в млн
+        
+        # Статистика по типам запланированных расходов
+        counts = np.bincount(purchase_name[bought], minlength=len(names))
+        totals = np.bincount(purchase_name[bought], weights=amount, minlength=len(names))
+        for k, name in enumerate(names):
+            if counts[k]:
+                stats = horizon_data['planned_expenses_stats'][name]
+                stats['count'] += int(counts[k])
+                stats['total_amount'] += totals[k].item()
+        horizon_data['planned_expense_months'] = first_expense_months(expense_month, plan_expenses, horizon_months)
+
+
+def first_expense_months(expense_month, plan_expenses, horizon_months):
+    """
+    НОВАЯ ФУНКЦИЯ: Месяц первой покупки по названиям расходов к горизонту
+
+    Args:
+        expense_month: месяц покупки (сценарии × расходы плана), 0 = не было
+        horizon_months: последний месяц горизонта (поздние покупки не учитываются)
+
+    Returns:
+        np.ndarray: (сценарии × названия расходов) int16; одинаковые названия -
+                    самая ранняя из покупок, как в planned_expenses_stats
+    """
+    names = list(dict.fromkeys(expense['name'] for expense in plan_expenses))
+    first = np.zeros((expense_month.shape[0], len(names)), dtype=np.int16)
+    for e, expense in enumerate(plan_expenses):
+        months = np.where(expense_month[:, e] <= horizon_months, expense_month[:, e], 0)
+        column = first[:, names.index(expense['name'])]
+        column[:] = np.where((column == 0) | ((months > 0) & (months < column)), months, column)
+    return first
+
+
+def merge_scenario_results(parts):
+    """
+    НОВАЯ ФУНКЦИЯ: Объединяет сырые результаты диапазонов сценариев (в порядке диапазонов)
+    """
+    merged = {}
+    for years in parts[0]:
+        horizon_parts = [part[years] for part in parts]
+        horizon_data = {}
+        for key, value in horizon_parts[0].items():
+            if isinstance(value, np.ndarray):
+                horizon_data[key] = np.concatenate([hp[key] for hp in horizon_parts])
+            elif isinstance(value, list):
+                horizon_data[key] = [item for hp in horizon_parts for item in hp[key]]
+            elif key == 'planned_expenses_stats':
+                horizon_data[key] = {name: {
+                    'count': sum(hp[key][name]['count'] for hp in horizon_parts),
+                    'total_amount': sum(hp[key][name]['total_amount'] for hp in horizon_parts),
+                } for name in value}
+            else:
+                horizon_data[key] = sum(hp[key] for hp in horizon_parts)
+        merged[years] = horizon_data
+    return merged
+
+
+def _simulate_shard(plan_id, plan_data, scenario_start, scenario_stop, horizons, seed, anomaly_log_file, profile,
+                    sim_config=None, trajectory_samples=0):
+    """
+    Точка входа воркера: считает диапазон сценариев в отдельном процессе
+    trajectory_samples - размер резервуара траекторий диапазона (0 = без траекторий)
+
+    Returns:
+        tuple: (сырые результаты, (проверок, аномалий), профиль или None, траектории выборки)
+    """
+    # Дочерний процесс (spawn) не видит значений, выставленных в main
+    config.ANOMALY_LOG_FILE = anomaly_log_file
+    VALIDATION_STATS['total_checks'] = 0
+    VALIDATION_STATS['total_anomalies'] = 0
+    VALIDATION_STATS['anomaly_details'] = []
+    
+    profiler = None
+    if profile:
+        from profiling import PhaseProfiler
+        profiler = PhaseProfiler(plan_id)
+    
+    reservoir = _trajectory_reservoir(trajectory_samples, seed, horizons, sim_config)
+    raw = simulate_scenarios(plan_id, plan_data, scenario_start, scenario_stop, horizons, seed, profiler=profiler,
+                             sim_config=sim_config, reservoir=reservoir)
+    if profiler is not None:
+        profiler.stop()
+    validation = (VALIDATION_STATS['total_checks'], VALIDATION_STATS['total_anomalies'])
+    traces = reservoir.traces() if reservoir is not None else []
+    return raw, validation, profiler.as_dict() if profiler is not None else None, traces
+
+
+def _simulate_shard_shared(block_descriptor, plan_id, plan_data, scenario_start, scenario_stop, horizons, seed,
+                           anomaly_log_file, profile, sim_config=None, trajectory_samples=0):
+    """
+    НОВОЕ: Точка входа воркера с записью показателей по сценариям в общую память
+
+    Returns:
+        tuple: (остаток сырых результатов без SCENARIO_FIELDS, (проверок, аномалий), профиль или None,
+                траектории выборки)
+    """
+    raw, validation, shard_profile, traces = _simulate_shard(plan_id, plan_data, scenario_start, scenario_stop,
+                                                             horizons, seed, anomaly_log_file, profile, sim_config,
+                                                             trajectory_samples)
+    block = SharedResultsBlock.attach(block_descriptor)
+    try:
+        rest = block.write(raw, scenario_start)
+    finally:
+        block.close()
+    return rest, validation, shard_profile, traces
+
+
+def _trajectory_reservoir(trajectory_samples, seed, horizons, sim_config=None):
+    """Резервуар траекторий на trajectory_samples сценариев (None при 0)"""
+    if not trajectory_samples:
+        return None
+    cfg = resolve_config(sim_config)
+    if seed is None:
+        seed = cfg.random_seed
+    return TrajectoryReservoir(trajectory_samples, seed, max(normalize_horizons(horizons, cfg)) * 12)
+
+
+def _trace_scenario(plan_id, plan_data, scenario, horizons=None, seed=None, sim_config=None):
+    """
+    Повторный расчет одного сценария с записью траектории
+
+    Сценарий считается на своем потоке случайных чисел, поэтому траектория
+    совпадает с массовым расчетом. Счетчики валидации повторного расчета не учитываются.
+
+    Returns:
+        ScenarioTrace
+    """
+    cfg = resolve_config(sim_config)
+    if seed is None:
+        seed = cfg.random_seed
+    reservoir = TrajectoryReservoir(1, seed, max(normalize_horizons(horizons, cfg)) * 12)
+    checks, anomalies = VALIDATION_STATS['total_checks'], VALIDATION_STATS['total_anomalies']
+    n_details = len(VALIDATION_STATS['anomaly_details'])
+    simulate_scenarios(plan_id, plan_data, scenario, scenario + 1, horizons, seed, sim_config=cfg,
+                       reservoir=reservoir)
+    VALIDATION_STATS['total_checks'], VALIDATION_STATS['total_anomalies'] = checks, anomalies
+    del VALIDATION_STATS['anomaly_details'][n_details:]
+    return reservoir.traces()[0]
+
+
+def replay_scenario(plan_id, scenario_index, plan_data=None, horizons=None, seed=None, sim_config=None,
+                    stream_id=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Повторный расчет одного сценария массового расчета по номеру
+
+    У каждого сценария свой поток случайных чисел, поэтому сценарий scenario_index
+    пересчитывается отдельно за O(месяцы) и совпадает с массовым расчетом побитово
+    (при тех же seed, горизонтах и конфигурации). Траектория содержит помесячные
+    доходы, расходы, шоки, налоговую базу, стадию долга и виртуальный сценарий,
+    журнал - ЧП, потери дохода, покупки, налог, реструктуризации и банкротства.
+
+    Args:
+        plan_id: идентификатор плана
+        scenario_index: номер сценария (>= 0; верхней границы нет - сценарию нужен
+                        только его поток случайных чисел)
+        plan_data: данные плана (None = план plan_id из конфигурации)
+        seed, stream_id: seed и поток случайных чисел расчета (results.random_stream);
+                         None - sim_config.random_seed и поток плана plan_id
+                         (для общих случайных чисел - config.COMMON_STREAM_ID)
+
+    Returns:
+        ScenarioTrace
+    """
+    cfg = resolve_config(sim_config)
+    if plan_data is None:
+        if plan_id not in cfg.plans:
+            raise ValueError(f"Неизвестный план '{plan_id}'")
+        plan_data = cfg.plans[plan_id]
+    if scenario_index < 0:
+        raise ValueError(f"Номер сценария {scenario_index} не может быть отрицательным")
+    stream_id = plan_id if stream_id is None else stream_id
+    return _trace_scenario(stream_id, plan_data, int(scenario_index), horizons, seed, cfg)
+
+
+def check_replay(plan_id, results, scenarios, plan_data=None, horizons=None, seed=None, sim_config=None,
+                 stream_id=None):
+    """
+    Самопроверка replay_scenario: сравнение траекторий с результатами массового расчета
+    seed и stream_id (None) берутся из results.random_stream
+
+    На каждом горизонте results сравниваются чистые активы, итоговый долг, число
+    ЧП по категориям, реструктуризаций и банкротств (точное равенство).
+
+    Returns:
+        list: расхождения (scenario, years, показатель, массовый расчет, повтор); пустой - все совпало
+    """
+    if results.random_stream is not None:
+        if seed is None:
+            seed = results.random_stream[0]
+        if stream_id is None:
+            stream_id = results.random_stream[1]
+    mismatches = []
+    for scenario in scenarios:
+        trace = replay_scenario(plan_id, scenario, plan_data, horizons, seed, sim_config, stream_id)
+        net_wealth, debt = trace.net_wealth, trace.field('debt')
+        for years, horizon_data in results.items():
+            month = years * 12
+            events = [event for event in trace.events if event['month'] <= month]
+            replayed = {
+                'net_wealth': net_wealth[month - 1],
+                'final_debt': debt[month - 1],
+                'minor_emergencies': sum(event.get('minor', 0) for event in events),
+                'medium_emergencies': sum(event.get('medium', 0) for event in events),
+                'major_emergencies': sum(event.get('major', 0) for event in events),
+                'restructuring_events': sum(event['type'] == 'restructuring' for event in events),
+                'bankruptcy_events': sum(event['type'] == 'bankruptcy' for event in events),
+            }
+            for metric, value in replayed.items():
+                if horizon_data[metric][scenario] != value:
+                    mismatches.append((scenario, years, metric, horizon_data[metric][scenario], value))
+    return mismatches
+
+
+def sample_quantile_trajectories(plan_id, plan_data, results, quantiles=TRAJECTORY_QUANTILES, horizons=None,
+                                 seed=None, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Траектории сценариев на перцентилях итоговых чистых активов
+
+    Сценарий перцентиля q - элемент с рангом round(q / 100 * (n - 1)) среди чистых
+    активов последнего горизонта; его траектория пересчитывается отдельно
+    (O(месяцы) памяти на сценарий).
+
+    Returns:
+        dict: {перцентиль: ScenarioTrace}
+    """
+    final_wealth = np.asarray(results[max(results)]['net_wealth'])
+    order = np.argsort(final_wealth, kind='stable')
+    traces = {}
+    for q in quantiles:
+        scenario = int(order[int(round(q / 100 * (len(order) - 1)))])
+        traces[q] = _trace_scenario(plan_id, plan_data, scenario, horizons, seed, sim_config)
+    return traces
+
+
+def split_scenarios(n_scenarios, n_shards):
+    """Делит [0, n_scenarios) на n_shards непрерывных диапазонов"""
+    n_shards = max(1, min(n_shards, n_scenarios))
+    bounds = np.linspace(0, n_scenarios, n_shards + 1).astype(int)
+    return [(int(bounds[i]), int(bounds[i + 1])) for i in range(n_shards)]
+
+
+def compute_baselines(plan_data, horizons, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Идеальный и линейный сценарии для каждого горизонта
+    НОВОЕ: sim_config (SimulationConfig) - параметры модели (по умолчанию константы config)
+
+    Returns:
+        dict: {years: {'ideal_wealth': ..., 'linear_wealth': ...}}
+    """
+    baselines = {}
+    for years in horizons:
+        months = years * 12
+        baselines[years] = {
+            'ideal_wealth': calculate_ideal_scenario(plan_data, months, True, sim_config),
+            'linear_wealth': calculate_linear_scenario(plan_data, months, True, sim_config),
+        }
+    return baselines
+
+
+def run_simulation(plan_id, plan_data, profiler=None, observer=None, progress_interval=PROGRESS_INTERVAL,
+                   compute_mode_stats=True, horizons=None, n_scenarios=None, seed=None, executor=None,
+                   sim_config=None, trajectory_samples=None, checkpoint=None):
+    """
+    ВЕКТОРИЗОВАНО: добавлен батчевый менеджер случайных чисел для ускорения
+    ИСПРАВЛЕНО: Налогообложение фантомного роста
+    НОВОЕ: profiler (PhaseProfiler) - таймеры по фазам месячного шага, None = выключено
+    НОВОЕ: observer (SimulationObserver) получает прогресс каждые progress_interval
+           сценариев вместо печати в консоль; None = без вывода
+    НОВОЕ: compute_mode_stats=False пропускает KDE-моду (и импорт scipy);
+           ключи modal_* и prob_*_mode в результатах тогда отсутствуют
+    НОВОЕ: horizons - подмножество горизонтов конфигурации (остальные не считаются),
+           n_scenarios - число сценариев (по умолчанию sim_config.n_scenarios),
+           seed - seed потоков случайных чисел сценариев (по умолчанию sim_config.random_seed),
+           executor - пул процессов (concurrent.futures), по которому
+           распределяются диапазоны сценариев; None = расчет в текущем процессе
+    НОВОЕ: возвращает ScenarioResults (results[years] - словарь-представление горизонта)
+    НОВОЕ: sim_config (SimulationConfig) - параметры модели, передаются в воркеры,
+           базовые сценарии и итоговые статистики; None = константы config
+    НОВОЕ: trajectory_samples - K сценариев (резервуар) с полными траекториями и
+           журналом событий, плюс сценарии на перцентилях TRAJECTORY_QUANTILES итоговых
+           чистых активов -> results.trajectories; None = config.TRAJECTORY_SAMPLES, 0 = выключено
+    НОВОЕ: checkpoint (checkpoints.RunCheckpoint) - сценарии считаются диапазонами
+           контрольных точек: готовые диапазоны загружаются, новые сохраняются сразу
+           после расчета (результаты те же, что и без контрольных точек); None = выключено
+    """
+    cfg = resolve_config(sim_config)
+    horizons = normalize_horizons(horizons, cfg)
+    if n_scenarios is None:
+        n_scenarios = cfg.n_scenarios
+    if seed is None:
+        seed = cfg.random_seed
+    if trajectory_samples is None:
+        trajectory_samples = TRAJECTORY_SAMPLES
+    trace_parts = []
+    
+    start_time = time.time()
+    if observer is not None:
+        observer.on_plan_start(plan_id, plan_data)
+    
+    # НОВОЕ: Профилирование по фазам (при profiler=None - только проверка булевой переменной)
+    profiling = profiler is not None
+    if profiling:
+        profiler.start()
+    
+    # Расчет идеальных и линейных сценариев для запрошенных горизонтов
+    baselines = compute_baselines(plan_data, horizons, cfg)
+    if profiling:
+        profiler.lap('baselines')
+    
+    if executor is None and checkpoint is None:
+        reservoir = _trajectory_reservoir(trajectory_samples, seed, horizons, cfg)
+        results = ScenarioResults.from_raw(simulate_scenarios(
+            plan_id, plan_data, 0, n_scenarios, horizons, seed,
+            profiler=profiler, observer=observer, progress_interval=progress_interval,
+            start_time=start_time, progress_total=n_scenarios, sim_config=cfg, reservoir=reservoir
+        ))
+        if reservoir is not None:
+            trace_parts.append(reservoir.traces())
+    elif executor is None:
+        # НОВОЕ: Диапазоны контрольных точек по очереди в текущем процессе;
+        # сохраненные диапазоны загружаются, остальные считаются и сохраняются
+        parts = []
+        for chunk_start, chunk_stop in checkpoint.chunks(n_scenarios):
+            saved = checkpoint.load(plan_id, chunk_start, chunk_stop)
+            if saved is None:
+                checks, anomalies = VALIDATION_STATS['total_checks'], VALIDATION_STATS['total_anomalies']
+                reservoir = _trajectory_reservoir(trajectory_samples, seed, horizons, cfg)
+                # Профиль диапазона - отдельно, чтобы сохранить его в контрольной точке
+                chunk_profiler = None
+                if profiling:
+                    from profiling import PhaseProfiler
+                    chunk_profiler = PhaseProfiler(plan_id)
+                raw = simulate_scenarios(
+                    plan_id, plan_data, chunk_start, chunk_stop, horizons, seed,
+                    profiler=chunk_profiler, observer=observer, progress_interval=progress_interval,
+                    start_time=start_time, progress_total=n_scenarios, sim_config=cfg, reservoir=reservoir
+                )
+                chunk_profile = None
+                if profiling:
+                    chunk_profiler.stop()
+                    chunk_profile = chunk_profiler.as_dict()
+                    profiler.merge(chunk_profile)
+                traces = reservoir.traces() if reservoir is not None else []
+                checkpoint.save(plan_id, chunk_start, chunk_stop, (
+                    raw, (VALIDATION_STATS['total_checks'] - checks, VALIDATION_STATS['total_anomalies'] - anomalies),
+                    chunk_profile, traces))
+            else:
+                raw, (checks, anomalies), chunk_profile, traces = saved
+                VALIDATION_STATS['total_checks'] += checks
+                VALIDATION_STATS['total_anomalies'] += anomalies
+                if profiling and chunk_profile is not None:
+                    profiler.merge(chunk_profile)
+                if observer is not None:
+                    observer.on_progress(make_progress_info(plan_id, chunk_stop, n_scenarios, start_time,
+                                                            VALIDATION_STATS))
+            parts.append(raw)
+            trace_parts.append(traces)
+        results = ScenarioResults.from_raw(merge_scenario_results(parts))
+        if profiling:
+            profiler.start()
+    else:
+        # НОВОЕ: Диапазоны сценариев считаются в пуле процессов.
+        # Диапазонов больше, чем воркеров, - для равномерной загрузки и прогресса
+        if checkpoint is not None:
+            # НОВОЕ: с контрольными точками диапазоны не зависят от числа воркеров
+            shards = checkpoint.chunks(n_scenarios)
+        else:
+            n_workers = getattr(executor, '_max_workers', 1) or 1
+            n_shards = max(1, min(n_scenarios // max(1, progress_interval), n_workers * 4))
+            shards = split_scenarios(n_scenarios, max(n_shards, n_workers))
+        # НОВОЕ: показатели по сценариям воркеры пишут в общую память, через pickle - только остаток
+        block = SharedResultsBlock(horizons, n_scenarios) if SHARED_MEMORY_RESULTS else None
+        futures = {}
+        try:
+            parts = [None] * len(shards)
+            completed = 0
+            pending = []
+            for i, (shard_start, shard_stop) in enumerate(shards):
+                saved = checkpoint.load(plan_id, shard_start, shard_stop) if checkpoint is not None else None
+                if saved is None:
+                    pending.append(i)
+                    continue
+                # НОВОЕ: диапазон из контрольной точки - как будто его вернул воркер
+                raw, (checks, anomalies), shard_profile, traces = saved
+                parts[i] = block.write(raw, shard_start) if block is not None else raw
+                trace_parts.append(traces)
+                VALIDATION_STATS['total_checks'] += checks
+                VALIDATION_STATS['total_anomalies'] += anomalies
+                if profiling and shard_profile is not None:
+                    profiler.merge(shard_profile)
+                completed += shard_stop - shard_start
+            if block is not None:
+                futures = {
+                    executor.submit(_simulate_shard_shared, block.descriptor(), plan_id, plan_data,
+                                    shards[i][0], shards[i][1], horizons, seed, config.ANOMALY_LOG_FILE, profiling, cfg,
+                                    trajectory_samples): i
+                    for i in pending
+                }
+            else:
+                futures = {
+                    executor.submit(_simulate_shard, plan_id, plan_data, shards[i][0], shards[i][1],
+                                    horizons, seed, config.ANOMALY_LOG_FILE, profiling, cfg, trajectory_samples): i
+                    for i in pending
+                }
+            for future in as_completed(futures):
+                i = futures[future]
+                raw, (checks, anomalies), shard_profile, traces = future.result()
+                parts[i] = raw
+                if checkpoint is not None:
+                    full_raw = block.read(raw, *shards[i]) if block is not None else raw
+                    checkpoint.save(plan_id, shards[i][0], shards[i][1],
+                                    (full_raw, (checks, anomalies), shard_profile, traces))
+                trace_parts.append(traces)
+                VALIDATION_STATS['total_checks'] += checks
+                VALIDATION_STATS['total_anomalies'] += anomalies
+                if profiling and shard_profile is not None:
+                    profiler.merge(shard_profile)
+                completed += shards[i][1] - shards[i][0]
+                if observer is not None:
+                    observer.on_progress(make_progress_info(plan_id, completed, n_scenarios, start_time, VALIDATION_STATS))
+        except BaseException:
+            if block is not None:
+                for future in futures:
+                    future.cancel()
+                block.unlink()
+            raise
+        if block is not None:
+            # Все воркеры отписались - имя блока больше не нужно, память живет вместе с массивами
+            block.unlink()
+            results = ScenarioResults.from_raw(merge_scenario_results(parts), block.fields)
+        else:
+            results = ScenarioResults.from_raw(merge_scenario_results(parts))
+        if profiling:
+            profiler.start()
+    
+    for years in horizons:
+        results[years].update(baselines[years])
+    results.random_stream = (seed, plan_id)
     
     # Расчет итоговых показателей
-    print(f"  Расчет статистик и моды через scipy KDE...")
+    if observer is not None:
+        observer.on_stage(plan_id, 'statistics')
+    finalize_horizon_statistics(results, plan_data, n_scenarios, compute_mode_stats, cfg)
+    
+    # НОВОЕ: Выборка траекторий - объединение резервуаров и сценарии перцентилей
+    if trajectory_samples:
+        if profiling:
+            profiler.lap('statistics')
+        sample = TrajectoryReservoir.merge(trajectory_samples, seed, max(horizons) * 12, trace_parts)
+        results.trajectories = {
+            'sample': sample.traces(),
+            'quantiles': sample_quantile_trajectories(plan_id, plan_data, results, horizons=horizons, seed=seed,
+                                                      sim_config=cfg),
+        }
+        if profiling:
+            profiler.lap('trajectories')
+    
+    if profiling:
+        profiler.lap('statistics')
+        profiler.count('scenarios', n_scenarios)
+        profiler.count('scenario_months', n_scenarios * max(horizons) * 12)
+        profiler.stop()
+    
+    if observer is not None:
+        observer.on_plan_complete(plan_id, make_progress_info(plan_id, n_scenarios, n_scenarios, start_time, VALIDATION_STATS))
+    return results
+
+
+def finalize_horizon_statistics(results_by_horizon, plan_data, n_scenarios, compute_mode_stats=True,
+                                sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Итоговые статистики по горизонтам (средние, перцентили, мода, доли)
+    НОВОЕ: коэффициенты роста капитала - из таблицы sim_config.ideal_growth_factors
+    """
+    ideal_growth_factors = resolve_config(sim_config).ideal_growth_factors
     for years, horizon_data in results_by_horizon.items():
         months = years * 12
         net_wealth = horizon_data['net_wealth']
         final_debt = horizon_data['final_debt']
-        
+        # НОВОЕ: отсортированное распределение строится один раз на горизонт и
+        # переиспользуется отчетами (ScenarioResults.distribution)
+        if isinstance(results_by_horizon, ScenarioResults):
+            distribution = results_by_horizon.distribution(years)
+        else:
+            distribution = WealthDistribution(net_wealth)
+    
         horizon_data['avg_wealth'] = np.mean(net_wealth)
-        horizon_data['median_wealth'] = np.median(net_wealth)
-        
+        horizon_data['median_wealth'] = distribution.median()
+    
         # Расчет модальных значений и вероятностей
-        modal_data = calculate_mode_with_probabilities(net_wealth)
-        horizon_data['modal_wealth'] = modal_data['mode']
-        horizon_data['modal_density'] = modal_data['mode_density']
-        horizon_data['prob_near_mode_5pct'] = modal_data['prob_near_mode_5pct']
-        horizon_data['prob_near_mode_10pct'] = modal_data['prob_near_mode_10pct']
-        horizon_data['prob_above_mode'] = modal_data['prob_above_mode']
-        horizon_data['prob_below_mode'] = modal_data['prob_below_mode']
-        horizon_data['p10_wealth'] = np.percentile(net_wealth, 10)
-        horizon_data['p1_wealth'] = np.percentile(net_wealth, 1)  # ДОБАВЛЕН 1-й ПЕРЦЕНТИЛЬ
-        horizon_data['min_wealth'] = np.min(net_wealth)
-        horizon_data['max_wealth'] = np.max(net_wealth)
-        
+        if compute_mode_stats:
+            modal_data = calculate_mode_with_probabilities(net_wealth)
+            horizon_data['modal_wealth'] = modal_data['mode']
+            horizon_data['modal_density'] = modal_data['mode_density']
+            horizon_data['prob_near_mode_5pct'] = modal_data['prob_near_mode_5pct']
+            horizon_data['prob_near_mode_10pct'] = modal_data['prob_near_mode_10pct']
+            horizon_data['prob_above_mode'] = modal_data['prob_above_mode']
+            horizon_data['prob_below_mode'] = modal_data['prob_below_mode']
+        horizon_data['p10_wealth'] = distribution.percentile(10)
+        horizon_data['p1_wealth'] = distribution.percentile(1)  # ДОБАВЛЕН 1-й ПЕРЦЕНТИЛЬ
+        horizon_data['min_wealth'] = distribution.min
+        horizon_data['max_wealth'] = distribution.max
+    
         # Процент месяцев
         horizon_data['pct_zero'] = np.mean(horizon_data['months_zero']) / months * 100
-        
+    
         # Долги
         debt_mask = final_debt > 0
-        horizon_data['pct_in_debt'] = np.sum(debt_mask) / N_SCENARIOS * 100
+        horizon_data['pct_in_debt'] = np.sum(debt_mask) / n_scenarios * 100
         horizon_data['avg_debt'] = np.mean(final_debt[debt_mask]) if np.any(debt_mask) else 0
-        
+    
         # Денежный поток
-        horizon_data['real_avg_cash_flow'] = horizon_data['total_cash_flow'] / (N_SCENARIOS * months)
-        
+        horizon_data['real_avg_cash_flow'] = horizon_data['total_cash_flow'] / (n_scenarios * months)
+    
         # Среднее количество ЧП
         horizon_data['avg_minor_em'] = np.mean(horizon_data['minor_emergencies'])
         horizon_data['avg_medium_em'] = np.mean(horizon_data['medium_emergencies'])
         horizon_data['avg_major_em'] = np.mean(horizon_data['major_emergencies'])
-        
+    
         # Шоки %: Если есть данные
-        if horizon_data['shock_pcts']:
-            shock_array = np.array(horizon_data['shock_pcts'])
+        if len(horizon_data['shock_pcts']) > 0:
+            shock_array = np.asarray(horizon_data['shock_pcts'])
             horizon_data['median_shock_pct'] = np.median(shock_array)
             horizon_data['p90_shock_pct'] = np.percentile(shock_array, 90)
             horizon_data['p95_shock_pct'] = np.percentile(shock_array, 95)
@@ -1426,7 +2019,7 @@ def run_simulation(plan_id, plan_data):
             horizon_data['median_shock_pct'] = 0
             horizon_data['p90_shock_pct'] = 0
             horizon_data['p95_shock_pct'] = 0
-        
+    
         # Расчет вклада стартового капитала
         horizon_data['avg_direct_losses'] = np.mean(horizon_data['scenarios_direct_losses'])
         horizon_data['avg_compounding_loss'] = np.mean(horizon_data['scenarios_compounding_loss'])
@@ -1434,30 +2027,77 @@ def run_simulation(plan_id, plan_data):
             horizon_data['avg_compounding_loss'] / horizon_data['avg_direct_losses'] 
             if horizon_data['avg_direct_losses'] > 0 else 0
         )
-        
+    
         # Расчет вклада стартового капитала
         initial_capital = plan_data.get('initial_capital', 0) or 0
         if initial_capital > 0:
             # Потенциальная стоимость стартового капитала при идеальной доходности
-            ideal_growth_factor = (1 + IDEAL_RETURN_RATE) ** months
+            ideal_growth_factor = ideal_growth_factors[months]
             horizon_data['initial_capital_potential'] = initial_capital * ideal_growth_factor
             horizon_data['initial_capital_profit'] = horizon_data['initial_capital_potential'] - initial_capital
         else:
             horizon_data['initial_capital_potential'] = 0
             horizon_data['initial_capital_profit'] = 0
-        
+    
         # Статистика запланированных расходов
         horizon_data['avg_planned_expenses'] = np.mean(horizon_data['scenarios_planned_expenses'])
         horizon_data['avg_planned_compounding_loss'] = np.mean(horizon_data['scenarios_planned_compounding_loss'])
-        
+    
         # Финализация статистики по типам запланированных расходов
         for name, stats in horizon_data['planned_expenses_stats'].items():
             if stats['count'] > 0:
                 stats['avg_amount'] = stats['total_amount'] / stats['count']
-                stats['frequency'] = stats['count'] / N_SCENARIOS * 100
+                stats['frequency'] = stats['count'] / n_scenarios * 100
             else:
                 stats['avg_amount'] = 0
                 stats['frequency'] = 0
+
+
+def compute_all_results(plans=None, seed=None, compute_mode_stats=False, observer=None,
+                        horizons=None, n_scenarios=None, executor=None, sim_config=None):
+    """
+    НОВАЯ ФУНКЦИЯ: Быстрый "только расчет" без модулей отчетности
+
+    Не импортирует reporting и (при compute_mode_stats=False) scipy, поэтому
+    подходит для воркеров и сервисов, которым нужны только числа.
+
+    Args:
+        plans: словарь планов в формате PLANS (по умолчанию sim_config.plans)
+        seed: seed потоков случайных чисел сценариев (по умолчанию sim_config.random_seed)
+        compute_mode_stats: считать ли KDE-моду (требует scipy)
+        observer: наблюдатель за прогрессом (None = без вывода)
+        horizons, n_scenarios, executor, sim_config: см. run_simulation
+
+    Returns:
+        dict: all_results {plan_id: results_by_horizon}
+    """
+    cfg = resolve_config(sim_config)
+    if plans is None:
+        plans = cfg.plans
     
-    print(f"  Завершено за {time.time() - start_time:.1f} сек")
-    return results_by_horizon
\ No newline at end of file
+    all_results = {}
+    for plan_id, plan_data in plans.items():
+        all_results[plan_id] = run_simulation(plan_id, plan_data, observer=observer,
+                                              compute_mode_stats=compute_mode_stats, horizons=horizons,
+                                              n_scenarios=n_scenarios, seed=seed, executor=executor,
+                                              sim_config=cfg)
+    return all_results
+
+
+def horizon_summary(results_by_horizon):
+    """
+    НОВАЯ ФУНКЦИЯ: Скалярные показатели по горизонтам в JSON-совместимом виде
+
+    Берутся все числовые итоговые показатели (avg_wealth, median_wealth,
+    pct_in_debt, ...); массивы по сценариям и вложенные словари пропускаются.
+
+    Returns:
+        dict: {years (str): {показатель: float}}
+    """
+    summary = {}
+    for years, horizon_data in results_by_horizon.items():
+        summary[str(years)] = {
+            key: float(value) for key, value in horizon_data.items()
+            if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool)
+        }
+    return summary
@@ -0,0 +1,164 @@
+import sys
+import json
+import time
+import datetime
+
+
+def peak_memory_mb():
+    """
+    Пиковое потребление памяти процессом (МБ) или None, если недоступно
+    (модуль resource есть только на Unix-системах)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдает килобайты, macOS - байты
+    if sys.platform == 'darwin':
+        return usage / 1024 / 1024
+    return usage / 1024
+
+
+def make_progress_info(plan_id, completed, total, start_time, validation_stats):
+    """
+    Формирует словарь прогресса, который получают наблюдатели
+
+    Returns:
+        dict: plan_id, completed, total, fraction, elapsed, scenarios_per_sec,
+              eta, peak_memory_mb, validation_checks, validation_anomalies
+    """
+    elapsed = time.time() - start_time
+    rate = completed / elapsed if elapsed > 0 else 0
+    remaining = total - completed
+    return {
+        'plan_id': plan_id,
+        'completed': completed,
+        'total': total,
+        'fraction': completed / total if total > 0 else 1.0,
+        'elapsed': elapsed,
+        'scenarios_per_sec': rate,
+        'eta': remaining / rate if rate > 0 else None,
+        'peak_memory_mb': peak_memory_mb(),
+        'validation_checks': validation_stats['total_checks'],
+        'validation_anomalies': validation_stats['total_anomalies'],
+    }
+
+
+class SimulationObserver:
+    """
+    НОВОЕ: Базовый наблюдатель за ходом симуляции
+
+    Движок вызывает методы в ключевые моменты расчета. Все методы по умолчанию
+    ничего не делают, поэтому наследник переопределяет только нужные.
+    """
+    def on_run_start(self, plan_ids, n_scenarios):
+        """Начало расчета всех планов"""
+
+    def on_plan_start(self, plan_id, plan_data):
+        """Начало расчета одного плана"""
+
+    def on_progress(self, progress):
+        """Периодический прогресс (словарь из make_progress_info)"""
+
+    def on_stage(self, plan_id, stage):
+        """Переход к этапу вне помесячного цикла (например, 'statistics')"""
+
+    def on_plan_complete(self, plan_id, summary):
+        """Завершение плана (summary - словарь прогресса на момент завершения)"""
+
+    def on_run_complete(self, summary):
+        """Завершение всего расчета (total_time, n_scenarios, scenarios_per_sec, ...)"""
+
+
+class CompositeObserver(SimulationObserver):
+    """Рассылает события нескольким наблюдателям"""
+    def __init__(self, observers):
+        self.observers = [observer for observer in observers if observer is not None]
+
+    def on_run_start(self, plan_ids, n_scenarios):
+        for observer in self.observers:
+            observer.on_run_start(plan_ids, n_scenarios)
+
+    def on_plan_start(self, plan_id, plan_data):
+        for observer in self.observers:
+            observer.on_plan_start(plan_id, plan_data)
+
+    def on_progress(self, progress):
+        for observer in self.observers:
+            observer.on_progress(progress)
+
+    def on_stage(self, plan_id, stage):
+        for observer in self.observers:
+            observer.on_stage(plan_id, stage)
+
+    def on_plan_complete(self, plan_id, summary):
+        for observer in self.observers:
+            observer.on_plan_complete(plan_id, summary)
+
+    def on_run_complete(self, summary):
+        for observer in self.observers:
+            observer.on_run_complete(summary)
+
+
+class ConsoleReporter(SimulationObserver):
+    """Вывод прогресса в консоль (прежнее поведение run_simulation и main)"""
+    STAGE_MESSAGES = {
+        'statistics': "Расчет статистик и моды через scipy KDE...",
+    }
+
+    def on_plan_start(self, plan_id, plan_data):
+        print(f"\nЗапуск модели для Плана {plan_id} (начальный доход {plan_data['initial_income']}₽/мес, стартовый капитал {plan_data.get('initial_capital', 0):,}₽)...")
+
+    def on_progress(self, progress):
+        print(f"  {progress['completed']}/{progress['total']} ({progress['fraction']*100:.0f}%) - {progress['elapsed']:.1f} сек")
+
+    def on_stage(self, plan_id, stage):
+        print(f"  {self.STAGE_MESSAGES.get(stage, stage)}")
+
+    def on_plan_complete(self, plan_id, summary):
+        print(f"  Завершено за {summary['elapsed']:.1f} сек")
+
+    def on_run_complete(self, summary):
+        total_time = summary['total_time']
+        print(f"\nОбщее время расчета: {total_time/60:.1f} минут")
+        if total_time > 0:
+            print(f"Скорость: {summary['n_scenarios']/total_time:.0f} сценариев/сек")
+
+
+class JsonLinesReporter(SimulationObserver):
+    """
+    Запись событий в файл JSON Lines (одна JSON-запись на строку)
+    Удобно для сбора метрик сервисом без разбора консольного вывода
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._file = open(filepath, 'a', encoding='utf-8')
+
+    def _write(self, event, **payload):
+        record = {'event': event, 'timestamp': datetime.datetime.now().isoformat()}
+        record.update(payload)
+        self._file.write(json.dumps(record, ensure_ascii=False, default=float) + "\n")
+        self._file.flush()
+
+    def on_run_start(self, plan_ids, n_scenarios):
+        self._write('run_start', plan_ids=list(plan_ids), n_scenarios=n_scenarios)
+
+    def on_plan_start(self, plan_id, plan_data):
+        self._write('plan_start', plan_id=plan_id)
+
+    def on_progress(self, progress):
+        self._write('progress', **progress)
+
+    def on_stage(self, plan_id, stage):
+        self._write('stage', plan_id=plan_id, stage=stage)
+
+    def on_plan_complete(self, plan_id, summary):
+        self._write('plan_complete', **summary)
+
+    def on_run_complete(self, summary):
+        self._write('run_complete', **summary)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
@@ -0,0 +1,20 @@
+import copy
+
+import pytest
+
+import config
+import batch_simulation
+import jit_kernel
+
+
+@pytest.mark.parametrize('compiled', [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(not jit_kernel.NUMBA_AVAILABLE, reason='Numba не установлена')),
+])
+def test_jit_kernel_matches_numpy_engine(compiled):
+    """Ядро jit_kernel (в интерпретаторе и скомпилированное) совпадает с NumPy-движком побитово, включая долг и банкротства"""
+    poor = copy.deepcopy(config.PLANS['A'])
+    poor['initial_income'] = 85000
+    poor['initial_expenses'] = 84000
+    plans = list(config.PLANS.values()) + [poor]
+    assert batch_simulation.check_jit_backend(plans, n_scenarios=100, compiled=compiled) == []
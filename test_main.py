@@ -0,0 +1,17 @@
+import os
+
+import main
+
+
+def test_main_without_reports(tmp_path, capsys):
+    """Запуск без отчетов (--reports none) сохраняет выгрузки и завершается без ошибок"""
+    main.main(['--plans', 'A', '--horizons', '5', '--scenarios', '50', '--reports', 'none',
+               '--exports', 'metrics', '--checkpoint', '--output-dir', str(tmp_path)])
+    output = capsys.readouterr().out
+    assert "✓ Результаты успешно сохранены!" in output
+    assert "✗ Ошибка при сохранении" not in output
+
+    (run_dir,) = tmp_path.iterdir()
+    files = set(os.listdir(run_dir))
+    assert {'metrics.jsonl', 'debug_anomalies.log'} <= files
+    assert 'checkpoints' not in files
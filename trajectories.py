@@ -0,0 +1,132 @@
+import heapq
+
+import numpy as np
+
+# ===== ВЫБОРКА ПОЛНЫХ ТРАЕКТОРИЙ =====
+# Для детального разбора сохраняются помесячные траектории состояния и журнал
+# событий (ЧП, потери дохода, покупки, налог, реструктуризация, банкротство) для K
+# равномерно выбранных сценариев. Выборка - резервуар с приоритетами: у каждого
+# сценария детерминированный приоритет (хэш seed и номера сценария), в
+# резервуаре остаются K сценариев с наименьшими приоритетами. Такая выборка
+# равномерна, не зависит от деления сценариев между процессами (резервуары
+# диапазонов объединяются теми же K наименьшими) и занимает O(K × месяцы) памяти
+# при любом числе сценариев.
+
+# Показатели траектории на конец месяца (строки ScenarioTrace.values)
+TRACE_FIELDS = (
+    'cushion', 'savings', 'debt',                              # реальный сценарий
+    'virtual_cushion', 'virtual_savings', 'virtual_debt',      # виртуальный сценарий без шоков
+    'income', 'expenses', 'emergency_cost', 'income_loss',     # потоки месяца, ₽
+    'annual_growth',                                           # рост savings с начала года (база налога)
+    'debt_stage',                                              # 0 - нет долга, 1 - кредит, 2 - реструктуризация
+)
+
+# Стадии долга (значения поля debt_stage)
+DEBT_STAGE_NONE, DEBT_STAGE_NORMAL, DEBT_STAGE_RESTRUCTURED = 0, 1, 2
+
+_MASK64 = (1 << 64) - 1
+
+
+def scenario_priority(seed, scenario):
+    """Приоритет сценария в резервуаре: равномерное число [0, 1) из хэша SplitMix64 (seed, сценарий)"""
+    z = (seed * 0x9E3779B97F4A7C15 + scenario + 1) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return (z ^ (z >> 31)) / 2.0 ** 64
+
+
+class ScenarioTrace:
+    """
+    НОВОЕ: Помесячная траектория одного сценария
+
+    Атрибуты:
+        scenario: номер сценария
+        values: массив (TRACE_FIELDS × месяцы); столбец m - конец месяца m + 1
+                (на месяцах горизонтов - после финального погашения, как в результатах)
+        events: журнал событий - словари {'month', 'type', 'amount', ...}
+    """
+    __slots__ = ('scenario', 'values', 'events')
+
+    def __init__(self, scenario, n_months):
+        self.scenario = scenario
+        self.values = np.zeros((len(TRACE_FIELDS), n_months))
+        self.events = []
+
+    def record(self, month, cushion, savings, debt, virtual_cushion, virtual_savings, virtual_debt,
+               income, expenses, emergency_cost, income_loss, annual_growth, is_restructured):
+        """Состояние и потоки на конец месяца month"""
+        if debt <= 0:
+            debt_stage = DEBT_STAGE_NONE
+        else:
+            debt_stage = DEBT_STAGE_RESTRUCTURED if is_restructured else DEBT_STAGE_NORMAL
+        self.values[:, month - 1] = (cushion, savings, debt, virtual_cushion, virtual_savings, virtual_debt,
+                                     income, expenses, emergency_cost, income_loss, annual_growth, debt_stage)
+
+    def event(self, month, kind, amount, **details):
+        """
+        Событие журнала; kind: 'emergency', 'income_loss', 'purchase', 'tax',
+        'restructuring', 'bankruptcy'
+        """
+        self.events.append({'month': month, 'type': kind, 'amount': float(amount), **details})
+
+    def field(self, name):
+        """Траектория показателя TRACE_FIELDS по месяцам"""
+        return self.values[TRACE_FIELDS.index(name)]
+
+    @property
+    def net_wealth(self):
+        """Чистые активы на конец каждого месяца: (подушка + сбережения) - долг"""
+        return (self.field('cushion') + self.field('savings')) - self.field('debt')
+
+    def as_dict(self):
+        """JSON-совместимое представление (траектории - списки)"""
+        data = {'scenario': self.scenario, 'events': self.events}
+        for name, values in zip(TRACE_FIELDS, self.values):
+            data[name] = values.tolist()
+        return data
+
+
+class TrajectoryReservoir:
+    """
+    НОВОЕ: Резервуар K сценариев с наименьшими приоритетами scenario_priority
+
+    simulate_scenarios вызывает offer() в начале каждого сценария: если сценарий
+    проходит в резервуар, возвращается пустая ScenarioTrace для записи, иначе None.
+    Вытесненные траектории сразу освобождаются.
+    """
+
+    def __init__(self, k, seed, n_months):
+        self.k = k
+        self.seed = seed
+        self.n_months = n_months
+        self._heap = []  # (-приоритет, сценарий, траектория): на вершине - наибольший приоритет
+
+    def offer(self, scenario):
+        """Траектория для записи сценария или None, если он не попадает в выборку"""
+        if self.k <= 0:
+            return None
+        priority = scenario_priority(self.seed, scenario)
+        if len(self._heap) >= self.k and -self._heap[0][0] <= priority:
+            return None
+        trace = ScenarioTrace(scenario, self.n_months)
+        if len(self._heap) >= self.k:
+            heapq.heapreplace(self._heap, (-priority, scenario, trace))
+        else:
+            heapq.heappush(self._heap, (-priority, scenario, trace))
+        return trace
+
+    def traces(self):
+        """Траектории выборки в порядке номеров сценариев"""
+        return [trace for _, _, trace in sorted(self._heap, key=lambda item: item[1])]
+
+    @classmethod
+    def merge(cls, k, seed, n_months, parts):
+        """
+        Объединение выборок диапазонов сценариев (списков ScenarioTrace):
+        K наименьших приоритетов объединения - та же выборка, что и в одном процессе
+        """
+        merged = cls(k, seed, n_months)
+        candidates = [(scenario_priority(seed, trace.scenario), trace) for part in parts for trace in part]
+        for priority, trace in sorted(candidates, key=lambda item: item[0])[:k]:
+            heapq.heappush(merged._heap, (-priority, trace.scenario, trace))
+        return merged